@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark for VisitorCardGenerator3 (template/template3.jpg).
+Renders cards for N synthetic tourists and reports cards/sec and peak RSS.
+Half the tourists get a (synthetic) profile photo, half the initials placeholder;
+names and IDs vary in length so the wrap/fit paths are exercised.
+
+Usage:
+    python bench_card_render.py [count] [format]     # default 1000 png
+    format: png | png8 | webp | thumb
+"""
+import os
+import sys
+import time
+import random
+import resource
+import tempfile
+
+from PIL import Image
+
+from template_generator import VisitorCardGenerator3
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+FORMAT = sys.argv[2] if len(sys.argv) > 2 else "png"
+
+FIRST = ["Aarav", "Vivaan", "Aditya", "Saanvi", "Ananya", "Ishaan", "Diya", "Kabir",
+         "Meera", "Rohan", "Priyanka", "Venkataraghavan", "Lakshmi", "Arjun"]
+LAST = ["Sharma", "Verma", "Iyer", "Reddy", "Chatterjee", "Kumar", "Singh",
+        "Subramaniam", "Bhattacharya", "Nair"]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def make_photos(folder: str, n: int = 10) -> list:
+    paths = []
+    for i in range(n):
+        path = os.path.join(folder, f"photo_{i}.jpg")
+        color = tuple(random.randint(0, 255) for _ in range(3))
+        Image.new("RGB", (640, 800), color).save(path, "JPEG")
+        paths.append(path)
+    return paths
+
+
+def synthetic_tourists(count: int, photos: list) -> list:
+    tourists = []
+    for i in range(count):
+        name = " ".join(random.choice(FIRST if j == 0 else LAST) for j in range(random.randint(2, 4)))
+        tourists.append({
+            "name": name,
+            "phone": f"9{random.randint(100000000, 999999999)}",
+            "qr_data": f"TOURIST-{i}-{random.randint(10**5, 10**12)}",
+            "valid_date": "2026-02-27",
+            "group_count": random.randint(1, 6),
+            "profile_image_path": photos[i % len(photos)] if i % 2 == 0 else None,
+        })
+    return tourists
+
+
+if __name__ == "__main__":
+    random.seed(42)
+    generator = VisitorCardGenerator3()
+    with tempfile.TemporaryDirectory() as tmp:
+        tourists = synthetic_tourists(COUNT, make_photos(tmp))
+        rss_before = peak_rss_mb()
+
+        total_bytes = 0
+        start = time.perf_counter()
+        for user_data in tourists:
+            total_bytes += len(generator.generate_card_in_memory(user_data, FORMAT).getbuffer())
+        elapsed = time.perf_counter() - start
+
+    print(f"Cards rendered : {COUNT} ({FORMAT})")
+    print(f"Elapsed        : {elapsed:.2f} s")
+    print(f"Cards/sec      : {COUNT / elapsed:,.1f}")
+    print(f"Avg card size  : {total_bytes / COUNT / 1024:,.1f} KiB")
+    print(f"Peak RSS       : {peak_rss_mb():,.1f} MiB (before rendering: {rss_before:,.1f} MiB)")
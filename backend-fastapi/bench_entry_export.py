@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the entry CSV export (utils/services/entry_export.py).
+
+Builds N synthetic entry_items (default 500,000) spread over entry_records and
+tourists, then compares:
+  1. old join  — next(r for r in records if ...) per item + one giant StringIO
+                 (O(items × records); run on a small slice and extrapolated)
+  2. streaming — EXPORT_PAGE_SIZE record pages, dict joins, chunked CSV output
+
+Reports rows/sec, bytes produced, largest chunk and peak RSS.
+No database is touched — pages are sliced from the in-memory dataset.
+
+Usage:
+    python bench_entry_export.py [items]
+"""
+import io
+import csv
+import sys
+import time
+import random
+import asyncio
+import resource
+
+from utils.services import entry_export
+from utils.services.entry_export import ENTRY_EXPORT_HEADER, build_entry_rows, csv_chunks
+
+ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+OLD_SLICE = 3_000           # items used for the quadratic baseline
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def synthetic_dataset(n_items: int):
+    random.seed(7)
+    n_records = max(1, n_items * 2 // 5)
+    n_tourists = max(1, n_records // 3)
+    verifiers = [f"00000000-0000-0000-0000-{i:012d}" for i in range(40)]
+
+    tourists = {
+        uid: {
+            "user_id": uid, "name": f"Tourist {uid}", "phone": f"9{uid:09d}",
+            "unique_id_type": "Aadhar", "unique_id": f"{uid:012d}",
+            "is_group": uid % 4 == 0, "group_count": 1 + uid % 6,
+        }
+        for uid in range(1, n_tourists + 1)
+    }
+    records = [
+        {"record_id": rid, "user_id": random.randint(1, n_tourists),
+         "entry_date": f"2026-02-{25 + rid * 4 // n_records:02d}"}
+        for rid in range(1, n_records + 1)
+    ]
+    items = []
+    for iid in range(1, n_items + 1):
+        exited = iid % 3 != 0
+        items.append({
+            "item_id": iid,
+            "record_id": random.randint(1, n_records),
+            "arrival_time": f"2026-02-27T{8 + iid % 10:02d}:{iid % 60:02d}:00+05:30",
+            "departure_time": f"2026-02-27T{12 + iid % 8:02d}:{iid % 60:02d}:00+05:30" if exited else None,
+            "duration": f"0{iid % 9}:{iid % 60:02d}:00" if exited else None,
+            "entry_type": "normal",
+            "entry_point": f"Gate {1 + iid % 4}",
+            "approved_by_uid": random.choice(verifiers),
+        })
+    verifiers_map = {v: {"name": f"Guard {i}", "phone": f"8{i:09d}"} for i, v in enumerate(verifiers)}
+    return records, items, tourists, verifiers_map
+
+
+def old_export(records, items, tourists, verifiers_map) -> int:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(ENTRY_EXPORT_HEADER)
+    for item in items:
+        record = next((r for r in records if r["record_id"] == item["record_id"]), None)
+        if not record:
+            continue
+        rows = build_entry_rows([item], {record["record_id"]: record}, tourists, verifiers_map)
+        for row in rows:
+            writer.writerow(row)
+    return len(output.getvalue())
+
+
+async def streaming_export(records, items, tourists, verifiers_map):
+    page_size = entry_export.EXPORT_PAGE_SIZE
+    items_by_record = {}
+    for item in items:
+        items_by_record.setdefault(item["record_id"], []).append(item)
+
+    async def pages():
+        for start in range(0, len(records), page_size):
+            page = records[start:start + page_size]
+            records_map = {r["record_id"]: r for r in page}
+            page_items = [i for rid in records_map for i in items_by_record.get(rid, ())]
+            page_tourists = {r["user_id"]: tourists[r["user_id"]] for r in page}
+            yield list(build_entry_rows(page_items, records_map, page_tourists, verifiers_map))
+
+    total = largest = 0
+    async for chunk in csv_chunks(pages()):
+        total += len(chunk)
+        largest = max(largest, len(chunk))
+    return total, largest
+
+
+if __name__ == "__main__":
+    records, items, tourists, verifiers_map = synthetic_dataset(ITEMS)
+    print(f"Dataset: {len(items):,} items / {len(records):,} records / {len(tourists):,} tourists")
+    print(f"RSS after building dataset: {peak_rss_mb():,.1f} MiB\n")
+
+    subset = items[:OLD_SLICE]
+    start = time.perf_counter()
+    old_export(records, subset, tourists, verifiers_map)
+    old_elapsed = time.perf_counter() - start
+    old_rate = len(subset) / old_elapsed
+    print(f"old join      : {old_rate:>12,.0f} rows/sec on {len(subset):,} items "
+          f"→ ~{len(items) / old_rate / 60:,.1f} min extrapolated for {len(items):,}")
+
+    start = time.perf_counter()
+    total_bytes, largest_chunk = asyncio.run(streaming_export(records, items, tourists, verifiers_map))
+    new_elapsed = time.perf_counter() - start
+    print(f"streaming     : {len(items) / new_elapsed:>12,.0f} rows/sec "
+          f"({new_elapsed:.2f} s, {total_bytes / 1024 / 1024:,.1f} MiB CSV, largest chunk {largest_chunk / 1024:,.0f} KiB)")
+    print(f"\nPeak RSS: {peak_rss_mb():,.1f} MiB")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Load test for QR entry scans (POST /entry/ → routes/entry_route.py).
+Compares the old 4-round-trip path with the single record_entry RPC
+(supabase_rpc_record_entry.sql) against a real Supabase project:
+
+  old  — verify_qr_code RPC → select entry_records → insert entry_records → insert entry_items
+  new  — record_entry RPC
+
+Each path runs SCANS scans at CONCURRENCY concurrent "gates" through the same
+db_execute thread pool the API uses, and reports scans/sec and p50 / p95 latency.
+
+⚠️  Writes real entry_items / entry_records — run it against a staging project.
+    Everything it creates is deleted afterwards (records that existed before
+    the run are kept).
+
+Usage:
+    python bench_entry_scan.py <short_code>[,<short_code>...] [event_id] [scans] [concurrency]
+    e.g. python bench_entry_scan.py AB12CD,EF34GH 1 500 20
+
+The short codes must belong to tourists whose valid_date is today (India time).
+"""
+import sys
+import time
+import asyncio
+import statistics
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
+from utils.india_time import india_today
+
+CODES = sys.argv[1].split(",") if len(sys.argv) > 1 else []
+EVENT_ID = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+SCANS = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+CONCURRENCY = int(sys.argv[4]) if len(sys.argv) > 4 else 20
+
+TODAY = str(india_today())
+METADATA = {"short_code": None, "verified_by_role": "admin", "verified_by_name": "bench_entry_scan"}
+
+created_items: list = []
+
+
+async def old_scan(short_code: str) -> None:
+    verify = await db_execute(supabaseAdmin.rpc(
+        "verify_qr_code", {"p_short_code": short_code, "p_event_id": EVENT_ID, "p_entry_date": TODAY}
+    ))
+    qr_data = verify.data[0]
+    if not qr_data.get("success"):
+        raise RuntimeError(qr_data.get("message"))
+    user_id = qr_data["user_id"]
+
+    record_resp = await db_execute(
+        supabaseAdmin.table("entry_records").select("*")
+        .eq("user_id", user_id).eq("event_id", EVENT_ID).eq("entry_date", TODAY)
+    )
+    if record_resp.data:
+        record_id = record_resp.data[0]["record_id"]
+    else:
+        new_record = await db_execute(supabaseAdmin.table("entry_records").insert(
+            {"user_id": user_id, "event_id": EVENT_ID, "entry_date": TODAY}
+        ))
+        record_id = new_record.data[0]["record_id"]
+
+    item_resp = await db_execute(supabaseAdmin.table("entry_items").insert({
+        "record_id": record_id,
+        "arrival_time": datetime.now(timezone.utc).isoformat(),
+        "entry_type": "qr_code_scan",
+        "metadata": {**METADATA, "short_code": short_code, "entry_number": qr_data["total_entries_today"] + 1},
+    }))
+    created_items.append(item_resp.data[0]["item_id"])
+
+
+async def new_scan(short_code: str) -> None:
+    resp = await db_execute(supabaseAdmin.rpc("record_entry", {
+        "p_short_code": short_code,
+        "p_event_id": EVENT_ID,
+        "p_entry_date": TODAY,
+        "p_approved_by_uid": None,
+        "p_metadata": {**METADATA, "short_code": short_code},
+    }))
+    result = resp.data[0]
+    if not result.get("success"):
+        raise RuntimeError(result.get("message"))
+    created_items.append(result["entry_item"]["item_id"])
+
+
+async def run(scan) -> dict:
+    latencies, errors = [], 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(SCANS):
+        queue.put_nowait(CODES[i % len(CODES)])
+
+    async def gate():
+        nonlocal errors
+        while not queue.empty():
+            code = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                await scan(code)
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(gate() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "scans/sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) if latencies else 0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] if latencies else 0,
+        "errors": errors,
+    }
+
+
+async def existing_record_ids() -> set:
+    meta = await db_execute(supabaseAdmin.table("tourist_meta").select("user_id").in_("qr_code", CODES))
+    user_ids = [m["user_id"] for m in meta.data or []]
+    if not user_ids:
+        return set()
+    records = await db_execute(
+        supabaseAdmin.table("entry_records").select("record_id")
+        .in_("user_id", user_ids).eq("event_id", EVENT_ID).eq("entry_date", TODAY)
+    )
+    return {r["record_id"] for r in records.data or []}
+
+
+async def cleanup(records_before: set) -> None:
+    for start in range(0, len(created_items), 200):
+        await db_execute(supabaseAdmin.table("entry_items").delete().in_("item_id", created_items[start:start + 200]))
+    new_records = await existing_record_ids() - records_before
+    if new_records:
+        await db_execute(supabaseAdmin.table("entry_records").delete().in_("record_id", list(new_records)))
+    print(f"\nCleaned up {len(created_items)} entry_items, {len(new_records)} entry_records")
+
+
+async def main():
+    if not CODES:
+        print(__doc__)
+        return
+    print(f"{SCANS} scans × {len(CODES)} code(s), concurrency {CONCURRENCY}, event {EVENT_ID}, date {TODAY}\n")
+    records_before = await existing_record_ids()
+    try:
+        for name, scan in (("old (4 round-trips)", old_scan), ("new (record_entry)", new_scan)):
+            result = await run(scan)
+            print(f"{name:<22}: {result['scans/sec']:>8,.1f} scans/sec   "
+                  f"p50 {result['p50_ms']:>7,.1f} ms   p95 {result['p95_ms']:>7,.1f} ms   errors {result['errors']}")
+    finally:
+        await cleanup(records_before)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
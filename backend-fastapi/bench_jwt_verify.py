@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for jwt_middleware token verification.
+Compares verifications/sec for:
+  1. old path   — get_unverified_header + jwk.construct().to_pem() + ES256 decode
+  2. cold path  — pre-built key per kid (utils/supabase/auth_key.PUBLIC_KEYS) + decode
+  3. cached     — verified-token LRU hit (utils/supabase/token_cache)
+
+Runs offline: signs its own ES256 tokens and seeds the JWKS cache directly.
+
+Usage:
+    python bench_jwt_verify.py [iterations]
+"""
+import sys
+import time
+import json
+
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives import serialization
+from jose import jwt, jwk
+
+from utils.supabase import auth_key, token_cache
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+KID = "bench-key"
+
+
+def make_keypair():
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    public_jwk = jwk.construct(public_pem, "ES256").to_dict()
+    public_jwk.update({"kid": KID, "alg": "ES256", "use": "sig"})
+    return private_pem, public_jwk
+
+
+def make_token(private_pem) -> str:
+    now = int(time.time())
+    claims = {
+        "sub": "bench-user",
+        "aud": "authenticated",
+        "iss": auth_key.ISSUER,
+        "iat": now,
+        "exp": now + 3600,
+        "app_metadata": {"role": "security"},
+    }
+    return jwt.encode(claims, private_pem, algorithm="ES256", headers={"kid": KID})
+
+
+def decode(token, key):
+    return jwt.decode(
+        token,
+        key,
+        algorithms=["ES256"],
+        audience="authenticated",
+        issuer=auth_key.ISSUER,
+        options={"verify_aud": True},
+    )
+
+
+def old_path(token, keys):
+    kid = jwt.get_unverified_header(token).get("kid")
+    for key in keys:
+        if key["kid"] == kid:
+            return decode(token, jwk.construct(key).to_pem())
+
+
+def cold_path(token):
+    # same lookup as auth_key.get_public_key() once the keys are loaded
+    return decode(token, auth_key.PUBLIC_KEYS[auth_key.get_token_kid(token)])
+
+
+def cached_path(token):
+    payload = token_cache.get_cached_payload(token)
+    if payload is None:
+        payload = cold_path(token)
+        token_cache.cache_payload(token, payload)
+    return payload
+
+
+def bench(name, fn, *args):
+    fn(*args)  # warm-up
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn(*args)
+    elapsed = time.perf_counter() - start
+    rate = ITERATIONS / elapsed
+    print(f"{name:<28} {rate:>12,.0f} verifications/sec   ({elapsed * 1e6 / ITERATIONS:,.1f} µs each)")
+    return rate
+
+
+if __name__ == "__main__":
+    private_pem, public_jwk = make_keypair()
+    keys = [public_jwk]
+
+    # Seed the JWKS cache so nothing touches the network
+    auth_key._build_public_keys(keys)
+    auth_key.JWKS_CACHE["keys"] = keys
+    auth_key.JWKS_CACHE["fetched_at"] = time.time()
+
+    token = make_token(private_pem)
+    print(f"Iterations: {ITERATIONS}\n")
+
+    before = bench("old (construct + to_pem)", old_path, token, keys)
+    cold = bench("pre-built key per kid", cold_path, token)
+    after = bench("LRU cache hit", cached_path, token)
+
+    print(f"\nSpeed-up  pre-built key: {cold / before:.1f}x   cache hit: {after / before:.1f}x")
+    print("Cache stats:", json.dumps(token_cache.stats()))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the short-code allocator (utils/services/short_code_allocator.py).
+
+  1. uniqueness   — N consecutive indexes → N distinct codes of SHORT_CODE_LENGTH
+                    chars (the Feistel permutation is a bijection)
+  2. single       — allocate_short_code() one at a time, as registrations do
+  3. concurrent   — many tasks allocating at once across block boundaries:
+                    no duplicates, one lease per SHORT_CODE_BLOCK_SIZE codes
+  4. bulk         — allocate_short_codes(300), a bulk-registration manifest
+
+Target: ≥ 10,000 allocations / sec.  The lease RPC is served from memory
+(counted), so no DB is needed; in production it is one round-trip per block.
+
+Usage (SHORT_CODE_SECRET must be set, as in production):
+    SHORT_CODE_SECRET=$(openssl rand -hex 32) python bench_short_code_allocator.py [codes]
+"""
+import sys
+import time
+import asyncio
+from types import SimpleNamespace
+
+from utils.services import short_code_allocator as sca
+
+CODES = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+TARGET_PER_SEC = 10_000
+
+
+class LeaseCounter:
+    """In-memory stand-in for the lease_short_code_block RPC."""
+
+    def __init__(self):
+        self.next_index = 0
+        self.leases = 0
+
+    def rpc(self, name, params):
+        return params["p_size"]
+
+    async def execute(self, size):
+        self.leases += 1
+        start, self.next_index = self.next_index, self.next_index + size
+        return SimpleNamespace(data=start)
+
+
+def use_lease_counter() -> LeaseCounter:
+    lease = LeaseCounter()
+    sca.supabaseAdmin = lease
+    sca.db_execute = lease.execute
+    sca._block.update(next=0, end=0)
+    return lease
+
+
+async def main():
+    results = []
+    print(f"{CODES:,} codes, length {sca.SHORT_CODE_LENGTH}, block {sca.SHORT_CODE_BLOCK_SIZE}\n")
+
+    # ── Uniqueness ────────────────────────────────────────────────────────
+    started = time.perf_counter()
+    codes = [sca.short_code_for(i) for i in range(CODES)]
+    elapsed = time.perf_counter() - started
+    distinct = len(set(codes)) == CODES and all(len(c) == sca.SHORT_CODE_LENGTH for c in codes)
+    print(f"index → code   : {CODES / elapsed:10,.0f} / s   e.g. {codes[0]} {codes[1]} {codes[2]}")
+    results.append(distinct)
+    print(f"{'✅' if distinct else '❌'} {CODES:,} consecutive indexes → distinct codes")
+
+    # ── One at a time ─────────────────────────────────────────────────────
+    lease = use_lease_counter()
+    started = time.perf_counter()
+    single = [await sca.allocate_short_code() for _ in range(CODES)]
+    per_sec = CODES / (time.perf_counter() - started)
+    ok = per_sec >= TARGET_PER_SEC and len(set(single)) == CODES
+    results.append(ok)
+    print(f"\nsingle         : {per_sec:10,.0f} / s   {lease.leases} leases (DB calls) for {CODES:,} codes")
+    print(f"{'✅' if ok else '❌'} {per_sec:,.0f} allocations / s (target ≥ {TARGET_PER_SEC:,})")
+
+    # ── Concurrent tasks ──────────────────────────────────────────────────
+    lease = use_lease_counter()
+    tasks, per_task = 100, CODES // 100
+
+    async def worker():
+        out = []
+        for _ in range(per_task):
+            out.append(await sca.allocate_short_code())
+            if len(out) % 50 == 0:
+                await asyncio.sleep(0)   # interleave with the other tasks
+        return out
+
+    started = time.perf_counter()
+    batches = await asyncio.gather(*(worker() for _ in range(tasks)))
+    per_sec = tasks * per_task / (time.perf_counter() - started)
+    allocated = [c for batch in batches for c in batch]
+    expected_leases = -(-len(allocated) // sca.SHORT_CODE_BLOCK_SIZE)
+    ok = len(set(allocated)) == len(allocated) and lease.leases == expected_leases
+    results.append(ok)
+    print(f"\nconcurrent     : {per_sec:10,.0f} / s   {tasks} tasks, {lease.leases} leases")
+    print(f"{'✅' if ok else '❌'} {len(allocated):,} codes from {tasks} tasks, no duplicates")
+
+    # ── Bulk manifest ─────────────────────────────────────────────────────
+    lease = use_lease_counter()
+    started = time.perf_counter()
+    bulk = await sca.allocate_short_codes(300)
+    took_ms = (time.perf_counter() - started) * 1000
+    ok = len(set(bulk)) == 300 and lease.leases == 1
+    results.append(ok)
+    print(f"\nbulk (300)     : {took_ms:8.2f} ms   {lease.leases} lease")
+    print(f"{'✅' if ok else '❌'} 300 codes for one manifest in one lease")
+
+    print(f"\nstats: {sca.stats()}")
+    return all(results)
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the in-process tourist search index (utils/services/tourist_search.py).
+
+Builds an index of N synthetic registrations (Latin + Devanagari names,
+10-digit phones, 6-char short codes), then times:
+  1. bulk load            — what warm_tourist_search_index does at startup
+  2. live adds            — index_tourist() after a registration
+  3. queries              — name fragments, phone prefixes, short-code prefixes
+     and misses, reporting p50 / p99 / max (target: p99 < 10 ms at 200k)
+  4. a linear ILIKE-style scan over the same rows, for comparison
+
+Runs offline — no DB / Redis needed.
+
+Usage:
+    python bench_tourist_search.py [registrations] [queries]
+"""
+import sys
+import time
+import random
+import string
+
+from utils.services import tourist_search as ts
+
+REGISTRATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+QUERIES = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+EVENT_ID = 1
+
+FIRST_LATIN = ["Ravi", "Rahul", "Priya", "Anita", "Suresh", "Ramesh", "Kavita", "Deepak", "Sunita", "Amit",
+               "Pooja", "Vijay", "Neha", "Sanjay", "Meena", "José", "Zoë", "Arjun", "Lakshmi", "Gopal"]
+LAST_LATIN = ["Kumar", "Sharma", "Patel", "Singh", "Gupta", "Verma", "Reddy", "Nair", "Iyer", "Joshi",
+              "Das", "Mehta", "Chauhan", "Yadav", "Mishra", "Pandey", "Rao", "Bhat", "Kulkarni", "Ghosh"]
+FIRST_DEVA = ["रवि", "राहुल", "प्रिया", "अनीता", "सुरेश", "रमेश", "कविता", "दीपक", "सुनीता", "अमित"]
+LAST_DEVA = ["कुमार", "शर्मा", "पटेल", "सिंह", "गुप्ता", "वर्मा", "यादव", "मिश्रा", "पांडेय", "ज़ैदी"]
+
+
+def make_tourists(n: int, rng: random.Random) -> list:
+    alphabet = string.ascii_letters + string.digits
+    tourists = []
+    for user_id in range(1, n + 1):
+        if rng.random() < 0.3:
+            name = f"{rng.choice(FIRST_DEVA)} {rng.choice(LAST_DEVA)}"
+        else:
+            name = f"{rng.choice(FIRST_LATIN)} {rng.choice(LAST_LATIN)}{rng.randint(0, 999)}"
+        tourists.append({
+            "user_id": user_id,
+            "name": name,
+            "phone": 6_000_000_000 + rng.randrange(3_999_999_999),
+            "short_code": "".join(rng.choice(alphabet) for _ in range(6)),
+            "valid_date": "2026-03-01",
+            "is_group": rng.random() < 0.2,
+            "group_count": rng.randint(2, 6),
+        })
+    return tourists
+
+
+def make_queries(tourists: list, n: int, rng: random.Random) -> list:
+    queries = []
+    for _ in range(n):
+        t = rng.choice(tourists)
+        kind = rng.random()
+        if kind < 0.35:
+            word = rng.choice(t["name"].split())
+            start = rng.randrange(max(1, len(word) - 3))
+            queries.append(word[start:start + rng.randint(3, 6)])
+        elif kind < 0.45:
+            queries.append(t["name"][:2])
+        elif kind < 0.70:
+            queries.append(str(t["phone"])[:rng.randint(4, 10)])
+        elif kind < 0.90:
+            queries.append(t["short_code"][:rng.randint(3, 6)])
+        else:
+            queries.append("".join(rng.choice("qxz") for _ in range(5)))
+    return queries
+
+
+def percentile(sorted_ms: list, pct: float) -> float:
+    return sorted_ms[min(len(sorted_ms) - 1, int(len(sorted_ms) * pct / 100))]
+
+
+def main():
+    rng = random.Random(42)
+    tourists = make_tourists(REGISTRATIONS, rng)
+    live = tourists[-1000:]
+    queries = make_queries(tourists, QUERIES, rng)
+    print(f"{REGISTRATIONS:,} registrations, {QUERIES:,} queries\n")
+
+    # ── Bulk load ─────────────────────────────────────────────────────────
+    started = time.perf_counter()
+    index = ts._indexes[EVENT_ID] = ts._EventIndex()
+    for t in tourists[:-len(live)]:
+        index.add(t)
+    index.finish_load()
+    print(f"bulk load      : {time.perf_counter() - started:6.2f} s  "
+          f"({len(index.grams):,} trigrams)")
+
+    # ── Live adds ─────────────────────────────────────────────────────────
+    started = time.perf_counter()
+    for t in live:
+        ts.index_tourist(EVENT_ID, t)
+    per_add = (time.perf_counter() - started) / len(live) * 1000
+    print(f"live add       : {per_add:6.3f} ms / registration")
+
+    # ── Queries ───────────────────────────────────────────────────────────
+    timings, hits = [], 0
+    for q in queries:
+        started = time.perf_counter()
+        results = ts.search_tourists(EVENT_ID, q, limit=20)
+        timings.append((time.perf_counter() - started) * 1000)
+        hits += bool(results)
+    timings.sort()
+    p99 = percentile(timings, 99)
+    print(f"index search   : p50 {percentile(timings, 50):6.3f} ms   p99 {p99:6.3f} ms   "
+          f"max {timings[-1]:6.3f} ms   ({hits:,}/{len(queries):,} with results)")
+
+    # ── Linear scan for comparison ────────────────────────────────────────
+    sample = queries[:200]
+    started = time.perf_counter()
+    for q in sample:
+        needle = q.casefold()
+        [t for t in tourists if needle in t["name"].casefold() or str(t["phone"]).startswith(q)][:20]
+    per_scan = (time.perf_counter() - started) / len(sample) * 1000
+    print(f"linear scan    : {per_scan:6.3f} ms / query (ILIKE-style, {len(sample)} queries)")
+
+    ok = p99 < 10
+    print(f"\n{'✅' if ok else '❌'} p99 {p99:.3f} ms (target < 10 ms)")
+    return ok
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,283 @@
+"""
+Shared helpers for the test_*.py scripts — check() and an in-memory
+stand-in for supabaseAdmin / db_execute.
+
+Import:
+    from fake_supabase import FakeDB, check, use_fake_db
+
+    db = FakeDB({"tourists": [...], "tourist_meta": [...]})
+    use_fake_db(db, tourist_route, batch_loader)   # patches supabaseAdmin + db_execute
+    ...
+    db.queries  → ["tourists", "insert tourist_meta", "rpc:lease_short_code_block", …]
+
+FakeQuery records the PostgREST builder calls the code makes (select / insert /
+update / delete, eq, neq, gt, gte, lt, lte, in_, like, ilike, is_, or_, order,
+limit, range, single) and FakeDB evaluates them against its tables.  Filter
+values are cast to the type of the row value, so eq("user_id", "5") matches 5
+the way PostgREST would.
+
+Table-specific behaviour (unique constraints, generated ids, injected
+failures) goes in a subclass overriding insert_rows(); RPCs are registered
+as callables in db.rpcs.
+"""
+import re
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+
+def check(name: str, ok: bool) -> bool:
+    print(f"{'✅' if ok else '❌'} {name}")
+    return ok
+
+
+def use_fake_db(db: "FakeDB", *modules) -> None:
+    for module in modules:
+        module.supabaseAdmin = db
+        module.db_execute = db.execute
+
+
+# ─── Filters ──────────────────────────────────────────────────────────────────
+def _cast(value, like):
+    """value (often a string from a filter expression) as the type of the row value `like`."""
+    if value is None or like is None or isinstance(like, bool):
+        return value
+    try:
+        if isinstance(like, int) and not isinstance(value, int):
+            return int(value)
+        if isinstance(like, float):
+            return float(value)
+    except (TypeError, ValueError):
+        return value
+    if isinstance(like, str) and not isinstance(value, str):
+        return str(value)
+    return value
+
+
+def _like(pattern: str, flags: int = 0) -> Callable:
+    """SQL LIKE pattern (% _ and PostgREST's *, backslash escapes) → fullmatch function."""
+    out, i = "", 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern):
+            out += re.escape(pattern[i + 1])
+            i += 2
+            continue
+        out += ".*" if ch in "%*" else "." if ch == "_" else re.escape(ch)
+        i += 1
+    return re.compile(out, flags | re.S).fullmatch
+
+
+def _compare(op: str, column: str, value) -> Callable:
+    def test(row: dict) -> bool:
+        current = row.get(column)
+        if op == "is":
+            return current is None if value in (None, "null") else current == value
+        if op in ("like", "ilike"):
+            return current is not None and bool(_like(str(value), re.I if op == "ilike" else 0)(str(current)))
+        if op == "in":
+            return current in {_cast(v, current) for v in value}
+        target = _cast(value, current)
+        if op == "eq":
+            return current == target
+        if op == "neq":
+            return current != target
+        if current is None or target is None:
+            return False
+        return {"gt": current > target, "gte": current >= target,
+                "lt": current < target, "lte": current <= target}[op]
+    return test
+
+
+def _split_top_level(expr: str) -> list:
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(expr):
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append(expr[start:i])
+            start = i + 1
+    parts.append(expr[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _parse_or(expr: str) -> Callable:
+    """PostgREST logic tree — "a.gt.1,and(b.eq.\"x\",c.lt.2)" — as a row predicate (any of the terms)."""
+    def term(text: str) -> Callable:
+        for combinator, join in (("and(", all), ("or(", any)):
+            if text.startswith(combinator) and text.endswith(")"):
+                subs = [term(t) for t in _split_top_level(text[len(combinator):-1])]
+                return lambda row: join(f(row) for f in subs)
+        column, op, value = text.split(".", 2)
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        return _compare(op, column, value)
+
+    terms = [term(t) for t in _split_top_level(expr)]
+    return lambda row: any(f(row) for f in terms)
+
+
+# ─── Builder + tables ─────────────────────────────────────────────────────────
+class FakeQuery:
+    """Records the builder calls; FakeDB.run evaluates them."""
+
+    def __init__(self, db: "FakeDB", table: str, params: Optional[dict] = None):
+        self.db = db
+        self.table = table
+        self.params = params
+        self.verb = "select"
+        self.rows = None
+        self.values = None
+        self.filters: list = []
+        self.orders: list = []
+        self.row_limit = None
+        self.row_range = None
+        self.one = False
+        self.count = None
+
+    # Verbs
+    def select(self, *_, count=None):
+        self.count = count
+        return self
+
+    def insert(self, rows):
+        self.verb, self.rows = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, values: dict):
+        self.verb, self.values = "update", values
+        return self
+
+    def delete(self):
+        self.verb = "delete"
+        return self
+
+    # Filters
+    def _filter(self, op: str, column: str, value):
+        self.filters.append(_compare(op, column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter("eq", column, value)
+
+    def neq(self, column, value):
+        return self._filter("neq", column, value)
+
+    def gt(self, column, value):
+        return self._filter("gt", column, value)
+
+    def gte(self, column, value):
+        return self._filter("gte", column, value)
+
+    def lt(self, column, value):
+        return self._filter("lt", column, value)
+
+    def lte(self, column, value):
+        return self._filter("lte", column, value)
+
+    def in_(self, column, values):
+        return self._filter("in", column, list(values))
+
+    def like(self, column, pattern):
+        return self._filter("like", column, pattern)
+
+    def ilike(self, column, pattern):
+        return self._filter("ilike", column, pattern)
+
+    def is_(self, column, value):
+        return self._filter("is", column, value)
+
+    def or_(self, expr: str):
+        self.filters.append(_parse_or(expr))
+        return self
+
+    # Shaping
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n):
+        self.row_limit = n
+        return self
+
+    def range(self, start, end):
+        self.row_range = (start, end)
+        return self
+
+    def single(self):
+        self.one = True
+        return self
+
+    maybe_single = single
+
+    def execute(self):
+        return self.db.run(self)
+
+
+class FakeDB:
+    def __init__(self, tables: Optional[dict] = None):
+        self.tables: dict = tables if tables is not None else {}
+        self.rpcs: dict = {}          # name → callable(params) → data
+        self.queries: list = []
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Optional[dict] = None) -> FakeQuery:
+        return FakeQuery(self, f"rpc:{name}", params or {})
+
+    async def execute(self, query: FakeQuery):
+        return self.run(query)
+
+    def count_during(self, coro):
+        """Await coro → (result, the queries it made)."""
+        start = len(self.queries)
+
+        async def _run():
+            result = await coro
+            return result, self.queries[start:]
+        return _run()
+
+    # Hooks
+    def insert_rows(self, table: str, rows: list) -> list:
+        """Append copies of rows to table; override for constraints / generated ids."""
+        inserted = [dict(row) for row in rows]
+        self.tables.setdefault(table, []).extend(inserted)
+        return inserted
+
+    # Evaluation
+    def matching(self, query: FakeQuery) -> list:
+        return [r for r in self.tables.setdefault(query.table, []) if all(f(r) for f in query.filters)]
+
+    def run(self, query: FakeQuery):
+        if query.table.startswith("rpc:"):
+            self.queries.append(query.table)
+            return SimpleNamespace(data=self.rpcs[query.table[4:]](query.params))
+        self.queries.append(query.table if query.verb == "select" else f"{query.verb} {query.table}")
+
+        if query.verb == "insert":
+            return SimpleNamespace(data=self.insert_rows(query.table, query.rows))
+        rows = self.matching(query)
+        if query.verb == "update":
+            for row in rows:
+                row.update(query.values)
+            return SimpleNamespace(data=[dict(r) for r in rows])
+        if query.verb == "delete":
+            gone = {id(r) for r in rows}
+            self.tables[query.table][:] = [r for r in self.tables[query.table] if id(r) not in gone]
+            return SimpleNamespace(data=rows)
+
+        total = len(rows)
+        for column, desc in reversed(query.orders):
+            rows.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+        if query.row_range:
+            rows = rows[query.row_range[0]:query.row_range[1] + 1]
+        if query.row_limit is not None:
+            rows = rows[:query.row_limit]
+        rows = [dict(r) for r in rows]
+        if query.one:
+            return SimpleNamespace(data=rows[0] if rows else None)
+        return SimpleNamespace(data=rows, count=total if query.count else None)
@@ -1,5 +1,5 @@
 import os
-from fastapi import FastAPI, Depends, UploadFile, File, Form, Query
+from fastapi import FastAPI, Depends, UploadFile, File, Form, Query, Request
 from fastapi.responses import JSONResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 import shutil
@@ -32,15 +32,52 @@ os.makedirs("static/temp-card",  exist_ok=True)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
+# Per-request DB query count / time — see utils/supabase/db.py
+from utils.supabase.db import begin_request_stats
+
+@app.middleware("http")
+async def db_request_metrics(request, call_next):
+    stats = begin_request_stats()
+    response = await call_next(request)
+    response.headers["X-DB-Queries"] = str(stats.queries)
+    response.headers["X-DB-Time-Ms"] = f"{stats.total_ms:.1f}"
+    return response
+
+
 import asyncio
-from utils.services.card_cache import run_cleanup_loop
+from utils.services.card_cache import run_cleanup_loop, conditional_file_response
+from utils.services.event_cache import run_invalidation_listener
+from utils.supabase.auth_key import run_jwks_refresh_loop
+from utils.services.card_renderer import shutdown_render_pool
+from utils.services.card_render_queue import run_prerender_workers
+from utils.services.staff_directory import run_staff_directory_refresh_loop
+from utils.services.short_code_index import warm_short_code_index
+from utils.services.gate_write_queue import run_gate_write_workers
+from utils.services.occupancy import run_occupancy_reconcile_loop
+from utils.services.analytics_feed import run_analytics_feed
+from utils.services.tourist_search import warm_tourist_search_index, run_tourist_search_listener
 
 @app.on_event("startup")
 async def startup():
     asyncio.create_task(run_cleanup_loop())
+    asyncio.create_task(run_invalidation_listener())
+    asyncio.create_task(run_jwks_refresh_loop())
+    asyncio.create_task(run_prerender_workers())
+    asyncio.create_task(run_staff_directory_refresh_loop())
+    asyncio.create_task(warm_short_code_index())
+    asyncio.create_task(run_gate_write_workers())
+    asyncio.create_task(run_occupancy_reconcile_loop())
+    asyncio.create_task(run_analytics_feed(event_analytics_snapshot))
+    asyncio.create_task(warm_tourist_search_index())
+    asyncio.create_task(run_tourist_search_listener())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    shutdown_render_pool()
 
 # Import and include routers
-from routes.analytics_route import router as analytics_router
+from routes.analytics_route import router as analytics_router, event_analytics_snapshot
 from routes.event_register import router as event_router
 from routes.tourist_route import router as tourist_router
 from routes.tourist_profile_route import router as tourist_profile_router
@@ -50,6 +87,7 @@ from routes.feedback_route import router as feedback_router
 from routes.admin_route import router as admin_router
 from routes.quick_route import router as quick_router
 from routes.camera_route import router as camera_router
+from routes.debug_route import router as debug_router
 from utils.services.public_access_link_provider import verify_public_access_link
 
 app.include_router(analytics_router, prefix="/analytics", tags=["analytics"])
@@ -61,11 +99,13 @@ app.include_router(entry_router, prefix="/entry", tags=["entries"])
 app.include_router(feedback_router, prefix="/feedback", tags=["feedback"])
 app.include_router(admin_router, prefix="/admin", tags=["admin"])
 app.include_router(quick_router, prefix="/quick", tags=["quick-renewal"])
+# Metrics / cache inspection — admin access token required
+app.include_router(debug_router, prefix="/debug", tags=["debug"])
 # Camera: no prefix — routes are /cam/stream (WS), /ws (WS), /api/* (REST)
 app.include_router(camera_router, tags=["camera"])
 
 @app.get("/static/access")
-async def serve_signed_file(file: str, expires: int, sig: str):
+async def serve_signed_file(file: str, expires: int, sig: str, request: Request):
     """Serve files with signed URLs for security"""
     if not verify_public_access_link(file, expires, sig):
         raise HTTPException(status_code=403, detail="Invalid or expired link")
@@ -81,7 +121,8 @@ async def serve_signed_file(file: str, expires: int, sig: str):
     elif file.lower().endswith('.pdf'):
         media_type = "application/pdf"
     
-    return FileResponse(
+    return conditional_file_response(
+        request,
         file_path,
         media_type=media_type,
         headers={
@@ -97,61 +138,3 @@ async def check():
 @app.get("/health-check")
 async def health_check():
     return {"status": "ok"}
-
-@app.get("/debug/card-cache")
-async def debug_card_cache():
-    """
-    Dev-only: inspect the Redis card cache state and temp-card files on disk.
-    Remove or protect this endpoint before going to production.
-    """
-    import glob
-    import time
-    from utils.services.card_cache import (
-        card_redis, card_redis_ok, TEMP_CARD_DIR,
-        CARD_TTL_SECONDS, CARD_CLEANUP_INTERVAL_SECONDS,
-    )
-
-    redis_status = "connected" if card_redis_ok else "unavailable"
-
-    # Scan all card_temp:* keys from Redis
-    redis_keys = []
-    if card_redis_ok and card_redis:
-        try:
-            for key in card_redis.scan_iter("card_temp:*"):
-                val  = card_redis.get(key)
-                ttl  = card_redis.ttl(key)
-                age  = round(time.time() - float(val), 1) if val else None
-                redis_keys.append({
-                    "key":             key,
-                    "last_access_ago": f"{age}s ago" if age is not None else "unknown",
-                    "is_fresh":        age is not None and age < CARD_TTL_SECONDS,
-                    "redis_ttl_remaining": f"{ttl}s",
-                })
-        except Exception as e:
-            redis_keys = [{"error": str(e)}]
-
-    # Scan files on disk
-    disk_files = []
-    for fpath in glob.glob(f"{TEMP_CARD_DIR}/card_temp_*.png"):
-        size_kb = round(os.path.getsize(fpath) / 1024, 1)
-        age     = round(time.time() - os.path.getmtime(fpath), 1)
-        disk_files.append({
-            "file":    os.path.basename(fpath),
-            "size_kb": size_kb,
-            "age":     f"{age}s ago",
-        })
-
-    return {
-        "config": {
-            "CARD_TTL_SECONDS":              CARD_TTL_SECONDS,
-            "CARD_CLEANUP_INTERVAL_SECONDS": CARD_CLEANUP_INTERVAL_SECONDS,
-        },
-        "redis": {
-            "status": redis_status,
-            "keys":   redis_keys,
-        },
-        "disk": {
-            "directory": TEMP_CARD_DIR,
-            "files":     disk_files,
-        },
-    }
@@ -2,6 +2,7 @@ from fastapi import Request, HTTPException, status, Depends
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
 from utils.supabase.auth import jwt_middleware
 from datetime import datetime
 from utils.india_time import india_today_str
@@ -158,11 +159,10 @@ async def onboarding(onboarding_request: OnboardingRequest, request: Request):
             detail="You do not have permission to access this resource."
         )
     try :
-            response = (
+            response = await db_execute(
             supabaseAdmin
             .rpc("get_event_full_summary",
                 {"p_event_id": onboarding_request.event_id})
-            .execute()
             )
             print("RPC Response: ", response)
             return response.data
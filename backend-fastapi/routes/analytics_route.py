@@ -1,13 +1,70 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
 from utils.india_time import india_today_str
-from utils.supabase.auth import check_guard_admin_access, jwt_middleware
+from utils.supabase.auth import check_guard_admin_access, jwt_middleware, verify_access_token
 from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
+from utils.services.event_cache import get_event, guard_allowed
+from utils.services.occupancy import (
+    get_occupancy, occupancy_crowd_status, occupancy_capacity_alerts, reconcile_occupancy,
+)
+from utils.services.analytics_feed import add_client, remove_client, shared_snapshot, resync_wait
+import json
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+async def build_event_analytics(event_id: int, target_date: str) -> dict:
+    """
+    The analytics payload served by GET /analytics/event/{event_id} — also the
+    snapshot pushed to dashboards on WS /analytics/ws/{event_id}.
+    """
+    # Today's crowd comes from the live occupancy counters when they are
+    # initialised — the RPC then skips its "currently inside" scan
+    live = get_occupancy(event_id, target_date) if target_date == india_today_str() else None
+
+    # ── Single RPC call — does all 9 sections in one DB round-trip ──
+    resp = await db_execute(supabaseAdmin.rpc(
+        "get_event_analytics",
+        {
+            "p_event_id":      event_id,
+            "p_date":          target_date,
+            "p_include_crowd": live is None,
+        }
+    ))
+
+    if not resp.data or len(resp.data) == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Event {event_id} not found"
+        )
+
+    row = resp.data[0]
+    crowd_status = row.get("crowd_status", {})
+    today_summary = row.get("today_summary", {})
+    alerts = row.get("alerts", [])
+
+    if live is not None:
+        max_capacity = (row.get("event_info") or {}).get("max_capacity")
+        crowd_status = occupancy_crowd_status(live, max_capacity)
+        today_summary = {**today_summary, "still_inside": live["inside_registrations"]}
+        alerts = occupancy_capacity_alerts(crowd_status, max_capacity) + list(alerts or [])
+
+    return {
+        "success":               True,
+        "event_info":            row.get("event_info",            {}),
+        "crowd_status":          crowd_status,
+        "today_summary":         today_summary,
+        "last_hour":             row.get("last_hour",             {}),
+        "entry_type_breakdown":  row.get("entry_type_breakdown",  []),
+        "hourly_distribution":   row.get("hourly_distribution",   []),
+        "recent_entries":        row.get("recent_entries",        []),
+        "alerts":                alerts,
+        "registrations_summary": row.get("registrations_summary", {}),
+    }
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # SINGLE ANALYTICS ENDPOINT — calls one RPC, returns everything
 # ─────────────────────────────────────────────────────────────────────────────
@@ -35,6 +92,8 @@ async def get_event_analytics(
     - `registrations_summary` — total registered vs attended (attendance rate %)
 
     Pass `?query_date=YYYY-MM-DD` to view a past date.
+    For today, `crowd_status` comes from the live occupancy counters
+    (utils/services/occupancy.py) when they are initialised.
     """
     try:
         # Use Python's local date (avoids Supabase UTC vs local timezone mismatch)
@@ -50,35 +109,7 @@ async def get_event_analytics(
                 detail="Invalid date format. Use YYYY-MM-DD."
             )
 
-        # ── Single RPC call — does all 9 sections in one DB round-trip ──
-        resp = supabaseAdmin.rpc(
-            "get_event_analytics",
-            {
-                "p_event_id": event_id,
-                "p_date":     target_date,
-            }
-        ).execute()
-
-        if not resp.data or len(resp.data) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Event {event_id} not found"
-            )
-
-        row = resp.data[0]
-
-        return {
-            "success":               True,
-            "event_info":            row.get("event_info",            {}),
-            "crowd_status":          row.get("crowd_status",          {}),
-            "today_summary":         row.get("today_summary",         {}),
-            "last_hour":             row.get("last_hour",             {}),
-            "entry_type_breakdown":  row.get("entry_type_breakdown",  []),
-            "hourly_distribution":   row.get("hourly_distribution",   []),
-            "recent_entries":        row.get("recent_entries",        []),
-            "alerts":                row.get("alerts",                []),
-            "registrations_summary": row.get("registrations_summary", {}),
-        }
+        return await build_event_analytics(event_id, target_date)
 
     except HTTPException:
         raise
@@ -89,3 +120,121 @@ async def get_event_analytics(
             detail=f"Failed to fetch analytics: {str(e)}"
         )
 
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# LIVE OCCUPANCY — served from Redis counters, no entry_items scan
+# ─────────────────────────────────────────────────────────────────────────────
+@router.get("/event/{event_id}/live")
+async def get_event_live_occupancy(
+    event_id: int,
+    user=Depends(check_guard_admin_access)
+):
+    """
+    Today's crowd status, entries by type and entries per hour from the
+    occupancy counters (utils/services/occupancy.py) — cheap enough to poll.
+    Counters that are not initialised yet are rebuilt from the DB first.
+    """
+    event = await get_event(event_id)
+    if not event:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Event {event_id} not found"
+        )
+
+    today = india_today_str()
+    live = get_occupancy(event_id, today)
+    if not live:
+        try:
+            await reconcile_occupancy(event_id, today)
+        except Exception as e:
+            logger.error(f"Occupancy reconcile error for event {event_id}: {e}")
+        live = get_occupancy(event_id, today)
+    if not live:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Live occupancy is unavailable — use /analytics/event/{event_id}"
+        )
+
+    return {
+        "success":             True,
+        "event_id":            event_id,
+        "date":                today,
+        "crowd_status":        occupancy_crowd_status(live, event.get("max_capacity")),
+        "total_entries":       live["entries_total"],
+        "entries_by_type":     live["entry_types"],
+        "hourly_distribution": live["hourly"],
+        "reconciled_at":       live["reconciled_at"],
+    }
+
+
+async def event_analytics_snapshot(event_id: int) -> dict:
+    """Today's analytics payload — the snapshot builder for the push feed."""
+    return await build_event_analytics(event_id, india_today_str())
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PUSH FEED — WebSocket instead of polling GET /analytics/event/{event_id}
+# ─────────────────────────────────────────────────────────────────────────────
+@router.websocket("/ws/{event_id}")
+async def event_analytics_ws(ws: WebSocket, event_id: int, token: str = Query(None)):
+    """
+    Live analytics for a dashboard (utils/services/analytics_feed.py).
+
+    Auth: ?token=<access token> (browsers can't set headers on a WebSocket)
+    or Authorization: Bearer <token>.  Same guard/admin + event check as REST.
+    Close 4001 = bad token | 4003 = not allowed | 4004 = unknown event
+
+    Server → client:
+        {"type": "snapshot", "event_id": .., "data": { ...GET /analytics/event/{id} payload... }}
+        {"type": "delta", "entries": [..], "departures": [..], "crowd_status": {..}, "alerts": [..], ...}
+        {"type": "resync_throttled", "retry_in": 4.2}
+    Client → server:
+        {"type": "resync"}   ← send the latest snapshot to this client only
+                               (once per ANALYTICS_FEED_RESYNC_SECONDS)
+
+    Snapshots come from the event's shared snapshot (built at most once per
+    ANALYTICS_FEED_SNAPSHOT_SECONDS for all of its dashboards), not a fresh RPC.
+    """
+    auth = ws.headers.get("authorization", "")
+    token = token or auth.removeprefix("Bearer ").strip()
+    try:
+        payload = await verify_access_token(token)
+    except HTTPException:
+        await ws.close(code=4001)
+        return
+    role = payload.get("role")
+    event = await get_event(event_id)
+    if not event:
+        await ws.close(code=4004)
+        return
+    if role not in ["admin", "security"] or not guard_allowed(event, role, payload.get("sub") or payload.get("uid")):
+        await ws.close(code=4003)
+        return
+
+    await ws.accept()
+    try:
+        # Subscribe first: deltas published while the snapshot is sent still reach this client
+        add_client(event_id, ws)
+        snapshot = await shared_snapshot(event_id, event_analytics_snapshot)
+        await ws.send_text(json.dumps({"type": "snapshot", "event_id": event_id, "data": snapshot}, default=str))
+        logger.info(f"Analytics feed client connected for event {event_id}")
+        while True:
+            try:
+                msg = json.loads(await ws.receive_text())
+            except ValueError:
+                continue
+            if isinstance(msg, dict) and msg.get("type") == "resync":
+                wait = resync_wait(ws)
+                if wait:
+                    await ws.send_text(json.dumps({"type": "resync_throttled", "retry_in": wait}))
+                    continue
+                snapshot = await shared_snapshot(event_id, event_analytics_snapshot)
+                await ws.send_text(json.dumps({"type": "snapshot", "event_id": event_id, "data": snapshot}, default=str))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Analytics feed error for event {event_id}: {e}")
+    finally:
+        remove_client(event_id, ws)
+        logger.info(f"Analytics feed client disconnected for event {event_id}")
@@ -0,0 +1,151 @@
+import os
+import glob
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from utils.supabase.auth import jwt_middleware
+from utils.supabase.db import metrics_snapshot as db_metrics_snapshot
+
+
+async def require_admin(user=Depends(jwt_middleware)) -> dict:
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    return user
+
+
+# Every /debug/* endpoint needs an admin access token
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/db-metrics")
+async def debug_db_metrics():
+    """Supabase query latency histogram + thread-pool saturation."""
+    return db_metrics_snapshot()
+
+
+@router.get("/card-render-queue")
+async def debug_card_render_queue():
+    """
+    Pre-render queue depth, render latency and process-pool load.
+    Use it to size CARD_PRERENDER_WORKERS / CARD_RENDER_WORKERS before event day.
+    """
+    from utils.services.card_render_queue import metrics_snapshot as queue_metrics
+    from utils.services.card_renderer import stats as pool_stats
+    return {"queue": queue_metrics(), "pool": pool_stats()}
+
+
+@router.get("/scan-idempotency")
+async def debug_scan_idempotency():
+    """Duplicate QR scans suppressed by the Redis scan window."""
+    from utils.services.scan_idempotency import metrics_snapshot as scan_metrics
+    return scan_metrics()
+
+
+@router.get("/short-code-index")
+async def debug_short_code_index():
+    """Hit / miss counters of the Redis short_code → tourist index."""
+    from utils.services.short_code_index import stats as short_code_stats
+    return short_code_stats()
+
+
+@router.get("/short-code-allocator")
+async def debug_short_code_allocator():
+    """Block leases, fallback count and remaining block of the short-code allocator."""
+    from utils.services.short_code_allocator import stats as allocator_stats
+    return allocator_stats()
+
+
+@router.get("/gate-write-queue")
+async def debug_gate_write_queue():
+    """Gate write log — unflushed / unacked arrivals, dead letters, batch size and flush latency."""
+    from utils.services.gate_write_queue import metrics_snapshot as gate_write_metrics
+    return gate_write_metrics()
+
+
+@router.get("/occupancy")
+async def debug_occupancy():
+    """Live occupancy counters — updates, unmatched departures and the drift repaired by reconciliation."""
+    from utils.services.occupancy import stats as occupancy_stats
+    return occupancy_stats()
+
+
+@router.get("/analytics-feed")
+async def debug_analytics_feed():
+    """Analytics push feed — connected dashboards per event, deltas received, messages sent."""
+    from utils.services.analytics_feed import stats as analytics_feed_stats
+    return analytics_feed_stats()
+
+
+@router.get("/tourist-search")
+async def debug_tourist_search():
+    """In-process tourist search index — indexed tourists / trigrams per event, query and update counts."""
+    from utils.services.tourist_search import stats as tourist_search_stats
+    return tourist_search_stats()
+
+
+@router.get("/card-cache")
+async def debug_card_cache():
+    """Redis card cache state and temp-card files on disk."""
+    from utils.services.card_cache import (
+        card_redis, card_redis_ok, TEMP_CARD_DIR,
+        CARD_TTL_SECONDS, CARD_CLEANUP_INTERVAL_SECONDS,
+        CARD_CACHE_MAX_BYTES, CARD_ACCESS_ZSET,
+    )
+
+    redis_status = "connected" if card_redis_ok else "unavailable"
+
+    # Scan all card_temp:* keys from Redis
+    redis_keys = []
+    if card_redis_ok and card_redis:
+        try:
+            for key in card_redis.scan_iter("card_temp:*"):
+                val  = card_redis.get(key)
+                ttl  = card_redis.ttl(key)
+                age  = round(time.time() - float(val), 1) if val else None
+                redis_keys.append({
+                    "key":             key,
+                    "last_access_ago": f"{age}s ago" if age is not None else "unknown",
+                    "is_fresh":        age is not None and age < CARD_TTL_SECONDS,
+                    "redis_ttl_remaining": f"{ttl}s",
+                })
+        except Exception as e:
+            redis_keys = [{"error": str(e)}]
+
+    access_index_size = None
+    if card_redis_ok and card_redis:
+        try:
+            access_index_size = card_redis.zcard(CARD_ACCESS_ZSET)
+        except Exception:
+            pass
+
+    # Scan files on disk (every format variant)
+    disk_files  = []
+    total_bytes = 0
+    for fpath in glob.glob(f"{TEMP_CARD_DIR}/card_temp_*.*"):
+        total_bytes += os.path.getsize(fpath)
+        size_kb = round(os.path.getsize(fpath) / 1024, 1)
+        age     = round(time.time() - os.path.getmtime(fpath), 1)
+        disk_files.append({
+            "file":    os.path.basename(fpath),
+            "size_kb": size_kb,
+            "age":     f"{age}s ago",
+        })
+
+    return {
+        "config": {
+            "CARD_TTL_SECONDS":              CARD_TTL_SECONDS,
+            "CARD_CLEANUP_INTERVAL_SECONDS": CARD_CLEANUP_INTERVAL_SECONDS,
+            "CARD_CACHE_MAX_BYTES":          CARD_CACHE_MAX_BYTES,
+        },
+        "redis": {
+            "status":            redis_status,
+            "access_index_size": access_index_size,
+            "keys":              redis_keys,
+        },
+        "disk": {
+            "directory":   TEMP_CARD_DIR,
+            "total_bytes": total_bytes,
+            "files":       disk_files,
+        },
+    }
@@ -1,10 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from datetime import datetime, date, timezone
 from pydantic import BaseModel
 from typing import Optional
 from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
 from utils.supabase.auth import jwt_middleware, check_guard_admin_access
 from utils.india_time import india_today, india_today_str
+from utils.services.staff_directory import get_staff_member
+from utils.services.scan_idempotency import run_idempotent_scan
+from utils.services.short_code_index import index_short_code, lookup_short_code
+from utils.services.public_access_link_provider import is_signed_qr_payload, verify_signed_qr_payload
+from utils.services.occupancy import record_arrival, record_departure, members_of
+from utils.services.batch_loader import entry_items_loader
+from utils.services.tourist_search import get_indexed_tourist
+from utils.services.gate_write_queue import (
+    GATE_WRITE_BEHIND, enqueue_gate_entry, write_gate_entry, pending_entries, wait_for_pending_entry,
+)
 
 router = APIRouter()
 
@@ -24,154 +35,261 @@ class DepartureRequest(BaseModel):
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_entry(
     entry: EntryRequest,
+    idempotency_key: Optional[str] = Header(None),
     user=Depends(check_guard_admin_access)
 ):
     """
     Register a new entry for a tourist using QR code (short_code).
+    Duplicate scans (double-tap / retry) within the dedupe window, or with the
+    same Idempotency-Key header, get the original response back without a DB
+    write — see utils/services/scan_idempotency.py.
+    """
+    return await run_idempotent_scan(
+        "entry", entry.event_id, entry.short_code, idempotency_key,
+        status.HTTP_201_CREATED, lambda: _create_entry(entry, user),
+    )
+
+
+def _verify_signed_qr(short_code: str, event_id: int, today: date, action: str) -> dict:
+    """
+    Check a signed QR payload offline: signature, event and valid_date.
+    Raises the same 404 / 403 errors as the short_code path.
+    """
+    card = verify_signed_qr_payload(short_code)
+    if not card:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="QR code not found or invalid"
+        )
+    if card["event_id"] != event_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Card was issued for a different event"
+        )
+    if card["valid_date"] != str(today):
+        if action == "departure":
+            detail = f"Your card is valid for {card['valid_date']}. Cannot register departure."
+        elif card["valid_date"] < str(today):
+            detail = "Card expired - valid_date has passed"
+        else:
+            detail = f"Card valid from {card['valid_date']} - not yet valid"
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+    return card
+
+
+def _arrival_job(entry: EntryRequest, user_id: int, user: dict, verified_by_name: Optional[str], today: date, **metadata) -> dict:
+    """Arrival for the gate write log (utils/services/gate_write_queue.py), stamped with the scan time."""
+    return {
+        "user_id": user_id,
+        "event_id": entry.event_id,
+        "entry_date": str(today),
+        "arrival_time": datetime.now(timezone.utc).isoformat(),
+        "approved_by_uid": user.get("sub"),
+        "metadata": {
+            "short_code": entry.short_code,
+            "verified_by_role": user.get("app_metadata", {}).get("role"),
+            "verified_by_name": verified_by_name,
+            **metadata,
+        },
+    }
+
+
+def _logged_arrival_response(entry: EntryRequest, job: dict, tourist: dict) -> dict:
+    """Response for an arrival that is in the log — record_id / entry_number are not known yet."""
+    print(f"Entry logged for user_id: {job['user_id']}, write_id: {job.get('write_id')}")
+    return {
+        "message": "Entry registered successfully",
+        "user_id": job["user_id"],
+        "name": tourist.get("name"),
+        "group_count": tourist.get("group_count"),
+        "record_id": None,
+        "entry_item": None,
+        "arrival_time": job["arrival_time"],
+        "qr_code": entry.short_code,
+        "entry_number": None,
+        "total_entries_today": None,
+        "is_reentry": None,
+        "status": "entered",
+        "queued": True,
+    }
+
+
+async def _signed_card_tourist(card: dict) -> Optional[dict]:
+    """
+    The tourist a valid signature points at — from the in-process search index,
+    else one primary-key read.  None when that tourist does not exist (deleted /
+    re-registered) or no longer matches the signed event + date.
+    """
+    tourist = get_indexed_tourist(card["event_id"], card["user_id"])
+    if tourist is None:
+        resp = await db_execute(
+            supabaseAdmin.table("tourists")
+            .select("user_id, name, valid_date, is_group, group_count, registered_event_id")
+            .eq("user_id", card["user_id"])
+            .limit(1)
+        )
+        tourist = resp.data[0] if resp.data else None
+        if tourist and tourist.get("registered_event_id") != card["event_id"]:
+            return None
+    if not tourist or str(tourist.get("valid_date"))[:10] != card["valid_date"]:
+        return None
+    return tourist
+
+
+async def _create_signed_entry(entry: EntryRequest, user: dict, today: date):
+    """
+    Signed-QR arrival: the payload is verified offline and the tourist checked
+    against the search index (a DB read only on an index miss).  The write goes
+    through the gate write log, so record_id / entry_number are not known yet.
+    """
+    card = _verify_signed_qr(entry.short_code, entry.event_id, today, "entry")
+    tourist = await _signed_card_tourist(card)
+    if not tourist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="QR code not found or invalid"
+        )
+
+    staff_member = await get_staff_member(user.get("sub"))
+    verified_by_name = (staff_member or {}).get("name") or user.get("user_metadata", {}).get("name")
+    job = _arrival_job(entry, card["user_id"], user, verified_by_name, today, signed_qr=True)
+
+    write_id = enqueue_gate_entry(job)
+    if write_id:
+        return _logged_arrival_response(entry, {**job, "write_id": write_id}, tourist)
+
+    # Log unavailable — write now
+    result = await write_gate_entry(job)
+    entry_number = result.get("entry_number", 1)
+    is_reentry = entry_number > 1
+    return {
+        "message": "Re-entry recorded" if is_reentry else "Entry registered successfully",
+        "user_id": card["user_id"],
+        "name": tourist.get("name"),
+        "group_count": tourist.get("group_count"),
+        "record_id": result.get("record_id"),
+        "entry_item": result.get("entry_item"),
+        "arrival_time": job["arrival_time"],
+        "qr_code": entry.short_code,
+        "entry_number": entry_number,
+        "total_entries_today": entry_number,
+        "is_reentry": is_reentry,
+        "status": "re-entered" if is_reentry else "entered",
+        "queued": False,
+    }
+
+
+async def _create_entry(entry: EntryRequest, user: dict):
+    """
+    Register a new entry for a tourist using QR code (short_code).
     
-    Flow:
-    1. Call RPC verify_qr_code(short_code, event_id) to get tourist details
-    2. Validate QR code validity and date match
-    3. Create entry_record if doesn't exist for today
-    4. Create entry_item with arrival time
-    
-    The RPC handles:
-    - QR code lookup in tourist_meta
-    - Tourist detail retrieval
-    - Valid date validation
-    - Current inside status check
-    - Entry history for today
+    One round-trip: RPC record_entry (supabase_rpc_record_entry.sql) does, in a
+    single transaction:
+    1. QR code lookup in tourist_meta + tourist detail retrieval
+    2. Valid date validation against today
+    3. Upsert of today's entry_record (idempotent on user/event/date)
+    4. entry_item insert with arrival time
     """
     today = india_today()
     
     print(f"Processing entry for short_code: {entry.short_code}, event_id: {entry.event_id}")
 
     try:
-        # STEP 1: Call RPC to verify QR code and get all details
-        qr_verify_resp = supabaseAdmin.rpc(
-            "verify_qr_code",
+        # Signed QR (T1.…): verified offline, write queued
+        if is_signed_qr_payload(entry.short_code):
+            return await _create_signed_entry(entry, user, today)
+
+        # Redis short_code index: reject cards for another day without a DB round-trip
+        indexed = lookup_short_code(entry.short_code)
+        if indexed and indexed["valid_date"] != str(today):
+            expired = indexed["valid_date"] < str(today)
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Card expired - valid_date has passed" if expired
+                else f"Card valid from {indexed['valid_date']} - not yet valid"
+            )
+
+        # Verifier info from JWT (role is in app_metadata); the name comes from the
+        # staff directory, falling back to the (possibly stale) user_metadata claim
+        verified_by_role = user.get("app_metadata", {}).get("role")  # e.g., 'admin', 'security'
+        verified_by_uid = user.get("sub")  # UUID of the security/admin person
+        staff_member = await get_staff_member(verified_by_uid)
+        verified_by_name = (staff_member or {}).get("name") or user.get("user_metadata", {}).get("name")  # e.g., 'Aditya Kumar'
+
+        # Write-behind: card already resolved from the index → acknowledge once
+        # the arrival is in the gate write log; the flusher inserts it in a batch
+        if GATE_WRITE_BEHIND and indexed:
+            job = _arrival_job(entry, indexed["user_id"], user, verified_by_name, today)
+            write_id = enqueue_gate_entry(job)
+            if write_id:
+                return _logged_arrival_response(entry, {**job, "write_id": write_id}, indexed)
+
+        entry_resp = await db_execute(supabaseAdmin.rpc(
+            "record_entry",
             {
                 "p_short_code": entry.short_code,
                 "p_event_id": entry.event_id,
-                "p_entry_date": str(today)
+                "p_entry_date": str(today),
+                "p_approved_by_uid": verified_by_uid,  # Store who verified the entry
+                "p_metadata": {
+                    "short_code": entry.short_code,
+                    "verified_by_role": verified_by_role,  # Role from JWT
+                    "verified_by_name": verified_by_name,  # Name from staff directory / JWT
+                    # entry_number is added by the RPC
+                },
             }
-        ).execute()
+        ))
 
-        if not qr_verify_resp.data or len(qr_verify_resp.data) == 0:
+        if not entry_resp.data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="QR code not found or invalid"
             )
 
-        qr_data = qr_verify_resp.data[0]
-        
-        # STEP 2: Check QR code validity
-        if not qr_data.get("success"):
-            message = qr_data.get("message", "QR code verification failed")
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=message
+        result = entry_resp.data[0]
+
+        if not result.get("success"):
+            reason = result.get("reason")
+            message = result.get("message", "QR code verification failed")
+            if reason == "not_found":
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=message)
+            if reason == "no_valid_date":
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=message)
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=message)
+
+        user_id = result.get("user_id")
+        record_id = result.get("record_id")
+        if not indexed:
+            index_short_code(
+                entry.short_code, user_id=user_id, valid_date=result.get("valid_date"),
+                name=result.get("name"), group_count=result.get("group_count"),
             )
-
-        user_id = qr_data.get("user_id")
-        valid_date = qr_data.get("valid_date")
-        is_already_inside = qr_data.get("is_already_inside", False)
-        total_entries_today = qr_data.get("total_entries_today", 0)
-        
-        # STEP 3: Validate date match
-        if valid_date:
-            try:
-                valid_date_obj = date.fromisoformat(str(valid_date))
-            except (ValueError, TypeError):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Invalid valid_date in QR code"
-                )
-            
-            # Check if today matches valid_date
-            if today != valid_date_obj:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail=f"Your card is valid for {valid_date_obj.strftime('%Y-%m-%d')}. Please renew your card for today's date ({today.strftime('%Y-%m-%d')})"
-                )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No valid_date in QR code"
-            )
-
-        # STEP 5: Get or create entry_record for today
-        record_resp = supabaseAdmin.table("entry_records").select("*").eq("user_id", user_id).eq("event_id", entry.event_id).eq("entry_date", str(today)).execute()
-        
-        if record_resp.data:
-            # Use existing record
-            record_id = record_resp.data[0]["record_id"]
-            print(f"Using existing entry_record: {record_id}")
-        else:
-            # Create new entry_record for today
-            new_record_resp = supabaseAdmin.table("entry_records").insert({
-                "user_id": user_id,
-                "event_id": entry.event_id,
-                "entry_date": str(today)
-                # Don't insert time_logs - let database use default
-            }).execute()
-            
-            if not new_record_resp.data:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Failed to create entry record"
-                )
-            record_id = new_record_resp.data[0]["record_id"]
-            print(f"Created new entry_record: {record_id}")
-
-        # STEP 6: Create entry_item (arrival)
-        # Extract verifier info from JWT (role is in app_metadata, name is in user_metadata)
-        verified_by_role = user.get("app_metadata", {}).get("role")  # e.g., 'admin', 'security'
-        verified_by_name = user.get("user_metadata", {}).get("name")  # e.g., 'Aditya Kumar'
-        verified_by_uid = user.get("sub")  # UUID of the security/admin person
-        
-        entry_item_data = {
-            "record_id": record_id,
-            "arrival_time": datetime.now(timezone.utc).isoformat(),
-            "entry_type": "qr_code_scan",
-            "bypass_reason": None,
-            "approved_by_uid": verified_by_uid,  # Store who verified the entry
-            "metadata": {
-                "short_code": entry.short_code,
-                "verified_by_role": verified_by_role,  # Role from JWT
-                "verified_by_name": verified_by_name,  # Name from JWT
-                "entry_number": total_entries_today + 1  # Track which entry this is
-            }
-        }
-        
-        item_resp = supabaseAdmin.table("entry_items").insert(entry_item_data).execute()
-        
-        if not item_resp.data:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Failed to create entry item"
-            )
-
-        entry_item = item_resp.data[0]
+        entry_item = result.get("entry_item") or {}
+        entry_number = result.get("entry_number", 1)
+        record_arrival(
+            entry.event_id, str(today), user_id,
+            members=members_of(result.get("is_group"), result.get("group_count")),
+            is_group=bool(result.get("is_group")), arrival_time=entry_item.get("arrival_time"),
+        )
         
-        print(f"Entry created successfully for user_id: {user_id}, item_id: {entry_item.get('item_id')}, entry_number: {total_entries_today + 1}")
+        print(f"Entry created successfully for user_id: {user_id}, item_id: {entry_item.get('item_id')}, entry_number: {entry_number}")
 
         # Determine if this is a re-entry
-        is_reentry = total_entries_today > 0
+        is_reentry = entry_number > 1
         
         return {
             "message": "Re-entry recorded" if is_reentry else "Entry registered successfully",
             "user_id": user_id,
-            "name": qr_data.get("name"),
-            "phone": qr_data.get("phone"),
-            "is_group": qr_data.get("is_group"),
-            "group_count": qr_data.get("group_count"),
+            "name": result.get("name"),
+            "phone": result.get("phone"),
+            "is_group": result.get("is_group"),
+            "group_count": result.get("group_count"),
             "record_id": record_id,
             "entry_item": entry_item,
             "arrival_time": entry_item.get("arrival_time"),
             "qr_code": entry.short_code,
-            "entry_number": total_entries_today + 1,  # Show which entry this is
-            "total_entries_today": total_entries_today + 1,  # Total count after this entry
+            "entry_number": entry_number,  # Show which entry this is
+            "total_entries_today": entry_number,  # Total count after this entry
             "is_reentry": is_reentry,
             "status": "re-entered" if is_reentry else "entered"
         }
@@ -194,8 +312,19 @@ async def create_entry(
 @router.post("/departure", status_code=status.HTTP_200_OK)
 async def register_departure(
     departure: DepartureRequest,
+    idempotency_key: Optional[str] = Header(None),
     user=Depends(check_guard_admin_access)
 ):
+    """
+    Register departure for a tourist using QR code (de-duplicated like create_entry).
+    """
+    return await run_idempotent_scan(
+        "departure", departure.event_id, departure.short_code, idempotency_key,
+        status.HTTP_200_OK, lambda: _register_departure(departure, user),
+    )
+
+
+async def _register_departure(departure: DepartureRequest, user: dict):
     """
     Register departure for a tourist using QR code.
     - Calls RPC to verify QR code and get user_id
@@ -207,23 +336,42 @@ async def register_departure(
     print(f"Processing departure for short_code: {departure.short_code}, event_id: {departure.event_id}")
 
     try:
-        # STEP 1: Verify QR code and get user_id
-        qr_verify_resp = supabaseAdmin.rpc(
-            "verify_qr_code",
-            {
-                "p_short_code": departure.short_code,
-                "p_event_id": departure.event_id,
-                "p_entry_date": str(today)
-            }
-        ).execute()
+        # STEP 1: Resolve QR code → user_id (signed payload, else Redis short_code
+        # index, verify_qr_code RPC on a miss)
+        if is_signed_qr_payload(departure.short_code):
+            card = _verify_signed_qr(departure.short_code, departure.event_id, today, "departure")
+            tourist = await _signed_card_tourist(card)
+            if not tourist:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="QR code not found or invalid"
+                )
+            qr_data = {**card, "name": tourist.get("name"), "group_count": tourist.get("group_count")}
+        else:
+            qr_data = lookup_short_code(departure.short_code)
+        if not qr_data:
+            qr_verify_resp = await db_execute(supabaseAdmin.rpc(
+                "verify_qr_code",
+                {
+                    "p_short_code": departure.short_code,
+                    "p_event_id": departure.event_id,
+                    "p_entry_date": str(today)
+                }
+            ))
+
+            if not qr_verify_resp.data or len(qr_verify_resp.data) == 0 or not qr_verify_resp.data[0].get("user_id"):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="QR code not found or invalid"
+                )
 
-        if not qr_verify_resp.data or len(qr_verify_resp.data) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="QR code not found or invalid"
+            qr_data = qr_verify_resp.data[0]
+            index_short_code(
+                departure.short_code, user_id=qr_data.get("user_id"), valid_date=qr_data.get("valid_date"),
+                event_id=qr_data.get("registered_event_id"), name=qr_data.get("name"),
+                group_count=qr_data.get("group_count"),
             )
 
-        qr_data = qr_verify_resp.data[0]
         user_id = qr_data.get("user_id")
         valid_date = qr_data.get("valid_date")
 
@@ -243,8 +391,16 @@ async def register_departure(
                     detail=f"Your card is valid for {valid_date_obj.strftime('%Y-%m-%d')}. Cannot register departure."
                 )
 
+        # The arrival may still be in the gate write log (5xx → not kept by the scan window)
+        if not await wait_for_pending_entry(user_id, departure.event_id, str(today)):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Entry is still being recorded. Please scan again in a moment.",
+                headers={"Retry-After": "1"},
+            )
+
         # STEP 2: Find entry_record for today
-        record_resp = supabaseAdmin.table("entry_records").select("*").eq("user_id", user_id).eq("event_id", departure.event_id).eq("entry_date", str(today)).execute()
+        record_resp = await db_execute(supabaseAdmin.table("entry_records").select("*").eq("user_id", user_id).eq("event_id", departure.event_id).eq("entry_date", str(today)))
 
         if not record_resp.data:
             raise HTTPException(
@@ -256,7 +412,7 @@ async def register_departure(
 
         # STEP 3: Find the last entry_item without departure_time
         query = supabaseAdmin.table("entry_items").select("*").eq("record_id", record_id).is_("departure_time", "null").order("arrival_time", desc=True)
-        item_resp = query.limit(1).execute()
+        item_resp = await db_execute(query.limit(1))
 
         if not item_resp.data:
             raise HTTPException(
@@ -282,10 +438,10 @@ async def register_departure(
         duration_str = str(duration)  # PostgreSQL interval format
 
         # STEP 4: Update entry_item with departure
-        update_resp = supabaseAdmin.table("entry_items").update({
+        update_resp = await db_execute(supabaseAdmin.table("entry_items").update({
             "departure_time": departure_time.isoformat(),
             "duration": duration_str
-        }).eq("item_id", item_id).execute()
+        }).eq("item_id", item_id))
 
         if not update_resp.data:
             raise HTTPException(
@@ -294,10 +450,12 @@ async def register_departure(
             )
 
         updated_item = update_resp.data[0]
+        record_departure(departure.event_id, str(today), user_id)
         
         # Extract verifier info for logging
         verified_by_role = user.get("app_metadata", {}).get("role")
-        verified_by_name = user.get("user_metadata", {}).get("name")
+        staff_member = await get_staff_member(user.get("sub"))
+        verified_by_name = (staff_member or {}).get("name") or user.get("user_metadata", {}).get("name")
         
         print(f"Departure registered for user_id: {user_id}, item_id: {item_id}, duration: {duration_str}, verified_by: {verified_by_name} ({verified_by_role})")
 
@@ -333,14 +491,16 @@ async def get_today_entries(
     user=Depends(check_guard_admin_access)
 ):
     """
-    Get all entries for a user today, including open/closed status
+    Get all entries for a user today, including open/closed status.
+    Arrivals still in the gate write log are merged in with "pending": true.
     """
     today = india_today()
+    pending = pending_entries(user_id, event_id, str(today))
     
     # Get entry_record for today
-    record_resp = supabaseAdmin.table("entry_records").select("*").eq("user_id", user_id).eq("event_id", event_id).eq("entry_date", str(today)).execute()
+    record_resp = await db_execute(supabaseAdmin.table("entry_records").select("*").eq("user_id", user_id).eq("event_id", event_id).eq("entry_date", str(today)))
     
-    if not record_resp.data:
+    if not record_resp.data and not pending:
         return {
             "message": "No entries found for today",
             "user_id": user_id,
@@ -350,20 +510,30 @@ async def get_today_entries(
             "total_entries": 0
         }
     
-    record_id = record_resp.data[0]["record_id"]
-    
-    # Get all entry_items for this record
-    items_resp = supabaseAdmin.table("entry_items").select("*").eq("record_id", record_id).order("arrival_time", desc=True).execute()
+    items = []
+    if record_resp.data:
+        # Get all entry_items for this record
+        items = await entry_items_loader().load(record_resp.data[0]["record_id"])
+
+    if pending:
+        # A just-flushed arrival can be in both until its pending copy is cleared
+        flushed = {(item.get("metadata") or {}).get("write_id") for item in items}
+        items = sorted(
+            items + [item for item in pending if item["metadata"]["write_id"] not in flushed],
+            key=lambda item: datetime.fromisoformat(item["arrival_time"].replace("Z", "+00:00")),
+            reverse=True,
+        )
     
-    open_entries = sum(1 for item in items_resp.data if item.get("departure_time") is None) if items_resp.data else 0
+    open_entries = sum(1 for item in items if item.get("departure_time") is None)
     
     return {
         "user_id": user_id,
         "event_id": event_id,
-        "entry_record": record_resp.data[0],
-        "entry_items": items_resp.data or [],
+        "entry_record": record_resp.data[0] if record_resp.data else None,
+        "entry_items": items,
         "open_entries": open_entries,
-        "total_entries": len(items_resp.data) if items_resp.data else 0
+        "total_entries": len(items),
+        "pending_entries": sum(1 for item in items if item.get("pending"))
     }
 
 
@@ -381,7 +551,7 @@ async def get_entry_history(
     Get entry history for a user across all dates
     """
     # Get all entry_records ordered by date descending
-    records_resp = supabaseAdmin.table("entry_records").select("*").eq("user_id", user_id).eq("event_id", event_id).order("entry_date", desc=True).limit(limit).execute()
+    records_resp = await db_execute(supabaseAdmin.table("entry_records").select("*").eq("user_id", user_id).eq("event_id", event_id).order("entry_date", desc=True).limit(limit))
     
     if not records_resp.data:
         return {
@@ -391,16 +561,16 @@ async def get_entry_history(
             "history": []
         }
     
+    # entry_items of every record in one query
+    items_per_record = await entry_items_loader().load_many(r["record_id"] for r in records_resp.data)
+
     history = []
-    for record in records_resp.data:
-        # Get entry_items for each record
-        items_resp = supabaseAdmin.table("entry_items").select("*").eq("record_id", record["record_id"]).order("arrival_time", desc=True).execute()
-        
+    for record, items in zip(records_resp.data, items_per_record):
         history.append({
             "date": record["entry_date"],
             "record_id": record["record_id"],
-            "entry_items": items_resp.data or [],
-            "total_entries": len(items_resp.data) if items_resp.data else 0,
+            "entry_items": items,
+            "total_entries": len(items),
             "created_at": record.get("created_at")
         })
     
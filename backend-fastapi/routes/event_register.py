@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request
 from datetime import datetime, timezone
 from utils.supabase.auth import jwt_middleware
 from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute, db_run
+from utils.services.event_cache import invalidate_event
 from utils.models.api_models import Event
 
 router = APIRouter()
@@ -74,7 +76,7 @@ async def get_events(
             detail="You do not have permission to view events.",
         )
 
-    response = supabaseAdmin.table("events").select("*").execute()
+    response = await db_execute(supabaseAdmin.table("events").select("*"))
     
     # Supabase returns data as a list
     if hasattr(response, 'data') and response.data is not None:
@@ -99,7 +101,7 @@ async def get_active_events(user = Depends(jwt_middleware)):
         )
     
     
-    response = supabaseAdmin.table("events").select("*").eq("is_active", True).execute()
+    response = await db_execute(supabaseAdmin.table("events").select("*").eq("is_active", True))
     
     
     
@@ -141,7 +143,7 @@ async def get_event(
             detail="You do not have permission to view this event.",
         )
 
-    response = supabaseAdmin.table("events").select("*").eq("event_id", event_id).single().execute()
+    response = await db_execute(supabaseAdmin.table("events").select("*").eq("event_id", event_id).single())
     
     if hasattr(response, 'data') and response.data:
         event_data = response.data
@@ -181,7 +183,7 @@ async def update_guard_list(
 
     # If guard list provided, validate each guard UID exists in Supabase Auth
     if allowed_guards:
-        all_users = supabaseAdmin.auth.admin.list_users()
+        all_users = await db_run(supabaseAdmin.auth.admin.list_users)
         existing_user_ids = {u.id for u in all_users.users}
 
         for guard_uid in allowed_guards:
@@ -191,9 +193,10 @@ async def update_guard_list(
                     detail=f"User {guard_uid} does not exist in Supabase Auth.",
                 )
 
-    response = supabaseAdmin.table("events").update({"allowed_guards": allowed_guards}).eq("event_id", event_id).execute()
+    response = await db_execute(supabaseAdmin.table("events").update({"allowed_guards": allowed_guards}).eq("event_id", event_id))
     
     if hasattr(response, 'data') and response.data:
+        invalidate_event(event_id)
         updated_event = response.data[0] if isinstance(response.data, list) else response.data
         return {"message": "Guard list updated successfully", "event": updated_event}
     else:
@@ -222,6 +225,7 @@ def update_event_status(
     response = supabaseAdmin.table("events").update({"is_active": is_active}).eq("event_id", event_id).execute()
     
     if hasattr(response, 'data') and response.data:
+        invalidate_event(event_id)
         updated_event = response.data[0] if isinstance(response.data, list) else response.data
         return {"message": "Event status updated successfully", "event": updated_event}
     else:
@@ -247,7 +251,7 @@ async def get_active_event(event_id: int, request: Request):
     feeback_route = request.headers.get("feedback-check", "false")
       
     
-    response = supabaseAdmin.table("events").select("*").eq("event_id", event_id).single().execute()
+    response = await db_execute(supabaseAdmin.table("events").select("*").eq("event_id", event_id).single())
     print(response)
     print("Feedback route header:", feeback_route)
 
@@ -5,9 +5,22 @@ from datetime import datetime, timedelta
 from utils.india_time import india_now
 from collections import defaultdict
 from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
 from utils.supabase.auth import jwt_middleware
+from utils.services.event_cache import get_event
+from utils.services.pagination import adjust_count, cached_count, decode_cursor, page_cursors
+from utils.services.entry_export import csv_chunks
+from utils.services.export_formats import (
+    EXPORT_FORMATS, COLUMNAR_FORMATS, EXPORT_MEDIA_TYPES, EXPORT_FILE_EXTENSIONS,
+    columnar_available, record_chunks,
+)
+from utils.services.feedback_export import (
+    FEEDBACK_EXPORT_FIELDS, feedback_csv_header, build_feedback_rows,
+    build_feedback_records, fetch_session_page, iter_feedback_pages,
+)
 import hashlib
 import os
+import re
 import logging
 
 # ─── Redis (shared client) ───────────────────────────────────────────────────
@@ -101,30 +114,23 @@ async def get_event_questions(event_id: int):
     Call this endpoint first to build the feedback form on the frontend.
     """
     try:
-        event_resp = (
-            supabaseAdmin.table("events")
-            .select("event_id, name, is_active")
-            .eq("event_id", event_id)
-            .single()
-            .execute()
-        )
-        if not event_resp.data:
+        event = await get_event(event_id)
+        if not event:
             raise HTTPException(status_code=404, detail="Event not found")
-        if not event_resp.data.get("is_active"):
+        if not event.get("is_active"):
             raise HTTPException(status_code=403, detail="Feedback is not open for this event")
 
-        questions_resp = (
+        questions_resp = await db_execute(
             supabaseAdmin.table("feedback_questions")
             .select("question_id, question_text, question_type, is_required, display_order, min_value, max_value")
             .eq("event_id", event_id)
             .eq("is_active", True)
             .order("display_order")
-            .execute()
         )
 
         return {
             "event_id": event_id,
-            "event_name": event_resp.data.get("name"),
+            "event_name": event.get("name"),
             "questions": questions_resp.data or []
         }
 
@@ -153,25 +159,18 @@ async def submit_feedback(event_id: int, body: SubmitFeedbackRequest, request: R
         device_hash = body.device_fingerprint or generate_device_hash(client_ip, user_agent, event_id)
 
         # ── Step 1: Verify event ─────────────────────────────────────────
-        event_resp = (
-            supabaseAdmin.table("events")
-            .select("event_id, is_active")
-            .eq("event_id", event_id)
-            .single()
-            .execute()
-        )
-        if not event_resp.data:
+        event = await get_event(event_id)
+        if not event:
             raise HTTPException(status_code=404, detail="Event not found")
-        if not event_resp.data.get("is_active"):
+        if not event.get("is_active"):
             raise HTTPException(status_code=403, detail="Feedback is not open for this event")
 
         # ── Step 2: Fetch active questions ───────────────────────────────
-        questions_resp = (
+        questions_resp = await db_execute(
             supabaseAdmin.table("feedback_questions")
             .select("question_id, question_type, is_required, min_value, max_value")
             .eq("event_id", event_id)
             .eq("is_active", True)
-            .execute()
         )
         if not questions_resp.data:
             raise HTTPException(status_code=400, detail="No active questions found for this event")
@@ -231,13 +230,12 @@ async def submit_feedback(event_id: int, body: SubmitFeedbackRequest, request: R
 
         # 4b. Device hash: same device cannot submit for same event within 24h
         one_day_ago = (india_now() - timedelta(hours=24)).isoformat()
-        duplicate = (
+        duplicate = await db_execute(
             supabaseAdmin.table("feedback_sessions")
             .select("session_id")
             .eq("event_id", event_id)
             .eq("device_info", device_hash)
             .gte("submitted_at", one_day_ago)
-            .execute()
         )
         if duplicate.data:
             raise HTTPException(
@@ -246,19 +244,19 @@ async def submit_feedback(event_id: int, body: SubmitFeedbackRequest, request: R
             )
 
         # ── Step 5: Create feedback_session ─────────────────────────────
-        session_result = (
+        session_result = await db_execute(
             supabaseAdmin.table("feedback_sessions")
             .insert({
                 "event_id": event_id,
                 "device_info": device_hash,
                 "submitted_at": india_now().isoformat()
             })
-            .execute()
         )
         if not session_result.data:
             raise HTTPException(status_code=500, detail="Failed to create feedback session")
 
         session_id = session_result.data[0]["session_id"]
+        adjust_count(f"feedback_sessions:event:{event_id}")
 
         # ── Step 6: Bulk insert feedback_answers ────────────────────────
         answers_payload = [
@@ -274,10 +272,9 @@ async def submit_feedback(event_id: int, body: SubmitFeedbackRequest, request: R
         ]
 
         if answers_payload:
-            answers_result = (
+            answers_result = await db_execute(
                 supabaseAdmin.table("feedback_answers")
                 .insert(answers_payload)
-                .execute()
             )
             if not answers_result.data:
                 raise HTTPException(status_code=500, detail="Failed to save feedback answers")
@@ -295,62 +292,97 @@ async def submit_feedback(event_id: int, body: SubmitFeedbackRequest, request: R
 
 # ─── Admin: paginated sessions list ─────────────────────────────────────────
 
+_SESSION_ID_RE = re.compile(r"^[0-9A-Fa-f-]{1,64}$")
+
+
+def _valid_session_key(key) -> bool:
+    """Cursor key [submitted_at, session_id] — both are interpolated into an or_() filter."""
+    if not (isinstance(key, list) and len(key) == 2 and all(isinstance(k, str) for k in key)):
+        return False
+    try:
+        datetime.fromisoformat(key[0].replace("Z", "+00:00"))
+    except ValueError:
+        return False
+    return bool(_SESSION_ID_RE.match(key[1]))
+
+
 @router.get("/event/{event_id}/sessions")
 async def list_feedback_sessions(
     event_id: int,
     limit:  int  = Query(20, ge=1, le=100),
     offset: int  = Query(0,  ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor / prev_cursor from a previous page"),
     user=Depends(jwt_middleware)
 ):
     """
     [Admin only] Paginated list of all feedback sessions for an event.
     Each session includes every answer with its question text.
+    Keyset pagination on (submitted_at, session_id), newest first: follow
+    pagination.next_cursor / prev_cursor with ?cursor=.
     """
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
         # Questions lookup
-        q_resp = (
+        q_resp = await db_execute(
             supabaseAdmin.table("feedback_questions")
             .select("question_id, question_text, question_type, display_order")
             .eq("event_id", event_id)
             .order("display_order")
-            .execute()
         )
         questions_map = {q["question_id"]: q for q in (q_resp.data or [])}
 
-        # Total count
-        all_sessions = (
-            supabaseAdmin.table("feedback_sessions")
-            .select("session_id")
-            .eq("event_id", event_id)
-            .execute()
-        )
-        total = len(all_sessions.data) if all_sessions.data else 0
+        # Total count — cached, bumped by submit_feedback
+        async def _count_sessions() -> int:
+            count_resp = await db_execute(
+                supabaseAdmin.table("feedback_sessions")
+                .select("session_id", count="exact")
+                .eq("event_id", event_id)
+                .limit(1)
+            )
+            return count_resp.count
+
+        total = await cached_count(f"feedback_sessions:event:{event_id}", _count_sessions)
 
-        # Page of sessions
-        sessions_resp = (
+        # Page of sessions — keyset on (submitted_at, session_id)
+        direction, after_key = decode_cursor(cursor, valid=_valid_session_key)
+        query = (
             supabaseAdmin.table("feedback_sessions")
             .select("session_id, submitted_at, device_info")
             .eq("event_id", event_id)
-            .order("submitted_at", desc=True)
-            .range(offset, offset + limit - 1)
-            .execute()
         )
-        sessions = sessions_resp.data or []
+        if direction:
+            submitted_at, session_id = after_key
+            op = "lt" if direction == "next" else "gt"
+            query = query.or_(
+                f'submitted_at.{op}."{submitted_at}",'
+                f'and(submitted_at.eq."{submitted_at}",session_id.{op}.{session_id})'
+            )
+        descending = direction != "prev"
+        query = query.order("submitted_at", desc=descending).order("session_id", desc=descending)
+        query = query.limit(limit + 1) if direction else query.range(offset, offset + limit)
+
+        sessions_resp = await db_execute(query)
+        sessions = (sessions_resp.data or [])[:limit]
+        has_more = len(sessions_resp.data or []) > limit
+        if not descending:
+            sessions.reverse()
+        cursors = page_cursors(
+            sessions, lambda s: [s["submitted_at"], str(s["session_id"])],
+            has_more, direction, has_previous=offset > 0,
+        )
         if not sessions:
             return {"event_id": event_id, "total": total, "sessions": [],
-                    "pagination": {"limit": limit, "offset": offset, "count": 0}}
+                    "pagination": {"limit": limit, "offset": offset, "count": 0, **cursors}}
 
         session_ids = [s["session_id"] for s in sessions]
 
         # All answers for this page
-        answers_resp = (
+        answers_resp = await db_execute(
             supabaseAdmin.table("feedback_answers")
             .select("session_id, question_id, answer_number, answer_text, answered_at")
             .in_("session_id", session_ids)
-            .execute()
         )
         answers_by_session: dict = defaultdict(list)
         for a in (answers_resp.data or []):
@@ -382,7 +414,7 @@ async def list_feedback_sessions(
             "event_id": event_id,
             "total":    total,
             "sessions": result,
-            "pagination": {"limit": limit, "offset": offset, "count": len(result)},
+            "pagination": {"limit": limit, "offset": offset if not cursor else None, "count": len(result), **cursors},
         }
 
     except HTTPException:
@@ -391,104 +423,74 @@ async def list_feedback_sessions(
         raise HTTPException(status_code=500, detail=f"Error listing sessions: {str(e)}")
 
 
-# ─── Admin: CSV export ───────────────────────────────────────────────────────
+# ─── Admin: CSV / columnar export ────────────────────────────────────────────
 
 @router.get("/event/{event_id}/export")
 async def export_feedback_csv(
     event_id: int,
+    format: str = Query("csv", description="csv | parquet | arrow | ndjson"),
     user=Depends(jwt_middleware)
 ):
     """
-    [Admin only] Download all feedback for an event as a CSV file.
-    Columns: Session Ref, Submitted At, <one column per question>
+    [Admin only] Download all feedback for an event.
+    csv     : Session Ref, Submitted At, <one column per question>
+    parquet / arrow / ndjson : one row per answer (session_ref, submitted_at,
+              question_no, question_text, question_type, answer_number, answer_text)
     """
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
 
+    fmt = (format or "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'. Use one of: {', '.join(EXPORT_FORMATS)}")
+    if fmt in COLUMNAR_FORMATS and not columnar_available():
+        raise HTTPException(status_code=501, detail=f"{fmt} export is not available on this server (pyarrow missing)")
+
     try:
-        import csv, io
         from fastapi.responses import StreamingResponse
 
         # Event name for filename
-        event_resp = (
+        event_resp = await db_execute(
             supabaseAdmin.table("events")
             .select("name")
             .eq("event_id", event_id)
             .single()
-            .execute()
         )
         event_name = (event_resp.data or {}).get("name", f"event_{event_id}")
 
         # Questions ordered by display_order
-        q_resp = (
+        q_resp = await db_execute(
             supabaseAdmin.table("feedback_questions")
             .select("question_id, question_text, question_type, display_order")
             .eq("event_id", event_id)
             .order("display_order")
-            .execute()
         )
         questions = q_resp.data or []
-        questions_map = {q["question_id"]: q for q in questions}
 
-        # All sessions
-        sessions_resp = (
-            supabaseAdmin.table("feedback_sessions")
-            .select("session_id, submitted_at")
-            .eq("event_id", event_id)
-            .order("submitted_at", desc=False)
-            .execute()
-        )
-        sessions = sessions_resp.data or []
-        if not sessions:
+        # First page of sessions up front so an empty event is still a clean 404;
+        # the rest is streamed page by page (utils/services/feedback_export.py)
+        first_page = await fetch_session_page(event_id, None)
+        if not first_page:
             raise HTTPException(status_code=404, detail="No feedback submissions found for this event")
 
-        session_ids = [s["session_id"] for s in sessions]
-
-        # All answers
-        answers_resp = (
-            supabaseAdmin.table("feedback_answers")
-            .select("session_id, question_id, answer_number, answer_text")
-            .in_("session_id", session_ids)
-            .execute()
-        )
-        answers_by_session: dict = defaultdict(dict)
-        for a in (answers_resp.data or []):
-            q = questions_map.get(a["question_id"], {})
-            value = (
-                a["answer_number"]
-                if q.get("question_type") == "rating"
-                else a["answer_text"]
+        if fmt == "csv":
+            body = csv_chunks(
+                iter_feedback_pages(event_id, questions, build_feedback_rows, first_page=first_page),
+                header=feedback_csv_header(questions),
+            )
+        else:
+            body = record_chunks(
+                iter_feedback_pages(event_id, questions, build_feedback_records, first_page=first_page),
+                FEEDBACK_EXPORT_FIELDS,
+                fmt,
             )
-            answers_by_session[a["session_id"]][a["question_id"]] = value
-
-        # Build CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # Header row
-        header = ["Session Ref", "Submitted At"] + [
-            f"Q{i+1}: {q['question_text']}" for i, q in enumerate(questions)
-        ]
-        writer.writerow(header)
 
-        # Data rows
-        for s in sessions:
-            sid = s["session_id"]
-            row = [
-                sid,
-                s["submitted_at"],
-            ]
-            for q in questions:
-                row.append(answers_by_session.get(sid, {}).get(q["question_id"], ""))
-            writer.writerow(row)
-
-        output.seek(0)
         safe_name = event_name.replace(" ", "_")
-        filename  = f"feedback_{safe_name}_{india_now().strftime('%Y%m%d')}.csv"
+        filename  = f"feedback_{safe_name}_{india_now().strftime('%Y%m%d')}.{EXPORT_FILE_EXTENSIONS[fmt]}"
 
         return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
+            body,
+            media_type=EXPORT_MEDIA_TYPES[fmt],
             headers={"Content-Disposition": f"attachment; filename={filename}"},
         )
 
@@ -498,38 +500,35 @@ async def export_feedback_csv(
         raise HTTPException(status_code=500, detail=f"Error exporting feedback: {str(e)}")
 # ─── shared helper ────────────────────────────────────────────────────────────
 
-def _fetch_stats_data(event_id: int):
+async def _fetch_stats_data(event_id: int):
     """
     Internal helper: returns (questions, total_sessions, answers_by_question).
     Raises HTTPException if no questions found.
     """
-    questions_resp = (
+    questions_resp = await db_execute(
         supabaseAdmin.table("feedback_questions")
         .select("question_id, question_text, question_type, min_value, max_value, display_order")
         .eq("event_id", event_id)
         .eq("is_active", True)
         .order("display_order")
-        .execute()
     )
     if not questions_resp.data:
         return [], 0, {}
 
-    sessions_resp = (
+    sessions_resp = await db_execute(
         supabaseAdmin.table("feedback_sessions")
         .select("session_id")
         .eq("event_id", event_id)
-        .execute()
     )
     session_ids = [s["session_id"] for s in (sessions_resp.data or [])]
     total_sessions = len(session_ids)
 
     answers_by_question: dict = defaultdict(list)
     if session_ids:
-        answers_resp = (
+        answers_resp = await db_execute(
             supabaseAdmin.table("feedback_answers")
             .select("question_id, answer_number, answer_text, answered_at")
             .in_("session_id", session_ids)
-            .execute()
         )
         for a in (answers_resp.data or []):
             answers_by_question[a["question_id"]].append(a)
@@ -555,7 +554,7 @@ async def get_event_feedback_stats(
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
-        questions, total_sessions, answers_by_question = _fetch_stats_data(event_id)
+        questions, total_sessions, answers_by_question = await _fetch_stats_data(event_id)
 
         if not questions:
             return {"event_id": event_id, "total_sessions": 0, "questions": []}
@@ -642,7 +641,7 @@ async def get_event_feedback_stats_page(
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
-        questions, total_sessions, answers_by_question = _fetch_stats_data(event_id)
+        questions, total_sessions, answers_by_question = await _fetch_stats_data(event_id)
 
         if not questions:
             return {"event_id": event_id, "total_sessions": 0, "page": page, "questions": []}
@@ -1,12 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form, BackgroundTasks
-from utils.services.public_access_link_provider import short_url_generator
+from utils.services.short_code_allocator import allocate_short_code
 from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
 from utils.supabase.auth import check_guard_admin_access, jwt_middleware
 from utils.models.api_models import Tourist
 from datetime import date, datetime
 from pydantic import BaseModel
 from utils.services.jwt_file_token import generate_card_token
 from utils.services.card_cache import TEMP_CARD_DIR
+from utils.services.card_render_queue import enqueue_card_render
+from utils.services.event_cache import get_event
+from utils.services.short_code_index import index_short_code, lookup_short_code
+from utils.services.pagination import adjust_count, tourist_count_name, event_tourist_count_name
+from utils.services.tourist_search import index_tourist
 from utils.india_time import india_today
 import jwt
 
@@ -54,23 +60,26 @@ async def renew_card_by_shortcode(
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "short_code is required")
 
     try:
-        # Find short_link by short_code to get the original user_id
-        short_link_resp = (
-            supabaseAdmin.table("short_links")
-            .select("*")
-            .eq("short_code", short_code)
-            .single()
-            .execute()
-        )
-        
-        if not short_link_resp.data:
-            raise HTTPException(
-                status.HTTP_404_NOT_FOUND,
-                "Short code not found. Please check your code."
+        # Find short_link by short_code to get the original user_id (Redis index first)
+        indexed = lookup_short_code(short_code, require=("token",))
+        if indexed:
+            original_token = indexed["token"]
+        else:
+            short_link_resp = await db_execute(
+                supabaseAdmin.table("short_links")
+                .select("*")
+                .eq("short_code", short_code)
+                .single()
             )
+            
+            if not short_link_resp.data:
+                raise HTTPException(
+                    status.HTTP_404_NOT_FOUND,
+                    "Short code not found. Please check your code."
+                )
 
-        short_link = short_link_resp.data
-        original_token = short_link.get("token")
+            short_link = short_link_resp.data
+            original_token = short_link.get("token")
         
         # Verify token is still valid to extract user_id
         try:
@@ -86,13 +95,13 @@ async def renew_card_by_shortcode(
             # Token expired, but we can still find the user via RPC using short_code
             # The verify_qr_code RPC will handle the lookup
             # We'll use the RPC to verify the short_code
-            qr_verify_resp = supabaseAdmin.rpc(
+            qr_verify_resp = await db_execute(supabaseAdmin.rpc(
                 "verify_qr_code",
                 {
                     "p_short_code": short_code,
                     "p_event_id": 1  # Default event
                 }
-            ).execute()
+            ))
             
             if not qr_verify_resp.data or len(qr_verify_resp.data) == 0:
                 raise HTTPException(
@@ -110,7 +119,7 @@ async def renew_card_by_shortcode(
             )
 
         # Fetch original tourist
-        existing_tourist_resp = supabaseAdmin.table("tourists").select("*").eq("user_id", original_user_id).single().execute()
+        existing_tourist_resp = await db_execute(supabaseAdmin.table("tourists").select("*").eq("user_id", original_user_id).single())
         if not existing_tourist_resp.data:
             raise HTTPException(
                 status.HTTP_404_NOT_FOUND,
@@ -122,13 +131,12 @@ async def renew_card_by_shortcode(
         registered_event_id = existing_tourist.get("registered_event_id")
 
         # Check if already registered for this date
-        already_registered_resp = (
+        already_registered_resp = await db_execute(
             supabaseAdmin.table("tourists")
             .select("user_id")
             .eq("phone", phone)
             .eq("registered_event_id", registered_event_id)
             .eq("valid_date", str(valid_date_obj))
-            .execute()
         )
         
         if already_registered_resp.data:
@@ -138,17 +146,15 @@ async def renew_card_by_shortcode(
             )
 
         # Validate active event
-        event_resp = supabaseAdmin.table("events").select("*").eq("is_active", True).eq("event_id", registered_event_id).execute()
-        if not event_resp.data:
+        event_data = await get_event(registered_event_id)
+        if not event_data or not event_data.get("is_active"):
             raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid or inactive event")
-        event_data = event_resp.data[0]
 
         # Fetch original tourist meta to get image_path
-        existing_meta_resp = (
+        existing_meta_resp = await db_execute(
             supabaseAdmin.table("tourist_meta")
             .select("image_path, unique_id_path")
             .eq("user_id", original_user_id)
-            .execute()
         )
         
         if not existing_meta_resp.data:
@@ -190,26 +196,38 @@ async def renew_card_by_shortcode(
         elif hasattr(reg_dict.get("valid_date"), "isoformat"):
             reg_dict["valid_date"] = reg_dict["valid_date"].isoformat()
 
-        insert_resp = supabaseAdmin.table("tourists").insert(reg_dict).execute()
+        insert_resp = await db_execute(supabaseAdmin.table("tourists").insert(reg_dict))
         if not insert_resp.data:
             raise HTTPException(status.HTTP_400_BAD_REQUEST, "Error creating new registration")
         
         new_user_id = insert_resp.data[0]["user_id"]
         print(f"Created new tourist entry with user_id: {new_user_id} for date: {valid_date_obj}")
+        adjust_count(tourist_count_name(reg_dict["valid_date"]))
+        adjust_count(event_tourist_count_name(reg_dict["registered_event_id"], reg_dict["valid_date"]))
 
         # Generate NEW QR code and short code
-        new_qr_code = short_url_generator()
+        new_qr_code = await allocate_short_code()
         
         # Create new meta with SAME image_path but NEW qr_code
-        meta_resp = supabaseAdmin.table("tourist_meta").insert({
+        meta_resp = await db_execute(supabaseAdmin.table("tourist_meta").insert({
             "user_id": new_user_id,
             "qr_code": new_qr_code,
             "image_path": existing_image_path,  # REUSE existing image
             "unique_id_path": existing_unique_id_path,  # REUSE existing ID photo if any
-        }).execute()
+        }))
         if not meta_resp.data:
             raise HTTPException(status.HTTP_400_BAD_REQUEST, "Error saving meta")
 
+        index_short_code(
+            new_qr_code, user_id=new_user_id, valid_date=str(valid_date_obj), event_id=registered_event_id,
+            name=new_registration.name, group_count=new_registration.group_count,
+        )
+        index_tourist(registered_event_id, {
+            "user_id": new_user_id, "name": new_registration.name, "phone": new_registration.phone,
+            "short_code": new_qr_code, "valid_date": str(valid_date_obj), "is_group": new_registration.is_group,
+            "group_count": new_registration.group_count,
+        })
+
         print(f"Created new tourist_meta for user_id: {new_user_id}, new_qr_code: {new_qr_code}")
 
         # Generate NEW visitor card token
@@ -226,11 +244,15 @@ async def renew_card_by_shortcode(
             )
             
             # Create NEW short_link with NEW token
-            supabaseAdmin.table("short_links").insert({
+            await db_execute(supabaseAdmin.table("short_links").insert({
                 "short_code": new_qr_code,
                 "token": visitor_card_token
-            }).execute()
+            }))
+            index_short_code(new_qr_code, token=visitor_card_token)
             card_public_url = f"/tourists/visitor-card/{visitor_card_token}"
+
+            # Warm static/temp-card/ before the SMS link gets clicked
+            enqueue_card_render(new_user_id, card_temp_path, str(valid_date_obj))
             
             print(f"Generated new visitor card token and short_link for user_id: {new_user_id}, short_code: {new_qr_code}")
             
@@ -324,21 +346,19 @@ async def renew_card_by_phone(
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "registered_event_id is required")
 
     # Validate active event
-    event_resp = supabaseAdmin.table("events").select("*").eq("is_active", True).eq("event_id", registered_event_id).execute()
-    if not event_resp.data:
+    event_data = await get_event(registered_event_id)
+    if not event_data or not event_data.get("is_active"):
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid or inactive event")
-    event_data = event_resp.data[0]
 
     try:
         # Find existing tourist with this phone (get the most recent one)
-        existing_tourists_resp = (
+        existing_tourists_resp = await db_execute(
             supabaseAdmin.table("tourists")
             .select("*")
             .eq("phone", phone)
             .eq("registered_event_id", registered_event_id)
             .order("user_id", desc=True)
             .limit(1)
-            .execute()
         )
         
         if not existing_tourists_resp.data:
@@ -351,13 +371,12 @@ async def renew_card_by_phone(
         existing_user_id = existing_tourist["user_id"]
 
         # Check if already registered for this date
-        already_registered_resp = (
+        already_registered_resp = await db_execute(
             supabaseAdmin.table("tourists")
             .select("user_id")
             .eq("phone", phone)
             .eq("registered_event_id", registered_event_id)
             .eq("valid_date", str(valid_date_obj))
-            .execute()
         )
         
         if already_registered_resp.data:
@@ -368,11 +387,10 @@ async def renew_card_by_phone(
             )
 
         # Fetch existing tourist meta to get image_path
-        existing_meta_resp = (
+        existing_meta_resp = await db_execute(
             supabaseAdmin.table("tourist_meta")
             .select("image_path, unique_id_path")
             .eq("user_id", existing_user_id)
-            .execute()
         )
         
         if not existing_meta_resp.data:
@@ -414,26 +432,38 @@ async def renew_card_by_phone(
         elif hasattr(reg_dict.get("valid_date"), "isoformat"):
             reg_dict["valid_date"] = reg_dict["valid_date"].isoformat()
 
-        insert_resp = supabaseAdmin.table("tourists").insert(reg_dict).execute()
+        insert_resp = await db_execute(supabaseAdmin.table("tourists").insert(reg_dict))
         if not insert_resp.data:
             raise HTTPException(status.HTTP_400_BAD_REQUEST, "Error creating new registration")
         
         new_user_id = insert_resp.data[0]["user_id"]
         print(f"Created new tourist entry with user_id: {new_user_id}")
+        adjust_count(tourist_count_name(reg_dict["valid_date"]))
+        adjust_count(event_tourist_count_name(reg_dict["registered_event_id"], reg_dict["valid_date"]))
 
         # Generate new QR code and short code
-        new_qr_code = short_url_generator()
+        new_qr_code = await allocate_short_code()
         
         # Create new meta with SAME image_path but NEW qr_code
-        meta_resp = supabaseAdmin.table("tourist_meta").insert({
+        meta_resp = await db_execute(supabaseAdmin.table("tourist_meta").insert({
             "user_id": new_user_id,
             "qr_code": new_qr_code,
             "image_path": existing_image_path,  # REUSE existing image
             "unique_id_path": existing_unique_id_path,  # REUSE existing ID photo if any
-        }).execute()
+        }))
         if not meta_resp.data:
             raise HTTPException(status.HTTP_400_BAD_REQUEST, "Error saving meta")
 
+        index_short_code(
+            new_qr_code, user_id=new_user_id, valid_date=str(valid_date_obj), event_id=registered_event_id,
+            name=new_registration.name, group_count=new_registration.group_count,
+        )
+        index_tourist(registered_event_id, {
+            "user_id": new_user_id, "name": new_registration.name, "phone": new_registration.phone,
+            "short_code": new_qr_code, "valid_date": str(valid_date_obj), "is_group": new_registration.is_group,
+            "group_count": new_registration.group_count,
+        })
+
         # Generate NEW visitor card token
         card_temp_path = f"{TEMP_CARD_DIR}/card_temp_{new_user_id}.png"
         card_public_url = None
@@ -448,11 +478,15 @@ async def renew_card_by_phone(
             )
             
             # Create NEW short_link with NEW token
-            supabaseAdmin.table("short_links").insert({
+            await db_execute(supabaseAdmin.table("short_links").insert({
                 "short_code": new_qr_code,
                 "token": visitor_card_token
-            }).execute()
+            }))
+            index_short_code(new_qr_code, token=visitor_card_token)
             card_public_url = f"/tourists/visitor-card/{visitor_card_token}"
+
+            # Warm static/temp-card/ before the SMS link gets clicked
+            enqueue_card_render(new_user_id, card_temp_path, str(valid_date_obj))
             
             print(f"Generated new visitor card token and short_link for user_id: {new_user_id}, short_code: {new_qr_code}")
             
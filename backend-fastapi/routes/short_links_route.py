@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 
 from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
 
 router = APIRouter()
 
@@ -13,7 +14,7 @@ async def redirect_short_link(code: str):
     - Increment click count
     - Redirect to original URL (extracted from token)
     """
-    response = supabaseAdmin.table("short_links").select("*").eq("short_code", code).eq("is_active", True).execute().data
+    response = (await db_execute(supabaseAdmin.table("short_links").select("*").eq("short_code", code).eq("is_active", True))).data
     if not response:
         raise HTTPException(status_code=404, detail="Short link not found or inactive")
     if hasattr(response, "data"):
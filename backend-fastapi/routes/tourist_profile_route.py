@@ -6,6 +6,7 @@ Fetches: Profile, Today's entries, Historical entries in one RPC call
 from fastapi import APIRouter, Depends, HTTPException, status
 from utils.services.jwt_file_token import generate_user_image_token
 from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
 from utils.supabase.auth import check_guard_admin_access
 from utils.india_time import india_today_str
 
@@ -74,14 +75,14 @@ async def get_tourist_profile(
     
     try:
         # Call RPC to get all tourist data in one call
-        resp = supabaseAdmin.rpc(
+        resp = await db_execute(supabaseAdmin.rpc(
             "get_tourist_complete",
             {
                 "p_user_id":  user_id,
                 "p_event_id": event_id,
                 "p_date":     india_today_str(),
             }
-        ).execute()
+        ))
         
         if not resp.data or len(resp.data) == 0:
             raise HTTPException(
@@ -169,7 +170,7 @@ async def get_tourist_profile_by_phone(
     
     try:
         # First find user_id by phone
-        tourist_lookup = supabaseAdmin.table("tourists").select("user_id").eq("phone", int(phone)).limit(1).execute()
+        tourist_lookup = await db_execute(supabaseAdmin.table("tourists").select("user_id").eq("phone", int(phone)).limit(1))
         
         if not tourist_lookup.data:
             raise HTTPException(
@@ -180,14 +181,14 @@ async def get_tourist_profile_by_phone(
         user_id = tourist_lookup.data[0]["user_id"]
         
         # Now get complete profile using the RPC
-        resp = supabaseAdmin.rpc(
+        resp = await db_execute(supabaseAdmin.rpc(
             "get_tourist_complete",
             {
                 "p_user_id":  user_id,
                 "p_event_id": event_id,
                 "p_date":     str(date.today()),
             }
-        ).execute()
+        ))
         
         if not resp.data or len(resp.data) == 0:
             raise HTTPException(
@@ -309,14 +310,14 @@ async def get_tourist_complete_with_related(
     
     try:
         # Call RPC to get all data including related users
-        resp = supabaseAdmin.rpc(
+        resp = await db_execute(supabaseAdmin.rpc(
             "get_tourist_with_related",
             {
                 "p_user_id":  user_id,
                 "p_event_id": event_id,
                 "p_date":     str(date.today()),
             }
-        ).execute()
+        ))
         
         if not resp.data or len(resp.data) == 0:
             raise HTTPException(
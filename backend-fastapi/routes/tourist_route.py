@@ -1,16 +1,16 @@
 from fastapi import (
-    APIRouter, BackgroundTasks, Depends, HTTPException, status, UploadFile, Query
+    APIRouter, BackgroundTasks, Depends, File, HTTPException, status, UploadFile, Query, Request
 )
 from fastapi.responses import FileResponse, StreamingResponse, RedirectResponse
 from utils.supabase.auth import jwt_middleware, check_guard_admin_access
 from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
 from utils.models.api_models import Tourist
 from fastapi import Form
 from utils.services.public_access_link_provider import generate_public_access_link, verify_public_access_link
-from utils.services.file_handlers import save_upload_file
-from template_generator import VisitorCardGenerator, VisitorCardGenerator3
+from utils.services.file_handlers import save_upload_file, save_upload_bytes
 from utils.services.email_handler import send_welcome_email_background
-from utils.services.sms_handler import send_welcome_sms_background
+from utils.services.sms_handler import send_welcome_sms_background, send_bulk_sms_background
 from utils.services.jwt_file_token import (
     generate_card_token,
     generate_user_image_token,
@@ -21,10 +21,37 @@ from datetime import datetime
 from utils.india_time import india_today_str
 
 from io import BytesIO
-from utils.services.card_cache import TEMP_CARD_DIR, touch_card, is_card_fresh
+from utils.services.card_cache import TEMP_CARD_DIR, conditional_file_response
+from utils.services.entry_export import (
+    ENTRY_EXPORT_FIELDS, fetch_record_page, iter_entry_pages, build_entry_records, csv_chunks,
+)
+from utils.services.export_formats import (
+    EXPORT_FORMATS, COLUMNAR_FORMATS, EXPORT_MEDIA_TYPES, EXPORT_FILE_EXTENSIONS,
+    columnar_available, record_chunks,
+)
+from utils.services.event_cache import get_event, guard_allowed
+from utils.services.short_code_index import index_short_code, lookup_short_code
+from utils.services.occupancy import get_occupancy, entry_counts
+from utils.services.batch_loader import entry_items_loader
+from utils.services.tourist_search import index_tourist, search_tourists, search_tourists_db
+from utils.services.pagination import (
+    adjust_count, cached_count, decode_cursor, page_cursors, tourist_count_name, event_tourist_count_name,
+)
+from utils.services.bulk_registration import (
+    parse_manifest, PhotoArchive, validate_manifest, find_registered_phones, BULK_REGISTER_CHUNK_SIZE,
+)
+from utils.services.card_renderer import (
+    RenderQueueFull, CARD_RENDER_RETRY_AFTER, CARD_MEDIA_TYPES, CARD_FILE_EXTENSIONS,
+    pick_card_format, record_card_served,
+)
+from utils.services.card_render_queue import get_or_render_card, enqueue_card_render
 import jwt
 import os
-from utils.services.public_access_link_provider import short_url_generator
+import json
+import time
+import asyncio
+from collections import Counter
+from utils.services.short_code_allocator import allocate_short_code, allocate_short_codes
 
 router = APIRouter()
 
@@ -97,10 +124,9 @@ async def register_tourist(
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "registered_event_id is required")
 
     # Validate active event
-    event_resp = supabaseAdmin.table("events").select("*").eq("is_active", True).eq("event_id", registration.registered_event_id).execute()
-    if not event_resp.data:
+    event_data = await get_event(registration.registered_event_id)
+    if not event_data or not event_data.get("is_active"):
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid or inactive event")
-    event_data = event_resp.data[0]
 
     # Insert tourist
     try:
@@ -110,10 +136,12 @@ async def register_tourist(
         elif hasattr(reg_dict.get("valid_date"), "isoformat"):
             reg_dict["valid_date"] = reg_dict["valid_date"].isoformat()
 
-        insert_resp = supabaseAdmin.table("tourists").insert(reg_dict).execute()
+        insert_resp = await db_execute(supabaseAdmin.table("tourists").insert(reg_dict))
         if not insert_resp.data:
             raise HTTPException(status.HTTP_400_BAD_REQUEST, "Error registering tourist")
         user_id = insert_resp.data[0]["user_id"]
+        adjust_count(tourist_count_name(reg_dict["valid_date"]))
+        adjust_count(event_tourist_count_name(reg_dict["registered_event_id"], reg_dict["valid_date"]))
 
         # Save profile image
         image_path = save_upload_file(image, prefix=f"tourist_{user_id}")
@@ -124,18 +152,28 @@ async def register_tourist(
             unique_id_path = save_upload_file(unique_id_photo, prefix=f"uid_{user_id}", is_id=True)
 
         # Generate QR short code
-        code = short_url_generator()
+        code = await allocate_short_code()
 
         # Save meta (profile image + QR + optional ID photo path)
-        meta_resp = supabaseAdmin.table("tourist_meta").insert({
+        meta_resp = await db_execute(supabaseAdmin.table("tourist_meta").insert({
             "user_id": user_id,
             "qr_code": code,
             "image_path": image_path,
             "unique_id_path": unique_id_path,
-        }).execute()
+        }))
         if not meta_resp.data:
             raise HTTPException(status.HTTP_400_BAD_REQUEST, "Error saving meta")
 
+        index_short_code(
+            code, user_id=user_id, valid_date=str(valid_date), event_id=registration.registered_event_id,
+            name=registration.name, group_count=registration.group_count,
+        )
+        index_tourist(registration.registered_event_id, {
+            "user_id": user_id, "name": registration.name, "phone": registration.phone,
+            "short_code": code, "valid_date": str(valid_date), "is_group": registration.is_group,
+            "group_count": registration.group_count,
+        })
+
         # Generate visitor card token & short link
         card_temp_path = f"{TEMP_CARD_DIR}/card_temp_{user_id}.png"
         card_public_url = None
@@ -147,12 +185,16 @@ async def register_tourist(
                 valid_dates=str(valid_date),
                 card_temp_path=card_temp_path,
             )
-            supabaseAdmin.table("short_links").insert({
+            await db_execute(supabaseAdmin.table("short_links").insert({
                 "short_code": code,
                 "token": visitor_card_token
-            }).execute()
+            }))
+            index_short_code(code, token=visitor_card_token)
             card_public_url = f"/tourists/visitor-card/{visitor_card_token}"
 
+            # Warm static/temp-card/ before the SMS link gets clicked
+            enqueue_card_render(user_id, card_temp_path, str(valid_date))
+
             if phone and background_tasks:
                 send_welcome_sms_background(
                     background_tasks=background_tasks,
@@ -176,27 +218,269 @@ async def register_tourist(
         }
 
     except Exception as e:
-        err_text = str(e)
-        if "duplicate key value violates unique constraint" in err_text or "23505" in err_text or "already exists" in err_text:
-            try:
-                import re
-                m = re.search(r"Key \((?P<field>[^)]+)\)=\((?P<value>[^)]+)\)", err_text)
-                if m:
-                    field = m.group("field")
-                    value = m.group("value")
-                    friendly = f"{field.replace('_', ' ').capitalize()} '{value}' already registered"
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, f"Error registering tourist: {_registration_error_message(e)}")
+
+
+def _registration_error_message(e: Exception) -> str:
+    """Readable reason for a failed tourist insert (unique-constraint violations spelled out)."""
+    err_text = str(e)
+    if "duplicate key value violates unique constraint" in err_text or "23505" in err_text or "already exists" in err_text:
+        try:
+            import re
+            m = re.search(r"Key \((?P<field>[^)]+)\)=\((?P<value>[^)]+)\)", err_text)
+            if m:
+                field = m.group("field")
+                value = m.group("value")
+                friendly = f"{field.replace('_', ' ').capitalize()} '{value}' already registered"
+            else:
+                m2 = re.search(r'constraint "(?P<constraint>[^"]+)"', err_text)
+                if m2:
+                    constraint = m2.group("constraint")
+                    friendly = "Phone number already registered for this date" if "phone" in constraint else "Duplicate value already exists"
+                else:
+                    friendly = "Duplicate value already exists"
+        except Exception:
+            friendly = "Duplicate value already exists"
+        return friendly
+    return err_text
+
+
+# ------------------------------------------------------------
+# BULK REGISTER TOURISTS (Admin only — groups / institutions)
+# ------------------------------------------------------------
+@router.post("/register/bulk", status_code=status.HTTP_200_OK)
+async def bulk_register_tourists(
+    registered_event_id: int = Form(...),
+    manifest: UploadFile = File(...),
+    photos: UploadFile = None,
+    valid_date: str = Form(None),
+    send_sms: bool = Form(True),
+    background_tasks: BackgroundTasks = None,
+    user=Depends(jwt_middleware),
+):
+    """
+    Register a whole group (school, tour operator) in one request.
+
+    Multipart form:
+    - registered_event_id
+    - manifest: CSV (header row) or JSON with the /register fields per row —
+      name, phone, unique_id_type, unique_id, is_group, group_count, valid_date,
+      image, unique_id_photo (image / unique_id_photo = file names in `photos`)
+    - photos: zip of the profile / ID photos
+    - valid_date: default for rows without one
+    - send_sms: text each tourist their card link (default true)
+
+    Every row is validated first; if any row is invalid nothing is registered
+    and a 422 lists the errors per row.  Otherwise rows are inserted in batches
+    of BULK_REGISTER_CHUNK_SIZE and the response streams one NDJSON line per
+    row as its batch completes, then a summary line:
+
+        {"row": 1, "status": "registered", "user_id": ..., "short_code": ..., "visitor_card_url": ...}
+        {"row": 2, "status": "failed", "error": "..."}
+        {"summary": {"registered": ..., "failed": ..., "took_ms": ...}}
+
+    A batch whose photos, short codes, meta or short links can't be saved is
+    removed again and its rows reported failed — re-send just those rows.
+    """
+    if user.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to register tourists in bulk.",
+        )
+
+    event_data = await get_event(registered_event_id)
+    if not event_data or not event_data.get("is_active"):
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid or inactive event")
+
+    rows = parse_manifest(manifest.filename, await manifest.read())
+    archive = PhotoArchive(photos)
+    registrations, errors = validate_manifest(rows, archive, registered_event_id, valid_date)
+    if not errors:
+        already = await find_registered_phones(registrations)
+        errors = [
+            {"row": r["row"], "errors": ["Phone number already registered for this date"]}
+            for r in registrations
+            if (r["tourist"]["phone"], r["tourist"]["valid_date"]) in already
+        ]
+    if errors:
+        archive.close()
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "message": f"{len(errors)} of {len(rows)} rows are invalid — nothing was registered",
+                "errors": errors,
+            },
+        )
+
+    return StreamingResponse(
+        _bulk_register_lines(registrations, archive, event_data, background_tasks if send_sms else None),
+        media_type="application/x-ndjson",
+    )
+
+
+async def _bulk_register_lines(registrations: list, archive: PhotoArchive, event_data: dict,
+                               background_tasks: BackgroundTasks = None):
+    started = time.perf_counter()
+    registered = failed = 0
+    messages = []
+    try:
+        for start in range(0, len(registrations), BULK_REGISTER_CHUNK_SIZE):
+            chunk = registrations[start:start + BULK_REGISTER_CHUNK_SIZE]
+            for result in await _bulk_register_chunk(chunk, archive, event_data, messages):
+                if result["status"] == "registered":
+                    registered += 1
                 else:
-                    m2 = re.search(r'constraint "(?P<constraint>[^"]+)"', err_text)
-                    if m2:
-                        constraint = m2.group("constraint")
-                        friendly = "Phone number already registered for this date" if "phone" in constraint else "Duplicate value already exists"
-                    else:
-                        friendly = "Duplicate value already exists"
-            except Exception:
-                friendly = "Duplicate value already exists"
-            raise HTTPException(status.HTTP_400_BAD_REQUEST, f"Error registering tourist: {friendly}")
-
-        raise HTTPException(status.HTTP_400_BAD_REQUEST, f"Error registering tourist: {err_text}")
+                    failed += 1
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+    finally:
+        archive.close()
+        if background_tasks is not None:
+            # Sent once the stream is done (FastAPI runs background tasks after the response)
+            send_bulk_sms_background(background_tasks, messages)
+
+    yield json.dumps({"summary": {
+        "registered": registered,
+        "failed": failed,
+        "sms_queued": len(messages) if background_tasks is not None else 0,
+        "took_ms": round((time.perf_counter() - started) * 1000, 1),
+    }}) + "\n"
+
+
+async def _insert_tourist_rows(chunk: list, results: dict) -> list:
+    """
+    One INSERT for the whole chunk; if it fails (e.g. a phone registered since
+    validation), rows are inserted one by one so only the offending rows fail.
+    → [(registration, inserted tourist row)] for the rows that went in.
+    """
+    try:
+        resp = await db_execute(supabaseAdmin.table("tourists").insert([r["tourist"] for r in chunk]))
+        by_key = {(t["phone"], str(t["valid_date"])[:10]): t for t in resp.data or []}
+        created = []
+        for r in chunk:
+            tourist = by_key.get((r["tourist"]["phone"], r["tourist"]["valid_date"]))
+            if tourist:
+                created.append((r, tourist))
+            else:
+                results[r["row"]] = {"row": r["row"], "status": "failed", "error": "Error registering tourist"}
+        return created
+    except Exception as e:
+        if len(chunk) == 1:
+            results[chunk[0]["row"]] = {"row": chunk[0]["row"], "status": "failed", "error": _registration_error_message(e)}
+            return []
+    created = []
+    for r in chunk:
+        created.extend(await _insert_tourist_rows([r], results))
+    return created
+
+
+def _save_bulk_photos(created: list, archive: PhotoArchive, saved: list) -> list:
+    """Write the chunk's photos; every written path also goes into `saved` (for rollback)."""
+    paths = []
+    for r, tourist in created:
+        user_id = tourist["user_id"]
+        image_path = save_upload_bytes(archive.read(r["image"]), r["image"], prefix=f"tourist_{user_id}")
+        saved.append(image_path)
+        unique_id_path = None
+        if r["unique_id_photo"]:
+            unique_id_path = save_upload_bytes(
+                archive.read(r["unique_id_photo"]), r["unique_id_photo"], prefix=f"uid_{user_id}", is_id=True
+            )
+            saved.append(unique_id_path)
+        paths.append((image_path, unique_id_path))
+    return paths
+
+
+async def _rollback_bulk_chunk(created: list, saved: list) -> None:
+    """Undo a chunk that could not be completed: its meta + tourist rows and saved photos."""
+    user_ids = [tourist["user_id"] for _, tourist in created]
+    await db_execute(supabaseAdmin.table("tourist_meta").delete().in_("user_id", user_ids))
+    await db_execute(supabaseAdmin.table("tourists").delete().in_("user_id", user_ids))
+    for path in saved:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+async def _bulk_register_chunk(chunk: list, archive: PhotoArchive, event_data: dict, messages: list) -> list:
+    """
+    register_tourist for a chunk of validated rows, with one statement per table.
+    If photos, codes, meta or short links fail, the chunk's tourists are deleted
+    again and its rows reported failed, so the operator can re-send them.
+    """
+    results: dict = {}
+    created = await _insert_tourist_rows(chunk, results)
+    if not created:
+        return [results[r["row"]] for r in chunk]
+
+    saved: list = []
+    links: list = []
+    try:
+        paths = await asyncio.to_thread(_save_bulk_photos, created, archive, saved)
+        codes = await allocate_short_codes(len(created))
+        meta_resp = await db_execute(supabaseAdmin.table("tourist_meta").insert([
+            {"user_id": tourist["user_id"], "qr_code": code, "image_path": image_path, "unique_id_path": unique_id_path}
+            for (_, tourist), code, (image_path, unique_id_path) in zip(created, codes, paths)
+        ]))
+        if not meta_resp.data:
+            raise RuntimeError("Error saving meta")
+
+        for (r, tourist), code in zip(created, codes):
+            token = generate_card_token(
+                user_id=tourist["user_id"],
+                user_name=tourist["name"],
+                event_name=event_data.get("name", ""),
+                valid_dates=r["tourist"]["valid_date"],
+                card_temp_path=f"{TEMP_CARD_DIR}/card_temp_{tourist['user_id']}.png",
+            )
+            links.append({"short_code": code, "token": token})
+        await db_execute(supabaseAdmin.table("short_links").insert(links))
+    except Exception as e:
+        print(f"Error completing bulk registration chunk: {e}")
+        error = f"Not registered ({e}) — re-send this row"
+        try:
+            await _rollback_bulk_chunk(created, saved)
+        except Exception as rollback_error:
+            print(f"Error rolling back bulk registration chunk: {rollback_error}")
+            # The rows stay, so the cached per-date count must include them
+            for valid_date, count in Counter(r["tourist"]["valid_date"] for r, _ in created).items():
+                adjust_count(tourist_count_name(valid_date), count)
+                adjust_count(event_tourist_count_name(event_data["event_id"], valid_date), count)
+            error = f"Registered without card ({e}); rollback failed: {rollback_error}"
+        for r, tourist in created:
+            results[r["row"]] = {"row": r["row"], "status": "failed", "user_id": tourist["user_id"], "error": error}
+        return [results[r["row"]] for r in chunk]
+
+    for valid_date, count in Counter(r["tourist"]["valid_date"] for r, _ in created).items():
+        adjust_count(tourist_count_name(valid_date), count)
+        adjust_count(event_tourist_count_name(event_data["event_id"], valid_date), count)
+
+    for (r, tourist), link in zip(created, links):
+        user_id, valid_date, code = tourist["user_id"], r["tourist"]["valid_date"], link["short_code"]
+        index_short_code(
+            code, user_id=user_id, valid_date=valid_date, event_id=tourist["registered_event_id"],
+            name=tourist["name"], group_count=tourist["group_count"], token=link["token"],
+        )
+        index_tourist(tourist["registered_event_id"], {
+            "user_id": user_id, "name": tourist["name"], "phone": tourist["phone"],
+            "short_code": code, "valid_date": valid_date, "is_group": tourist["is_group"],
+            "group_count": tourist["group_count"],
+        })
+        enqueue_card_render(user_id, f"{TEMP_CARD_DIR}/card_temp_{user_id}.png", valid_date)
+        messages.append({
+            "to": tourist["phone"],
+            "event_name": event_data.get("name", ""),
+            "e_id": str(code),
+            "valid_date": valid_date,
+            "short_code": code,
+        })
+        results[r["row"]] = {
+            "row": r["row"], "status": "registered", "user_id": user_id, "name": tourist["name"],
+            "short_code": code, "valid_date": valid_date,
+            "visitor_card_url": f"/tourists/visitor-card/{link['token']}",
+        }
+
+    return [results[r["row"]] for r in chunk]
 
 # ────────────────────────────────────────────────────────────────────────────
 # Quick card renewal endpoints are in quick_route.py:
@@ -207,16 +491,48 @@ async def register_tourist(
 # ------------------------------------------------------------
 # GET ALL TOURISTS (Admin only, Paginated)
 # ------------------------------------------------------------
+def _live_today_entries(tourists: list, today: str):
+    """
+    {user_id: today_entry} from the occupancy counters of each tourist's event,
+    or None when any of those events has no initialised counters.
+    """
+    by_event = {}
+    for tourist in tourists:
+        by_event.setdefault(tourist.get("registered_event_id"), []).append(tourist["user_id"])
+
+    entries = {}
+    for event_id, user_ids in by_event.items():
+        counts = entry_counts(event_id, today, user_ids) if event_id is not None else None
+        if counts is None:
+            return None
+        for user_id in user_ids:
+            total, open_entries = counts.get(user_id, (0, 0))
+            entries[user_id] = {
+                "has_entry_today": total > 0,
+                "is_currently_inside": open_entries > 0,
+                "total_entries_today": total,
+                "open_entries": open_entries,
+            }
+    return entries
+
+
 @router.get("/", status_code=status.HTTP_200_OK)
 async def get_all_tourists(
     limit: int = 20,
     offset: int = 0,
+    cursor: str = Query(None, description="next_cursor / prev_cursor from a previous page"),
     date_filter: str = Query(None, alias="date", description="Filter by valid_date (YYYY-MM-DD). Defaults to today."),
     user=Depends(jwt_middleware)
 ):
     """
     Get all tourists with today's entry status, filtered by valid_date.
     Pass ?date=YYYY-MM-DD to view a specific date's tourists.
+
+    Keyset pagination on user_id (newest first): follow pagination.next_cursor /
+    prev_cursor with ?cursor=.  ?offset= still works for the first page.
+    pagination.total is the cached count for the date (utils/services/pagination.py).
+    today_entry comes from the live occupancy counters (utils/services/occupancy.py)
+    when they are initialised for every event on the page.
     """
     from datetime import date
     today = india_today_str()
@@ -228,30 +544,40 @@ async def get_all_tourists(
             detail="You do not have permission to view tourists.",
         )
 
-    resp = (
-        supabaseAdmin.table("tourists")
-        .select("*")
-        .eq("valid_date", filter_date)
-        .range(offset, offset + limit - 1)
-        .order("user_id", desc=True)
-        .execute()
-    )
+    direction, after_key = decode_cursor(cursor)
+    query = supabaseAdmin.table("tourists").select("*").eq("valid_date", filter_date)
+    if direction == "next":
+        query = query.lt("user_id", after_key).order("user_id", desc=True).limit(limit + 1)
+    elif direction == "prev":
+        query = query.gt("user_id", after_key).order("user_id", desc=False).limit(limit + 1)
+    else:
+        query = query.order("user_id", desc=True).range(offset, offset + limit)
+
+    resp = await db_execute(query)
     if hasattr(resp, "error") and resp.error:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error fetching tourists: {resp.error.message}",
         )
-
-    tourist_ids = [t["user_id"] for t in resp.data]
-    
-    if tourist_ids:
+    has_more = len(resp.data) > limit
+    tourists = resp.data[:limit]
+    if direction == "prev":
+        tourists.reverse()
+
+    tourist_ids = [t["user_id"] for t in tourists]
+    live_entries = _live_today_entries(tourists, today) if tourist_ids else None
+
+    if live_entries is not None:
+        # Today's entry status from the live occupancy counters — no entry_items read
+        for tourist in tourists:
+            tourist["today_entry"] = live_entries[tourist["user_id"]]
+    elif tourist_ids:
         # Fetch TODAY's entry records
-        entries_resp = (
+        entries_resp = await db_execute(
             supabaseAdmin.table("entry_records")
             .select("*")
             .in_("user_id", tourist_ids)
             .eq("entry_date", today)
-            .execute()
         )
         
         entry_records_map = {}
@@ -259,28 +585,12 @@ async def get_all_tourists(
             for record in entries_resp.data:
                 entry_records_map[record["user_id"]] = record
         
-        # Fetch entry_items for today's records
+        # Fetch entry_items for today's records (one batched query)
         record_ids = [r["record_id"] for r in entry_records_map.values()]
-        entry_items_map = {}
-        
-        if record_ids:
-            items_resp = (
-                supabaseAdmin.table("entry_items")
-                .select("*")
-                .in_("record_id", record_ids)
-                .order("arrival_time", desc=True)
-                .execute()
-            )
-            
-            if hasattr(items_resp, 'data') and items_resp.data:
-                for item in items_resp.data:
-                    record_id = item["record_id"]
-                    if record_id not in entry_items_map:
-                        entry_items_map[record_id] = []
-                    entry_items_map[record_id].append(item)
+        entry_items_map = dict(zip(record_ids, await entry_items_loader().load_many(record_ids)))
         
         # Enrich tourist data with today's entry info
-        for tourist in resp.data:
+        for tourist in tourists:
             user_id = tourist["user_id"]
             entry_record = entry_records_map.get(user_id)
             
@@ -303,17 +613,26 @@ async def get_all_tourists(
                     "open_entries": 0
                 }
 
-    # Get total count for pagination info
-    total_resp = supabaseAdmin.rpc("count_tourists").execute() if hasattr(supabaseAdmin, "rpc") else None
-    total_count = total_resp.data if total_resp and not hasattr(total_resp, "error") else None
+    # Total for this date — cached, kept current by the registration routes
+    async def _count_for_date() -> int:
+        count_resp = await db_execute(
+            supabaseAdmin.table("tourists")
+            .select("user_id", count="exact")
+            .eq("valid_date", filter_date)
+            .limit(1)
+        )
+        return count_resp.count
+
+    total_count = await cached_count(tourist_count_name(filter_date), _count_for_date)
 
     return {
-        "tourists": resp.data,
+        "tourists": tourists,
         "pagination": {
             "limit": limit,
-            "offset": offset,
-            "count": len(resp.data),
-            "total": total_count
+            "offset": offset if not cursor else None,
+            "count": len(tourists),
+            "total": total_count,
+            **page_cursors(tourists, lambda t: t["user_id"], has_more, direction, has_previous=offset > 0),
         }
     }
 
@@ -326,6 +645,7 @@ async def get_tourists_by_event(
     event_id: int,
     limit: int = 20,
     offset: int = 0,
+    cursor: str = Query(None, description="next_cursor / prev_cursor from a previous page"),
     date_filter: str = Query(None, alias="date", description="Filter by valid_date (YYYY-MM-DD). Defaults to today."),
     only_active: bool = Query(False, description="If true, return only tourists currently inside"),
     search: str = Query(None, description="Search tourists by name (case-insensitive substring)"),
@@ -337,6 +657,11 @@ async def get_tourists_by_event(
     - ?date=YYYY-MM-DD      — filter by valid_date (defaults to today)
     - ?only_active=true     — return only tourists currently inside the venue
     - ?search=ravi          — filter by name (case-insensitive, partial match)
+    - ?cursor=...           — keyset page on user_id from pagination.next_cursor / prev_cursor
+
+    For today (without ?search / ?only_active) the currently_inside_* statistics
+    come from the live occupancy counters (utils/services/occupancy.py) once
+    initialised, and the RPC skips its per-tourist open-entry scan.
 
     Response shape:
     {
@@ -344,30 +669,114 @@ async def get_tourists_by_event(
       "statistics": { total_tourist_registrations, total_members,
                       currently_inside_registrations, currently_inside_members,
                       with_entry_today_registrations, with_entry_today_members, ... },
-      "pagination": { limit, offset, count, total, date }
+      "pagination": { limit, offset, count, total, date, has_more, next_cursor, prev_cursor }
     }
+    pagination.total is cached per (event, date, search) — utils/services/pagination.py.
     """
     today       = india_today_str()
     filter_date = date_filter or today
+    direction, after_key = decode_cursor(cursor)
 
-    resp = supabaseAdmin.rpc("get_tourists_by_event", {
-        "p_event_id":    event_id,
-        "p_filter_date": filter_date,
-        "p_today":       today,
-        "p_limit":       limit,
-        "p_offset":      offset,
-        "p_only_active": only_active,
-        "p_search":      search or None,
-    }).execute()
+    # Today's "currently inside" figures from the live occupancy counters —
+    # the RPC then reads entry_items for the page only
+    live = (
+        get_occupancy(event_id, today)
+        if filter_date == today and not search and not only_active else None
+    )
 
-    if hasattr(resp, "error") and resp.error:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Error fetching tourists: {resp.error.message}",
-        )
+    async def _fetch_page(include_total: bool):
+        page_resp = await db_execute(supabaseAdmin.rpc("get_tourists_by_event", {
+            "p_event_id":    event_id,
+            "p_filter_date": filter_date,
+            "p_today":       today,
+            "p_limit":       limit,
+            "p_offset":      offset,
+            "p_only_active": only_active,
+            "p_search":      search or None,
+            "p_after_user_id":  after_key if direction == "next" else None,
+            "p_before_user_id": after_key if direction == "prev" else None,
+            "p_include_crowd":  live is None,
+            "p_include_total":  include_total,
+        }))
+        if hasattr(page_resp, "error") and page_resp.error:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Error fetching tourists: {page_resp.error.message}",
+            )
+        return page_resp
+
+    # pagination.total is cached per (event, date, search) and only counted by
+    # the RPC on a cache miss; with ?only_active it changes with every scan,
+    # so it is counted with the page
+    resp = None
+    total = None
+    if only_active:
+        resp = await _fetch_page(True)
+    else:
+        async def _count_with_page() -> int:
+            nonlocal resp
+            resp = await _fetch_page(True)
+            return ((resp.data or {}).get("pagination") or {}).get("total") or 0
+
+        total = await cached_count(event_tourist_count_name(event_id, filter_date, search), _count_with_page)
+        if resp is None:
+            resp = await _fetch_page(False)
+
+    pagination = resp.data.get("pagination") if isinstance(resp.data, dict) else None
+    if isinstance(pagination, dict):
+        if total is not None:
+            pagination["total"] = total
+        pagination.update(page_cursors(
+            resp.data.get("tourists") or [], lambda t: t["user_id"],
+            bool(pagination.get("has_more")), direction, has_previous=offset > 0,
+        ))
+
+    if live is not None and isinstance(resp.data, dict) and isinstance(resp.data.get("statistics"), dict):
+        resp.data["statistics"]["currently_inside_registrations"] = live["inside_registrations"]
+        resp.data["statistics"]["currently_inside_members"] = live["inside_members"]
 
     return resp.data
 
+
+# ------------------------------------------------------------
+# SEARCH TOURISTS OF AN EVENT (Admin or Guard)
+# ------------------------------------------------------------
+@router.get("/event/{event_id}/search", status_code=status.HTTP_200_OK)
+async def search_event_tourists(
+    event_id: int,
+    q: str = Query(..., min_length=1, max_length=64, description="Name fragment, phone prefix or short-code prefix"),
+    limit: int = Query(20, ge=1, le=100),
+    user=Depends(check_guard_admin_access)
+):
+    """
+    Find a visitor by partial name (Latin or Devanagari), phone prefix or
+    short-code prefix — served from the in-process index
+    (utils/services/tourist_search.py).  While the event is not indexed the
+    lookup runs the same match against the DB ("source": "db"), as does a
+    search the index has no hits for; the first search of an event starts
+    indexing it.
+
+    Response shape:
+    {
+      "results": [ { user_id, name, phone, short_code, valid_date, is_group, group_count, matched } ],
+      "count": 3, "source": "index", "took_ms": 0.4
+    }
+    """
+    started = time.perf_counter()
+    results = search_tourists(event_id, q, limit)
+    source = "index"
+    if not results:
+        # Not indexed yet, or a registration this worker's index missed
+        source = "db"
+        results = await search_tourists_db(event_id, q, limit)
+
+    return {
+        "results": results,
+        "count":   len(results),
+        "source":  source,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
 # ------------------------------------------------------------
 # GET SINGLE TOURIST (Admin or Guard)
 # ------------------------------------------------------------
@@ -407,28 +816,26 @@ async def get_tourist(user_id: int, user=Depends(jwt_middleware)):
     if user.get("role") not in ["admin", "security"]:
         raise HTTPException(status.HTTP_403_FORBIDDEN, "Not allowed")
 
-    tourist_resp = supabaseAdmin.table("tourists").select("*").eq("user_id", user_id).single().execute()
+    tourist_resp = await db_execute(supabaseAdmin.table("tourists").select("*").eq("user_id", user_id).single())
     if not tourist_resp.data:
         raise HTTPException(status.HTTP_404_NOT_FOUND, f"Tourist {user_id} not found")
 
     tourist_event_id = tourist_resp.data["registered_event_id"]
 
-    # Security guard access check
-    event_resp = supabaseAdmin.table("events").select("allowed_guards").eq("event_id", tourist_event_id).single().execute()
-    if not event_resp.data:
+    # Security guard access check (shared event cache — no extra DB round-trip)
+    event = await get_event(tourist_event_id)
+    if not event:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Event not found")
 
-    allowed_guards = event_resp.data.get("allowed_guards") or []
     uid = user.get("uid") or user.get("sub")
-    if allowed_guards:
-        if user["role"] == "security" and uid not in allowed_guards:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You are not authorized to access this event.",
-            )
+    if not guard_allowed(event, user["role"], uid):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not authorized to access this event.",
+        )
 
     # Fetch meta
-    meta_resp = supabaseAdmin.table("tourist_meta").select("*").eq("user_id", user_id).execute()
+    meta_resp = await db_execute(supabaseAdmin.table("tourist_meta").select("*").eq("user_id", user_id))
     meta = meta_resp.data[0] if meta_resp.data else None
 
     # Add secure image token to meta
@@ -441,13 +848,12 @@ async def get_tourist(user_id: int, user=Depends(jwt_middleware)):
             meta["image_url"] = f"/tourists/user-image/{image_token}"
 
     # Fetch ALL entry records for this user across all dates in one query
-    all_records_resp = (
+    all_records_resp = await db_execute(
         supabaseAdmin.table("entry_records")
         .select("*")
         .eq("user_id", user_id)
         .in_("entry_date", EVENT_DATES)
         .order("entry_date", desc=False)
-        .execute()
     )
     all_records = all_records_resp.data or []
 
@@ -456,18 +862,7 @@ async def get_tourist(user_id: int, user=Depends(jwt_middleware)):
 
     # Fetch ALL entry_items for all those records in one query
     record_ids = [r["record_id"] for r in all_records]
-    items_by_record = {}
-    if record_ids:
-        all_items_resp = (
-            supabaseAdmin.table("entry_items")
-            .select("*")
-            .in_("record_id", record_ids)
-            .order("arrival_time", desc=False)
-            .execute()
-        )
-        for item in (all_items_resp.data or []):
-            rid = item["record_id"]
-            items_by_record.setdefault(rid, []).append(item)
+    items_by_record = dict(zip(record_ids, await entry_items_loader(descending=False).load_many(record_ids)))
 
     # Build date-keyed response
     dates_data = {}
@@ -509,7 +904,7 @@ async def get_tourist(user_id: int, user=Depends(jwt_middleware)):
 # GET USER IMAGE WITH JWT TOKEN (Public Access)
 # ------------------------------------------------------------
 @router.get("/user-image/{token}", status_code=status.HTTP_200_OK)
-async def get_user_image(token: str):
+async def get_user_image(token: str, request: Request):
     """
     Serve user image using JWT token for security
     URL format: /tourists/user-image/{jwt_token}
@@ -548,8 +943,9 @@ async def get_user_image(token: str):
         }
         media_type = media_types.get(file_ext, 'image/jpeg')
         
-        # Return the file
-        return FileResponse(
+        # Return the file (304 when the client already has this version)
+        return conditional_file_response(
+            request,
             file_path,
             media_type=media_type,
             headers={
@@ -584,7 +980,7 @@ async def get_user_image_token(
     """
     try:
         # Fetch tourist meta to get image path
-        meta_resp = supabaseAdmin.table("tourist_meta").select("image_path").eq("user_id", user_id).execute()
+        meta_resp = await db_execute(supabaseAdmin.table("tourist_meta").select("image_path").eq("user_id", user_id))
         
         if not meta_resp.data or len(meta_resp.data) == 0:
             raise HTTPException(status.HTTP_404_NOT_FOUND, "User image not found")
@@ -613,67 +1009,6 @@ async def get_user_image_token(
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, "Failed to generate image token")
 
 
-# ─── Card cache helper ───────────────────────────────────────────────────────
-async def _get_or_generate_card_path(user_id: int, card_temp_path: str, valid_date : str) -> str:
-    """
-    Return a valid path to the visitor card PNG, using a file cache under static/temp-card/.
-
-    Cache HIT  (file on disk + Redis says it's fresh):
-        → update last-access timestamp in Redis → return existing file path.
-
-    Cache MISS (file absent or Redis says it's stale):
-        → query tourists / tourist_meta / events
-        → generate PNG with VisitorCardGenerator.generate_card_in_memory()
-        → write to card_temp_path (deterministic per user_id)
-        → stamp Redis timestamp → return path.
-
-    Multiple simultaneous requests for the same user_id are fine because:
-        - writing a completed PNG over the same path is an atomic OS rename on Linux;
-        - even if two workers race, the second write just overwrites an identical file.
-    """
-    os.makedirs(TEMP_CARD_DIR, exist_ok=True)
-
-    # ── Cache hit ──────────────────────────────────────────────────────────
-    if os.path.exists(card_temp_path) and is_card_fresh(user_id):
-        touch_card(user_id)
-        return card_temp_path
-
-    # ── Cache miss — fetch from DB and render ──────────────────────────────
-    tourist_resp = supabaseAdmin.table("tourists").select("*").eq("user_id", user_id).single().execute()
-    if not tourist_resp.data:
-        raise HTTPException(status.HTTP_404_NOT_FOUND, "Tourist not found")
-    tourist = tourist_resp.data
-
-    meta_resp = supabaseAdmin.table("tourist_meta").select("image_path, qr_code").eq("user_id", user_id).execute()
-    meta = meta_resp.data[0] if meta_resp.data else {}
-
-    event_id = tourist.get("registered_event_id")
-    event_resp = supabaseAdmin.table("events").select("name, start_date, end_date").eq("event_id", event_id).single().execute()
-    event = event_resp.data or {}
-
-
-    card_data = {
-        "name":               tourist.get("name", ""),
-        "phone":              tourist.get("phone", ""),
-        "profile_image_path": meta.get("image_path"),
-        "qr_data":            meta.get("qr_code") or f"TOURIST-{user_id}",
-        "valid_date":         valid_date,
-        "group_count":         tourist.get("group_count", 1),
-    }
-
-    generator = VisitorCardGenerator3()
-    card_bytes = generator.generate_card_in_memory(card_data)
-
-    # Write to a tmp file first, then rename — prevents half-written files being served
-    tmp_path = card_temp_path + ".tmp"
-    with open(tmp_path, "wb") as f:
-        f.write(card_bytes.read())
-    os.replace(tmp_path, card_temp_path)  # atomic on Linux
-
-    touch_card(user_id)
-    return card_temp_path
-
-
 # ------------------------------------------------------------
 # SHORT URL RESOLVE — Get card URLs from short code
 # ------------------------------------------------------------
@@ -700,23 +1035,28 @@ async def resolve_short_url(short_code: str):
     - Or navigate: window.location.href = response.card_urls.preview
     """
     try:
-        # Query short_links table for the code
-        short_link_resp = (
-            supabaseAdmin.table("short_links")
-            .select("short_code, token")
-            .eq("short_code", short_code)
-            .single()
-            .execute()
-        )
-        
-        if not short_link_resp.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Short link not found"
+        # Redis short_code index first, short_links table on a miss
+        indexed = lookup_short_code(short_code, require=("token",))
+        if indexed:
+            short_link = indexed
+            token = indexed["token"]
+        else:
+            short_link_resp = await db_execute(
+                supabaseAdmin.table("short_links")
+                .select("short_code, token, created_at")
+                .eq("short_code", short_code)
+                .single()
             )
-        
-        short_link = short_link_resp.data
-        token = short_link.get("token")
+            
+            if not short_link_resp.data:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Short link not found"
+                )
+            
+            short_link = short_link_resp.data
+            token = short_link.get("token")
+            index_short_code(short_code, token=token, created_at=short_link.get("created_at"))
         
         if not token:
             raise HTTPException(
@@ -775,20 +1115,33 @@ async def resolve_short_url(short_code: str):
 # Serve inline (view) by default, or download as attachment
 # ------------------------------------------------------------
 @router.get("/visitor-card/{token}", status_code=status.HTTP_200_OK)
-async def visitor_card(token: str, download: bool = Query(False, description="If true, download as attachment; else view inline")):
+async def visitor_card(
+    token: str,
+    request: Request,
+    download: bool = Query(False, description="If true, download as attachment; else view inline"),
+    format: str = Query(None, description="png | png8 | webp | thumb — overrides Accept negotiation"),
+):
     """
-    Serve or download the visitor card PNG.
+    Serve or download the visitor card image.
     
     Query Parameters:
     - download: bool (default: False)
         - False → serve inline with Cache-Control headers (view mode)
         - True → serve as attachment with Content-Disposition header (download mode)
+    - format: png | png8 | webp | thumb (optional)
+        - absent → WebP when the Accept header allows image/webp, full PNG otherwise
     
     Cache behavior:
     - First request → generated fresh from DB and cached in static/temp-card/
+      (each format is cached as its own file)
     - Subsequent requests within TTL → served from disk (no DB hit)
     - Cache is refreshed by touching the Redis last-access key on every hit
     """
+    try:
+        fmt = pick_card_format(request.headers.get("accept"), format)
+    except ValueError as e:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(e))
+
     try:
         payload = verify_file_token(token, expected_type="visitor_card")
         user_id = payload.get("user_id")
@@ -799,23 +1152,34 @@ async def visitor_card(token: str, download: bool = Query(False, description="If
 
         # card_temp_path is baked into the token; fall back to default if old token
         card_temp_path = payload.get("card_temp_path") or f"{TEMP_CARD_DIR}/card_temp_{user_id}.png"
-        path = await _get_or_generate_card_path(int(user_id), card_temp_path, valid_date=valid_date)
+        path = await get_or_render_card(int(user_id), card_temp_path, valid_date=valid_date, fmt=fmt)
         tourist_name = payload.get("user_name", f"tourist_{user_id}").replace(" ", "_")
 
         # Build headers based on download flag
         headers = {"Access-Control-Allow-Origin": "*"}
+        if not format:
+            headers["Vary"] = "Accept"
         
         if download:
-            headers["Content-Disposition"] = f"attachment; filename=visitor_card_{tourist_name}.png"
+            headers["Content-Disposition"] = f"attachment; filename=visitor_card_{tourist_name}.{CARD_FILE_EXTENSIONS[fmt]}"
         else:
             headers["Cache-Control"] = "public, max-age=300"
 
-        return FileResponse(
+        response = conditional_file_response(
+            request,
             path,
-            media_type="image/png",
+            media_type=CARD_MEDIA_TYPES[fmt],
             headers=headers,
         )
+        record_card_served(fmt, 0 if response.status_code == 304 else os.path.getsize(path))
+        return response
 
+    except RenderQueueFull:
+        raise HTTPException(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            "Card renderer is busy, please retry shortly",
+            headers={"Retry-After": str(CARD_RENDER_RETRY_AFTER)},
+        )
     except jwt.ExpiredSignatureError:
         raise HTTPException(status.HTTP_403_FORBIDDEN, "Token has expired")
     except jwt.InvalidTokenError:
@@ -843,22 +1207,20 @@ async def get_event_entry_date_range(
     """
     try:
         # Get the earliest and latest entry dates for this event
-        entry_records_resp = (
+        entry_records_resp = await db_execute(
             supabaseAdmin.table("entry_records")
             .select("entry_date")
             .eq("event_id", event_id)
             .order("entry_date", desc=False)
             .limit(1)
-            .execute()
         )
         
-        latest_records_resp = (
+        latest_records_resp = await db_execute(
             supabaseAdmin.table("entry_records")
             .select("entry_date")
             .eq("event_id", event_id)
             .order("entry_date", desc=True)
             .limit(1)
-            .execute()
         )
         
         first_entry_date = None
@@ -871,7 +1233,7 @@ async def get_event_entry_date_range(
             last_entry_date = latest_records_resp.data[0]["entry_date"]
         
         # Get event details
-        event_resp = supabaseAdmin.table("events").select("name, start_date, end_date").eq("event_id", event_id).single().execute()
+        event_resp = await db_execute(supabaseAdmin.table("events").select("name, start_date, end_date").eq("event_id", event_id).single())
         
         if hasattr(event_resp, 'error'):
             raise HTTPException(status.HTTP_404_NOT_FOUND, "Event not found")
@@ -909,11 +1271,17 @@ async def download_event_entries(
     event_id: int,
     from_date: str = Query(..., description="Start date (YYYY-MM-DD format)"),
     to_date: str = Query(..., description="End date (YYYY-MM-DD format)"),
+    format: str = Query("csv", description="csv | parquet | arrow | ndjson"),
     user=Depends(check_guard_admin_access)
 ):
     """
     Download all entry records for an event within a specific date range.
     
+    The export is streamed: records are keyset-paginated and written out page by
+    page, so memory stays flat and nothing is cut off at the PostgREST row limit.
+    format=parquet|arrow|ndjson returns the same rows as typed columns
+    (ENTRY_EXPORT_FIELDS in utils/services/entry_export.py).
+    
     Returns a CSV file with the following columns:
     - Entry Date
     - Tourist Name
@@ -932,12 +1300,22 @@ async def download_event_entries(
     Query Parameters:
     - from_date: Start date in YYYY-MM-DD format
     - to_date: End date in YYYY-MM-DD format
+    - format: csv (default), parquet, arrow (IPC stream) or ndjson
     """
+    fmt = (format or "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format '{format}'. Use one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    if fmt in COLUMNAR_FORMATS and not columnar_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=f"{fmt} export is not available on this server (pyarrow missing)"
+        )
+
     try:
         from datetime import datetime
-        import csv
-        import io
-        from fastapi.responses import StreamingResponse
         
         # Validate dates
         try:
@@ -956,182 +1334,35 @@ async def download_event_entries(
             )
         
         # Get event details
-        event_resp = supabaseAdmin.table("events").select("name").eq("event_id", event_id).single().execute()
+        event_resp = await db_execute(supabaseAdmin.table("events").select("name").eq("event_id", event_id).single())
         if hasattr(event_resp, 'error'):
             raise HTTPException(status.HTTP_404_NOT_FOUND, "Event not found")
         
         event_name = event_resp.data.get("name", f"Event_{event_id}")
         
-        # Fetch all entry records within the date range
-        entry_records_resp = (
-            supabaseAdmin.table("entry_records")
-            .select("*")
-            .eq("event_id", event_id)
-            .gte("entry_date", from_date)
-            .lte("entry_date", to_date)
-            .order("entry_date", desc=False)
-            .execute()
-        )
-        
-        if not entry_records_resp.data:
+        # First page fetched up front so an empty range is still a clean 404;
+        # everything after it is streamed page by page (utils/services/entry_export.py)
+        first_page = await fetch_record_page(event_id, from_date, to_date, None)
+        if not first_page:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No entry records found for the specified date range"
             )
-        
-        # Get all user IDs
-        user_ids = list(set([record["user_id"] for record in entry_records_resp.data]))
-        
-        # Fetch tourist details
-        tourists_resp = (
-            supabaseAdmin.table("tourists")
-            .select("*")
-            .in_("user_id", user_ids)
-            .execute()
-        )
-        
-        tourists_map = {t["user_id"]: t for t in tourists_resp.data} if tourists_resp.data else {}
-        
-        # Fetch all entry items for these records
-        record_ids = [record["record_id"] for record in entry_records_resp.data]
-        entry_items_resp = (
-            supabaseAdmin.table("entry_items")
-            .select("*")
-            .in_("record_id", record_ids)
-            .order("arrival_time", desc=False)
-            .execute()
-        )
-        
-        # Fetch verifier (security/admin) information
-        # Get unique verifier IDs from entry_items
-        verifier_ids = []
-        if entry_items_resp.data:
-            verifier_ids = list(set([
-                item.get("verified_by") 
-                for item in entry_items_resp.data 
-                if item.get("verified_by")
-            ]))
-        
-        # Fetch verifier details from users table (or auth.users)
-        verifiers_map = {}
-        if verifier_ids:
-            try:
-                # Fetch from Supabase auth users
-                for verifier_id in verifier_ids:
-                    try:
-                        # Get user from auth
-                        user_resp = supabaseAdmin.auth.admin.get_user_by_id(verifier_id)
-                        if user_resp and user_resp.user:
-                            verifiers_map[verifier_id] = {
-                                "name": user_resp.user.user_metadata.get("name", "Unknown"),
-                                "phone": user_resp.user.phone or "No phone"
-                            }
-                    except:
-                        verifiers_map[verifier_id] = {
-                            "name": "Unknown",
-                            "phone": "phone"
-                        }
-            except Exception as e:
-                print(f"Error fetching verifiers: {e}")
-        
-        # Create CSV in memory
-        output = io.StringIO()
-        csv_writer = csv.writer(output)
-        
-        # Write header (removed IDs and bypass_reason, added verifier info)
-        csv_writer.writerow([
-            "Entry Date",
-            "Tourist Name",
-            "Email",
-            "Unique ID Type",
-            "Unique ID",
-            "Is Group",
-            "Group Count",
-            "Total Members",
-            "Arrival Time",
-            "Departure Time",
-            "Duration (minutes)",
-            "Entry Type",
-            "Entry Point",
-            "Status",
-            "Verified By Name",
-            "Verified By Email"
-        ])
-        
-        # Write data rows
-        for entry_item in entry_items_resp.data if entry_items_resp.data else []:
-            record_id = entry_item["record_id"]
-            
-            # Find the entry record
-            entry_record = next((r for r in entry_records_resp.data if r["record_id"] == record_id), None)
-            if not entry_record:
-                continue
-            
-            # Get tourist details
-            tourist = tourists_map.get(entry_record["user_id"], {})
-            
-            # Calculate duration in minutes
-            duration_minutes = ""
-            if entry_item.get("duration"):
-                try:
-                    # duration is in format like "1 days 00:30:00" or "00:30:00"
-                    duration_str = str(entry_item["duration"])
-                    # Simple parsing - this can be improved
-                    if "days" in duration_str:
-                        parts = duration_str.split()
-                        days = int(parts[0])
-                        time_part = parts[2]
-                    else:
-                        days = 0
-                        time_part = duration_str
-                    
-                    time_parts = time_part.split(":")
-                    hours = int(time_parts[0])
-                    minutes = int(time_parts[1])
-                    
-                    total_minutes = (days * 24 * 60) + (hours * 60) + minutes
-                    duration_minutes = str(total_minutes)
-                except:
-                    duration_minutes = "N/A"
-            
-            # Determine status
-            status = "Exited" if entry_item.get("departure_time") else "Inside"
-            
-            # Calculate total members
-            is_group = tourist.get("is_group", False)
-            group_count = tourist.get("group_count", 1)
-            total_members = group_count if is_group else 1
-            
-            # Get verifier information
-            verifier_id = entry_item.get("verified_by")
-            verifier_info = verifiers_map.get(verifier_id, {"name": "N/A", "phone": "N/A"})
-            
-            csv_writer.writerow([
-                entry_record.get("entry_date", ""),
-                tourist.get("name", ""),
-                tourist.get("phone", ""),
-                tourist.get("unique_id_type", ""),
-                tourist.get("unique_id", ""),
-                "Yes" if is_group else "No",
-                group_count,
-                total_members,
-                entry_item.get("arrival_time", ""),
-                entry_item.get("departure_time", "") or "Still Inside",
-                duration_minutes or "N/A",
-                entry_item.get("entry_type", ""),
-                entry_item.get("entry_point", ""),
-                status,
-                verifier_info["name"],
-                verifier_info["phone"]
-            ])
-        
-        # Prepare the response
-        output.seek(0)
-        filename = f"{event_name.replace(' ', '_')}_entries_{from_date}_to_{to_date}.csv"
+
+        filename = f"{event_name.replace(' ', '_')}_entries_{from_date}_to_{to_date}.{EXPORT_FILE_EXTENSIONS[fmt]}"
+
+        if fmt == "csv":
+            body = csv_chunks(iter_entry_pages(event_id, from_date, to_date, first_page=first_page))
+        else:
+            body = record_chunks(
+                iter_entry_pages(event_id, from_date, to_date, first_page=first_page, build=build_entry_records),
+                ENTRY_EXPORT_FIELDS,
+                fmt,
+            )
         
         return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
+            body,
+            media_type=EXPORT_MEDIA_TYPES[fmt],
             headers={
                 "Content-Disposition": f"attachment; filename={filename}",
                 "Access-Control-Allow-Origin": "*"
@@ -3,6 +3,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from utils.supabase.auth import jwt_middleware, register_middleware
 from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_run
+from utils.services.staff_directory import invalidate_staff_directory
 
 router = APIRouter()
 
@@ -26,10 +28,11 @@ async def register_user(
             "app_metadata": {"role": data["role"]},
             "user_metadata": {"name": user.name}
         }
-        response = supabaseAdmin.auth.admin.create_user(register_data)
+        response = await db_run(supabaseAdmin.auth.admin.create_user, register_data)
         
         # Supabase auth admin responses have a 'user' attribute on success
         if hasattr(response, 'user') and response.user:
+            invalidate_staff_directory()
             return {"message": "User registered successfully", "user": response.user}
         else:
             print(response)
@@ -56,7 +59,7 @@ async def list_users(
         )
 
     try:
-            response = supabaseAdmin.auth.admin.list_users()
+            response = await db_run(supabaseAdmin.auth.admin.list_users)
             users = []
             # Supabase may return users in response.users or as a list
             if hasattr(response, 'users'):
@@ -97,7 +100,8 @@ async def delete_user(
         )
 
     try:
-        response = supabaseAdmin.auth.admin.delete_user(user_id)
+        response = await db_run(supabaseAdmin.auth.admin.delete_user, user_id)
+        invalidate_staff_directory()
         
         # Delete operations may return None or a success indicator
         return {"message": "User deleted successfully"}
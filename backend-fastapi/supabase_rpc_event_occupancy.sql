@@ -0,0 +1,83 @@
+-- ============================================================
+-- RPC: get_event_occupancy
+-- Ground truth for the Redis occupancy counters
+-- (utils/services/occupancy.py) — the reconciliation job compares the
+-- counters with this and repairs any drift.
+--
+-- Parameters:
+--   p_event_id – event to count
+--   p_date     – entry_date (IST day)
+--
+-- Returns: single JSONB object with:
+--   entries_total – entry_items of the day
+--   entry_types   – { entry_type: count }
+--   hours         – { IST hour of arrival: count }
+--   open          – [ [user_id, open_items, members, is_group], … ] for every
+--                   tourist with an item that has no departure_time;
+--                   members = group_count for groups, else 1
+--                   (same weighting as get_event_analytics crowd_status)
+--   visits        – [ [user_id, entry_items], … ] for every tourist with an
+--                   entry that day (today_entry of the tourist endpoints)
+--   as_of         – epoch seconds of the snapshot; updates the API counted
+--                   after it are replayed on top of this result
+-- ============================================================
+
+DROP FUNCTION IF EXISTS get_event_occupancy(BIGINT, DATE);
+
+CREATE OR REPLACE FUNCTION get_event_occupancy(
+    p_event_id BIGINT,
+    p_date     DATE
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH
+    day_items AS (
+        SELECT er.user_id, ei.entry_type, ei.arrival_time, ei.departure_time
+        FROM public.entry_records er
+        JOIN public.entry_items ei ON ei.record_id = er.record_id
+        WHERE er.event_id   = p_event_id
+          AND er.entry_date = p_date
+    ),
+    open_users AS (
+        SELECT
+            di.user_id,
+            COUNT(*)                                                        AS open_items,
+            CASE WHEN t.is_group THEN COALESCE(t.group_count, 1) ELSE 1 END AS members,
+            COALESCE(t.is_group, FALSE)                                     AS is_group
+        FROM day_items di
+        JOIN public.tourists t ON t.user_id = di.user_id
+        WHERE di.departure_time IS NULL
+        GROUP BY di.user_id, t.is_group, t.group_count
+    )
+    SELECT jsonb_build_object(
+        'as_of',         EXTRACT(EPOCH FROM now()),
+        'entries_total', (SELECT COUNT(*) FROM day_items),
+        'entry_types', COALESCE((
+            SELECT jsonb_object_agg(x.entry_type, x.n)
+            FROM (
+                SELECT COALESCE(entry_type::TEXT, 'unknown') AS entry_type, COUNT(*) AS n
+                FROM day_items GROUP BY 1
+            ) x
+        ), '{}'::JSONB),
+        'hours', COALESCE((
+            SELECT jsonb_object_agg(x.hour, x.n)
+            FROM (
+                SELECT EXTRACT(HOUR FROM arrival_time AT TIME ZONE 'Asia/Kolkata')::INT AS hour, COUNT(*) AS n
+                FROM day_items GROUP BY 1
+            ) x
+        ), '{}'::JSONB),
+        'open', COALESCE((
+            SELECT jsonb_agg(jsonb_build_array(user_id, open_items, members, is_group) ORDER BY user_id)
+            FROM open_users
+        ), '[]'::JSONB),
+        'visits', COALESCE((
+            SELECT jsonb_agg(jsonb_build_array(x.user_id, x.n) ORDER BY x.user_id)
+            FROM (SELECT user_id, COUNT(*) AS n FROM day_items GROUP BY user_id) x
+        ), '[]'::JSONB)
+    );
+$$;
+
+REVOKE EXECUTE ON FUNCTION get_event_occupancy(BIGINT, DATE) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION get_event_occupancy(BIGINT, DATE) TO service_role;
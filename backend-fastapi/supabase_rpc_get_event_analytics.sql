@@ -5,6 +5,10 @@
 -- Parameters:
 --   p_event_id   BIGINT  – event to analyse
 --   p_date       DATE    – the date to analyse (pass from Python to avoid UTC mismatch)
+--   p_include_crowd BOOLEAN – compute crowd_status / still_inside from entry_items.
+--                  The API passes FALSE when the live occupancy counters
+--                  (utils/services/occupancy.py) are initialised and fills
+--                  those fields itself; they come back as 0 then.
 --
 -- Returns: single JSONB row with all sections:
 --   event_info, crowd_status, today_summary, last_hour,
@@ -13,10 +17,12 @@
 -- ============================================================
 
 DROP FUNCTION IF EXISTS get_event_analytics(BIGINT, DATE);
+DROP FUNCTION IF EXISTS get_event_analytics(BIGINT, DATE, BOOLEAN);
 
 CREATE OR REPLACE FUNCTION get_event_analytics(
-    p_event_id   BIGINT,
-    p_date       DATE DEFAULT CURRENT_DATE
+    p_event_id        BIGINT,
+    p_date            DATE    DEFAULT CURRENT_DATE,
+    p_include_crowd   BOOLEAN DEFAULT TRUE
 )
 RETURNS TABLE (
     event_info              JSONB,
@@ -97,23 +103,25 @@ BEGIN
     END IF;
 
     -- ── 1. Crowd status (currently inside) ──────────────────────────
-    SELECT
-        COUNT(DISTINCT er.user_id),
-        COALESCE(SUM(CASE WHEN t.is_group THEN t.group_count ELSE 1 END), 0),
-        COUNT(DISTINCT CASE WHEN t.is_group     THEN er.user_id END),
-        COUNT(DISTINCT CASE WHEN NOT t.is_group THEN er.user_id END)
-    INTO
-        v_total_inside, v_total_people_inside,
-        v_groups_inside, v_individuals_inside
-    FROM public.entry_records er
-    JOIN public.tourists t ON t.user_id = er.user_id
-    WHERE er.event_id = p_event_id
-      AND er.entry_date = p_date
-      AND EXISTS (
-          SELECT 1 FROM public.entry_items ei
-          WHERE ei.record_id = er.record_id
-            AND ei.departure_time IS NULL
-      );
+    IF p_include_crowd THEN
+        SELECT
+            COUNT(DISTINCT er.user_id),
+            COALESCE(SUM(CASE WHEN t.is_group THEN t.group_count ELSE 1 END), 0),
+            COUNT(DISTINCT CASE WHEN t.is_group     THEN er.user_id END),
+            COUNT(DISTINCT CASE WHEN NOT t.is_group THEN er.user_id END)
+        INTO
+            v_total_inside, v_total_people_inside,
+            v_groups_inside, v_individuals_inside
+        FROM public.entry_records er
+        JOIN public.tourists t ON t.user_id = er.user_id
+        WHERE er.event_id = p_event_id
+          AND er.entry_date = p_date
+          AND EXISTS (
+              SELECT 1 FROM public.entry_items ei
+              WHERE ei.record_id = er.record_id
+                AND ei.departure_time IS NULL
+          );
+    END IF;
 
     -- ── 2. Today's summary ───────────────────────────────────────────
     SELECT
@@ -222,8 +230,8 @@ BEGIN
     ) x;
 
     -- ── 8. Alerts ────────────────────────────────────────────────────
-    -- 8a. Capacity alert
-    IF v_max_capacity IS NOT NULL AND v_max_capacity > 0 THEN
+    -- 8a. Capacity alert (the API adds it from the live counters otherwise)
+    IF p_include_crowd AND v_max_capacity IS NOT NULL AND v_max_capacity > 0 THEN
         v_capacity_pct := ROUND((v_total_people_inside::FLOAT / v_max_capacity) * 100, 2);
         IF v_capacity_pct >= 90 THEN
             j_alerts := j_alerts || jsonb_build_object(
@@ -354,5 +362,5 @@ BEGIN
 END;
 $$;
 
-GRANT EXECUTE ON FUNCTION get_event_analytics(BIGINT, DATE) TO authenticated;
-GRANT EXECUTE ON FUNCTION get_event_analytics(BIGINT, DATE) TO anon;
+GRANT EXECUTE ON FUNCTION get_event_analytics(BIGINT, DATE, BOOLEAN) TO authenticated;
+GRANT EXECUTE ON FUNCTION get_event_analytics(BIGINT, DATE, BOOLEAN) TO anon;
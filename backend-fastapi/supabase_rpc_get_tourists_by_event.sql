@@ -9,13 +9,30 @@
 --   p_filter_date – valid_date filter (which registration dates to show)
 --   p_today       – IST date from Python (used for entry status checks)
 --   p_limit       – page size  (default 20)
---   p_offset      – page start (default 0)
+--   p_offset      – page start (default 0, ignored when a cursor is given)
 --   p_only_active – if TRUE, return only tourists currently inside
 --   p_search      – optional name substring search (case-insensitive)
+--   p_after_user_id  – keyset cursor: the page after this user_id  (user_id <)
+--   p_before_user_id – keyset cursor: the page before this user_id (user_id >)
+--   p_include_crowd  – compute is_currently_inside for every tourist (the
+--                      currently_inside_* statistics and p_only_active).
+--                      The API passes FALSE when the live occupancy counters
+--                      (utils/services/occupancy.py) are initialised: the
+--                      event's entry_items are then only read for the page,
+--                      and currently_inside_* come back as 0 for the API to fill.
+--   p_include_total  – return pagination.total (COUNT of the filtered set).
+--                      The API passes FALSE when it has the total cached
+--                      (utils/services/pagination.py cached_count); total is NULL then.
+--
+-- pagination.has_more is TRUE when another page exists in the fetch
+-- direction (probed with p_limit + 1 rows).
 -- ============================================================
 
 DROP FUNCTION IF EXISTS get_tourists_by_event(BIGINT, DATE, DATE, INT, INT, BOOLEAN);
 DROP FUNCTION IF EXISTS get_tourists_by_event(BIGINT, DATE, DATE, INT, INT, BOOLEAN, TEXT);
+DROP FUNCTION IF EXISTS get_tourists_by_event(BIGINT, DATE, DATE, INT, INT, BOOLEAN, TEXT, BIGINT, BIGINT);
+DROP FUNCTION IF EXISTS get_tourists_by_event(BIGINT, DATE, DATE, INT, INT, BOOLEAN, TEXT, BIGINT, BIGINT, BOOLEAN);
+DROP FUNCTION IF EXISTS get_tourists_by_event(BIGINT, DATE, DATE, INT, INT, BOOLEAN, TEXT, BIGINT, BIGINT, BOOLEAN, BOOLEAN);
 
 CREATE OR REPLACE FUNCTION get_tourists_by_event(
     p_event_id    BIGINT,
@@ -24,7 +41,11 @@ CREATE OR REPLACE FUNCTION get_tourists_by_event(
     p_limit       INT     DEFAULT 20,
     p_offset      INT     DEFAULT 0,
     p_only_active BOOLEAN DEFAULT FALSE,
-    p_search      TEXT    DEFAULT NULL
+    p_search      TEXT    DEFAULT NULL,
+    p_after_user_id  BIGINT DEFAULT NULL,
+    p_before_user_id BIGINT DEFAULT NULL,
+    p_include_crowd  BOOLEAN DEFAULT TRUE,
+    p_include_total  BOOLEAN DEFAULT TRUE
 )
 RETURNS JSON
 LANGUAGE plpgsql
@@ -53,14 +74,7 @@ BEGIN
           AND er.user_id    IN (SELECT user_id FROM all_tourists)
     ),
 
-    -- ── 3. All entry items for today's records ───────────────────────────────
-    today_items AS (
-        SELECT tr.user_id, ei.*
-        FROM today_records tr
-        JOIN entry_items ei ON ei.record_id = tr.record_id
-    ),
-
-    -- ── 4. Per-tourist entry status ───────────────────────────────────────────
+    -- ── 3/4. Per-tourist entry status (open items only with p_include_crowd) ──
     tourist_status AS (
         SELECT
             at.user_id,
@@ -68,12 +82,12 @@ BEGIN
             at.is_group,
             at.group_count,
             (tr.record_id IS NOT NULL)                                           AS has_entry_today,
-            (COUNT(ti.item_id) FILTER (WHERE ti.departure_time IS NULL) > 0)     AS is_currently_inside,
-            COUNT(ti.item_id)                                                     AS total_entries_today,
-            COUNT(ti.item_id) FILTER (WHERE ti.departure_time IS NULL)           AS open_entries
+            (COUNT(ei.item_id) > 0)                                              AS is_currently_inside
         FROM all_tourists at
         LEFT JOIN today_records tr ON tr.user_id = at.user_id
-        LEFT JOIN today_items   ti ON ti.user_id = at.user_id
+        LEFT JOIN entry_items   ei ON ei.record_id = tr.record_id
+                                  AND ei.departure_time IS NULL
+                                  AND p_include_crowd
         GROUP BY at.user_id, at.member_count, at.is_group, at.group_count, tr.record_id
     ),
 
@@ -98,25 +112,48 @@ BEGIN
         WHERE (NOT p_only_active OR is_currently_inside)
     ),
 
-    -- ── 7. Current page IDs (ordered, paginated) ─────────────────────────────
-    page_ids AS (
+    -- ── 7. Current page IDs (keyset on user_id, one extra row probes has_more) ─
+    page_window AS (
         SELECT user_id
         FROM filtered
-        ORDER BY user_id DESC
-        LIMIT  p_limit
-        OFFSET p_offset
+        WHERE (p_after_user_id  IS NULL OR user_id < p_after_user_id)
+          AND (p_before_user_id IS NULL OR user_id > p_before_user_id)
+        ORDER BY CASE WHEN p_before_user_id IS NOT NULL THEN user_id END ASC,
+                 user_id DESC
+        LIMIT  p_limit + 1
+        OFFSET CASE WHEN p_after_user_id IS NULL AND p_before_user_id IS NULL THEN p_offset ELSE 0 END
+    ),
+
+    page_ids AS (
+        SELECT user_id
+        FROM page_window
+        ORDER BY CASE WHEN p_before_user_id IS NOT NULL THEN user_id END ASC,
+                 user_id DESC
+        LIMIT p_limit
+    ),
+
+    -- ── 8. Entry counts of the page tourists ──────────────────────────────────
+    page_status AS (
+        SELECT
+            pi.user_id,
+            COUNT(ei.item_id)                                           AS total_entries_today,
+            COUNT(ei.item_id) FILTER (WHERE ei.departure_time IS NULL) AS open_entries
+        FROM page_ids pi
+        LEFT JOIN today_records tr ON tr.user_id = pi.user_id
+        LEFT JOIN entry_items   ei ON ei.record_id = tr.record_id
+        GROUP BY pi.user_id
     ),
 
-    -- ── 8. Enrich page tourists with full columns + today_entry object ────────
+    -- ── 9. Enrich page tourists with full columns + today_entry object ────────
     page_data AS (
         SELECT
             to_jsonb(t) ||
             jsonb_build_object(
                 'today_entry', jsonb_build_object(
                     'has_entry_today',     ts.has_entry_today,
-                    'is_currently_inside', ts.is_currently_inside,
-                    'total_entries_today', ts.total_entries_today,
-                    'open_entries',        ts.open_entries,
+                    'is_currently_inside', ps.open_entries > 0,
+                    'total_entries_today', ps.total_entries_today,
+                    'open_entries',        ps.open_entries,
                     'entry_record', (
                         SELECT to_jsonb(er)
                         FROM entry_records er
@@ -145,6 +182,7 @@ BEGIN
         FROM tourists t
         JOIN page_ids       pi ON pi.user_id = t.user_id
         JOIN tourist_status ts ON ts.user_id = t.user_id
+        JOIN page_status    ps ON ps.user_id = t.user_id
         ORDER BY t.user_id DESC
     )
 
@@ -155,7 +193,8 @@ BEGIN
             'limit',  p_limit,
             'offset', p_offset,
             'count',  (SELECT COUNT(*) FROM page_ids),
-            'total',  (SELECT COUNT(*) FROM filtered),
+            'has_more', (SELECT COUNT(*) FROM page_window) > p_limit,
+            'total',  CASE WHEN p_include_total THEN (SELECT COUNT(*) FROM filtered) END,
             'date',   p_filter_date::text,
             'search', p_search
         )
@@ -165,5 +204,5 @@ BEGIN
 END;
 $$;
 
-GRANT EXECUTE ON FUNCTION get_tourists_by_event(BIGINT, DATE, DATE, INT, INT, BOOLEAN, TEXT)
+GRANT EXECUTE ON FUNCTION get_tourists_by_event(BIGINT, DATE, DATE, INT, INT, BOOLEAN, TEXT, BIGINT, BIGINT, BOOLEAN, BOOLEAN)
     TO anon, authenticated, service_role;
@@ -0,0 +1,238 @@
+-- ============================================================
+-- RPC: RECORD_ENTRY
+-- ============================================================
+-- Single round-trip QR entry for POST /entry/ (routes/entry_route.py)
+-- Input: short_code (from QR), event_id, entry_date (India "today"),
+--        verifier uid + item metadata built by the API
+-- Does, in one transaction:
+--   1. QR lookup (tourist_meta → tourists) + valid_date check (as verify_qr_code)
+--   2. idempotent upsert of the day's entry_records row
+--      (ON CONFLICT on UNIQUE (user_id, event_id, entry_date) — the row lock
+--       also serialises concurrent scans of the same card, so entry_number is exact)
+--   3. entry_items insert (arrival)
+-- Output: one row; success = FALSE with reason / message when nothing was written
+--   reason: 'not_found' | 'no_valid_date' | 'expired' | 'not_yet_valid' | 'ok'
+-- Purpose: replaces verify_qr_code + select/insert entry_records + insert entry_items
+--          (3–4 sequential PostgREST round-trips per scan)
+
+CREATE OR REPLACE FUNCTION record_entry(
+  p_short_code TEXT,
+  p_event_id BIGINT DEFAULT 1,
+  p_entry_date DATE DEFAULT CURRENT_DATE,
+  p_approved_by_uid UUID DEFAULT NULL,
+  p_metadata JSONB DEFAULT '{}'::JSONB
+)
+RETURNS TABLE (
+  success BOOLEAN,
+  reason TEXT,
+  message TEXT,
+  user_id BIGINT,
+  name TEXT,
+  phone BIGINT,
+  valid_date DATE,
+  is_group BOOLEAN,
+  group_count INTEGER,
+  record_id BIGINT,
+  entry_number INTEGER,
+  entry_item JSONB
+) AS $$
+-- OUT columns (user_id, record_id, …) share names with table columns
+#variable_conflict use_column
+DECLARE
+  v_tourist RECORD;
+  v_record_id BIGINT;
+  v_previous INTEGER;
+  v_item public.entry_items%ROWTYPE;
+BEGIN
+  -- Step 1: QR lookup
+  SELECT t.user_id, t.name, t.phone, t.valid_date, t.is_group, t.group_count
+  INTO v_tourist
+  FROM public.tourist_meta tm
+  JOIN public.tourists t ON t.user_id = tm.user_id
+  WHERE tm.qr_code = p_short_code
+  LIMIT 1;
+
+  IF NOT FOUND THEN
+    RETURN QUERY SELECT FALSE, 'not_found'::TEXT, 'QR code not found or invalid'::TEXT,
+      NULL::BIGINT, NULL::TEXT, NULL::BIGINT, NULL::DATE, NULL::BOOLEAN, NULL::INTEGER,
+      NULL::BIGINT, NULL::INTEGER, NULL::JSONB;
+    RETURN;
+  END IF;
+
+  -- Step 2: validity (same messages as verify_qr_code)
+  IF v_tourist.valid_date IS NULL OR v_tourist.valid_date <> p_entry_date THEN
+    RETURN QUERY SELECT
+      FALSE,
+      CASE
+        WHEN v_tourist.valid_date IS NULL THEN 'no_valid_date'
+        WHEN v_tourist.valid_date < p_entry_date THEN 'expired'
+        ELSE 'not_yet_valid'
+      END::TEXT,
+      CASE
+        WHEN v_tourist.valid_date IS NULL THEN 'No valid_date in QR code'
+        WHEN v_tourist.valid_date < p_entry_date THEN 'Card expired - valid_date has passed'
+        ELSE format('Card valid from %s - not yet valid', v_tourist.valid_date)
+      END::TEXT,
+      v_tourist.user_id, v_tourist.name, v_tourist.phone, v_tourist.valid_date,
+      v_tourist.is_group, v_tourist.group_count,
+      NULL::BIGINT, NULL::INTEGER, NULL::JSONB;
+    RETURN;
+  END IF;
+
+  -- Step 3: day's record — insert or lock the existing one
+  INSERT INTO public.entry_records AS er (user_id, event_id, entry_date)
+  VALUES (v_tourist.user_id, p_event_id, p_entry_date)
+  ON CONFLICT (user_id, event_id, entry_date)
+  DO UPDATE SET entry_date = EXCLUDED.entry_date
+  RETURNING er.record_id INTO v_record_id;
+
+  SELECT COUNT(*)::INTEGER INTO v_previous
+  FROM public.entry_items ei
+  WHERE ei.record_id = v_record_id;
+
+  -- Step 4: arrival item
+  INSERT INTO public.entry_items (record_id, arrival_time, entry_type, bypass_reason, approved_by_uid, metadata)
+  VALUES (
+    v_record_id,
+    NOW(),
+    'qr_code_scan',
+    NULL,
+    p_approved_by_uid,
+    COALESCE(p_metadata, '{}'::JSONB) || jsonb_build_object('entry_number', v_previous + 1)
+  )
+  RETURNING * INTO v_item;
+
+  RETURN QUERY SELECT
+    TRUE,
+    'ok'::TEXT,
+    CASE WHEN v_previous > 0 THEN 'Re-entry recorded' ELSE 'Entry registered successfully' END::TEXT,
+    v_tourist.user_id, v_tourist.name, v_tourist.phone, v_tourist.valid_date,
+    v_tourist.is_group, v_tourist.group_count,
+    v_record_id,
+    v_previous + 1,
+    to_jsonb(v_item);
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+-- Writes rows — only the backend (service role) may call it
+REVOKE EXECUTE ON FUNCTION record_entry(TEXT, BIGINT, DATE, UUID, JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION record_entry(TEXT, BIGINT, DATE, UUID, JSONB) TO service_role;
+
+
+
+-- ============================================================
+-- RPC: RECORD_ENTRIES_BULK
+-- ============================================================
+-- Batched arrival writes for the gate write log (utils/services/gate_write_queue.py):
+-- signed-QR scans and write-behind short_code scans are acknowledged once they
+-- are in the log; the flusher writes them here N rows at a time
+-- Input: JSONB array of
+--   {write_id, user_id, event_id, entry_date, arrival_time, approved_by_uid, metadata}
+--   user_id / valid date were already checked by the API; arrival_time is the scan time
+-- Does, per item (oldest first, each in its own sub-transaction):
+--   1. skip it if an entry_item with the same write_id exists (log replay after a crash)
+--   2. upsert the day's entry_records row (as record_entry)
+--   3. entry_items insert, write_id kept in metadata
+-- Output: one row per item; success = FALSE with message for an item that failed
+--   (e.g. tourist deleted → entry_records foreign key) — the other items are kept;
+--   is_group / group_count let the caller update the occupancy counters
+
+-- write_id is unique, so a replayed log entry can never be inserted twice
+CREATE UNIQUE INDEX IF NOT EXISTS idx_entry_items_write_id
+  ON public.entry_items ((metadata->>'write_id'))
+  WHERE metadata ? 'write_id';
+
+DROP FUNCTION IF EXISTS record_entry_for_user(BIGINT, BIGINT, DATE, TIMESTAMPTZ, UUID, JSONB);
+DROP FUNCTION IF EXISTS record_entries_bulk(JSONB);
+
+CREATE OR REPLACE FUNCTION record_entries_bulk(p_items JSONB)
+RETURNS TABLE (
+  write_id TEXT,
+  success BOOLEAN,
+  duplicate BOOLEAN,
+  message TEXT,
+  record_id BIGINT,
+  entry_number INTEGER,
+  entry_item JSONB,
+  is_group BOOLEAN,
+  group_count INTEGER
+) AS $$
+#variable_conflict use_column
+DECLARE
+  v RECORD;
+  v_tourist RECORD;
+  v_record_id BIGINT;
+  v_previous INTEGER;
+  v_item public.entry_items%ROWTYPE;
+BEGIN
+  FOR v IN
+    SELECT *
+    FROM jsonb_to_recordset(COALESCE(p_items, '[]'::JSONB)) AS x(
+      write_id TEXT, user_id BIGINT, event_id BIGINT, entry_date DATE,
+      arrival_time TIMESTAMPTZ, approved_by_uid UUID, metadata JSONB
+    )
+    ORDER BY x.arrival_time
+  LOOP
+    BEGIN
+      -- Step 1: already written by an earlier (interrupted) flush
+      IF v.write_id IS NOT NULL THEN
+        SELECT ei.* INTO v_item
+        FROM public.entry_items ei
+        WHERE ei.metadata->>'write_id' = v.write_id;
+        IF FOUND THEN
+          RETURN QUERY SELECT v.write_id, TRUE, TRUE, 'Already recorded'::TEXT,
+            v_item.record_id, (v_item.metadata->>'entry_number')::INTEGER, to_jsonb(v_item),
+            NULL::BOOLEAN, NULL::INTEGER;
+          CONTINUE;
+        END IF;
+      END IF;
+
+      -- Step 2: day's record — insert or lock the existing one
+      INSERT INTO public.entry_records AS er (user_id, event_id, entry_date)
+      VALUES (v.user_id, COALESCE(v.event_id, 1), v.entry_date)
+      ON CONFLICT (user_id, event_id, entry_date)
+      DO UPDATE SET entry_date = EXCLUDED.entry_date
+      RETURNING er.record_id INTO v_record_id;
+
+      SELECT COUNT(*)::INTEGER INTO v_previous
+      FROM public.entry_items ei
+      WHERE ei.record_id = v_record_id;
+
+      -- Step 3: arrival item
+      INSERT INTO public.entry_items (record_id, arrival_time, entry_type, bypass_reason, approved_by_uid, metadata)
+      VALUES (
+        v_record_id,
+        COALESCE(v.arrival_time, NOW()),
+        'qr_code_scan',
+        NULL,
+        v.approved_by_uid,
+        COALESCE(v.metadata, '{}'::JSONB)
+          || jsonb_build_object('entry_number', v_previous + 1)
+          || CASE WHEN v.write_id IS NULL THEN '{}'::JSONB ELSE jsonb_build_object('write_id', v.write_id) END
+      )
+      RETURNING * INTO v_item;
+
+      SELECT t.is_group, t.group_count INTO v_tourist
+      FROM public.tourists t
+      WHERE t.user_id = v.user_id;
+
+      RETURN QUERY SELECT v.write_id, TRUE, FALSE,
+        CASE WHEN v_previous > 0 THEN 'Re-entry recorded' ELSE 'Entry registered successfully' END::TEXT,
+        v_record_id, v_previous + 1, to_jsonb(v_item),
+        v_tourist.is_group, v_tourist.group_count;
+    EXCEPTION
+      WHEN unique_violation THEN
+        -- Same write_id committed concurrently by another flusher
+        RETURN QUERY SELECT v.write_id, TRUE, TRUE, 'Already recorded'::TEXT,
+          NULL::BIGINT, NULL::INTEGER, NULL::JSONB, NULL::BOOLEAN, NULL::INTEGER;
+      WHEN OTHERS THEN
+        RETURN QUERY SELECT v.write_id, FALSE, FALSE, SQLERRM::TEXT,
+          NULL::BIGINT, NULL::INTEGER, NULL::JSONB, NULL::BOOLEAN, NULL::INTEGER;
+    END;
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+-- Writes rows — only the backend (service role) may call it
+REVOKE EXECUTE ON FUNCTION record_entries_bulk(JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION record_entries_bulk(JSONB) TO service_role;
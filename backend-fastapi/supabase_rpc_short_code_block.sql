@@ -0,0 +1,44 @@
+-- ============================================================
+-- RPC: lease_short_code_block
+-- Hands out ranges of the short-code sequence to the API workers
+-- (utils/services/short_code_allocator.py).  Each worker leases a
+-- block, turns every index in it into a code locally (Feistel
+-- permutation → base62), and only comes back when the block is used up
+-- — one round-trip per SHORT_CODE_BLOCK_SIZE codes instead of a
+-- uniqueness SELECT per code.
+--
+-- The counter lives in Postgres (not Redis) so a cache flush can never
+-- hand out a range twice.  short_links.short_code / tourist_meta.qr_code
+-- stay UNIQUE as the safety net.
+--
+-- Parameters:
+--   p_size – number of indexes to reserve (> 0)
+--
+-- Returns: BIGINT — first index of the block; the caller owns
+--          [result, result + p_size)
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS public.short_code_counter (
+    id         SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    next_index BIGINT   NOT NULL DEFAULT 0
+);
+
+INSERT INTO public.short_code_counter (id, next_index)
+VALUES (1, 0)
+ON CONFLICT (id) DO NOTHING;
+
+DROP FUNCTION IF EXISTS lease_short_code_block(INT);
+
+CREATE OR REPLACE FUNCTION lease_short_code_block(
+    p_size INT
+)
+RETURNS BIGINT
+LANGUAGE sql
+VOLATILE
+AS $$
+    -- Row lock on the single counter row serialises concurrent leases
+    UPDATE public.short_code_counter
+    SET next_index = next_index + GREATEST(p_size, 1)
+    WHERE id = 1
+    RETURNING next_index - GREATEST(p_size, 1);
+$$;
@@ -1,10 +1,78 @@
 from utils.india_time import india_now
 from PIL import Image, ImageDraw, ImageFont
+from functools import lru_cache
 import os
+import threading
 import qrcode
 from io import BytesIO
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# Process-wide asset cache — shared by every generator instance
+# ══════════════════════════════════════════════════════════════════════════════
+# The decoded template is kept as an immutable base; each render works on a
+# .copy() (a memcpy) instead of re-opening and re-decoding the JPEG.
+_template_lock  = threading.Lock()
+_template_cache: dict = {}
+
+
+def _template_base(path: str) -> Image.Image:
+    """Decoded RGBA template — never draw on the returned image, copy it."""
+    base = _template_cache.get(path)
+    if base is None:
+        with _template_lock:
+            base = _template_cache.get(path)
+            if base is None:
+                with Image.open(path) as img:
+                    base = img.convert("RGBA")
+                base.load()
+                _template_cache[path] = base
+    return base
+
+
+@lru_cache(maxsize=128)
+def _cached_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    """TrueType font memoized per (path, size) — _fit_text/_wrap_text probe many sizes."""
+    return ImageFont.truetype(path, size)
+
+
+# ── output encodings ──────────────────────────────────────────────────────
+#   png   — full-size RGB PNG (original output, ~1.5 MB)
+#   png8  — full-size 256-colour palette PNG (~0.45 MB)
+#   webp  — full-size lossy WebP (~0.2 MB)
+#   thumb — CARD_THUMB_WIDTH wide WebP for list/preview screens (~0.06 MB)
+CARD_FORMATS     = ("png", "png8", "webp", "thumb")
+CARD_THUMB_WIDTH = 384
+
+
+def encode_card(card: Image.Image, fmt: str = "png") -> BytesIO:
+    """Serialise a rendered RGB card in one of CARD_FORMATS."""
+    output = BytesIO()
+    if fmt == "png":
+        card.save(output, "PNG", optimize=False)
+    elif fmt == "png8":
+        card.quantize(256, method=Image.Quantize.FASTOCTREE).save(output, "PNG")
+    elif fmt == "webp":
+        card.save(output, "WEBP", quality=82, method=4)
+    elif fmt == "thumb":
+        height = round(card.height * CARD_THUMB_WIDTH / card.width)
+        card.resize((CARD_THUMB_WIDTH, height), Image.Resampling.LANCZOS).save(
+            output, "WEBP", quality=80, method=4
+        )
+    else:
+        raise ValueError(f"Unknown card format: {fmt}")
+    output.seek(0)
+    return output
+
+
+@lru_cache(maxsize=16)
+def _circle_mask(diameter: int) -> Image.Image:
+    """Circular "L" paste mask, built once per diameter (treat as read-only)."""
+    mask = Image.new("L", (diameter, diameter), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, diameter - 1, diameter - 1), fill=255)
+    return mask
+
+
 class VisitorCardGenerator:
     """
     Generates visitor cards using template_2026.jpg (3375 × 6000 px).
@@ -29,7 +97,7 @@ class VisitorCardGenerator:
 
     # ── public API ────────────────────────────────────────────────────────
 
-    def generate_card_in_memory(self, user_data: dict) -> BytesIO:
+    def generate_card_in_memory(self, user_data: dict, fmt: str = "png") -> BytesIO:
         """
         Generate a visitor card in memory without writing to disk.
 
@@ -38,10 +106,13 @@ class VisitorCardGenerator:
             unique_id          – e.g. "Aadhar: 123456789012"
             profile_image_path – path to photo (may be absent/None)
             qr_data            – string encoded in QR, e.g. "TOURIST-34"
+            qr_payload         – optional; encoded in the QR instead of qr_data (qr_data is still printed as ID)
             valid_dates        – e.g. "2026-02-01 to 2026-02-28"
             group_count        – integer (1 = solo)
+
+        fmt: one of CARD_FORMATS (png | png8 | webp | thumb), see encode_card().
         """
-        card = Image.open(self.template_path).convert("RGBA")
+        card = _template_base(self.template_path).copy()
 
         # ── 1. Circular profile photo ─────────────────────────────────
         diameter = self.CIRCLE_R * 2          # 550 px
@@ -70,7 +141,7 @@ class VisitorCardGenerator:
         qr_size = min(panel_w, panel_h) - qr_pad * 2   # 780
         qr_x = self.PANEL_X1 + (panel_w - qr_size) // 2
         qr_y = self.PANEL_Y1 + (panel_h - qr_size) // 2
-        qr_img = self._generate_qr(user_data.get("qr_data", "TOURIST"), qr_size)
+        qr_img = self._generate_qr(user_data.get("qr_payload") or user_data.get("qr_data", "TOURIST"), qr_size)
         card.paste(qr_img, (qr_x, qr_y))
 
         # ── 3. Data text inside the cream/gold-bordered rectangle ────
@@ -121,10 +192,7 @@ class VisitorCardGenerator:
                                 fn_small, fill="#444444")
 
         # ── serialise ─────────────────────────────────────────────────
-        output = BytesIO()
-        card.convert("RGB").save(output, "PNG", optimize=False)
-        output.seek(0)
-        return output
+        return encode_card(card.convert("RGB"), fmt)
 
     def create_visitor_card(self, user_data: dict) -> str:
         """Generate card and save to static/cards/. Returns the file path."""
@@ -147,10 +215,8 @@ class VisitorCardGenerator:
         img = self._crop_to_square(image).resize(
             (diameter, diameter), Image.Resampling.LANCZOS
         )
-        mask = Image.new("L", (diameter, diameter), 0)
-        ImageDraw.Draw(mask).ellipse((0, 0, diameter - 1, diameter - 1), fill=255)
         result = Image.new("RGBA", (diameter, diameter), (0, 0, 0, 0))
-        result.paste(img.convert("RGBA"), mask=mask)
+        result.paste(img.convert("RGBA"), mask=_circle_mask(diameter))
         return result
 
     def _make_placeholder_circle(self, diameter: int, name: str) -> Image.Image:
@@ -165,7 +231,7 @@ class VisitorCardGenerator:
         )
         initials = "".join(w[0].upper() for w in name.split() if w)[:2] or "?"
         try:
-            font = ImageFont.truetype(self.font_path, diameter // 3)
+            font = _cached_font(self.font_path, diameter // 3)
         except Exception:
             font = ImageFont.load_default()
         bbox = draw.textbbox((0, 0), initials, font=font)
@@ -198,7 +264,7 @@ class VisitorCardGenerator:
         return image.crop((left, top, left + side, top + side))
 
     def _font(self, size: int) -> ImageFont.FreeTypeFont:
-        return ImageFont.truetype(self.font_path, size)
+        return _cached_font(self.font_path, size)
 
     def _draw_centered(
         self,
@@ -303,7 +369,7 @@ class VisitorCardGenerator3:
 
     # ── public API ────────────────────────────────────────────────────────
 
-    def generate_card_in_memory(self, user_data: dict) -> BytesIO:
+    def generate_card_in_memory(self, user_data: dict, fmt: str = "png") -> BytesIO:
         """
         Generate a visitor card in memory without writing to disk.
 
@@ -312,11 +378,14 @@ class VisitorCardGenerator3:
             unique_id          – e.g. "Aadhar: 123456789012"
             profile_image_path – path to photo (may be absent/None)
             qr_data            – string encoded in QR, e.g. "TOURIST-34"
+            qr_payload         – optional; encoded in the QR instead of qr_data (qr_data is still printed as ID)
             valid_date         – e.g. "2026-02-27"
             phone              – phone number string
             group_count        – integer (1 = solo)
+
+        fmt: one of CARD_FORMATS (png | png8 | webp | thumb), see encode_card().
         """
-        card = Image.open(self.template_path).convert("RGBA")
+        card = _template_base(self.template_path).copy()
 
         # ── 1. Circular profile photo ─────────────────────────────────
         diameter = self.CIRCLE_R * 2          # 136 px
@@ -345,7 +414,7 @@ class VisitorCardGenerator3:
         qr_size = min(panel_w, panel_h) - qr_pad * 2   # 186
         qr_x    = self.PANEL_X1 + (panel_w - qr_size) // 2
         qr_y    = self.PANEL_Y1 + qr_pad               # top-aligned (moved up ~36px vs centred)
-        qr_img  = self._generate_qr(user_data.get("qr_data", "TOURIST"), qr_size)
+        qr_img  = self._generate_qr(user_data.get("qr_payload") or user_data.get("qr_data", "TOURIST"), qr_size)
         card.paste(qr_img, (qr_x, qr_y))
 
         # ── 3. Data text ──────────────────────────────────────────────
@@ -410,10 +479,7 @@ class VisitorCardGenerator3:
                                 fn_small, fill="#444444")
 
         # ── serialise ─────────────────────────────────────────────────
-        output = BytesIO()
-        card.convert("RGB").save(output, "PNG", optimize=False)
-        output.seek(0)
-        return output
+        return encode_card(card.convert("RGB"), fmt)
 
     def create_visitor_card(self, user_data: dict) -> str:
         """Generate card and save to static/cards/. Returns the file path."""
@@ -530,10 +596,8 @@ class VisitorCardGenerator3:
         img  = self._crop_to_square(image).resize(
             (diameter, diameter), Image.Resampling.LANCZOS
         )
-        mask = Image.new("L", (diameter, diameter), 0)
-        ImageDraw.Draw(mask).ellipse((0, 0, diameter - 1, diameter - 1), fill=255)
         result = Image.new("RGBA", (diameter, diameter), (0, 0, 0, 0))
-        result.paste(img.convert("RGBA"), mask=mask)
+        result.paste(img.convert("RGBA"), mask=_circle_mask(diameter))
         return result
 
     def _make_placeholder_circle(self, diameter: int, name: str) -> Image.Image:
@@ -547,7 +611,7 @@ class VisitorCardGenerator3:
         )
         initials = "".join(w[0].upper() for w in name.split() if w)[:2] or "?"
         try:
-            font = ImageFont.truetype(self.font_path, diameter // 3)
+            font = _cached_font(self.font_path, diameter // 3)
         except Exception:
             font = ImageFont.load_default()
         bbox = draw.textbbox((0, 0), initials, font=font)
@@ -578,7 +642,7 @@ class VisitorCardGenerator3:
         return image.crop((left, top, left + side, top + side))
 
     def _font(self, size: int) -> ImageFont.FreeTypeFont:
-        return ImageFont.truetype(self.font_path, size)
+        return _cached_font(self.font_path, size)
 
     def _draw_centered(
         self,
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Test for bulk tourist registration (POST /tourists/register/bulk,
+utils/services/bulk_registration.py).
+
+Runs the route against an in-memory table set and checks:
+  1. manifest parsing — CSV and JSON give the same rows
+  2. up-front validation — every bad row is reported, nothing is inserted (422)
+  3. a 120-row manifest with a photos zip — one INSERT per table per chunk,
+     one short-code block lease for all rows, per-row NDJSON lines + summary,
+     one bulk SMS task, photos written, cached count adjusted
+  4. a phone registered after validation — only that row fails, the rest of
+     its chunk is still registered
+  5. tourist_meta / short_links failing for a chunk — its tourists and photos
+     are removed again, the rows are reported failed, the other chunks and the
+     cached count are unaffected, and re-sending the failed rows registers them
+  6. the SMS carries the event's name
+
+supabaseAdmin / db_execute are replaced by the counting in-memory stand-in
+from fake_supabase.py and uploads go to a temp folder, so no database is needed.
+
+Usage:
+    python test_bulk_registration.py
+"""
+import io
+import os
+import json
+import shutil
+import asyncio
+import zipfile
+import tempfile
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from fastapi import BackgroundTasks, HTTPException, UploadFile
+
+from fake_supabase import FakeDB, check, use_fake_db
+from utils.services import bulk_registration, file_handlers, pagination, short_code_allocator
+from routes import tourist_route
+
+send_bulk_sms_background = tourist_route.send_bulk_sms_background
+sms_sent: list = []
+
+EVENT_ID = 7
+VALID_DATE = "2026-03-01"
+ROWS = 120
+CHUNK = 50
+
+
+class DuplicateKey(Exception):
+    pass
+
+
+class BulkDB(FakeDB):
+    """tourists: (phone, valid_date) unique key and generated user_ids; inserts can be made to fail."""
+
+    def __init__(self):
+        super().__init__({"tourists": [], "tourist_meta": [], "short_links": []})
+        self.next_index = 0
+        self.next_user_id = 1000
+        self.fail_inserts = {}   # table → inserts left to fail
+        self.rpcs["lease_short_code_block"] = self._lease
+
+    def _lease(self, params: dict) -> int:
+        start, self.next_index = self.next_index, self.next_index + params["p_size"]
+        return start
+
+    def insert_rows(self, table: str, rows: list) -> list:
+        if self.fail_inserts.get(table):
+            self.fail_inserts[table] -= 1
+            raise RuntimeError(f"{table} unavailable")
+        if table == "tourists":
+            taken = {(r["phone"], r["valid_date"]) for r in self.tables[table]}
+            for row in rows:
+                if (row["phone"], row["valid_date"]) in taken:
+                    raise DuplicateKey(
+                        'duplicate key value violates unique constraint "tourists_phone_valid_date_key"'
+                    )
+                taken.add((row["phone"], row["valid_date"]))
+            rows = [{**row, "user_id": self.next_user_id + i} for i, row in enumerate(rows, start=1)]
+            self.next_user_id += len(rows)
+        return super().insert_rows(table, rows)
+
+
+def make_manifest(n: int) -> list:
+    rows = []
+    for i in range(n):
+        group = i % 10 == 0
+        rows.append({
+            "name": f"Student {i}",
+            "phone": f"98{i:08d}",
+            "unique_id_type": "" if i % 3 == 0 else "college_id",
+            "unique_id": "" if i % 3 == 0 else f"C-{i}",
+            "is_group": "true" if group else "false",
+            "group_count": "4" if group else "",
+            "valid_date": "",
+            "image": f"photos/s{i}.jpg",
+            "unique_id_photo": f"id_{i}.png" if i % 3 == 0 else "",
+        })
+    return rows
+
+
+def as_csv(rows: list) -> bytes:
+    header = list(rows[0])
+    lines = [",".join(header)] + [",".join(r[h] for h in header) for r in rows]
+    return "\n".join(lines).encode()
+
+
+def make_zip(rows: list, skip: tuple = ()) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for r in rows:
+            for field in ("image", "unique_id_photo"):
+                if r[field] and r[field] not in skip:
+                    zf.writestr(r[field], b"\xff\xd8fake-jpeg")
+    return buffer.getvalue()
+
+
+def upload(name: str, data: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=name)
+
+
+def patch_routes(db: FakeDB) -> None:
+    use_fake_db(db, tourist_route, bulk_registration, short_code_allocator)
+    short_code_allocator._block.update(next=0, end=0)
+    tourist_route.enqueue_card_render = lambda *_: True
+
+    async def _get_event(event_id):
+        return {"event_id": event_id, "name": "Test Event", "is_active": True}
+    tourist_route.get_event = _get_event
+
+    def _capture_sms(background_tasks, messages):
+        sms_sent.extend(messages)
+        send_bulk_sms_background(background_tasks, messages)
+    sms_sent.clear()
+    tourist_route.send_bulk_sms_background = _capture_sms
+
+
+async def call_bulk(rows: list, photos: bytes, manifest_name: str = "manifest.csv"):
+    tasks = BackgroundTasks()
+    data = as_csv(rows) if manifest_name.endswith(".csv") else json.dumps(rows).encode()
+    response = await tourist_route.bulk_register_tourists(
+        registered_event_id=EVENT_ID,
+        manifest=upload(manifest_name, data),
+        photos=upload("photos.zip", photos),
+        valid_date=VALID_DATE,
+        send_sms=True,
+        background_tasks=tasks,
+        user={"role": "admin"},
+    )
+    lines = [json.loads(chunk) async for chunk in response.body_iterator]
+    return lines, tasks
+
+
+async def main():
+    results = []
+    upload_dir = tempfile.mkdtemp()
+    file_handlers.UPLOAD_DIR = os.path.join(upload_dir, "uploads")
+    file_handlers.ID_UPLOAD_DIR = os.path.join(upload_dir, "id_uploads")
+    tourist_route.BULK_REGISTER_CHUNK_SIZE = CHUNK
+
+    manifest = make_manifest(ROWS)
+    from_csv = bulk_registration.parse_manifest("m.csv", as_csv(manifest))
+    from_json = bulk_registration.parse_manifest("m.json", json.dumps({"tourists": manifest}).encode())
+    results.append(check("CSV and JSON manifests parse to the same rows", from_csv == from_json == manifest))
+
+    # ── Up-front validation ───────────────────────────────────────────────
+    db = BulkDB()
+    patch_routes(db)
+    bad = make_manifest(6)
+    bad[1]["name"] = ""
+    bad[2]["valid_date"] = "01-03-2026"
+    bad[3]["is_group"], bad[3]["group_count"] = "true", "1"
+    bad[4]["phone"] = bad[5]["phone"]
+    try:
+        await call_bulk(bad, make_zip(bad, skip=("photos/s5.jpg",)))
+        rejected = None
+    except HTTPException as e:
+        rejected = e
+    rows_with_errors = [e["row"] for e in rejected.detail["errors"]] if rejected else []
+    results.append(check(
+        f"invalid manifest → {rejected and rejected.status_code}, rows {rows_with_errors} reported",
+        rejected is not None and rejected.status_code == 422 and rows_with_errors == [2, 3, 4, 6],
+    ))
+    results.append(check("nothing inserted for a rejected manifest", not any(db.tables.values())))
+
+    # ── Happy path ────────────────────────────────────────────────────────
+    db = BulkDB()
+    patch_routes(db)
+    pagination._local_counts[pagination.tourist_count_name(VALID_DATE)] = (float("inf"), 10)
+    lines, tasks = await call_bulk(manifest, make_zip(manifest), "manifest.json")
+    registered = [l for l in lines if l.get("status") == "registered"]
+    summary = lines[-1].get("summary", {})
+    chunks = -(-ROWS // CHUNK)
+    expected = ["tourists", "insert tourists", "rpc:lease_short_code_block", "insert tourist_meta", "insert short_links"] \
+        + ["insert tourists", "insert tourist_meta", "insert short_links"] * (chunks - 1)
+    results.append(check(
+        f"{ROWS} rows in {len(db.queries)} queries (single /register: ~{ROWS * 4})",
+        db.queries == expected,
+    ))
+    results.append(check(
+        f"{len(registered)} NDJSON row lines in manifest order + summary {summary}",
+        [l["row"] for l in registered] == list(range(1, ROWS + 1))
+        and summary.get("registered") == ROWS and summary.get("failed") == 0
+        and all(l["visitor_card_url"] and l["short_code"] for l in registered),
+    ))
+    codes = [m["qr_code"] for m in db.tables["tourist_meta"]]
+    results.append(check(
+        "meta + short_links rows written with unique codes",
+        len(set(codes)) == ROWS and sorted(codes) == sorted(l["short_code"] for l in db.tables["short_links"]),
+    ))
+    saved = len(os.listdir(file_handlers.UPLOAD_DIR)), len(os.listdir(file_handlers.ID_UPLOAD_DIR))
+    results.append(check(f"photos saved (profile, id) = {saved}", saved == (ROWS, ROWS // 3)))
+    groups = [t for t in db.tables["tourists"] if t["is_group"]]
+    results.append(check(
+        "group rows keep group_count, others get 1",
+        len(groups) == ROWS // 10 and all(t["group_count"] == 4 for t in groups)
+        and all(t["group_count"] == 1 for t in db.tables["tourists"] if not t["is_group"]),
+    ))
+    results.append(check(
+        f"SMS queued as {len(tasks.tasks)} background task",
+        len(tasks.tasks) == 1 and summary.get("sms_queued") == ROWS,
+    ))
+    count = pagination._local_counts[pagination.tourist_count_name(VALID_DATE)][1]
+    results.append(check(f"cached tourist count adjusted 10 → {count}", count == 10 + ROWS))
+
+    # ── Phone registered between validation and insert ─────────────────────
+    db = BulkDB()
+    patch_routes(db)
+    late = make_manifest(5)
+    db.tables["tourists"].append({"user_id": 1, "phone": late[2]["phone"], "valid_date": VALID_DATE})
+
+    async def _none_registered(_):
+        return set()
+    tourist_route.find_registered_phones = _none_registered
+    lines, _ = await call_bulk(late, make_zip(late))
+    statuses = [l.get("status") for l in lines[:-1]]
+    results.append(check(
+        f"late duplicate isolated: {statuses}",
+        statuses == ["registered", "registered", "failed", "registered", "registered"]
+        and "already registered" in lines[2]["error"],
+    ))
+
+    results.append(check(
+        "SMS names the event",
+        sms_sent and all(m["event_name"] == "Test Event" for m in sms_sent),
+    ))
+
+    # ── A chunk whose meta / short_links insert fails is rolled back ──────
+    for failing in ("tourist_meta", "short_links"):
+        db = BulkDB()
+        patch_routes(db)
+        db.fail_inserts[failing] = 1   # the first chunk's insert
+        shutil.rmtree(file_handlers.UPLOAD_DIR, ignore_errors=True)
+        pagination._local_counts[pagination.tourist_count_name(VALID_DATE)] = (float("inf"), 0)
+        batch = make_manifest(CHUNK + 10)
+        lines, _ = await call_bulk(batch, make_zip(batch))
+        failed = [l for l in lines[:-1] if l.get("status") == "failed"]
+        photos_left = len(os.listdir(file_handlers.UPLOAD_DIR))
+        count = pagination._local_counts[pagination.tourist_count_name(VALID_DATE)][1]
+        results.append(check(
+            f"{failing} failure: {len(failed)} rows failed, {len(db.tables['tourists'])} tourists / "
+            f"{photos_left} photos kept, count {count}",
+            [l["row"] for l in failed] == list(range(1, CHUNK + 1))
+            and all("re-send" in l["error"] for l in failed)
+            and len(db.tables["tourists"]) == len(db.tables["tourist_meta"]) == len(db.tables["short_links"]) == 10
+            and photos_left == 10 and count == 10
+            and len(sms_sent) == 10,
+        ))
+        resend = [batch[l["row"] - 1] for l in failed]
+        lines, _ = await call_bulk(resend, make_zip(resend))
+        results.append(check(
+            f"{failing} failure: re-sent rows → {lines[-1]['summary']['registered']} registered",
+            lines[-1]["summary"]["registered"] == CHUNK and len(db.tables["short_links"]) == CHUNK + 10,
+        ))
+
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
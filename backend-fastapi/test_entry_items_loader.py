@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Query-count test for the batched entry_items loader (utils/services/batch_loader.py).
+
+Runs the history / today / tourist endpoints against an in-memory table set
+and counts the DB round-trips each request makes:
+  1. BatchLoader — same-tick loads share one batch, keys are de-duplicated
+     and cached, large key sets are chunked, failed keys are not cached
+  2. GET /entry/history/{user_id}  — 10 days of history in 2 queries (was 11)
+  3. GET /entry/today/{user_id}    — 2 queries
+  4. GET /tourists/                — tourists + records + items + count = 4 queries
+  5. GET /tourists/{user_id}       — tourist + meta + records + items = 4 queries
+
+supabaseAdmin / db_execute are replaced by the counting in-memory stand-in
+from fake_supabase.py, so no database is needed.
+
+Usage:
+    python test_entry_items_loader.py
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from fake_supabase import FakeDB, check, use_fake_db
+from utils.india_time import india_today_str
+from utils.services import batch_loader
+from routes import entry_route, tourist_route
+
+EVENT_ID = 1
+USER_ID = 501
+DAYS = 10
+ITEMS_PER_DAY = 3
+EVENT_DATES = ["2026-02-27", "2026-02-28", "2026-03-01"]
+
+
+def build_tables(today: str) -> dict:
+    base = datetime.strptime(today, "%Y-%m-%d")
+    records, items = [], []
+    dates = [(base - timedelta(days=d)).strftime("%Y-%m-%d") for d in range(DAYS)] + EVENT_DATES
+    for record_id, entry_date in enumerate(dict.fromkeys(dates), start=1):
+        records.append({"record_id": record_id, "user_id": USER_ID, "event_id": EVENT_ID,
+                        "entry_date": entry_date, "created_at": f"{entry_date}T00:00:00+00:00"})
+        for i in range(ITEMS_PER_DAY):
+            arrival = datetime.strptime(entry_date, "%Y-%m-%d").replace(hour=9 + i, tzinfo=timezone.utc)
+            items.append({"item_id": record_id * 10 + i, "record_id": record_id,
+                          "arrival_time": arrival.isoformat(),
+                          "departure_time": None if i == ITEMS_PER_DAY - 1 else arrival.isoformat(),
+                          "metadata": {}})
+    tourists = [{"user_id": USER_ID + n, "name": f"T{n}", "valid_date": today, "registered_event_id": EVENT_ID}
+                for n in range(5)]
+    return {"entry_records": records, "entry_items": items, "tourists": tourists, "tourist_meta": []}
+
+
+def patch_routes(db: FakeDB) -> None:
+    use_fake_db(db, batch_loader, entry_route, tourist_route)
+    entry_route.pending_entries = lambda *_: []
+
+    async def _get_event(event_id):
+        return {"event_id": event_id, "is_active": True}
+    tourist_route.get_event = _get_event
+
+
+async def loader_checks() -> list:
+    results = []
+    calls = []
+
+    async def batch_fn(keys):
+        calls.append(list(keys))
+        return {k: k * 10 for k in keys if k != 4}
+
+    loader = batch_loader.BatchLoader(batch_fn, default=lambda: "missing", max_keys=3)
+    values = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1), loader.load_many([2, 4]))
+    results.append(check(
+        f"same-tick loads → {loader.queries} batch call with de-duplicated keys",
+        loader.queries == 1 and calls == [[1, 2, 4]] and values[:3] == [10, 20, 10],
+    ))
+    results.append(check("keys missing from the batch resolve to default()", values[3] == [20, "missing"]))
+    await loader.load(2)
+    results.append(check("cached key does not hit the batch function again", loader.queries == 1))
+    await loader.load_many(range(10, 17))
+    results.append(check(f"7 new keys with max_keys=3 → {loader.queries - 1} chunks", loader.queries == 4))
+
+    failures = {"left": 1}
+
+    async def flaky(keys):
+        if failures["left"]:
+            failures["left"] -= 1
+            raise RuntimeError("db down")
+        return {k: k for k in keys}
+
+    flaky_loader = batch_loader.BatchLoader(flaky)
+    try:
+        await flaky_loader.load(7)
+        failed = False
+    except RuntimeError:
+        failed = True
+    results.append(check("failed batch raises and is retried on the next load", failed and await flaky_loader.load(7) == 7))
+    return results
+
+
+async def main():
+    results = await loader_checks()
+
+    db = FakeDB(build_tables(india_today_str()))
+    patch_routes(db)
+    admin = {"role": "admin", "sub": "admin-uid"}
+
+    history, queries = await db.count_during(entry_route.get_entry_history(USER_ID, EVENT_ID, limit=DAYS, user=admin))
+    first_items = history["history"][0]["entry_items"]
+    results.append(check(
+        f"history: {history['total_records']} days in {len(queries)} queries {queries}",
+        history["total_records"] == DAYS and queries == ["entry_records", "entry_items"],
+    ))
+    results.append(check(
+        "history: every day has its items, newest first",
+        all(h["total_entries"] == ITEMS_PER_DAY for h in history["history"])
+        and first_items[0]["arrival_time"] > first_items[-1]["arrival_time"],
+    ))
+
+    today_resp, queries = await db.count_during(entry_route.get_today_entries(USER_ID, EVENT_ID, user=admin))
+    results.append(check(
+        f"today: {today_resp['total_entries']} entries, {today_resp['open_entries']} open in {len(queries)} queries",
+        today_resp["total_entries"] == ITEMS_PER_DAY and today_resp["open_entries"] == 1 and len(queries) == 2,
+    ))
+
+    tourists, queries = await db.count_during(tourist_route.get_all_tourists(limit=20, offset=0, date_filter=None, cursor=None, user=admin))
+    inside = [t for t in tourists["tourists"] if t["today_entry"]["is_currently_inside"]]
+    results.append(check(
+        f"all tourists: {tourists['pagination']['count']} tourists in {len(queries)} queries {queries}",
+        len(queries) == 4 and queries.count("entry_items") == 1 and [t["user_id"] for t in inside] == [USER_ID],
+    ))
+
+    tourist, queries = await db.count_during(tourist_route.get_tourist(USER_ID, user=admin))
+    dates = tourist["tourist"]["dates"]
+    results.append(check(
+        f"single tourist: {len(dates)} event dates in {len(queries)} queries {queries}",
+        len(queries) == 4 and queries.count("entry_items") == 1
+        and all(d["total_entries"] == ITEMS_PER_DAY for d in dates.values())
+        and all(d["last_entry"]["departure_time"] is None for d in dates.values()),
+    ))
+
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Round-trip test for the export formats (utils/services/export_formats.py).
+
+Builds synthetic entry and feedback data, encodes it as CSV and as
+parquet / arrow / ndjson, reads every format back and checks that it holds
+the same values as the CSV:
+  1. entries  — each format, row for row (timestamps compared as instants)
+  2. feedback — long format pivoted back to the wide CSV layout; sessions
+                and answers are paged through iter_feedback_pages (served by the
+                in-memory stand-in from fake_supabase.py) and must match a single in-memory build
+  3. parquet / arrow keep entry_type / entry_point / question_text dictionary-encoded
+  4. parquet output is streamed in several chunks (one per row group)
+
+parquet / arrow checks need pyarrow; without it only ndjson is checked.
+
+Usage:
+    python test_export_formats.py
+"""
+import io
+import csv
+import json
+import asyncio
+import random
+from datetime import datetime
+
+from fake_supabase import FakeDB, check, use_fake_db
+from utils.services import export_formats
+from utils.services.export_formats import columnar_available, record_chunks
+from utils.services.entry_export import (
+    ENTRY_EXPORT_FIELDS, build_entry_rows, build_entry_records, format_entry_row, csv_chunks,
+)
+from utils.services import feedback_export
+from utils.services.feedback_export import (
+    FEEDBACK_EXPORT_FIELDS, feedback_csv_header, build_feedback_rows, build_feedback_records, iter_feedback_pages,
+)
+
+FORMATS = ["ndjson"] + (["parquet", "arrow"] if columnar_available() else [])
+PAGE_SIZE = 500
+
+
+# ─── Synthetic data ───────────────────────────────────────────────────────────
+def entry_dataset(n_items: int = 5000):
+    random.seed(13)
+    tourists = {
+        uid: {"user_id": uid, "name": f"Tourist {uid}" if uid % 17 else None, "phone": f"9{uid:09d}",
+              "unique_id_type": random.choice(["Aadhar", "PAN", "Passport"]), "unique_id": f"{uid:012d}",
+              "is_group": uid % 4 == 0, "group_count": 1 + uid % 6}
+        for uid in range(1, 300)
+    }
+    records = [
+        {"record_id": rid, "user_id": random.randint(1, 299), "entry_date": f"2026-02-{25 + rid % 4:02d}"}
+        for rid in range(1, 2000)
+    ]
+    verifiers = {f"guard-{i}": {"name": f"Guard {i}", "phone": f"8{i:09d}"} for i in range(5)}
+    items = []
+    for iid in range(1, n_items + 1):
+        exited = iid % 3 != 0
+        items.append({
+            "item_id": iid,
+            "record_id": random.randint(1, 1999),
+            "arrival_time": f"2026-02-27T{8 + iid % 10:02d}:{iid % 60:02d}:00.{iid:06d}+05:30",
+            "departure_time": f"2026-02-27T{18 + iid % 4:02d}:{iid % 60:02d}:00+00:00" if exited else None,
+            "duration": (f"{iid % 2} days 0{iid % 9}:{iid % 60:02d}:00" if iid % 5 == 0 else f"0{iid % 9}:{iid % 60:02d}:00") if exited else None,
+            "entry_type": random.choice(["qr_code_scan", "manual", "bypass"]),
+            "entry_point": f"Gate {1 + iid % 4}",
+            "approved_by_uid": random.choice(list(verifiers) + [None]),
+        })
+    return records, items, tourists, verifiers
+
+
+def feedback_dataset(n_sessions: int = 400):
+    random.seed(21)
+    questions = [
+        {"question_id": 11, "question_text": "How was the event?", "question_type": "rating"},
+        {"question_id": 12, "question_text": "Was the entry quick?", "question_type": "rating"},
+        {"question_id": 13, "question_text": "Any suggestions?", "question_type": "text"},
+    ]
+    sessions = [
+        {"session_id": sid, "submitted_at": f"2026-02-27T{10 + sid % 10:02d}:{sid % 60:02d}:00+05:30"}
+        for sid in range(1, n_sessions + 1)
+    ]
+    answers_by_session = {}
+    for s in sessions:
+        answers = {}
+        for q in questions:
+            if random.random() < 0.15:
+                continue  # unanswered
+            if q["question_type"] == "rating":
+                answers[q["question_id"]] = {"answer_number": random.randint(1, 5), "answer_text": None}
+            else:
+                answers[q["question_id"]] = {"answer_number": None, "answer_text": f"Suggestion, \"{s['session_id']}\""}
+        answers_by_session[s["session_id"]] = answers
+    return sessions, questions, answers_by_session
+
+
+async def entry_pages(build, records, items, tourists, verifiers):
+    items_by_record = {}
+    for item in items:
+        items_by_record.setdefault(item["record_id"], []).append(item)
+    for start in range(0, len(records), PAGE_SIZE):
+        records_map = {r["record_id"]: r for r in records[start:start + PAGE_SIZE]}
+        page_items = [i for rid in records_map for i in items_by_record.get(rid, ())]
+        yield list(build(page_items, records_map, tourists, verifiers))
+
+
+# ─── Encode / decode ──────────────────────────────────────────────────────────
+async def collect(chunks) -> tuple:
+    parts = [chunk async for chunk in chunks]
+    joined = "".join(parts) if parts and isinstance(parts[0], str) else b"".join(parts)
+    return joined, len(parts)
+
+
+def read_back(fmt: str, data, fields: list):
+    names = [name for name, _ in fields]
+    if fmt == "ndjson":
+        return [tuple(json.loads(line)[n] for n in names) for line in data.splitlines()], None
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pq.read_table(io.BytesIO(data)) if fmt == "parquet" else pa.ipc.open_stream(data).read_all()
+    return [tuple(row[n] for n in names) for row in table.to_pylist()], table.schema
+
+
+def is_dictionary(schema, name: str) -> bool:
+    import pyarrow as pa
+    return pa.types.is_dictionary(schema.field(name).type)
+
+
+def norm_cell(value: str):
+    """Compare timestamps as instants and numbers as numbers."""
+    if isinstance(value, str) and len(value) > 18 and value[4:5] == "-" and value[10:11] in ("T", " "):
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def norm_rows(rows) -> list:
+    return [[norm_cell(str(cell)) for cell in row] for row in rows]
+
+
+def parse_csv(text: str) -> list:
+    return list(csv.reader(io.StringIO(text)))[1:]
+
+
+# ─── Checks ───────────────────────────────────────────────────────────────────
+async def main():
+    results = []
+    export_formats.EXPORT_ROW_GROUP_ROWS = 1000
+
+    records, items, tourists, verifiers = entry_dataset()
+    csv_text, _ = await collect(csv_chunks(entry_pages(build_entry_rows, records, items, tourists, verifiers)))
+    expected = norm_rows(parse_csv(csv_text))
+
+    for fmt in FORMATS:
+        data, n_chunks = await collect(record_chunks(
+            entry_pages(build_entry_records, records, items, tourists, verifiers), ENTRY_EXPORT_FIELDS, fmt
+        ))
+        rows, schema = read_back(fmt, data, ENTRY_EXPORT_FIELDS)
+        got = norm_rows(format_entry_row(row) for row in rows)
+        results.append(check(f"entries {fmt}: {len(got)} rows match CSV", got == expected and len(got) == len(items)))
+
+        if schema is not None:
+            dict_cols = [name for name in ("entry_type", "entry_point", "status") if is_dictionary(schema, name)]
+            results.append(check(f"entries {fmt}: entry_type/entry_point/status dictionary-encoded", len(dict_cols) == 3))
+        if fmt == "parquet":
+            results.append(check(f"entries parquet streamed in {n_chunks} chunks", n_chunks > 1))
+
+    sessions, questions, answers_by_session = feedback_dataset()
+    db = FakeDB({
+        "feedback_sessions": [{**s, "event_id": 1} for s in sessions],
+        "feedback_answers": [
+            {"session_id": sid, "question_id": qid, **answer}
+            for sid, answers in answers_by_session.items() for qid, answer in answers.items()
+        ],
+    })
+    use_fake_db(db, feedback_export)
+    feedback_export.EXPORT_PAGE_SIZE = 64
+    csv_text, _ = await collect(csv_chunks(
+        iter_feedback_pages(1, questions, build_feedback_rows),
+        header=feedback_csv_header(questions),
+    ))
+    expected = norm_rows(parse_csv(csv_text))
+    in_memory = norm_rows(build_feedback_rows(sorted(sessions, key=lambda s: (s["submitted_at"], s["session_id"])), questions, answers_by_session))
+    results.append(check(
+        f"feedback paged CSV ({len(db.queries)} queries) matches the in-memory build",
+        expected == in_memory and len(db.queries) > len(sessions) // 64,
+    ))
+
+    for fmt in FORMATS:
+        data, _ = await collect(record_chunks(
+            iter_feedback_pages(1, questions, build_feedback_records), FEEDBACK_EXPORT_FIELDS, fmt
+        ))
+        rows, schema = read_back(fmt, data, FEEDBACK_EXPORT_FIELDS)
+
+        # Pivot long → wide in session order
+        wide, order = {}, []
+        for session_ref, submitted_at, question_no, _, question_type, number, text in rows:
+            if session_ref not in wide:
+                wide[session_ref] = [session_ref, submitted_at] + [""] * len(questions)
+                order.append(session_ref)
+            wide[session_ref][1 + question_no] = number if question_type == "rating" else text
+        answered = [s for s in expected if any(cell != "" for cell in s[2:])]
+        got = norm_rows(wide[ref] for ref in order)
+        results.append(check(f"feedback {fmt}: {len(got)} sessions match CSV", got == answered))
+
+        if schema is not None:
+            results.append(check(f"feedback {fmt}: question_text dictionary-encoded", is_dictionary(schema, "question_text")))
+
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
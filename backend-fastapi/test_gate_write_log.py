@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Crash-recovery test for the gate write log (utils/services/gate_write_queue.py).
+
+Appends arrivals to the log, kills flushers in the middle of a batch and
+checks that a fresh flusher replays the log so every arrival ends up written
+exactly once:
+  1. logged arrivals show up as pending (what GET /entry/today merges in)
+  2. flusher killed before its batch is committed → nothing written, batch stays unacked
+  3. flusher killed after the commit but before the ack → batch stays unacked
+  4. a new flusher re-claims both batches and flushes the rest of the log
+     - every write_id written exactly once (the replayed batch comes back as duplicates)
+     - writes were batched (≤ GATE_WRITE_BATCH_ROWS rows per call)
+     - a row the DB rejects goes to the dead-letter list, the rest of its batch is kept
+     - log, unacked list and pending hashes are empty afterwards
+  5. the log key is deleted under a running flusher (Redis flush) → the
+     flusher recreates the consumer group and flushes new arrivals
+
+The record_entries_bulk RPC is replaced by an in-memory table with the same
+write_id de-duplication; Redis must be reachable (REDIS_HOST / REDIS_PORT).  Uses
+test:gate_writes:* keys, so it does not touch a live log.
+
+Usage:
+    python test_gate_write_log.py
+"""
+import asyncio
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from fake_supabase import check
+from utils.services import gate_write_queue as gwq
+
+TOURISTS = [101, 102, 103]
+ARRIVALS_PER_TOURIST = 150
+REJECTED_USER_ID = -1
+TODAY = "2026-03-01"
+
+
+class FakeEntryDB:
+    """In-memory stand-in for record_entries_bulk — de-duplicates on write_id."""
+
+    def __init__(self):
+        self.rows: dict[str, dict] = {}
+        self.inserts: dict[str, int] = {}
+        self.batch_sizes: list[int] = []
+        self.hang_before_commit = False
+        self.hang_after_commit = False
+        self.called = asyncio.Event()
+
+    async def write_batch(self, jobs: list) -> list:
+        self.batch_sizes.append(len(jobs))
+        self.called.set()
+        if self.hang_before_commit:
+            await asyncio.Event().wait()  # killed here
+        results = []
+        for job in jobs:
+            write_id = job["write_id"]
+            if job["user_id"] == REJECTED_USER_ID:
+                results.append({"write_id": write_id, "success": False, "message": "violates foreign key constraint"})
+            elif write_id in self.rows:
+                results.append({"write_id": write_id, "success": True, "duplicate": True})
+            else:
+                self.rows[write_id] = job
+                self.inserts[write_id] = self.inserts.get(write_id, 0) + 1
+                results.append({"write_id": write_id, "success": True, "duplicate": False})
+        if self.hang_after_commit:
+            await asyncio.Event().wait()  # killed here
+        return results
+
+
+def use_test_keys() -> None:
+    gwq.GATE_WRITE_LOG_KEY = "test:gate_writes:log"
+    gwq.GATE_WRITE_DEAD_KEY = "test:gate_writes:dead"
+    gwq.GATE_WRITE_PENDING_PREFIX = "test:gate_writes:pending:"
+    gwq.GATE_WRITE_BATCH_ROWS = 50
+    gwq.GATE_WRITE_BATCH_MS = 50
+
+
+def cleanup() -> None:
+    redis = gwq._redis
+    keys = [gwq.GATE_WRITE_LOG_KEY, gwq.GATE_WRITE_DEAD_KEY]
+    keys += list(redis.scan_iter(gwq.GATE_WRITE_PENDING_PREFIX + "*"))
+    redis.delete(*keys)
+
+
+def unacked() -> int:
+    return gwq._redis.xpending(gwq.GATE_WRITE_LOG_KEY, gwq.GATE_WRITE_GROUP)["pending"]
+
+
+async def kill_mid_batch(db: FakeEntryDB, n: int) -> None:
+    db.called.clear()
+    task = asyncio.create_task(gwq._flusher(n))
+    await asyncio.wait_for(db.called.wait(), timeout=10)
+    await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def main():
+    if not gwq._use_redis():
+        print("❌ Redis is not reachable — this test needs a real Redis (REDIS_HOST / REDIS_PORT)")
+        return False
+
+    results = []
+    use_test_keys()
+    cleanup()
+    gwq._ensure_group()
+    db = FakeEntryDB()
+    gwq._write_batch = db.write_batch
+
+    # ── Append ────────────────────────────────────────────────────────────
+    write_ids = []
+    for i in range(ARRIVALS_PER_TOURIST):
+        for user_id in TOURISTS:
+            write_ids.append(gwq.enqueue_gate_entry({
+                "user_id": user_id, "event_id": 1, "entry_date": TODAY,
+                "arrival_time": f"2026-03-01T{8 + i // 60:02d}:{i % 60:02d}:00+00:00",
+                "approved_by_uid": None, "metadata": {"short_code": f"S{user_id}"},
+            }))
+    rejected_id = gwq.enqueue_gate_entry({
+        "user_id": REJECTED_USER_ID, "event_id": 1, "entry_date": TODAY,
+        "arrival_time": "2026-03-01T12:00:00+00:00", "approved_by_uid": None, "metadata": {},
+    })
+    total = len(write_ids) + 1
+    results.append(check(f"{total} arrivals appended to the log", all(write_ids) and bool(rejected_id)))
+
+    pending = gwq.pending_entries(TOURISTS[0], 1, TODAY)
+    results.append(check(
+        f"pending_entries shows {len(pending)} logged arrivals, newest first",
+        len(pending) == ARRIVALS_PER_TOURIST and all(p["pending"] for p in pending)
+        and pending[0]["arrival_time"] > pending[-1]["arrival_time"],
+    ))
+
+    # ── Kill before commit ────────────────────────────────────────────────
+    db.hang_before_commit = True
+    await kill_mid_batch(db, 0)
+    db.hang_before_commit = False
+    results.append(check(
+        f"killed before commit: nothing written, {unacked()} entries left unacked",
+        not db.rows and unacked() == db.batch_sizes[-1],
+    ))
+
+    # ── Kill after commit, before ack ─────────────────────────────────────
+    unacked_before = unacked()
+    db.hang_after_commit = True
+    await kill_mid_batch(db, 1)
+    db.hang_after_commit = False
+    committed = len(db.rows)
+    results.append(check(
+        f"killed after commit: {committed} rows written but {unacked()} entries still unacked",
+        committed > 0 and unacked() == unacked_before + committed,
+    ))
+
+    # ── Recovery ──────────────────────────────────────────────────────────
+    gwq.GATE_WRITE_CLAIM_IDLE_MS = 0
+    duplicates_before = gwq._counters["duplicates"]
+    task = asyncio.create_task(gwq._flusher(2))
+    for _ in range(200):
+        if gwq._redis.xlen(gwq.GATE_WRITE_LOG_KEY) == 0:
+            break
+        await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    written_ids = set(db.rows)
+    results.append(check(
+        f"after replay: {len(written_ids)}/{len(write_ids)} arrivals written exactly once",
+        written_ids == set(write_ids) and all(count == 1 for count in db.inserts.values()),
+    ))
+    results.append(check(
+        f"committed-but-unacked batch replayed as {gwq._counters['duplicates'] - duplicates_before} duplicates",
+        gwq._counters["duplicates"] - duplicates_before == committed,
+    ))
+    results.append(check(
+        f"batched: {len(db.batch_sizes)} RPC calls, largest {max(db.batch_sizes)} rows",
+        max(db.batch_sizes) <= gwq.GATE_WRITE_BATCH_ROWS and len(db.batch_sizes) < total / 2,
+    ))
+    dead = gwq._redis.lrange(gwq.GATE_WRITE_DEAD_KEY, 0, -1)
+    results.append(check(
+        "rejected arrival moved to dead letters",
+        len(dead) == 1 and rejected_id in dead[0],
+    ))
+    leftover_pending = sum(len(gwq.pending_entries(user_id, 1, TODAY)) for user_id in TOURISTS)
+    results.append(check(
+        "log, unacked list and pending hashes are empty",
+        gwq._redis.xlen(gwq.GATE_WRITE_LOG_KEY) == 0 and unacked() == 0 and leftover_pending == 0,
+    ))
+
+    # ── Consumer group lost ───────────────────────────────────────────────
+    task = asyncio.create_task(gwq._flusher(3))
+    await asyncio.sleep(0.1)
+    gwq._redis.delete(gwq.GATE_WRITE_LOG_KEY)    # drops the consumer group with it
+    recreated_before = gwq._counters["group_recreated"]
+    for _ in range(100):
+        if gwq._counters["group_recreated"] > recreated_before:
+            break
+        await asyncio.sleep(0.05)
+    late_id = gwq.enqueue_gate_entry({
+        "user_id": TOURISTS[0], "event_id": 1, "entry_date": TODAY,
+        "arrival_time": "2026-03-01T18:00:00+00:00", "approved_by_uid": None, "metadata": {},
+    })
+    for _ in range(100):
+        if late_id in db.rows:
+            break
+        await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    results.append(check(
+        f"group recreated after NOGROUP ({gwq._counters['group_recreated'] - recreated_before}x), "
+        "new arrival written",
+        gwq._counters["group_recreated"] > recreated_before and late_id in db.rows,
+    ))
+
+    cleanup()
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
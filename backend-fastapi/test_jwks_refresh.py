@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test script for the non-blocking JWKS refresh (utils/supabase/auth_key.py)
+Starts a local stub JWKS server, points JWKS_URL at it and checks:
+  1. initial fetch loads the keys
+  2. key rotation: 50 concurrent requests with an unknown kid → exactly ONE refetch
+  3. a second unknown kid inside JWKS_MIN_REFETCH_SECONDS → no extra fetch
+  4. server down → stale keys keep being served
+
+Usage:
+    python test_jwks_refresh.py
+"""
+import os
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives import serialization
+from jose import jwt, jwk
+
+from fake_supabase import check
+
+# Stub server state
+STUB = {"keys": [], "hits": 0, "down": False}
+
+
+class StubJWKSHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        STUB["hits"] += 1
+        if STUB["down"]:
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = json.dumps({"keys": STUB["keys"]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), StubJWKSHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+os.environ["JWKS_URL"] = f"http://127.0.0.1:{server.server_port}/jwks.json"
+
+from utils.supabase import auth_key  # noqa: E402  (must see JWKS_URL)
+
+
+def make_key(kid: str):
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    public_jwk = jwk.construct(public_pem, "ES256").to_dict()
+    public_jwk.update({"kid": kid, "alg": "ES256", "use": "sig"})
+    return private_pem, public_jwk
+
+
+def token_for(private_pem, kid: str) -> str:
+    return jwt.encode({"sub": "stub"}, private_pem, algorithm="ES256", headers={"kid": kid})
+
+
+async def main():
+    results = []
+    auth_key.JWKS_MIN_REFETCH_SECONDS = 2
+
+    pem_a, jwk_a = make_key("key-a")
+    STUB["keys"] = [jwk_a]
+
+    # 1. Initial load
+    await auth_key.fetch_jwks()
+    key = await auth_key.get_public_key(token_for(pem_a, "key-a"))
+    results.append(check("initial fetch loads key-a", key is auth_key.PUBLIC_KEYS["key-a"] and STUB["hits"] == 1))
+
+    # 2. Rotation — many concurrent requests with a new kid share one refetch
+    await asyncio.sleep(auth_key.JWKS_MIN_REFETCH_SECONDS)
+    pem_b, jwk_b = make_key("key-b")
+    STUB["keys"] = [jwk_a, jwk_b]
+    hits_before = STUB["hits"]
+    token_b = token_for(pem_b, "key-b")
+    keys = await asyncio.gather(*(auth_key.get_public_key(token_b) for _ in range(50)))
+    results.append(check(
+        f"50 concurrent unknown-kid lookups → {STUB['hits'] - hits_before} fetch(es)",
+        STUB["hits"] - hits_before == 1 and all(k is keys[0] for k in keys),
+    ))
+
+    # 3. Unknown kid again inside the rate-limit window → rejected without fetching
+    hits_before = STUB["hits"]
+    try:
+        await auth_key.get_public_key(token_for(pem_a, "key-unknown"))
+        rejected = False
+    except Exception:
+        rejected = True
+    results.append(check("unknown kid within refetch window → no fetch", rejected and STUB["hits"] == hits_before))
+
+    # 4. Server down — stale keys still served
+    STUB["down"] = True
+    ok = await auth_key.fetch_jwks()
+    key = await auth_key.get_public_key(token_b)
+    results.append(check("JWKS server down → stale keys kept", not ok and key is auth_key.PUBLIC_KEYS["key-b"]))
+
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    server.shutdown()
+    return all(results)
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
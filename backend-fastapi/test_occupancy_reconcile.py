@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Reconciliation test for the live occupancy counters (utils/services/occupancy.py).
+
+The get_event_occupancy RPC is replaced by a stand-in that keeps scanning
+while it "reads the DB", as a busy gate would:
+  1. cold start mid-day — counters rebuilt from the RPC and stamped even
+     though arrivals / departures land during every rebuild
+  2. updates counted before the RPC's as_of are not applied twice; the ones
+     after it are replayed on top of the snapshot
+  3. drift in Redis is reported and repaired
+  4. a second rebuild of the same day while one runs is skipped
+  5. a rebuild whose marker expired is abandoned without touching the counters
+  6. outside a rebuild nothing is journaled
+
+Redis must be reachable (REDIS_HOST / REDIS_PORT).  Uses event_id -7, so it
+does not touch live counters.
+
+Usage:
+    python test_occupancy_reconcile.py
+"""
+import time
+import asyncio
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from fake_supabase import check
+from utils.services import occupancy
+
+EVENT_ID = -7
+TODAY = "2026-03-01"
+
+
+class BusyGateRPC:
+    """get_event_occupancy stand-in: `before` runs ahead of the snapshot, `after` behind it."""
+
+    def __init__(self, truth: dict):
+        self.truth = truth
+        self.before = lambda: None
+        self.after = lambda: None
+        self.calls = 0
+
+    def rpc(self, name, params):
+        return params
+
+    async def execute(self, params):
+        self.calls += 1
+        self.before()
+        await asyncio.sleep(0.01)
+        as_of = time.time()
+        await asyncio.sleep(0.01)
+        self.after()
+        return SimpleNamespace(data={**self.truth, "as_of": as_of})
+
+
+def cleanup() -> None:
+    keys = occupancy._keys(EVENT_ID, TODAY) + occupancy._rebuild_keys(EVENT_ID, TODAY)
+    occupancy._redis.delete(*keys)
+
+
+def arrive(user_id: int, members: int = 1, is_group: bool = False) -> None:
+    occupancy.record_arrival(EVENT_ID, TODAY, user_id, members, is_group, arrival_time="2026-03-01T05:00:00+00:00")
+
+
+def depart(user_id: int) -> None:
+    occupancy.record_departure(EVENT_ID, TODAY, user_id)
+
+
+async def main():
+    if not occupancy._use_redis():
+        print("❌ Redis is not reachable — this test needs a real Redis (REDIS_HOST / REDIS_PORT)")
+        return False
+
+    results = []
+    cleanup()
+    # DB: users 1, 2 (group of 4) and 3 inside; 3 has an earlier closed visit
+    truth = {
+        "entries_total": 4, "entry_types": {"qr_code_scan": 4}, "hours": {"10": 4},
+        "open": [[1, 1, 1, False], [2, 1, 4, True], [3, 1, 1, False]],
+        "visits": [[1, 1], [2, 1], [3, 2]],
+    }
+    rpc = BusyGateRPC(truth)
+    occupancy.supabaseAdmin = rpc
+    occupancy.db_execute = rpc.execute
+
+    # ── Cold start at a busy gate ─────────────────────────────────────────
+    # Arrival of 3 was committed (and is in truth) but counted just after the marker;
+    # user 4 arrives and user 1 leaves after the snapshot
+    rpc.before = lambda: arrive(3)
+    rpc.after = lambda: (arrive(4), depart(1))
+    await occupancy.reconcile_occupancy(EVENT_ID, TODAY)
+    live = occupancy.get_occupancy(EVENT_ID, TODAY)
+    results.append(check(
+        f"cold start with scans during the rebuild → stamped ({live and live['inside_registrations']} inside)",
+        live is not None,
+    ))
+    results.append(check(
+        f"snapshot + replayed journal: inside {live['inside_registrations']} registrations / "
+        f"{live['inside_members']} members, {live['entries_total']} entries",
+        live["inside_registrations"] == 3 and live["inside_members"] == 6
+        and live["groups_inside"] == 1 and live["individuals_inside"] == 2 and live["entries_total"] == 5,
+    ))
+    counts = occupancy.entry_counts(EVENT_ID, TODAY, [1, 3, 4])
+    results.append(check(f"per-user counts {counts}", counts == {1: (1, 0), 3: (2, 1), 4: (1, 1)}))
+    keys = occupancy._keys(EVENT_ID, TODAY)
+    results.append(check(
+        "marker, journal and rebuild keys are gone",
+        not occupancy._redis.exists(keys[5], keys[6], *occupancy._rebuild_keys(EVENT_ID, TODAY)),
+    ))
+
+    # ── Drift ─────────────────────────────────────────────────────────────
+    rpc.before = rpc.after = lambda: None
+    occupancy._redis.hset(keys[0], "inside_members", 40)
+    truth.update(open=[[2, 1, 4, True], [3, 1, 1, False], [4, 1, 1, False]],
+                 visits=[[1, 1], [2, 1], [3, 2], [4, 1]], entries_total=5, hours={"10": 5},
+                 entry_types={"qr_code_scan": 5})
+    drift = await occupancy.reconcile_occupancy(EVENT_ID, TODAY)
+    results.append(check(f"drift repaired: {drift}", drift == {"inside_members": {"redis": 40, "db": 6}}))
+
+    # ── Concurrent rebuild ────────────────────────────────────────────────
+    nested = {}
+
+    async def nested_reconcile():
+        nested["drift"] = await occupancy.reconcile_occupancy(EVENT_ID, TODAY)
+
+    rpc.before = lambda: nested.setdefault("task", asyncio.ensure_future(nested_reconcile()))
+    calls_before = rpc.calls
+    await occupancy.reconcile_occupancy(EVENT_ID, TODAY)
+    await nested["task"]
+    results.append(check(
+        "second rebuild while one runs → skipped",
+        rpc.calls == calls_before + 1 and nested["drift"] == {} and occupancy._counters["reconcile_busy"] >= 1,
+    ))
+
+    # ── Marker expired ────────────────────────────────────────────────────
+    occupancy._redis.hset(keys[0], "inside_members", 99)
+    rpc.before = lambda: occupancy._redis.delete(keys[5])
+    drift = await occupancy.reconcile_occupancy(EVENT_ID, TODAY)
+    results.append(check(
+        "marker expired during the rebuild → abandoned, counters untouched",
+        drift == {} and occupancy._redis.hget(keys[0], "inside_members") == "99"
+        and not occupancy._redis.exists(*occupancy._rebuild_keys(EVENT_ID, TODAY)),
+    ))
+
+    # ── No rebuild running ────────────────────────────────────────────────
+    arrive(5)
+    depart(5)
+    results.append(check("outside a rebuild nothing is journaled", not occupancy._redis.exists(keys[6])))
+
+    cleanup()
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
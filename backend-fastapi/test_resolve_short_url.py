@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test for GET /tourists/short/{short_code} (resolve_short_url).
+
+  1. index hit   — the Redis short_code index has the token: no DB query,
+                   card URLs + created_at come from the index entry
+  2. index miss  — short_links is queried and created_at returned
+  3. unknown code → 404
+
+lookup_short_code / supabaseAdmin / db_execute are replaced by in-memory
+stand-ins, so neither Redis nor a database is needed.
+
+Usage:
+    python test_resolve_short_url.py
+"""
+import asyncio
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from fastapi import HTTPException
+
+from fake_supabase import FakeDB, check, use_fake_db
+from utils.services.jwt_file_token import generate_card_token
+from routes import tourist_route
+
+CREATED_AT = "2026-03-01T09:15:00+00:00"
+
+
+async def main():
+    results = []
+    token = generate_card_token(user_id=42, user_name="Asha", event_name="Expo", valid_dates="2026-03-01")
+    db = FakeDB({"short_links": [{"short_code": "abc1234", "token": token, "created_at": CREATED_AT}]})
+    use_fake_db(db, tourist_route)
+    tourist_route.index_short_code = lambda *_, **__: None
+
+    # Index hit — hash fields as Redis returns them (strings, ints converted)
+    tourist_route.lookup_short_code = lambda code, require=(): {
+        "user_id": 42, "token": token, "created_at": CREATED_AT,
+    }
+    resp = await tourist_route.resolve_short_url("abc1234")
+    results.append(check(
+        f"index hit → user {resp['user_id']}, created_at {resp['created_at']}, {len(db.queries)} DB queries",
+        resp["user_id"] == 42 and resp["card_urls"]["preview"] == f"/tourists/visitor-card/{token}"
+        and resp["created_at"] == CREATED_AT and not db.queries,
+    ))
+
+    # Index hit for an entry written at registration (no created_at yet)
+    tourist_route.lookup_short_code = lambda code, require=(): {"user_id": 42, "token": token}
+    resp = await tourist_route.resolve_short_url("abc1234")
+    results.append(check("index hit without created_at → created_at None", resp["created_at"] is None))
+
+    # Index miss — short_links
+    tourist_route.lookup_short_code = lambda code, require=(): None
+    resp = await tourist_route.resolve_short_url("abc1234")
+    results.append(check(
+        f"index miss → short_links ({len(db.queries)} query), created_at {resp['created_at']}",
+        db.queries == ["short_links"] and resp["created_at"] == CREATED_AT and resp["user_name"] == "Asha",
+    ))
+
+    try:
+        await tourist_route.resolve_short_url("nope123")
+        status_code = 200
+    except HTTPException as e:
+        status_code = e.status_code
+    results.append(check(f"unknown code → {status_code}", status_code == 404))
+
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
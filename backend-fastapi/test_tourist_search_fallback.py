@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test for the DB side of the tourist search (utils/services/tourist_search.py).
+
+  1. phone prefix  — a numeric range on tourists.phone (bare and 91-prefixed),
+                     not an exact match on the last 10 digits
+  2. short code    — prefix match on tourist_meta.qr_code, scoped to the event
+  3. names         — '%' / '_' in q match literally (escaped before ILIKE)
+  4. short_code    — returned for every result
+  5. lazy loading  — the first search of an unindexed event starts loading it;
+                     once loaded the same query is served from the index
+  6. missed rows   — a registration that never reached this worker's index:
+                     the route falls back to the DB when the index has no hits,
+                     and the catch-up adds it to the index
+
+supabaseAdmin / db_execute are replaced by an in-memory stand-in that applies
+the filters, so no database is needed.
+
+Usage:
+    python test_tourist_search_fallback.py
+"""
+import asyncio
+
+from fake_supabase import FakeDB, check, use_fake_db
+from utils.services import tourist_search as ts
+from routes import tourist_route
+
+EVENT_ID, OTHER_EVENT_ID = 7, 8
+
+TOURISTS = [
+    {"user_id": 1, "registered_event_id": EVENT_ID, "name": "Ravi Kumar", "phone": 9876543210},
+    {"user_id": 2, "registered_event_id": EVENT_ID, "name": "Priya 100%", "phone": 919876512345},
+    {"user_id": 3, "registered_event_id": EVENT_ID, "name": "Priya 1000", "phone": 9123456789},
+    {"user_id": 4, "registered_event_id": EVENT_ID, "name": "Anita_Das", "phone": 9000000001},
+    {"user_id": 5, "registered_event_id": EVENT_ID, "name": "AnitaXDas", "phone": 9000000002},
+    {"user_id": 6, "registered_event_id": OTHER_EVENT_ID, "name": "Ravi Other", "phone": 9876549999},
+]
+for t in TOURISTS:
+    t.update(valid_date="2026-03-01", is_group=False, group_count=1)
+META = [{"user_id": t["user_id"], "qr_code": code}
+        for t, code in zip(TOURISTS, ["k3ZpQ9a", "k3Zxx01", "Ab12345", "Zz00000", "Yy11111", "k3Zother"])]
+
+
+def ids(results):
+    return [r["user_id"] for r in results]
+
+
+async def main():
+    results = []
+    use_fake_db(FakeDB({"tourists": TOURISTS, "tourist_meta": META}), ts)
+
+    found = await ts.search_tourists_db(EVENT_ID, "98765", 20)
+    results.append(check(f"phone prefix 98765 → {ids(found)}",
+                         ids(found) == [2, 1] and all(r["matched"] == "phone" for r in found)))
+
+    found = await ts.search_tourists_db(EVENT_ID, "+91 91234", 20)
+    results.append(check(f"+91 phone prefix → {ids(found)}", ids(found) == [3]))
+
+    found = await ts.search_tourists_db(EVENT_ID, "k3Z", 20)
+    results.append(check(f"short-code prefix k3Z → {ids(found)} (other event excluded)",
+                         ids(found) == [2, 1] and all(r["matched"] == "short_code" for r in found)))
+
+    found = await ts.search_tourists_db(EVENT_ID, "iya 100%", 20)
+    results.append(check(f"'iya 100%' matches literally → {ids(found)}", ids(found) == [2]))
+
+    found = await ts.search_tourists_db(EVENT_ID, "anita_", 20)
+    results.append(check(f"'anita_' matches literally → {ids(found)}", ids(found) == [4]))
+
+    found = await ts.search_tourists_db(EVENT_ID, "ravi", 20)
+    results.append(check(f"name + short_code returned → {found}",
+                         ids(found) == [1] and found[0]["short_code"] == "k3ZpQ9a"))
+
+    # Lazy load: the event is not indexed → DB now, index afterwards
+    ts._indexes.clear()
+    first = ts.search_tourists(EVENT_ID, "ravi")
+    loading = ts._loading.get(EVENT_ID)
+    results.append(check("first search of an unindexed event → None, load started",
+                         first is None and loading is not None))
+    await loading
+    again = ts.search_tourists(EVENT_ID, "ravi")
+    results.append(check(f"after the load → served from the index {again}",
+                         again is not None and ids(again) == [1] and again[0]["short_code"] == "k3ZpQ9a"))
+
+    # A registration made on another worker while pub/sub was down
+    TOURISTS.append({"user_id": 9, "registered_event_id": EVENT_ID, "name": "Meena Iyer", "phone": 9555512345,
+                     "valid_date": "2026-03-01", "is_group": False, "group_count": 1})
+    META.append({"user_id": 9, "qr_code": "Mm99999"})
+    resp = await tourist_route.search_event_tourists(EVENT_ID, "meena", 20, user={})
+    results.append(check(f"missed by the index → route falls back to the DB ({resp['source']}, {ids(resp['results'])})",
+                         resp["source"] == "db" and ids(resp["results"]) == [9]))
+    added = await ts._catch_up()
+    again = ts.search_tourists(EVENT_ID, "meena")
+    results.append(check(f"catch-up indexed {added} missed row(s) → {ids(again or [])}",
+                         added == 1 and ids(again or []) == [9]))
+    results.append(check("catch-up again → nothing new", await ts._catch_up() == 0))
+
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,18 @@
+"""
+Latency summaries for the /debug/* metrics of the background queues
+(card_render_queue, gate_write_queue) — samples are milliseconds.
+"""
+from typing import Iterable
+
+
+def latency_summary(samples: Iterable[float]) -> dict:
+    """{samples, avg_ms, p95_ms, max_ms} — None values when there are no samples."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"samples": 0, "avg_ms": None, "p95_ms": None, "max_ms": None}
+    return {
+        "samples": len(ordered),
+        "avg_ms":  round(sum(ordered) / len(ordered), 1),
+        "p95_ms":  round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+        "max_ms":  round(ordered[-1], 1),
+    }
@@ -0,0 +1,280 @@
+"""
+Push feed for the admin analytics dashboard — deltas instead of polling.
+
+Import:
+    from utils.services.analytics_feed import (
+        add_client, remove_client, shared_snapshot, resync_wait, run_analytics_feed,
+    )
+
+Every open dashboard used to poll GET /analytics/event/{id}, and every poll
+ran the full get_event_analytics RPC.  Dashboards now hold a WebSocket
+(WS /analytics/ws/{event_id}, routes/analytics_route.py) and this module
+pushes to them:
+
+  • snapshot — the full analytics payload, sent on connect / resync and
+    re-sent every ANALYTICS_FEED_SNAPSHOT_SECONDS to resync the sections
+    deltas don't cover.  It is built at most once per
+    ANALYTICS_FEED_SNAPSHOT_SECONDS per event and shared by all of its
+    dashboards (crowd_status is refreshed from the counters when served);
+    a client may ask for a resync once per ANALYTICS_FEED_RESYNC_SECONDS
+  • delta    — every ANALYTICS_FEED_FLUSH_MS: the entries / departures
+    published by the occupancy counters (utils/services/occupancy.py) since
+    the last flush, the live crowd_status and any capacity alert raised
+
+Deltas arrive on the OCCUPANCY_FEED_CHANNEL pub/sub channel, so a scan
+handled by any worker reaches dashboards connected to every worker.  Each
+message is encoded once per event and sent to its clients, so the cost is
+O(events) per tick instead of O(dashboards × polls).  Without Redis there
+are no deltas and dashboards only get the periodic snapshots.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from fastapi import WebSocket
+
+from utils.services.event_cache import get_event
+from utils.services.occupancy import OCCUPANCY_FEED_CHANNEL, get_occupancy, occupancy_crowd_status
+from utils.services.redis_client import redis_client as _redis, redis_ok as _redis_ok
+from utils.india_time import india_today_str
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+ANALYTICS_FEED_FLUSH_MS         = int(os.getenv("ANALYTICS_FEED_FLUSH_MS",         "1000"))
+ANALYTICS_FEED_SNAPSHOT_SECONDS = int(os.getenv("ANALYTICS_FEED_SNAPSHOT_SECONDS", "60"))
+ANALYTICS_FEED_MAX_ITEMS        = int(os.getenv("ANALYTICS_FEED_MAX_ITEMS",        "50"))
+ANALYTICS_FEED_SEND_TIMEOUT     = float(os.getenv("ANALYTICS_FEED_SEND_TIMEOUT",   "5"))
+ANALYTICS_FEED_RESYNC_SECONDS   = float(os.getenv("ANALYTICS_FEED_RESYNC_SECONDS", "10"))
+
+# Capacity alerts fire when capacity_status escalates — same thresholds / shape as the RPC
+_ALERT_LEVELS = {"high": ("capacity_high", "warning", "High"), "critical": ("capacity_critical", "critical", "Critical")}
+_SEVERITY_ORDER = ["unknown", "low", "moderate", "high", "critical"]
+
+# ─── In-memory state (per worker) ─────────────────────────────────────────────
+_clients:  dict[int, set[WebSocket]] = {}   # event_id → dashboards on this worker
+_deltas:   dict[int, list]           = {}   # event_id → deltas since the last flush
+_capacity: dict[int, str]            = {}   # event_id → last capacity_status pushed
+_snapshot_at: dict[int, float]       = {}   # event_id → time of the last snapshot push
+_snapshots: dict[int, tuple]         = {}   # event_id → (built_at, snapshot) shared by its dashboards
+_snapshot_locks: dict[int, asyncio.Lock] = {}
+_resync_at: dict[WebSocket, float]   = {}   # dashboard → time of its last resync
+
+_counters = {
+    "deltas_received": 0, "messages_sent": 0, "snapshots_built": 0, "snapshots_shared": 0,
+    "resyncs_throttled": 0, "send_errors": 0,
+}
+
+
+def _use_redis() -> bool:
+    return bool(_redis_ok and _redis)
+
+
+# ─── Clients ──────────────────────────────────────────────────────────────────
+def add_client(event_id: int, ws: WebSocket) -> None:
+    """Subscribe a dashboard — call before sending its initial snapshot, so no delta is missed."""
+    _clients.setdefault(event_id, set()).add(ws)
+    _snapshot_at.setdefault(event_id, time.monotonic())
+
+
+def remove_client(event_id: int, ws: WebSocket) -> None:
+    _resync_at.pop(ws, None)
+    clients = _clients.get(event_id)
+    if clients is None:
+        return
+    clients.discard(ws)
+    if not clients:
+        for state in (_clients, _deltas, _capacity, _snapshot_at):
+            state.pop(event_id, None)
+
+
+async def _send(event_id: int, payload: dict) -> None:
+    """Encode once, send to every dashboard of the event; drop the ones that fail."""
+    clients = list(_clients.get(event_id, ()))
+    if not clients:
+        return
+    msg = json.dumps(payload, default=str)
+
+    async def _one(ws: WebSocket) -> Optional[WebSocket]:
+        try:
+            await asyncio.wait_for(ws.send_text(msg), timeout=ANALYTICS_FEED_SEND_TIMEOUT)
+            return None
+        except Exception:
+            return ws
+
+    dead = [ws for ws in await asyncio.gather(*(_one(ws) for ws in clients)) if ws is not None]
+    _counters["messages_sent"] += len(clients) - len(dead)
+    _counters["send_errors"] += len(dead)
+    for ws in dead:
+        remove_client(event_id, ws)
+
+
+# ─── Snapshots ────────────────────────────────────────────────────────────────
+def _capacity_status(snapshot: dict) -> str:
+    return (snapshot.get("crowd_status") or {}).get("capacity_status") or "unknown"
+
+
+async def _build(event_id: int, build_snapshot: Callable[[int], Awaitable[dict]]) -> dict:
+    lock = _snapshot_locks.setdefault(event_id, asyncio.Lock())
+    async with lock:
+        cached = _snapshots.get(event_id)
+        if cached and time.monotonic() - cached[0] < ANALYTICS_FEED_SNAPSHOT_SECONDS:
+            return cached[1]   # built by a concurrent caller while this one waited
+        snapshot = await build_snapshot(event_id)
+        _counters["snapshots_built"] += 1
+        _snapshots[event_id] = (time.monotonic(), snapshot)
+        _capacity.setdefault(event_id, _capacity_status(snapshot))
+        return snapshot
+
+
+def _with_live_crowd(event_id: int, snapshot: dict) -> dict:
+    """The shared snapshot with crowd_status / still_inside from the occupancy counters."""
+    live = get_occupancy(event_id, india_today_str())
+    if not live:
+        return snapshot
+    crowd_status = occupancy_crowd_status(live, (snapshot.get("event_info") or {}).get("max_capacity"))
+    today_summary = {**(snapshot.get("today_summary") or {}), "still_inside": live["inside_registrations"]}
+    return {**snapshot, "crowd_status": crowd_status, "today_summary": today_summary}
+
+
+async def shared_snapshot(event_id: int, build_snapshot: Callable[[int], Awaitable[dict]]) -> dict:
+    """
+    Snapshot for a connecting / resyncing dashboard — the event's shared one
+    while it is younger than ANALYTICS_FEED_SNAPSHOT_SECONDS, else rebuilt once.
+    """
+    cached = _snapshots.get(event_id)
+    if cached and time.monotonic() - cached[0] < ANALYTICS_FEED_SNAPSHOT_SECONDS:
+        _counters["snapshots_shared"] += 1
+        return _with_live_crowd(event_id, cached[1])
+    return await _build(event_id, build_snapshot)
+
+
+def resync_wait(ws: WebSocket) -> float:
+    """Seconds until this dashboard may resync again (0 = now; the resync is counted)."""
+    now = time.monotonic()
+    wait = _resync_at.get(ws, float("-inf")) + ANALYTICS_FEED_RESYNC_SECONDS - now
+    if wait > 0:
+        _counters["resyncs_throttled"] += 1
+        return round(wait, 1)
+    _resync_at[ws] = now
+    return 0.0
+
+
+# ─── Deltas ───────────────────────────────────────────────────────────────────
+
+def _alerts(event_id: int, crowd_status: dict) -> list:
+    """A capacity alert when the status escalates to high / critical since the last push."""
+    current = crowd_status.get("capacity_status") or "unknown"
+    previous = _capacity.get(event_id, "unknown")
+    _capacity[event_id] = current
+    if current not in _ALERT_LEVELS or _SEVERITY_ORDER.index(current) <= _SEVERITY_ORDER.index(previous):
+        return []
+    alert_type, severity, label = _ALERT_LEVELS[current]
+    pct = crowd_status.get("capacity_percentage")
+    return [{
+        "type": alert_type, "severity": severity,
+        "message": f"Capacity at {pct}% – {label}",
+        "data": {"current": crowd_status.get("total_people_inside"), "max": crowd_status.get("max_capacity"), "percentage": pct},
+    }]
+
+
+async def _flush_deltas(event_id: int, today: str) -> None:
+    deltas = _deltas.pop(event_id, None)
+    if not deltas:
+        return
+    entries = [d for d in deltas if d.get("kind") == "entry"]
+    departures = [d for d in deltas if d.get("kind") == "departure"]
+    payload = {
+        "type":             "delta",
+        "event_id":         event_id,
+        "date":             today,
+        "entries_count":    len(entries),
+        "departures_count": len(departures),
+        "entries":          entries[-ANALYTICS_FEED_MAX_ITEMS:],
+        "departures":       departures[-ANALYTICS_FEED_MAX_ITEMS:],
+        "crowd_status":     None,
+        "total_entries":    None,
+        "alerts":           [],
+    }
+    live = get_occupancy(event_id, today)
+    if live:
+        event = await get_event(event_id) or {}
+        crowd_status = occupancy_crowd_status(live, event.get("max_capacity"))
+        payload["crowd_status"] = crowd_status
+        payload["total_entries"] = live["entries_total"]
+        payload["alerts"] = _alerts(event_id, {**crowd_status, "max_capacity": event.get("max_capacity")})
+    await _send(event_id, payload)
+
+
+async def _listen() -> None:
+    """Collect occupancy deltas for events that have a dashboard on this worker."""
+    while True:
+        pubsub = None
+        try:
+            pubsub = _redis.pubsub(ignore_subscribe_messages=True)
+            await asyncio.to_thread(pubsub.subscribe, OCCUPANCY_FEED_CHANNEL)
+            logging.info("[AnalyticsFeed] Listening on '%s'", OCCUPANCY_FEED_CHANNEL)
+            while True:
+                msg = await asyncio.to_thread(pubsub.get_message, timeout=1.0)
+                if not msg:
+                    continue
+                try:
+                    delta = json.loads(msg.get("data"))
+                    event_id = int(delta["event_id"])
+                except (TypeError, ValueError, KeyError):
+                    continue
+                if event_id in _clients:
+                    _counters["deltas_received"] += 1
+                    _deltas.setdefault(event_id, []).append(delta)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.warning("[AnalyticsFeed] Listener error, reconnecting in 5s: %s", e)
+            await asyncio.sleep(5)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+async def _flush_loop(build_snapshot: Callable[[int], Awaitable[dict]]) -> None:
+    while True:
+        await asyncio.sleep(ANALYTICS_FEED_FLUSH_MS / 1000)
+        today = india_today_str()
+        for event_id in list(_clients):
+            try:
+                await _flush_deltas(event_id, today)
+                if time.monotonic() - _snapshot_at.get(event_id, 0) >= ANALYTICS_FEED_SNAPSHOT_SECONDS:
+                    _snapshot_at[event_id] = time.monotonic()
+                    snapshot = _with_live_crowd(event_id, await _build(event_id, build_snapshot))
+                    _capacity[event_id] = _capacity_status(snapshot)
+                    await _send(event_id, {"type": "snapshot", "event_id": event_id, "data": snapshot})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning("[AnalyticsFeed] Push failed for event_id=%s: %s", event_id, e)
+
+
+async def run_analytics_feed(build_snapshot: Callable[[int], Awaitable[dict]]) -> None:
+    """
+    Background coroutine — call once at startup with asyncio.create_task().
+    build_snapshot(event_id) returns today's full analytics payload.
+    """
+    if not _use_redis():
+        logging.info("[AnalyticsFeed] Redis unavailable — dashboards get periodic snapshots only")
+        await _flush_loop(build_snapshot)
+        return
+    await asyncio.gather(_listen(), _flush_loop(build_snapshot))
+
+
+def stats() -> dict:
+    return {
+        "backend": "redis" if _use_redis() else "snapshots-only",
+        "clients": {event_id: len(clients) for event_id, clients in _clients.items()},
+        "buffered_deltas": sum(len(d) for d in _deltas.values()),
+        **_counters,
+    }
@@ -0,0 +1,97 @@
+"""
+Per-request batched loaders (DataLoader pattern) — one query instead of N+1.
+
+Import:
+    from utils.services.batch_loader import BatchLoader, entry_items_loader
+
+get_entry_history fetched the entry_items of each entry_record with its own
+query inside a loop — 10 days of history meant 11 serial round-trips.  A
+loader collects every key requested in the same event-loop tick and resolves
+them with one batch call:
+
+    loader = entry_items_loader()                        # one per request
+    items  = await loader.load_many(record_ids)          # 1 query, any N
+    items  = await loader.load(record_id)                # cached after that
+
+Keys are de-duplicated and cached for the loader's lifetime, so create a
+fresh loader per request (never share one across requests).  Large key sets
+are split into chunks of BATCH_LOADER_MAX_KEYS to keep the in_() URL short.
+`queries` counts the batch calls made — the tests assert on it.
+"""
+
+import os
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+BATCH_LOADER_MAX_KEYS = int(os.getenv("BATCH_LOADER_MAX_KEYS", "200"))
+
+
+class BatchLoader:
+    """
+    batch_fn(keys) → {key: value}; keys missing from the result resolve to
+    default() (e.g. list for "no rows").
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list], Awaitable[dict]],
+        default: Callable[[], Any] = lambda: None,
+        max_keys: int = BATCH_LOADER_MAX_KEYS,
+    ):
+        self._batch_fn = batch_fn
+        self._default = default
+        self._max_keys = max(1, max_keys)
+        self._futures: dict[Hashable, asyncio.Future] = {}
+        self._queue: list = []
+        self.queries = 0
+
+    def load(self, key: Hashable) -> Awaitable:
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[key] = loop.create_future()
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                # Dispatch after every load() of the current tick has been queued
+                loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+        return future
+
+    async def load_many(self, keys: Iterable[Hashable]) -> list:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    async def _dispatch(self) -> None:
+        keys, self._queue = self._queue, []
+        for start in range(0, len(keys), self._max_keys):
+            chunk = keys[start:start + self._max_keys]
+            self.queries += 1
+            try:
+                results = await self._batch_fn(chunk)
+            except Exception as e:
+                for key in chunk:
+                    # Not cached — a later load() retries
+                    self._futures.pop(key).set_exception(e)
+                continue
+            for key in chunk:
+                self._futures[key].set_result(results[key] if key in results else self._default())
+
+
+def entry_items_loader(descending: bool = True) -> BatchLoader:
+    """record_id → its entry_items, ordered by arrival_time (newest first by default)."""
+
+    async def _fetch(record_ids: list) -> dict:
+        resp = await db_execute(
+            supabaseAdmin.table("entry_items")
+            .select("*")
+            .in_("record_id", record_ids)
+            .order("arrival_time", desc=descending)
+        )
+        items_by_record: dict = {}
+        for item in resp.data or []:
+            items_by_record.setdefault(item["record_id"], []).append(item)
+        return items_by_record
+
+    return BatchLoader(_fetch, default=list)
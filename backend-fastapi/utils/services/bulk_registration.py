@@ -0,0 +1,262 @@
+"""
+Manifest parsing + up-front validation for bulk tourist registration
+(POST /tourists/register/bulk).
+
+Import:
+    from utils.services.bulk_registration import (
+        parse_manifest, PhotoArchive, validate_manifest, find_registered_phones,
+        BULK_REGISTER_CHUNK_SIZE,
+    )
+
+Schools and tour operators register 50–300 people at once.  Through
+/tourists/register that was one request per person, each with its own event
+lookup, inserts, short-code uniqueness query and SMS task.  The bulk route
+takes one manifest + one zip of photos instead:
+
+    manifest (CSV with a header row, or JSON — a list of objects or
+    {"tourists": [...]}) with the /register form fields per row:
+
+        name, phone, unique_id_type, unique_id, is_group, group_count,
+        valid_date, image, unique_id_photo
+
+    image / unique_id_photo are file names inside the photos zip (folders
+    inside the zip are ignored — names are matched on the base name).
+
+Every row is validated before anything is written — same rules as
+register_tourist, plus duplicate phones within the manifest and phones
+already registered for that date — so a bad manifest is rejected as a whole
+with the errors of every row, and the operator fixes and re-sends it.
+"""
+
+import os
+import csv
+import json
+import zipfile
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, status, UploadFile
+
+from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
+from utils.models.api_models import Tourist
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+BULK_REGISTER_MAX_ROWS      = int(os.getenv("BULK_REGISTER_MAX_ROWS",      "500"))
+BULK_REGISTER_CHUNK_SIZE    = int(os.getenv("BULK_REGISTER_CHUNK_SIZE",    "100"))
+BULK_REGISTER_MAX_PHOTO_MB  = int(os.getenv("BULK_REGISTER_MAX_PHOTO_MB",  "10"))
+BULK_REGISTER_MAX_ZIP_MB    = int(os.getenv("BULK_REGISTER_MAX_ZIP_MB",    "500"))
+
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+_TRUE  = ("true", "1", "yes", "y")
+_FALSE = ("false", "0", "no", "n", "")
+_LOOKUP_CHUNK = 200
+
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status.HTTP_400_BAD_REQUEST, detail)
+
+
+# ─── Manifest ─────────────────────────────────────────────────────────────────
+def parse_manifest(filename: str, data: bytes) -> list:
+    """CSV or JSON manifest → list of row dicts (values as given).  400 when unreadable."""
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise _bad_request("Manifest must be UTF-8 encoded")
+
+    is_json = (filename or "").lower().endswith(".json") or text.lstrip()[:1] in ("[", "{")
+    if is_json:
+        try:
+            rows = json.loads(text)
+        except ValueError as e:
+            raise _bad_request(f"Invalid JSON manifest: {e}")
+        if isinstance(rows, dict):
+            rows = rows.get("tourists")
+        if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+            raise _bad_request('JSON manifest must be a list of objects or {"tourists": [...]}')
+    else:
+        reader = csv.DictReader(text.splitlines())
+        if not reader.fieldnames:
+            raise _bad_request("CSV manifest needs a header row")
+        rows = [
+            {(k or "").strip().lower(): (v.strip() if isinstance(v, str) else v) for k, v in row.items()}
+            for row in reader
+            if any((v or "").strip() for v in row.values() if isinstance(v, str))
+        ]
+
+    if not rows:
+        raise _bad_request("Manifest has no rows")
+    if len(rows) > BULK_REGISTER_MAX_ROWS:
+        raise _bad_request(f"Manifest has {len(rows)} rows; at most {BULK_REGISTER_MAX_ROWS} per request")
+    return rows
+
+
+# ─── Photos ───────────────────────────────────────────────────────────────────
+class PhotoArchive:
+    """Zip of photos, read member by member (the upload is never loaded whole)."""
+
+    def __init__(self, upload: Optional[UploadFile]):
+        self._zip = None
+        self._members: dict[str, zipfile.ZipInfo] = {}
+        if upload is None:
+            return
+        try:
+            self._zip = zipfile.ZipFile(upload.file)
+        except zipfile.BadZipFile:
+            raise _bad_request("photos must be a .zip archive")
+
+        total = 0
+        for info in self._zip.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or info.filename.startswith("__MACOSX/") or name.startswith("."):
+                continue
+            total += info.file_size
+            self._members.setdefault(name, info)
+        if total > BULK_REGISTER_MAX_ZIP_MB * 1024 * 1024:
+            raise _bad_request(f"photos archive expands to more than {BULK_REGISTER_MAX_ZIP_MB} MB")
+
+    def check(self, name: str) -> Optional[str]:
+        """Error message for a referenced photo, or None when it is usable."""
+        info = self._members.get(os.path.basename(name))
+        if info is None:
+            return f"'{name}' not found in photos archive"
+        if not name.lower().endswith(PHOTO_EXTENSIONS):
+            return f"'{name}' must be one of {', '.join(PHOTO_EXTENSIONS)}"
+        if info.file_size == 0:
+            return f"'{name}' is empty"
+        if info.file_size > BULK_REGISTER_MAX_PHOTO_MB * 1024 * 1024:
+            return f"'{name}' is larger than {BULK_REGISTER_MAX_PHOTO_MB} MB"
+        return None
+
+    def read(self, name: str) -> bytes:
+        return self._zip.read(self._members[os.path.basename(name)])
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+
+
+# ─── Validation ───────────────────────────────────────────────────────────────
+def _text(row: dict, field: str) -> str:
+    value = row.get(field)
+    return "" if value is None else str(value).strip()
+
+
+def _validate_row(row: dict, photos: PhotoArchive, event_id: int, default_valid_date: Optional[str]) -> tuple:
+    """One manifest row → (registration dict, errors).  Mirrors register_tourist's checks."""
+    errors = []
+    name, phone = _text(row, "name"), _text(row, "phone")
+    if not name:
+        errors.append("name is required")
+    if not phone:
+        errors.append("phone is required")
+
+    valid_date = _text(row, "valid_date") or default_valid_date
+    if not valid_date:
+        errors.append("valid_date is required (column or form field)")
+    else:
+        try:
+            valid_date = datetime.strptime(valid_date, "%Y-%m-%d").date().isoformat()
+        except ValueError:
+            errors.append("Invalid date format for valid_date. Use YYYY-MM-DD.")
+
+    raw_group = row.get("is_group")
+    is_group = raw_group if isinstance(raw_group, bool) else _text(row, "is_group").lower()
+    if not isinstance(is_group, bool):
+        if is_group not in _TRUE + _FALSE:
+            errors.append("is_group must be true or false")
+        is_group = is_group in _TRUE
+
+    group_count = 1
+    if is_group:
+        try:
+            group_count = int(_text(row, "group_count") or 0)
+        except ValueError:
+            group_count = 0
+        if group_count < 2:
+            errors.append("group_count must be ≥ 2 for groups")
+
+    unique_id_type, unique_id = _text(row, "unique_id_type"), _text(row, "unique_id")
+    has_text_id = bool(unique_id_type and unique_id)
+    id_photo = _text(row, "unique_id_photo")
+    if not has_text_id and not id_photo:
+        errors.append("Either provide unique_id_type + unique_id (text) OR a unique_id_photo")
+    elif id_photo and not has_text_id:
+        photo_error = photos.check(id_photo)
+        if photo_error:
+            errors.append(f"unique_id_photo: {photo_error}")
+
+    image = _text(row, "image")
+    if not image:
+        errors.append("image (profile photo file name) is required")
+    else:
+        photo_error = photos.check(image)
+        if photo_error:
+            errors.append(f"image: {photo_error}")
+
+    if errors:
+        return None, errors
+
+    registration = Tourist(
+        name=name,
+        phone=phone,
+        unique_id_type=unique_id_type if has_text_id else None,
+        unique_id=unique_id if has_text_id else None,
+        is_group=is_group,
+        group_count=group_count,
+        registered_event_id=event_id,
+        valid_date=valid_date,
+    )
+    reg_dict = registration.dict(exclude={"user_id"})
+    reg_dict["valid_date"] = valid_date
+    return {
+        "tourist": reg_dict,
+        "image": image,
+        "unique_id_photo": None if has_text_id else id_photo,
+    }, []
+
+
+def validate_manifest(rows: list, photos: PhotoArchive, event_id: int,
+                      default_valid_date: Optional[str] = None) -> tuple:
+    """
+    → (registrations, errors).  registrations keep manifest order and carry
+    their 1-based "row"; errors is [{"row", "errors": [...]}] — empty when the
+    whole manifest can be registered.
+    """
+    registrations, errors = [], []
+    first_row_for: dict[tuple, int] = {}
+    for n, row in enumerate(rows, start=1):
+        registration, row_errors = _validate_row(row, photos, event_id, default_valid_date)
+        if registration:
+            key = (registration["tourist"]["phone"], registration["tourist"]["valid_date"])
+            if key in first_row_for:
+                row_errors.append(f"phone {key[0]} is repeated for {key[1]} (row {first_row_for[key]})")
+            else:
+                first_row_for[key] = n
+        if row_errors:
+            errors.append({"row": n, "errors": row_errors})
+        else:
+            registration["row"] = n
+            registrations.append(registration)
+    return registrations, errors
+
+
+async def find_registered_phones(registrations: list) -> set:
+    """(phone, valid_date) pairs of the manifest that are already registered — one query per chunk."""
+    wanted = {(r["tourist"]["phone"], r["tourist"]["valid_date"]) for r in registrations}
+    phones = sorted({phone for phone, _ in wanted})
+    dates = sorted({valid_date for _, valid_date in wanted})
+    found = set()
+    for start in range(0, len(phones), _LOOKUP_CHUNK):
+        resp = await db_execute(
+            supabaseAdmin.table("tourists")
+            .select("phone, valid_date")
+            .in_("phone", phones[start:start + _LOOKUP_CHUNK])
+            .in_("valid_date", dates)
+        )
+        found.update(
+            (row["phone"], str(row["valid_date"])[:10]) for row in resp.data or []
+            if (row["phone"], str(row["valid_date"])[:10]) in wanted
+        )
+    return found
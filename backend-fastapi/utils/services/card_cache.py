@@ -8,14 +8,25 @@ no more split-brain between the route and the cleaner.
 
 import os
 import time
-import glob
 import asyncio
+import hashlib
 import logging
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
 
 # ─── Config ───────────────────────────────────────────────────────────────────
 TEMP_CARD_DIR                 = "static/temp-card"
 CARD_TTL_SECONDS              = int(os.getenv("CARD_TEMP_TTL_SECONDS",          str(15 * 60)))
 CARD_CLEANUP_INTERVAL_SECONDS = int(os.getenv("CARD_CLEANUP_INTERVAL_SECONDS",  str(5  * 60)))
+CARD_CACHE_MAX_BYTES          = int(os.getenv("CARD_CACHE_MAX_MB",              "2048")) * 1024 * 1024
+CARD_CLEANUP_BATCH            = int(os.getenv("CARD_CLEANUP_BATCH",             "500"))
+CARD_ORPHAN_SWEEP_EVERY       = int(os.getenv("CARD_ORPHAN_SWEEP_EVERY",        "12"))   # cycles
+
+# Sorted set user_id → last access (unix ts); cleanup pops expired members in batches
+CARD_ACCESS_ZSET              = "card_access:lru"
 
 # ─── Redis (shared client — aliased for backward compat) ────────────────────
 from utils.services.redis_client import redis_client as card_redis, redis_ok as card_redis_ok
@@ -26,13 +37,33 @@ def card_redis_key(user_id: int) -> str:
     return f"card_temp:{user_id}"
 
 
+def card_variant_path(card_temp_path: str, fmt: str) -> str:
+    """
+    Each output format is cached as its own file next to the base PNG:
+        card_temp_34.png  → card_temp_34.webp / card_temp_34.png8.png / card_temp_34.thumb.webp
+    All variants share the user's Redis last-access key.
+    """
+    if fmt == "png":
+        return card_temp_path
+    stem = card_temp_path[:-4] if card_temp_path.endswith(".png") else card_temp_path
+    return {
+        "webp":  f"{stem}.webp",
+        "png8":  f"{stem}.png8.png",
+        "thumb": f"{stem}.thumb.webp",
+    }[fmt]
+
+
 def touch_card(user_id: int) -> None:
-    """Record current unix timestamp as last-access for this card."""
+    """Record current unix timestamp as last-access for this card (key + access index)."""
     if not card_redis_ok or not card_redis:
         return
     try:
+        now  = time.time()
+        pipe = card_redis.pipeline(transaction=False)
         # Redis TTL = file TTL + 5 min buffer so the key is never evicted before the file is cleaned up
-        card_redis.set(card_redis_key(user_id), time.time(), ex=CARD_TTL_SECONDS + 300)
+        pipe.set(card_redis_key(user_id), now, ex=CARD_TTL_SECONDS + 300)
+        pipe.zadd(CARD_ACCESS_ZSET, {str(user_id): now})
+        pipe.execute()
     except Exception:
         pass
 
@@ -54,7 +85,247 @@ def is_card_fresh(user_id: int) -> bool:
         return True
 
 
+# ─── Conditional GET (ETag / Last-Modified) ───────────────────────────────────
+# Content-hash ETags are computed once per file version (mtime + size) and kept
+# next to the freshness key in Redis (card_etag:<path>) plus a local dict, so
+# repeat views cost one os.stat() and a 304 instead of re-sending the image.
+FILE_ETAG_LOCAL_MAX = 10_000
+_etag_local: dict = {}   # path → (version, etag)
+
+
+def card_etag_redis_key(path: str) -> str:
+    return f"card_etag:{path}"
+
+
+def _hash_file(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return f'"{h.hexdigest()}"'
+
+
+def get_file_validators(path: str) -> tuple:
+    """Return (etag, last_modified_http_date, mtime) for path, hashing only on a new version."""
+    st      = os.stat(path)
+    version = f"{st.st_mtime_ns}-{st.st_size}"
+    last_modified = formatdate(st.st_mtime, usegmt=True)
+
+    hit = _etag_local.get(path)
+    if hit and hit[0] == version:
+        return hit[1], last_modified, st.st_mtime
+
+    etag = None
+    if card_redis_ok and card_redis:
+        try:
+            val = card_redis.get(card_etag_redis_key(path))
+            if val and val.startswith(version + "|"):
+                etag = val.split("|", 1)[1]
+        except Exception:
+            pass
+
+    if etag is None:
+        etag = _hash_file(path)
+        if card_redis_ok and card_redis:
+            try:
+                card_redis.set(card_etag_redis_key(path), f"{version}|{etag}", ex=CARD_TTL_SECONDS + 300)
+            except Exception:
+                pass
+
+    if len(_etag_local) >= FILE_ETAG_LOCAL_MAX:
+        _etag_local.clear()
+    _etag_local[path] = (version, etag)
+    return etag, last_modified, st.st_mtime
+
+
+def is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """RFC 9110: If-None-Match wins; If-Modified-Since only when it is absent."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def conditional_file_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    headers: Optional[dict] = None,
+) -> Response:
+    """FileResponse with ETag + Last-Modified, or an empty 304 when the client copy is current."""
+    etag, last_modified, mtime = get_file_validators(path)
+    headers = {**(headers or {}), "ETag": etag, "Last-Modified": last_modified}
+
+    if is_not_modified(request, etag, mtime):
+        # 304 carries the validators and caching headers, never the body
+        headers.pop("Content-Disposition", None)
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
 # ─── Background cleanup loop ──────────────────────────────────────────────────
+def _card_files(user_id: int) -> list:
+    """Every cached variant of this user's card (see card_variant_path)."""
+    base = f"{TEMP_CARD_DIR}/card_temp_{user_id}.png"
+    return [card_variant_path(base, fmt) for fmt in ("png", "png8", "webp", "thumb")]
+
+
+def _evict_card(user_id: int) -> int:
+    """Delete all variants + Redis state for one user. Returns bytes freed."""
+    freed, paths = 0, _card_files(user_id)
+    for path in paths:
+        _etag_local.pop(path, None)
+        try:
+            freed += os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    if card_redis_ok and card_redis:
+        try:
+            pipe = card_redis.pipeline()
+            pipe.zrem(CARD_ACCESS_ZSET, user_id)
+            pipe.delete(card_redis_key(user_id), *(card_etag_redis_key(p) for p in paths))
+            pipe.execute()
+        except Exception:
+            pass
+    return freed
+
+
+def _scan_card_files() -> list:
+    """[(path, user_id, size, mtime)] for every finished card file on disk."""
+    out = []
+    with os.scandir(TEMP_CARD_DIR) as it:
+        for entry in it:
+            name = entry.name
+            if not name.startswith("card_temp_") or name.endswith(".tmp"):
+                continue
+            uid_str = name[len("card_temp_"):].split(".", 1)[0]
+            if not uid_str.isdigit():
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            out.append((entry.path, int(uid_str), st.st_size, st.st_mtime))
+    return out
+
+
+def _cleanup_expired_redis(now: float) -> int:
+    """
+    Pop expired members from the access index in batches — O(expired) round
+    trips instead of one GET per file.  Scores are re-checked right before
+    eviction so a card touched mid-batch survives.
+    """
+    cutoff  = now - CARD_TTL_SECONDS
+    deleted = 0
+    while True:
+        uids = card_redis.zrangebyscore(CARD_ACCESS_ZSET, "-inf", cutoff, start=0, num=CARD_CLEANUP_BATCH)
+        if not uids:
+            return deleted
+
+        pipe = card_redis.pipeline()
+        for uid in uids:
+            pipe.zscore(CARD_ACCESS_ZSET, uid)
+        scores = pipe.execute()
+
+        for uid, score in zip(uids, scores):
+            if score is not None and score > cutoff:
+                continue
+            _evict_card(int(uid))
+            deleted += 1
+        if len(uids) < CARD_CLEANUP_BATCH:
+            return deleted
+
+
+def _cleanup_orphans(files: list, now: float) -> int:
+    """
+    Files with no access-index entry (index lost, cards from before the index
+    existed) are judged by mtime.  Runs every CARD_ORPHAN_SWEEP_EVERY cycles.
+    """
+    candidates = sorted({uid for _, uid, _, mtime in files if now - mtime > CARD_TTL_SECONDS})
+    if not candidates:
+        return 0
+
+    pipe = card_redis.pipeline()
+    for uid in candidates:
+        pipe.zscore(CARD_ACCESS_ZSET, uid)
+    scores = pipe.execute()
+
+    deleted = 0
+    for uid, score in zip(candidates, scores):
+        if score is None:
+            _evict_card(uid)
+            deleted += 1
+    return deleted
+
+
+def _cleanup_by_mtime(files: list, now: float) -> int:
+    """Redis unavailable: fall back to file mtime."""
+    stale = {uid for _, uid, _, mtime in files if now - mtime > CARD_TTL_SECONDS}
+    for uid in stale:
+        _evict_card(uid)
+    return len(stale)
+
+
+def _enforce_disk_cap(files: list) -> int:
+    """
+    Keep static/temp-card/ under CARD_CACHE_MAX_BYTES by evicting least
+    recently used cards (access index order, or mtime when Redis is down).
+    """
+    total = sum(f[2] for f in files)
+    if CARD_CACHE_MAX_BYTES <= 0 or total <= CARD_CACHE_MAX_BYTES:
+        return 0
+
+    on_disk = {f[1] for f in files}
+    if card_redis_ok and card_redis:
+        indexed = [int(u) for u in card_redis.zrange(CARD_ACCESS_ZSET, 0, -1)]
+        # Unindexed files are the coldest of all
+        ordered = list(on_disk - set(indexed)) + [u for u in indexed if u in on_disk]
+    else:
+        newest = {}
+        for _, uid, _, mtime in files:
+            newest[uid] = max(mtime, newest.get(uid, 0))
+        ordered = sorted(newest, key=newest.get)
+
+    evicted = 0
+    for uid in ordered:
+        if total <= CARD_CACHE_MAX_BYTES:
+            break
+        total -= _evict_card(uid)
+        evicted += 1
+    return evicted
+
+
+def _cleanup_cycle(cycle: int) -> dict:
+    os.makedirs(TEMP_CARD_DIR, exist_ok=True)
+    now    = time.time()
+    result = {"expired": 0, "orphans": 0, "over_cap": 0}
+
+    if card_redis_ok and card_redis:
+        try:
+            result["expired"] = _cleanup_expired_redis(now)
+            if cycle % CARD_ORPHAN_SWEEP_EVERY == 1:
+                result["orphans"] = _cleanup_orphans(_scan_card_files(), now)
+        except Exception as e:
+            logging.warning("[CardCleanup] Redis index unavailable, using mtime: %s", e)
+            result["expired"] = _cleanup_by_mtime(_scan_card_files(), now)
+    else:
+        result["expired"] = _cleanup_by_mtime(_scan_card_files(), now)
+
+    result["over_cap"] = _enforce_disk_cap(_scan_card_files())
+    return result
+
+
 async def run_cleanup_loop() -> None:
     """
     Background coroutine — call once at startup with asyncio.create_task().
@@ -64,54 +335,23 @@ async def run_cleanup_loop() -> None:
         makes early test runs visible without a 5-minute wait)
       • Subsequent runs: every CARD_CLEANUP_INTERVAL_SECONDS
 
-    Stale = last Redis touch older than CARD_TTL_SECONDS.
+    Stale = last access (CARD_ACCESS_ZSET score) older than CARD_TTL_SECONDS.
     Falls back to file mtime when Redis is unavailable.
+    Afterwards the directory is trimmed to CARD_CACHE_MAX_BYTES, LRU first.
     """
     logging.info(
-        "[CardCleanup] Task started — TTL=%ds  interval=%ds",
-        CARD_TTL_SECONDS, CARD_CLEANUP_INTERVAL_SECONDS,
+        "[CardCleanup] Task started — TTL=%ds  interval=%ds  cap=%dMB",
+        CARD_TTL_SECONDS, CARD_CLEANUP_INTERVAL_SECONDS, CARD_CACHE_MAX_BYTES // (1024 * 1024),
     )
 
-    first_run = True
+    cycle = 0
     while True:
         # Short initial delay so the server finishes booting before the first scan
-        await asyncio.sleep(10 if first_run else CARD_CLEANUP_INTERVAL_SECONDS)
-        first_run = False
+        await asyncio.sleep(10 if cycle == 0 else CARD_CLEANUP_INTERVAL_SECONDS)
+        cycle += 1
 
         try:
-            os.makedirs(TEMP_CARD_DIR, exist_ok=True)
-            files   = glob.glob(f"{TEMP_CARD_DIR}/card_temp_*.png")
-            deleted = 0
-            now     = time.time()
-
-            for fpath in files:
-                try:
-                    uid_str = os.path.basename(fpath).replace("card_temp_", "").replace(".png", "")
-                    if not uid_str.isdigit():
-                        continue
-                    uid = int(uid_str)
-
-                    if card_redis_ok and card_redis:
-                        val   = card_redis.get(card_redis_key(uid))
-                        stale = val is None or (now - float(val)) > CARD_TTL_SECONDS
-                    else:
-                        # Redis unavailable: fall back to file mtime
-                        stale = now - os.path.getmtime(fpath) > CARD_TTL_SECONDS
-
-                    if stale:
-                        os.remove(fpath)
-                        if card_redis_ok and card_redis:
-                            card_redis.delete(card_redis_key(uid))
-                        deleted += 1
-                        logging.info("[CardCleanup] Deleted stale card — user_id=%d", uid)
-
-                except Exception as _fe:
-                    logging.warning("[CardCleanup] Error processing %s: %s", fpath, _fe)
-
-            logging.info(
-                "[CardCleanup] Scan complete — %d deleted / %d total files",
-                deleted, len(files),
-            )
-
+            deleted = await asyncio.to_thread(_cleanup_cycle, cycle)
+            logging.info("[CardCleanup] Cycle %d complete — %s", cycle, deleted)
         except Exception as _ce:
             logging.error("[CardCleanup] Cycle error: %s", _ce)
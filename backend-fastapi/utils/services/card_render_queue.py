@@ -0,0 +1,272 @@
+"""
+Visitor card pre-render queue.
+
+Cards used to be rendered lazily on the first /tourists/visitor-card/{token}
+hit — i.e. exactly when the SMS lands and everyone opens their link at once.
+Registration and renewal now enqueue a render job; worker tasks (started from
+main.py) drain the queue and warm static/temp-card/ ahead of the click.
+
+Import:
+    from utils.services.card_render_queue import get_or_render_card, enqueue_card_render
+
+Queue:
+    Redis list CARD_PRERENDER_QUEUE_KEY (LPUSH / BRPOP → FIFO), shared by all
+    uvicorn workers; CARD_PRERENDER_PENDING_KEY dedupes user_ids already queued.
+    When Redis is down jobs go to a bounded in-process asyncio.Queue instead.
+
+Metrics (GET /debug/card-render-queue):
+    queue depth, enqueued / rendered / skipped / failed counters,
+    queue wait and render latency (avg / p95 / max over the last samples).
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+
+from fastapi import HTTPException, status
+
+from utils.latency_stats import latency_summary
+from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
+from utils.services.card_cache import TEMP_CARD_DIR, touch_card, is_card_fresh, card_variant_path
+from utils.services.card_renderer import (
+    render_single_flight, render_card_file, RenderQueueFull, CARD_RENDER_RETRY_AFTER,
+)
+from utils.services.redis_client import redis_client as _redis, redis_ok as _redis_ok
+from utils.services.public_access_link_provider import generate_signed_qr_payload, SIGNED_QR_ENABLED
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+CARD_PRERENDER_WORKERS      = int(os.getenv("CARD_PRERENDER_WORKERS",      "2"))
+CARD_PRERENDER_LOCAL_MAX    = int(os.getenv("CARD_PRERENDER_LOCAL_MAX",    "1000"))
+# Variants warmed per job — WebP for phones first, PNG for everything else
+CARD_PRERENDER_FORMATS      = [f.strip() for f in os.getenv("CARD_PRERENDER_FORMATS", "webp,png").split(",") if f.strip()]
+CARD_PRERENDER_QUEUE_KEY    = "card_render:queue"
+CARD_PRERENDER_PENDING_KEY  = "card_render:pending"
+
+_LATENCY_SAMPLES = 500
+
+# In-process fallback queue (created lazily — must bind to the running loop)
+_local_queue: "asyncio.Queue | None" = None
+
+_counters = {"enqueued": 0, "deduped": 0, "dropped": 0, "rendered": 0, "skipped_fresh": 0, "failed": 0, "requeued": 0}
+_wait_ms:   deque = deque(maxlen=_LATENCY_SAMPLES)
+_render_ms: deque = deque(maxlen=_LATENCY_SAMPLES)
+
+
+def _use_redis() -> bool:
+    return bool(_redis_ok and _redis)
+
+
+def _get_local_queue() -> asyncio.Queue:
+    global _local_queue
+    if _local_queue is None:
+        _local_queue = asyncio.Queue(maxsize=CARD_PRERENDER_LOCAL_MAX)
+    return _local_queue
+
+
+# ─── Render (on-demand + pre-render share this path) ─────────────────────────
+async def get_or_render_card(user_id: int, card_temp_path: str, valid_date: str, fmt: str = "png") -> str:
+    """
+    Return a valid path to the visitor card in format fmt, using a file cache
+    under static/temp-card/ (one file per format, see card_variant_path).
+
+    Cache HIT  (file on disk + Redis says it's fresh):
+        → update last-access timestamp in Redis → return existing file path.
+
+    Cache MISS (file absent or Redis says it's stale):
+        → query tourists / tourist_meta
+        → render with VisitorCardGenerator3 in the card render process pool
+        → write to the variant path (deterministic per user_id + fmt)
+        → stamp Redis timestamp → return path.
+
+    Simultaneous misses for the same (user_id, fmt) share one in-flight render
+    (render_single_flight); a saturated pool raises RenderQueueFull → 503.
+    """
+    os.makedirs(TEMP_CARD_DIR, exist_ok=True)
+    path = card_variant_path(card_temp_path, fmt)
+
+    # ── Cache hit ──────────────────────────────────────────────────────────
+    if os.path.exists(path) and is_card_fresh(user_id):
+        touch_card(user_id)
+        return path
+
+    # ── Cache miss — one render per (user_id, fmt), shared by concurrent requests
+    return await render_single_flight(
+        (user_id, fmt), lambda: _render_user_card(user_id, path, valid_date, fmt)
+    )
+
+
+async def _render_user_card(user_id: int, card_temp_path: str, valid_date: str, fmt: str) -> str:
+    """Fetch the card fields from DB and render them off the event loop."""
+    tourist_resp = await db_execute(supabaseAdmin.table("tourists").select("*").eq("user_id", user_id).single())
+    if not tourist_resp.data:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Tourist not found")
+    tourist = tourist_resp.data
+
+    meta_resp = await db_execute(supabaseAdmin.table("tourist_meta").select("image_path, qr_code").eq("user_id", user_id))
+    meta = meta_resp.data[0] if meta_resp.data else {}
+
+    card_data = {
+        "name":               tourist.get("name", ""),
+        "phone":              tourist.get("phone", ""),
+        "profile_image_path": meta.get("image_path"),
+        "qr_data":            meta.get("qr_code") or f"TOURIST-{user_id}",
+        "valid_date":         valid_date,
+        "group_count":         tourist.get("group_count", 1),
+    }
+    if SIGNED_QR_ENABLED and tourist.get("registered_event_id") and valid_date:
+        card_data["qr_payload"] = generate_signed_qr_payload(user_id, tourist["registered_event_id"], valid_date)
+
+    await render_card_file(card_data, card_temp_path, fmt)
+    touch_card(user_id)
+    return card_temp_path
+
+
+# ─── Producer ─────────────────────────────────────────────────────────────────
+def enqueue_card_render(user_id: int, card_temp_path: str, valid_date: str) -> bool:
+    """
+    Queue a pre-render for this card. Never raises — a lost job only means the
+    card is rendered on first click instead. Returns True when a job was queued.
+    """
+    job = {
+        "user_id":        int(user_id),
+        "card_temp_path": card_temp_path,
+        "valid_date":     str(valid_date),
+        "enqueued_at":    time.time(),
+    }
+
+    if _use_redis():
+        try:
+            if not _redis.sadd(CARD_PRERENDER_PENDING_KEY, job["user_id"]):
+                _counters["deduped"] += 1
+                return False
+            _redis.lpush(CARD_PRERENDER_QUEUE_KEY, json.dumps(job))
+            _counters["enqueued"] += 1
+            return True
+        except Exception as e:
+            logging.warning("[CardQueue] Redis enqueue failed, using local queue: %s", e)
+
+    try:
+        _get_local_queue().put_nowait(job)
+        _counters["enqueued"] += 1
+        return True
+    except asyncio.QueueFull:
+        _counters["dropped"] += 1
+        return False
+
+
+def _requeue(job: dict) -> None:
+    _counters["requeued"] += 1
+    if _use_redis():
+        try:
+            _redis.sadd(CARD_PRERENDER_PENDING_KEY, job["user_id"])
+            _redis.lpush(CARD_PRERENDER_QUEUE_KEY, json.dumps(job))
+            return
+        except Exception:
+            pass
+    try:
+        _get_local_queue().put_nowait(job)
+    except asyncio.QueueFull:
+        _counters["dropped"] += 1
+
+
+# ─── Consumers ────────────────────────────────────────────────────────────────
+async def _next_job():
+    """Block (≤1 s) for the next job; Redis first, then the local fallback queue."""
+    local = _get_local_queue()
+    if not local.empty():
+        return local.get_nowait()
+
+    if _use_redis():
+        try:
+            item = await asyncio.to_thread(_redis.brpop, CARD_PRERENDER_QUEUE_KEY, 1)
+        except Exception as e:
+            logging.warning("[CardQueue] BRPOP failed: %s", e)
+            await asyncio.sleep(1)
+            return None
+        if not item:
+            return None
+        job = json.loads(item[1])
+        try:
+            _redis.srem(CARD_PRERENDER_PENDING_KEY, job["user_id"])
+        except Exception:
+            pass
+        return job
+
+    try:
+        return await asyncio.wait_for(local.get(), timeout=1)
+    except asyncio.TimeoutError:
+        return None
+
+
+async def _worker(n: int) -> None:
+    while True:
+        try:
+            job = await _next_job()
+            if not job:
+                continue
+
+            user_id, card_temp_path = job["user_id"], job["card_temp_path"]
+            _wait_ms.append((time.time() - job.get("enqueued_at", time.time())) * 1000)
+
+            if is_card_fresh(user_id) and all(
+                os.path.exists(card_variant_path(card_temp_path, fmt)) for fmt in CARD_PRERENDER_FORMATS
+            ):
+                _counters["skipped_fresh"] += 1
+                continue
+
+            start = time.perf_counter()
+            try:
+                for fmt in CARD_PRERENDER_FORMATS:
+                    await get_or_render_card(user_id, card_temp_path, job["valid_date"], fmt)
+            except RenderQueueFull:
+                # Interactive requests own the pool — back off and retry later
+                _requeue(job)
+                await asyncio.sleep(CARD_RENDER_RETRY_AFTER)
+                continue
+            except Exception as e:
+                _counters["failed"] += 1
+                logging.warning("[CardQueue] worker %d: render failed for user_id=%s: %s", n, user_id, e)
+                continue
+
+            _render_ms.append((time.perf_counter() - start) * 1000)
+            _counters["rendered"] += 1
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error("[CardQueue] worker %d error: %s", n, e)
+            await asyncio.sleep(1)
+
+
+async def run_prerender_workers() -> None:
+    """
+    Background coroutine — call once at startup with asyncio.create_task().
+    Runs CARD_PRERENDER_WORKERS consumers (set 0 to disable pre-rendering).
+    """
+    if CARD_PRERENDER_WORKERS <= 0:
+        logging.info("[CardQueue] Pre-render workers disabled")
+        return
+    logging.info("[CardQueue] Starting %d pre-render worker(s) (redis=%s)", CARD_PRERENDER_WORKERS, _use_redis())
+    await asyncio.gather(*(_worker(i) for i in range(CARD_PRERENDER_WORKERS)))
+
+
+# ─── Metrics ──────────────────────────────────────────────────────────────────
+def metrics_snapshot() -> dict:
+    redis_depth = None
+    if _use_redis():
+        try:
+            redis_depth = _redis.llen(CARD_PRERENDER_QUEUE_KEY)
+        except Exception:
+            pass
+    return {
+        "workers":           CARD_PRERENDER_WORKERS,
+        "queue_depth_redis": redis_depth,
+        "queue_depth_local": _local_queue.qsize() if _local_queue else 0,
+        "counters":          dict(_counters),
+        "queue_wait":        latency_summary(_wait_ms),
+        "render_latency":    latency_summary(_render_ms),
+    }
@@ -0,0 +1,183 @@
+"""
+Off-loop visitor card rendering.
+
+PIL compose + PNG encode takes hundreds of ms of pure CPU; doing it inside an
+async handler froze every other request on the worker.  Cards are now rendered
+in a bounded ProcessPoolExecutor whose workers preload the template assets
+once (see template_generator's asset cache), and written to disk by the worker
+so the PNG never crosses the process pipe.
+
+Import:
+    from utils.services.card_renderer import render_single_flight, render_card_file, RenderQueueFull
+    from utils.services.card_renderer import pick_card_format, record_card_served
+
+  • single-flight — concurrent requests for the same key (user_id) await one
+    shared future instead of rendering the same card N times.
+  • backpressure  — at most CARD_RENDER_MAX_QUEUE renders queued/running;
+    beyond that RenderQueueFull is raised and routes answer 503 + Retry-After.
+  • variants      — png / png8 / webp / thumb (pick_card_format negotiates from
+    Accept or ?format=); bytes saved vs full PNG are tracked per format.
+"""
+
+import os
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Optional
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+CARD_RENDER_WORKERS        = int(os.getenv("CARD_RENDER_WORKERS",        str(max(1, min(4, os.cpu_count() or 1)))))
+CARD_RENDER_MAX_QUEUE      = int(os.getenv("CARD_RENDER_MAX_QUEUE",      str(CARD_RENDER_WORKERS * 8)))
+CARD_RENDER_RETRY_AFTER    = int(os.getenv("CARD_RENDER_RETRY_AFTER",    "5"))
+
+# Output variants (encoders live in template_generator.encode_card)
+CARD_MEDIA_TYPES = {
+    "png":   "image/png",
+    "png8":  "image/png",
+    "webp":  "image/webp",
+    "thumb": "image/webp",
+}
+CARD_FILE_EXTENSIONS = {"png": "png", "png8": "png", "webp": "webp", "thumb": "webp"}
+
+_executor: Optional[ProcessPoolExecutor] = None
+_pending = 0
+_inflight: dict = {}          # key → asyncio.Future shared by concurrent callers
+
+
+# Per-format size accounting — bytes saved are measured against the average full PNG
+_format_stats = {
+    fmt: {"renders": 0, "rendered_bytes": 0, "serves": 0, "served_bytes": 0}
+    for fmt in CARD_MEDIA_TYPES
+}
+
+
+class RenderQueueFull(Exception):
+    """Raised when CARD_RENDER_MAX_QUEUE renders are already queued or running."""
+
+
+def pick_card_format(accept: Optional[str], requested: Optional[str] = None) -> str:
+    """
+    Explicit ?format= wins (ValueError if unknown); otherwise WebP for clients
+    that advertise image/webp in Accept, full PNG for everyone else.
+    """
+    if requested:
+        requested = requested.lower()
+        if requested not in CARD_MEDIA_TYPES:
+            raise ValueError(f"Unsupported format '{requested}'. Use one of: {', '.join(CARD_MEDIA_TYPES)}")
+        return requested
+    if accept and "image/webp" in accept.lower():
+        return "webp"
+    return "png"
+
+
+def record_card_served(fmt: str, nbytes: int) -> None:
+    fs = _format_stats[fmt]
+    fs["serves"]       += 1
+    fs["served_bytes"] += nbytes
+
+
+# ─── Worker side (runs in the pool processes) ────────────────────────────────
+_generator = None
+
+
+def _init_worker() -> None:
+    """Pool initializer — decode the template and load fonts once per process."""
+    global _generator
+    from template_generator import VisitorCardGenerator3, _template_base, _cached_font
+
+    _generator = VisitorCardGenerator3()
+    try:
+        _template_base(_generator.template_path)
+        for size in (48, 33, 28, _generator.CIRCLE_R * 2 // 3):
+            _cached_font(_generator.font_path, size)
+    except Exception as e:
+        # Rendering will retry the load and surface the real error per card
+        logging.warning("[CardRenderer] Asset preload failed: %s", e)
+
+
+def _render_to_file(card_data: dict, out_path: str, fmt: str) -> int:
+    if _generator is None:
+        _init_worker()
+    buf = _generator.generate_card_in_memory(card_data, fmt)
+
+    # Write to a tmp file first, then rename — prevents half-written files being served
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(buf.getbuffer())
+    os.replace(tmp_path, out_path)  # atomic on Linux
+    return buf.getbuffer().nbytes
+
+
+# ─── Event-loop side ──────────────────────────────────────────────────────────
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=CARD_RENDER_WORKERS, initializer=_init_worker)
+        logging.info("[CardRenderer] Process pool started (%d workers)", CARD_RENDER_WORKERS)
+    return _executor
+
+
+async def render_card_file(card_data: dict, out_path: str, fmt: str = "png") -> str:
+    """Render card_data to out_path in the pool. Raises RenderQueueFull when saturated."""
+    global _pending
+    if _pending >= CARD_RENDER_MAX_QUEUE:
+        raise RenderQueueFull()
+
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        nbytes = await loop.run_in_executor(_get_executor(), _render_to_file, card_data, out_path, fmt)
+    finally:
+        _pending -= 1
+
+    fs = _format_stats[fmt]
+    fs["renders"]        += 1
+    fs["rendered_bytes"] += nbytes
+    return out_path
+
+
+async def render_single_flight(key, factory: Callable[[], Awaitable]):
+    """
+    Run factory() once per key at a time; concurrent callers share its result
+    (or its exception).  The leader runs as its own task so a client
+    disconnect on one request doesn't cancel the render for everyone else.
+    """
+    fut = _inflight.get(key)
+    if fut is None:
+        fut = asyncio.ensure_future(factory())
+        _inflight[key] = fut
+        fut.add_done_callback(lambda _f: _inflight.pop(key, None))
+    return await asyncio.shield(fut)
+
+
+def format_stats() -> dict:
+    png = _format_stats["png"]
+    avg_png = png["rendered_bytes"] / png["renders"] if png["renders"] else None
+
+    out = {}
+    for fmt, fs in _format_stats.items():
+        avg = fs["rendered_bytes"] / fs["renders"] if fs["renders"] else None
+        out[fmt] = {
+            **fs,
+            "avg_bytes":   round(avg) if avg is not None else None,
+            # None until at least one full PNG has been rendered to compare against
+            "bytes_saved": round(fs["serves"] * avg_png - fs["served_bytes"]) if avg_png is not None else None,
+        }
+    return out
+
+
+def stats() -> dict:
+    return {
+        "workers":     CARD_RENDER_WORKERS,
+        "max_queue":   CARD_RENDER_MAX_QUEUE,
+        "pending":     _pending,
+        "in_flight":   len(_inflight),
+        "formats":     format_stats(),
+    }
+
+
+def shutdown_render_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,273 @@
+"""
+Streaming entry export — used by GET /tourists/event/{id}/download-entries.
+
+The old export loaded every entry_record / tourist / entry_item for the range
+into memory, joined items to records with a linear scan (O(items × records))
+and silently stopped at the PostgREST row limit.  Now:
+
+  • entry_records are keyset-paginated on (entry_date, record_id)
+  • per page: tourists and entry_items are fetched for just that page
+    (items keyset-paginated on item_id) and joined through dicts
+  • verifier names come from the staff directory (one bulk-loaded cache)
+  • CSV rows are encoded and yielded in chunks as each page arrives
+
+Memory is bounded by EXPORT_PAGE_SIZE regardless of the date range.
+
+Import:
+    from utils.services.entry_export import (
+        ENTRY_EXPORT_HEADER, ENTRY_EXPORT_FIELDS, fetch_record_page, iter_entry_pages,
+        build_entry_rows, build_entry_records, csv_chunks,
+    )
+"""
+
+import os
+import csv
+import io
+from typing import AsyncIterator, Callable, Iterable, Iterator, Optional
+
+from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
+from utils.services.staff_directory import get_staff
+from utils.services.export_formats import EXPORT_CHUNK_BYTES
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+
+RECORD_COLUMNS  = "record_id, user_id, entry_date"
+TOURIST_COLUMNS = "user_id, name, phone, unique_id_type, unique_id, is_group, group_count"
+# Verifier lives in approved_by_uid (entry_route.create_entry); there is no verified_by column
+ITEM_COLUMNS    = "item_id, record_id, arrival_time, departure_time, duration, entry_type, entry_point, approved_by_uid"
+
+# Typed columns for parquet / arrow / ndjson (utils/services/export_formats.py);
+# "category" columns are dictionary-encoded
+ENTRY_EXPORT_FIELDS = [
+    ("entry_date",        "date"),
+    ("tourist_name",      "string"),
+    ("phone",             "string"),
+    ("unique_id_type",    "category"),
+    ("unique_id",         "string"),
+    ("is_group",          "bool"),
+    ("group_count",       "int32"),
+    ("total_members",     "int32"),
+    ("arrival_time",      "timestamp"),
+    ("departure_time",    "timestamp"),
+    ("duration_minutes",  "int32"),
+    ("entry_type",        "category"),
+    ("entry_point",       "category"),
+    ("status",            "category"),
+    ("verified_by_name",  "category"),
+    ("verified_by_phone", "category"),
+]
+
+ENTRY_EXPORT_HEADER = [
+    "Entry Date",
+    "Tourist Name",
+    "Email",
+    "Unique ID Type",
+    "Unique ID",
+    "Is Group",
+    "Group Count",
+    "Total Members",
+    "Arrival Time",
+    "Departure Time",
+    "Duration (minutes)",
+    "Entry Type",
+    "Entry Point",
+    "Status",
+    "Verified By Name",
+    "Verified By Email",
+]
+
+
+# ─── Fetching (keyset pagination) ─────────────────────────────────────────────
+async def fetch_record_page(event_id: int, from_date: str, to_date: str, after: Optional[tuple]) -> list:
+    """One page of entry_records ordered by (entry_date, record_id), strictly after `after`."""
+    query = (
+        supabaseAdmin.table("entry_records")
+        .select(RECORD_COLUMNS)
+        .eq("event_id", event_id)
+        .gte("entry_date", from_date)
+        .lte("entry_date", to_date)
+    )
+    if after:
+        last_date, last_id = after
+        query = query.or_(f"entry_date.gt.{last_date},and(entry_date.eq.{last_date},record_id.gt.{last_id})")
+    resp = await db_execute(
+        query.order("entry_date", desc=False).order("record_id", desc=False).limit(EXPORT_PAGE_SIZE)
+    )
+    return resp.data or []
+
+
+async def _fetch_items(record_ids: list) -> list:
+    """All entry_items for these records, keyset-paginated on item_id."""
+    items, last_id = [], 0
+    while True:
+        resp = await db_execute(
+            supabaseAdmin.table("entry_items")
+            .select(ITEM_COLUMNS)
+            .in_("record_id", record_ids)
+            .gt("item_id", last_id)
+            .order("item_id", desc=False)
+            .limit(EXPORT_PAGE_SIZE)
+        )
+        batch = resp.data or []
+        items.extend(batch)
+        if len(batch) < EXPORT_PAGE_SIZE:
+            return items
+        last_id = batch[-1]["item_id"]
+
+
+async def _fetch_tourists(user_ids: list) -> dict:
+    resp = await db_execute(
+        supabaseAdmin.table("tourists").select(TOURIST_COLUMNS).in_("user_id", user_ids)
+    )
+    return {t["user_id"]: t for t in resp.data or []}
+
+
+async def _resolve_verifiers(items: list, verifiers_map: dict) -> None:
+    """Fill verifiers_map (shared across pages) from the staff directory for ids not seen yet."""
+    new_ids = {i.get("approved_by_uid") for i in items if i.get("approved_by_uid")} - verifiers_map.keys()
+    if not new_ids:
+        return
+    staff = await get_staff(new_ids)
+    for verifier_id in new_ids:
+        verifiers_map[verifier_id] = staff.get(str(verifier_id), {"name": "Unknown", "phone": "No phone"})
+
+
+async def iter_entry_pages(
+    event_id: int,
+    from_date: str,
+    to_date: str,
+    first_page: Optional[list] = None,
+    build: Callable[..., Iterator] = None,
+) -> AsyncIterator[list]:
+    """
+    Yield lists of rows, one list per entry_records page — CSV rows by default,
+    typed records (ENTRY_EXPORT_FIELDS order) with build=build_entry_records.
+    Pass first_page when the caller already fetched it (e.g. to 404 on empty).
+    """
+    build = build or build_entry_rows
+    verifiers_map: dict = {}
+    page = first_page if first_page is not None else await fetch_record_page(event_id, from_date, to_date, None)
+
+    while page:
+        records_map = {r["record_id"]: r for r in page}
+        tourists_map = await _fetch_tourists(list({r["user_id"] for r in page}))
+        items = await _fetch_items(list(records_map))
+        await _resolve_verifiers(items, verifiers_map)
+
+        items.sort(key=lambda i: (records_map[i["record_id"]]["entry_date"], i.get("arrival_time") or ""))
+        yield list(build(items, records_map, tourists_map, verifiers_map))
+
+        if len(page) < EXPORT_PAGE_SIZE:
+            return
+        last = page[-1]
+        page = await fetch_record_page(event_id, from_date, to_date, (last["entry_date"], last["record_id"]))
+
+
+# ─── Row building (pure — benchmarked in bench_entry_export.py) ─────────────
+def duration_minutes(duration) -> Optional[int]:
+    """'1 days 00:30:00' / '00:30:00' → 1470 / 30; None when unparseable or empty."""
+    if not duration:
+        return None
+    try:
+        duration_str = str(duration)
+        if "day" in duration_str:
+            parts = duration_str.split()
+            days, time_part = int(parts[0]), parts[2]
+        else:
+            days, time_part = 0, duration_str
+        hours, minutes = time_part.split(":")[:2]
+        return days * 24 * 60 + int(hours) * 60 + int(minutes)
+    except Exception:
+        return None
+
+
+def build_entry_records(
+    items: Iterable[dict],
+    records_map: dict,
+    tourists_map: dict,
+    verifiers_map: dict,
+) -> Iterator[tuple]:
+    """Join entry_items → entry_records → tourists / verifiers via dict lookups; typed values."""
+    for entry_item in items:
+        entry_record = records_map.get(entry_item["record_id"])
+        if not entry_record:
+            continue
+
+        tourist = tourists_map.get(entry_record["user_id"], {})
+        is_group = bool(tourist.get("is_group", False))
+        group_count = tourist.get("group_count", 1)
+        verifier_info = verifiers_map.get(entry_item.get("approved_by_uid"), {"name": "N/A", "phone": "N/A"})
+        departure_time = entry_item.get("departure_time") or None
+
+        yield (
+            entry_record.get("entry_date"),
+            tourist.get("name"),
+            tourist.get("phone"),
+            tourist.get("unique_id_type"),
+            tourist.get("unique_id"),
+            is_group,
+            group_count,
+            group_count if is_group else 1,
+            entry_item.get("arrival_time"),
+            departure_time,
+            duration_minutes(entry_item.get("duration")),
+            entry_item.get("entry_type"),
+            entry_item.get("entry_point"),
+            "Exited" if departure_time else "Inside",
+            verifier_info["name"],
+            verifier_info["phone"],
+        )
+
+
+def format_entry_row(record: tuple) -> list:
+    """Typed record → CSV row (Yes/No, 'Still Inside', 'N/A' placeholders)."""
+    (entry_date, name, phone, unique_id_type, unique_id, is_group, group_count, total_members,
+     arrival_time, departure_time, duration, entry_type, entry_point, entry_status,
+     verifier_name, verifier_phone) = record
+    return [
+        entry_date or "",
+        name or "",
+        phone or "",
+        unique_id_type or "",
+        unique_id or "",
+        "Yes" if is_group else "No",
+        group_count,
+        total_members,
+        arrival_time or "",
+        departure_time or "Still Inside",
+        "N/A" if duration is None else str(duration),
+        entry_type or "",
+        entry_point or "",
+        entry_status,
+        verifier_name,
+        verifier_phone,
+    ]
+
+
+def build_entry_rows(
+    items: Iterable[dict],
+    records_map: dict,
+    tourists_map: dict,
+    verifiers_map: dict,
+) -> Iterator[list]:
+    """CSV rows for the joined page (see build_entry_records)."""
+    for record in build_entry_records(items, records_map, tourists_map, verifiers_map):
+        yield format_entry_row(record)
+
+
+async def csv_chunks(pages: AsyncIterator[list], header: list = ENTRY_EXPORT_HEADER) -> AsyncIterator[str]:
+    """Encode row pages as CSV, yielding ~EXPORT_CHUNK_BYTES strings."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    async for rows in pages:
+        for row in rows:
+            writer.writerow(row)
+            if buf.tell() >= EXPORT_CHUNK_BYTES:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate(0)
+    if buf.tell():
+        yield buf.getvalue()
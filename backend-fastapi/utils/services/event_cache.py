@@ -0,0 +1,116 @@
+"""
+Per-process event row cache — shared by every route that needs an event's
+allowed_guards / is_active / name / dates.
+
+Import:
+    from utils.services.event_cache import get_event, invalidate_event
+
+Every guard QR scan used to re-read `events.allowed_guards` (once in
+check_guard_admin_access, again in the route).  Rows are now kept in memory
+for EVENT_CACHE_TTL_SECONDS.
+
+Consistency across uvicorn workers:
+    invalidate_event() drops the local copy AND publishes the event_id on the
+    Redis channel EVENT_INVALIDATE_CHANNEL; every worker runs
+    run_invalidation_listener() (started from main.py) and drops its copy too.
+    When Redis is down the TTL alone bounds staleness.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Optional
+
+from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
+from utils.services.redis_client import redis_client as _redis, redis_ok as _redis_ok
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+EVENT_CACHE_TTL_SECONDS  = int(os.getenv("EVENT_CACHE_TTL_SECONDS", "60"))
+EVENT_INVALIDATE_CHANNEL = "events:invalidate"
+EVENT_CACHE_COLUMNS      = "event_id, name, is_active, allowed_guards, start_date, end_date, location, max_capacity"
+
+# event_id → (expires_at, row)
+_cache: dict[int, tuple[float, dict]] = {}
+
+
+# ─── Public API ───────────────────────────────────────────────────────────────
+async def get_event(event_id: int) -> Optional[dict]:
+    """Return the cached event row (or fetch it). None when the event does not exist."""
+    event_id = int(event_id)
+    hit = _cache.get(event_id)
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+
+    resp = await db_execute(
+        supabaseAdmin.table("events")
+        .select(EVENT_CACHE_COLUMNS)
+        .eq("event_id", event_id)
+        .limit(1)
+    )
+    if not resp.data:
+        _cache.pop(event_id, None)
+        return None
+
+    row = resp.data[0]
+    _cache[event_id] = (time.monotonic() + EVENT_CACHE_TTL_SECONDS, row)
+    return row
+
+
+def guard_allowed(event: dict, role: str, uid: Optional[str]) -> bool:
+    """Empty allowed_guards = open to every guard; admins are always allowed."""
+    allowed_guards = event.get("allowed_guards") or []
+    if not allowed_guards or role != "security":
+        return True
+    return uid in allowed_guards
+
+
+def invalidate_event(event_id: int) -> None:
+    """Drop the cached row here and tell every other worker to do the same."""
+    _cache.pop(int(event_id), None)
+    if not _redis_ok or not _redis:
+        return
+    try:
+        _redis.publish(EVENT_INVALIDATE_CHANNEL, str(event_id))
+    except Exception as e:
+        logging.warning("[EventCache] publish failed for event_id=%s: %s", event_id, e)
+
+
+# ─── Background listener ──────────────────────────────────────────────────────
+async def run_invalidation_listener() -> None:
+    """
+    Background coroutine — call once at startup with asyncio.create_task().
+    Subscribes to EVENT_INVALIDATE_CHANNEL and evicts local rows on every message.
+    """
+    if not _redis_ok or not _redis:
+        logging.info("[EventCache] Redis unavailable — relying on %ds TTL only", EVENT_CACHE_TTL_SECONDS)
+        return
+
+    while True:
+        pubsub = None
+        try:
+            pubsub = _redis.pubsub(ignore_subscribe_messages=True)
+            await asyncio.to_thread(pubsub.subscribe, EVENT_INVALIDATE_CHANNEL)
+            logging.info("[EventCache] Listening on '%s'", EVENT_INVALIDATE_CHANNEL)
+            while True:
+                msg = await asyncio.to_thread(pubsub.get_message, timeout=1.0)
+                if not msg:
+                    continue
+                data = msg.get("data")
+                if str(data).isdigit():
+                    _cache.pop(int(data), None)
+                    logging.info("[EventCache] Invalidated event_id=%s", data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Drop everything — we may have missed invalidations while disconnected
+            _cache.clear()
+            logging.warning("[EventCache] Listener error, reconnecting in 5s: %s", e)
+            await asyncio.sleep(5)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
@@ -0,0 +1,200 @@
+"""
+Columnar / line-delimited export formats — used by the entry and feedback exports.
+
+Import:
+    from utils.services.export_formats import (
+        EXPORT_FORMATS, EXPORT_MEDIA_TYPES, EXPORT_FILE_EXTENSIONS,
+        columnar_available, record_chunks,
+    )
+
+Analysts re-import the CSV exports into pandas every night and CSV parsing is
+the slow part.  The same row pages can be written as:
+
+  • parquet — typed columns, "category" columns dictionary-encoded,
+              one row group per EXPORT_ROW_GROUP_ROWS rows
+  • arrow   — Arrow IPC *stream* format (pyarrow.ipc.open_stream / pandas via
+              pyarrow); dictionaries may be replaced between batches
+  • ndjson  — one JSON object per row, no extra dependency
+
+Each format is written incrementally and handed to StreamingResponse chunk by
+chunk, exactly like the CSV path.  Columns are described as (name, kind)
+pairs, kind ∈ string | category | bool | int32 | float64 | date | timestamp;
+dates / timestamps arrive as the ISO strings PostgREST returns.
+
+pyarrow is a declared dependency (pyproject.toml); where it is missing all the
+same, only csv / ndjson are offered and columnar_available() is False.
+"""
+
+import io
+import os
+import json
+import asyncio
+import logging
+from datetime import date, datetime
+from typing import AsyncIterator, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pa_ipc = pq = None
+    logging.info("[Export] pyarrow not installed — parquet / arrow exports disabled")
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+EXPORT_ROW_GROUP_ROWS  = int(os.getenv("EXPORT_ROW_GROUP_ROWS",  "50000"))
+EXPORT_CHUNK_BYTES     = int(os.getenv("EXPORT_CHUNK_BYTES",     str(64 * 1024)))
+
+EXPORT_FORMATS = ("csv", "parquet", "arrow", "ndjson")
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+EXPORT_MEDIA_TYPES = {
+    "csv":     "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow":   "application/vnd.apache.arrow.stream",
+    "ndjson":  "application/x-ndjson",
+}
+EXPORT_FILE_EXTENSIONS = {
+    "csv":     "csv",
+    "parquet": "parquet",
+    "arrow":   "arrows",
+    "ndjson":  "ndjson",
+}
+
+
+def columnar_available() -> bool:
+    return pa is not None
+
+
+# ─── Arrow conversion ─────────────────────────────────────────────────────────
+def _arrow_type(kind: str):
+    return {
+        "string":    pa.string(),
+        "category":  pa.dictionary(pa.int32(), pa.string()),
+        "bool":      pa.bool_(),
+        "int32":     pa.int32(),
+        "float64":   pa.float64(),
+        "date":      pa.date32(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }[kind]
+
+
+def arrow_schema(fields: list):
+    return pa.schema([pa.field(name, _arrow_type(kind)) for name, kind in fields])
+
+
+def _parse_date(value) -> Optional[date]:
+    if not value:
+        return None
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    if not value:
+        return None
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+
+def _arrow_column(kind: str, values: tuple):
+    if kind == "category":
+        return pa.array(values, pa.string()).dictionary_encode()
+    if kind == "date":
+        values = [_parse_date(v) for v in values]
+    elif kind == "timestamp":
+        values = [_parse_timestamp(v) for v in values]
+    return pa.array(values, _arrow_type(kind))
+
+
+def records_to_batch(records: list, fields: list):
+    """List of row tuples (fields order) → pyarrow.RecordBatch."""
+    columns = list(zip(*records)) if records else [()] * len(fields)
+    arrays = [_arrow_column(kind, col) for (_, kind), col in zip(fields, columns)]
+    return pa.RecordBatch.from_arrays(arrays, schema=arrow_schema(fields))
+
+
+class _DrainSink(io.RawIOBase):
+    """Write-only file object whose bytes are drained after each row group."""
+
+    def __init__(self):
+        self._parts: list = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Parquet footers record absolute offsets — keep counting across drains
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+# ─── Streaming writers ────────────────────────────────────────────────────────
+async def _ndjson_chunks(pages: AsyncIterator[list], fields: list) -> AsyncIterator[str]:
+    names = [name for name, _ in fields]
+    buf, size = [], 0
+    async for records in pages:
+        for record in records:
+            line = json.dumps(dict(zip(names, record)), default=str, ensure_ascii=False) + "\n"
+            buf.append(line)
+            size += len(line)
+            if size >= EXPORT_CHUNK_BYTES:
+                yield "".join(buf)
+                buf, size = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+async def _arrow_chunks(pages: AsyncIterator[list], fields: list, fmt: str) -> AsyncIterator[bytes]:
+    schema = arrow_schema(fields)
+    sink = _DrainSink()
+    writer = pq.ParquetWriter(sink, schema) if fmt == "parquet" else pa_ipc.new_stream(sink, schema)
+
+    def write(records: list) -> None:
+        batch = records_to_batch(records, fields)
+        if fmt == "parquet":
+            writer.write_batch(batch, row_group_size=len(records))
+        else:
+            writer.write_batch(batch)
+
+    try:
+        pending: list = []
+        async for records in pages:
+            pending.extend(records)
+            if len(pending) >= EXPORT_ROW_GROUP_ROWS:
+                # Encoding a row group is CPU-bound — keep it off the event loop
+                await asyncio.to_thread(write, pending)
+                pending = []
+                data = sink.drain()
+                if data:
+                    yield data
+        if pending:
+            await asyncio.to_thread(write, pending)
+    finally:
+        writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def record_chunks(pages: AsyncIterator[list], fields: list, fmt: str) -> AsyncIterator:
+    """
+    Encode pages of typed row tuples as fmt ("parquet" | "arrow" | "ndjson").
+    Callers check columnar_available() before asking for parquet / arrow.
+    """
+    if fmt == "ndjson":
+        return _ndjson_chunks(pages, fields)
+    if fmt in COLUMNAR_FORMATS:
+        if pa is None:
+            raise RuntimeError(f"{fmt} export requires pyarrow")
+        return _arrow_chunks(pages, fields, fmt)
+    raise ValueError(f"Unsupported export format: {fmt}")
@@ -0,0 +1,136 @@
+"""
+Feedback export rows — used by GET /feedback/event/{id}/export.
+
+Import:
+    from utils.services.feedback_export import (
+        FEEDBACK_EXPORT_FIELDS, feedback_csv_header, build_feedback_rows,
+        build_feedback_records, fetch_session_page, iter_feedback_pages,
+    )
+
+Two shapes of the same data:
+  • CSV — wide: one row per session, one column per question
+  • parquet / arrow / ndjson — long: one row per answer, with question_text /
+    question_type dictionary-encoded (see utils/services/export_formats.py)
+
+feedback_sessions are keyset-paginated on (submitted_at, session_id) and the
+answers fetched per page, like the entry export (utils/services/entry_export.py),
+so memory is bounded by EXPORT_PAGE_SIZE however many submissions there are.
+
+answers_by_session maps session_id → {question_id: feedback_answers row}.
+"""
+
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
+from utils.services.entry_export import EXPORT_PAGE_SIZE
+
+SESSION_COLUMNS = "session_id, submitted_at"
+ANSWER_COLUMNS  = "session_id, question_id, answer_number, answer_text"
+
+# Typed columns for the long format; "category" columns are dictionary-encoded
+FEEDBACK_EXPORT_FIELDS = [
+    ("session_ref",   "string"),
+    ("submitted_at",  "timestamp"),
+    ("question_no",   "int32"),
+    ("question_text", "category"),
+    ("question_type", "category"),
+    ("answer_number", "float64"),
+    ("answer_text",   "string"),
+]
+
+
+def feedback_csv_header(questions: list) -> list:
+    return ["Session Ref", "Submitted At"] + [
+        f"Q{i+1}: {q['question_text']}" for i, q in enumerate(questions)
+    ]
+
+
+def _answer_value(question: dict, answer: dict):
+    return answer["answer_number"] if question.get("question_type") == "rating" else answer["answer_text"]
+
+
+def build_feedback_rows(sessions: list, questions: list, answers_by_session: dict) -> Iterator[list]:
+    """Wide CSV rows: Session Ref, Submitted At, <one value per question>."""
+    for s in sessions:
+        answers = answers_by_session.get(s["session_id"], {})
+        row = [s["session_id"], s["submitted_at"]]
+        for q in questions:
+            answer = answers.get(q["question_id"])
+            row.append(_answer_value(q, answer) if answer else "")
+        yield row
+
+
+def build_feedback_records(sessions: list, questions: list, answers_by_session: dict) -> Iterator[tuple]:
+    """Long typed records (FEEDBACK_EXPORT_FIELDS order), one per answered question."""
+    for s in sessions:
+        answers = answers_by_session.get(s["session_id"], {})
+        for i, q in enumerate(questions):
+            answer = answers.get(q["question_id"])
+            if not answer:
+                continue
+            number = answer.get("answer_number")
+            yield (
+                str(s["session_id"]),
+                s["submitted_at"],
+                i + 1,
+                q["question_text"],
+                q.get("question_type"),
+                float(number) if number is not None else None,
+                answer.get("answer_text"),
+            )
+
+
+# ─── Fetching (keyset pagination) ─────────────────────────────────────────────
+async def fetch_session_page(event_id: int, after: Optional[tuple]) -> list:
+    """One page of feedback_sessions ordered by (submitted_at, session_id), strictly after `after`."""
+    query = supabaseAdmin.table("feedback_sessions").select(SESSION_COLUMNS).eq("event_id", event_id)
+    if after:
+        last_at, last_id = after
+        query = query.or_(f'submitted_at.gt."{last_at}",and(submitted_at.eq."{last_at}",session_id.gt.{last_id})')
+    resp = await db_execute(
+        query.order("submitted_at", desc=False).order("session_id", desc=False).limit(EXPORT_PAGE_SIZE)
+    )
+    return resp.data or []
+
+
+async def _fetch_answers(session_ids: list) -> dict:
+    """session_id → {question_id: answer} for one page of sessions, paged past the row limit."""
+    answers_by_session: dict = {sid: {} for sid in session_ids}
+    start = 0
+    while True:
+        resp = await db_execute(
+            supabaseAdmin.table("feedback_answers")
+            .select(ANSWER_COLUMNS)
+            .in_("session_id", session_ids)
+            .order("session_id", desc=False)
+            .order("question_id", desc=False)
+            .range(start, start + EXPORT_PAGE_SIZE - 1)
+        )
+        batch = resp.data or []
+        for a in batch:
+            answers_by_session[a["session_id"]][a["question_id"]] = a
+        if len(batch) < EXPORT_PAGE_SIZE:
+            return answers_by_session
+        start += EXPORT_PAGE_SIZE
+
+
+async def iter_feedback_pages(
+    event_id: int,
+    questions: list,
+    build: Callable[..., Iterator],
+    first_page: Optional[list] = None,
+) -> AsyncIterator[list]:
+    """
+    Yield lists of rows, one list per feedback_sessions page, for csv_chunks /
+    record_chunks.  Pass first_page when the caller already fetched it (e.g. to 404 on empty).
+    """
+    page = first_page if first_page is not None else await fetch_session_page(event_id, None)
+    while page:
+        answers_by_session = await _fetch_answers([s["session_id"] for s in page])
+        yield list(build(page, questions, answers_by_session))
+
+        if len(page) < EXPORT_PAGE_SIZE:
+            return
+        last = page[-1]
+        page = await fetch_session_page(event_id, (last["submitted_at"], last["session_id"]))
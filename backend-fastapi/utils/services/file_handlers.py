@@ -19,6 +19,16 @@ def save_upload_file(file: UploadFile, prefix: str = "" , is_id: bool = False) -
         shutil.copyfileobj(file.file, buffer)
     return file_path
 
+def save_upload_bytes(data: bytes, filename: str, prefix: str = "", is_id: bool = False) -> str:
+    """Same naming / folders as save_upload_file, for files taken out of an archive (bulk registration)"""
+    filename = f"{prefix}_{uuid4().hex}_{os.path.basename(filename)}"
+    folder = ID_UPLOAD_DIR if is_id else UPLOAD_DIR
+    os.makedirs(folder, exist_ok=True)
+    file_path = os.path.join(folder, filename)
+    with open(file_path, "wb") as buffer:
+        buffer.write(data)
+    return file_path
+
 def delete_file(file_path: str) -> bool:
     """Delete a file if it exists"""
     try:
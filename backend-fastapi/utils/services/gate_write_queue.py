@@ -0,0 +1,401 @@
+"""
+Gate write log — write-behind arrivals for QR scans, flushed in batches.
+
+A signed QR (public_access_link_provider.generate_signed_qr_payload) carries
+user_id / event_id / valid_date under an HMAC, so POST /entry/ can accept the
+scan without reading the DB; with GATE_WRITE_BEHIND=true a short_code scan
+resolved from the Redis short_code index is accepted the same way.  Either
+way the scan is acknowledged once its arrival is appended to the log, and
+flusher tasks (started from main.py) write the log to entry_items in batches
+through the record_entries_bulk RPC (supabase_rpc_record_entry.sql), keeping
+the scan time as arrival_time.
+
+Import:
+    from utils.services.gate_write_queue import (
+        enqueue_gate_entry, write_gate_entry, pending_entries, wait_for_pending_entry,
+    )
+
+Log:
+    Redis stream GATE_WRITE_LOG_KEY, consumer group GATE_WRITE_GROUP — an
+    entry is XACKed / XDELed only after its batch is committed, so it is as
+    durable as the Redis persistence settings (use appendonly yes).
+    Flushers read up to GATE_WRITE_BATCH_ROWS entries, or whatever arrived
+    within GATE_WRITE_BATCH_MS of the first one, and write them in one RPC.
+
+Crash recovery:
+    Entries read by a flusher that died before acking stay in the group's
+    pending list; every flusher re-claims entries idle for more than
+    GATE_WRITE_CLAIM_IDLE_MS (XAUTOCLAIM) at startup and then periodically.
+    Each entry has a write_id stored in entry_items.metadata under a unique
+    index, so replaying a batch that was already committed writes nothing twice.
+
+While an arrival is in the log it is also kept in a per-tourist hash
+(GATE_WRITE_PENDING_PREFIX…) so GET /entry/today/{user_id} can show it and a
+departure scanned right after it can wait for it to land.
+
+When Redis is down nothing is logged — callers write synchronously.
+A DB outage only delays flushing (retried with backoff); items the DB
+rejects (e.g. tourist deleted) are parked on GATE_WRITE_DEAD_KEY.
+Written arrivals are counted in the occupancy counters (utils/services/occupancy.py).
+
+Metrics (GET /debug/gate-write-queue):
+    log length / unacked entries, dead letters, counters, queue wait,
+    batch size and flush latency.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from utils.latency_stats import latency_summary
+from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
+from utils.services.redis_client import redis_client as _redis, redis_ok as _redis_ok
+from utils.services.occupancy import record_arrival, members_of
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+# Acknowledge short_code scans after the log append too (signed QRs always are)
+GATE_WRITE_BEHIND            = os.getenv("GATE_WRITE_BEHIND", "false").lower() == "true"
+GATE_WRITE_WORKERS           = int(os.getenv("GATE_WRITE_WORKERS",             "1"))
+GATE_WRITE_BATCH_ROWS        = int(os.getenv("GATE_WRITE_BATCH_ROWS",          "200"))
+GATE_WRITE_BATCH_MS          = int(os.getenv("GATE_WRITE_BATCH_MS",            "250"))
+GATE_WRITE_CLAIM_IDLE_MS     = int(os.getenv("GATE_WRITE_CLAIM_IDLE_MS",       "30000"))
+GATE_WRITE_RETRY_SECONDS     = float(os.getenv("GATE_WRITE_RETRY_SECONDS",     "2"))
+GATE_WRITE_RETRY_MAX_SECONDS = float(os.getenv("GATE_WRITE_RETRY_MAX_SECONDS", "30"))
+GATE_PENDING_WAIT_SECONDS    = float(os.getenv("GATE_PENDING_WAIT_SECONDS",    "3"))
+GATE_WRITE_LOG_KEY           = "gate_writes:log"
+GATE_WRITE_GROUP             = "gate_writes"
+GATE_WRITE_DEAD_KEY          = "gate_writes:dead"
+GATE_WRITE_PENDING_PREFIX    = "gate_writes:pending:"
+
+_PENDING_TTL_SECONDS = 2 * 24 * 3600
+_LATENCY_SAMPLES = 500
+_POLL_SECONDS = 0.05
+_IDLE_BLOCK_MS = 1000
+
+_counters = {
+    "appended": 0, "not_logged": 0, "written": 0, "duplicates": 0,
+    "failed": 0, "batches": 0, "batch_retries": 0, "recovered": 0, "pending_waits": 0,
+    "group_recreated": 0,
+}
+_wait_ms:  deque = deque(maxlen=_LATENCY_SAMPLES)
+_flush_ms: deque = deque(maxlen=_LATENCY_SAMPLES)
+_batch_rows: deque = deque(maxlen=_LATENCY_SAMPLES)
+
+
+def _use_redis() -> bool:
+    return bool(_redis_ok and _redis)
+
+
+def _pending_key(user_id: int, event_id: int, entry_date: str) -> str:
+    return f"{GATE_WRITE_PENDING_PREFIX}{event_id}:{user_id}:{entry_date}"
+
+
+# ─── Write ────────────────────────────────────────────────────────────────────
+async def _write_batch(jobs: list) -> list:
+    """One record_entries_bulk call; returns one result row per job."""
+    resp = await db_execute(supabaseAdmin.rpc("record_entries_bulk", {
+        "p_items": [
+            {
+                "write_id":        job.get("write_id"),
+                "user_id":         job["user_id"],
+                "event_id":        job["event_id"],
+                "entry_date":      job["entry_date"],
+                "arrival_time":    job["arrival_time"],
+                "approved_by_uid": job.get("approved_by_uid"),
+                "metadata":        job.get("metadata") or {},
+            }
+            for job in jobs
+        ],
+    }))
+    return resp.data or []
+
+
+def _count_arrival(job: dict, result: dict) -> None:
+    record_arrival(
+        job["event_id"], job["entry_date"], job["user_id"],
+        members=members_of(result.get("is_group"), result.get("group_count")),
+        is_group=bool(result.get("is_group")), arrival_time=job["arrival_time"],
+    )
+
+
+async def write_gate_entry(job: dict) -> dict:
+    """
+    Write one arrival now (used when it could not be logged);
+    returns {record_id, entry_number, entry_item, ...}.
+    """
+    results = await _write_batch([job])
+    if not results:
+        raise RuntimeError("record_entries_bulk returned no row")
+    if not results[0].get("success"):
+        raise RuntimeError(results[0].get("message") or "Entry write failed")
+    _count_arrival(job, results[0])
+    return results[0]
+
+
+# ─── Producer ─────────────────────────────────────────────────────────────────
+def enqueue_gate_entry(job: dict) -> Optional[str]:
+    """
+    Append an arrival to the log:
+        {user_id, event_id, entry_date, arrival_time, approved_by_uid, metadata}
+    Returns its write_id, or None when it could not be logged — the caller
+    should then await write_gate_entry(job) itself.
+    """
+    if GATE_WRITE_WORKERS <= 0 or not _use_redis():
+        _counters["not_logged"] += 1
+        return None
+
+    write_id = uuid.uuid4().hex
+    job = {**job, "write_id": write_id, "enqueued_at": time.time()}
+    payload = json.dumps(job)
+    key = _pending_key(job["user_id"], job["event_id"], job["entry_date"])
+    try:
+        pipe = _redis.pipeline(transaction=True)
+        pipe.xadd(GATE_WRITE_LOG_KEY, {"job": payload})
+        pipe.hset(key, write_id, payload)
+        pipe.expire(key, _PENDING_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        logging.warning("[GateWrites] Log append failed, writing synchronously: %s", e)
+        _counters["not_logged"] += 1
+        return None
+    _counters["appended"] += 1
+    return write_id
+
+
+# ─── Pending arrivals (logged, not flushed yet) ───────────────────────────────
+def pending_entries(user_id: int, event_id: int, entry_date: str) -> list:
+    """Logged arrivals of this tourist shaped like entry_items rows (newest first)."""
+    if not _use_redis():
+        return []
+    try:
+        values = _redis.hvals(_pending_key(user_id, event_id, entry_date))
+    except Exception as e:
+        logging.warning("[GateWrites] pending read failed: %s", e)
+        return []
+    items = []
+    for value in values:
+        job = json.loads(value)
+        items.append({
+            "item_id":         None,
+            "record_id":       None,
+            "entry_point":     None,
+            "arrival_time":    job["arrival_time"],
+            "departure_time":  None,
+            "duration":        None,
+            "entry_type":      "qr_code_scan",
+            "bypass_reason":   None,
+            "approved_by_uid": job.get("approved_by_uid"),
+            "metadata":        {**(job.get("metadata") or {}), "write_id": job["write_id"]},
+            "pending":         True,
+        })
+    items.sort(key=lambda item: datetime.fromisoformat(item["arrival_time"]), reverse=True)
+    return items
+
+
+async def wait_for_pending_entry(user_id: int, event_id: int, entry_date: str) -> bool:
+    """
+    Wait up to GATE_PENDING_WAIT_SECONDS for logged arrivals of this tourist to
+    be flushed.  Returns False if some are still pending.
+    """
+    if not _use_redis():
+        return True
+    key = _pending_key(user_id, event_id, entry_date)
+    deadline = time.monotonic() + GATE_PENDING_WAIT_SECONDS
+    waited = False
+    while True:
+        try:
+            pending = _redis.hlen(key)
+        except Exception:
+            return True
+        if not pending:
+            return True
+        if not waited:
+            _counters["pending_waits"] += 1
+            waited = True
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(_POLL_SECONDS)
+
+
+# ─── Flushers ─────────────────────────────────────────────────────────────────
+def _ensure_group() -> None:
+    try:
+        _redis.xgroup_create(GATE_WRITE_LOG_KEY, GATE_WRITE_GROUP, id="0", mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _parse(entries) -> list:
+    """[(stream_id, fields)] → [(stream_id, job)]; entries deleted meanwhile come back empty."""
+    return [(stream_id, json.loads(fields["job"])) for stream_id, fields in entries if fields]
+
+
+async def _read_batch(consumer: str) -> list:
+    """
+    Up to GATE_WRITE_BATCH_ROWS new entries: blocks ≤1 s for the first, then
+    collects for at most GATE_WRITE_BATCH_MS more.
+    """
+    batch, deadline = [], None
+    while len(batch) < GATE_WRITE_BATCH_ROWS:
+        if deadline is None:
+            block_ms = _IDLE_BLOCK_MS
+        else:
+            block_ms = int((deadline - time.monotonic()) * 1000)
+            if block_ms <= 0:
+                break
+        resp = await asyncio.to_thread(
+            _redis.xreadgroup, GATE_WRITE_GROUP, consumer, {GATE_WRITE_LOG_KEY: ">"},
+            GATE_WRITE_BATCH_ROWS - len(batch), block_ms,
+        )
+        if resp:
+            batch.extend(_parse(resp[0][1]))
+            if deadline is None:
+                deadline = time.monotonic() + GATE_WRITE_BATCH_MS / 1000
+        elif deadline is None:
+            break
+    return batch
+
+
+async def _claim_stale(consumer: str) -> list:
+    """Entries another (dead) flusher read but never acked."""
+    resp = await asyncio.to_thread(
+        _redis.xautoclaim, GATE_WRITE_LOG_KEY, GATE_WRITE_GROUP, consumer,
+        GATE_WRITE_CLAIM_IDLE_MS, "0-0", GATE_WRITE_BATCH_ROWS,
+    )
+    return _parse(resp[1])
+
+
+async def _flush(batch: list) -> None:
+    """Write a batch (retrying until the DB takes it), then ack it and clear pending."""
+    jobs = [job for _, job in batch]
+    now = time.time()
+    for job in jobs:
+        _wait_ms.append((now - job.get("enqueued_at", now)) * 1000)
+
+    delay = GATE_WRITE_RETRY_SECONDS
+    while True:
+        start = time.perf_counter()
+        try:
+            results = await _write_batch(jobs)
+            break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _counters["batch_retries"] += 1
+            logging.warning("[GateWrites] Batch of %d failed, retrying in %.0fs: %s", len(jobs), delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, GATE_WRITE_RETRY_MAX_SECONDS)
+
+    _flush_ms.append((time.perf_counter() - start) * 1000)
+    _batch_rows.append(len(jobs))
+    _counters["batches"] += 1
+
+    by_write_id = {r.get("write_id"): r for r in results}
+    pipe = _redis.pipeline()
+    for _, job in batch:
+        result = by_write_id.get(job["write_id"])
+        if result and result.get("success"):
+            if result.get("duplicate"):
+                _counters["duplicates"] += 1
+            else:
+                _counters["written"] += 1
+                _count_arrival(job, result)
+        else:
+            _counters["failed"] += 1
+            error = (result or {}).get("message") or "no result returned"
+            logging.error("[GateWrites] Dropping arrival for user_id=%s event_id=%s to dead letters: %s",
+                          job["user_id"], job["event_id"], error)
+            pipe.lpush(GATE_WRITE_DEAD_KEY, json.dumps({**job, "error": error, "failed_at": time.time()}))
+        pipe.hdel(_pending_key(job["user_id"], job["event_id"], job["entry_date"]), job["write_id"])
+    stream_ids = [stream_id for stream_id, _ in batch]
+    pipe.xack(GATE_WRITE_LOG_KEY, GATE_WRITE_GROUP, *stream_ids)
+    pipe.xdel(GATE_WRITE_LOG_KEY, *stream_ids)
+    pipe.execute()
+
+
+async def _flusher(n: int) -> None:
+    consumer = f"{socket.gethostname()}:{os.getpid()}:{n}"
+    next_claim = 0.0  # recover right away at startup
+    while True:
+        try:
+            if time.monotonic() >= next_claim:
+                next_claim = time.monotonic() + max(GATE_WRITE_CLAIM_IDLE_MS / 1000, 1)
+                while True:
+                    stale = await _claim_stale(consumer)
+                    if not stale:
+                        break
+                    _counters["recovered"] += len(stale)
+                    logging.info("[GateWrites] flusher %d: replaying %d unacked log entries", n, len(stale))
+                    await _flush(stale)
+
+            batch = await _read_batch(consumer)
+            if batch:
+                await _flush(batch)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if "NOGROUP" in str(e):
+                # Log key or group lost (Redis flush / failover) — recreate it; whatever is
+                # still in the log is read again from id 0 and de-duplicated on write_id
+                logging.warning("[GateWrites] flusher %d: consumer group missing, recreating it", n)
+                try:
+                    await asyncio.to_thread(_ensure_group)
+                    _counters["group_recreated"] += 1
+                    continue
+                except Exception as group_error:
+                    e = group_error
+            logging.error("[GateWrites] flusher %d error: %s", n, e)
+            await asyncio.sleep(1)
+
+
+async def run_gate_write_workers() -> None:
+    """
+    Background coroutine — call once at startup with asyncio.create_task().
+    Runs GATE_WRITE_WORKERS flushers.
+    """
+    if GATE_WRITE_WORKERS <= 0 or not _use_redis():
+        logging.info("[GateWrites] Log disabled — signed-QR / write-behind scans are written synchronously")
+        return
+    try:
+        _ensure_group()
+    except Exception as e:
+        logging.error("[GateWrites] Could not create consumer group: %s", e)
+        return
+    logging.info("[GateWrites] Starting %d flusher(s) (batch %d rows / %d ms, write-behind=%s)",
+                 GATE_WRITE_WORKERS, GATE_WRITE_BATCH_ROWS, GATE_WRITE_BATCH_MS, GATE_WRITE_BEHIND)
+    await asyncio.gather(*(_flusher(i) for i in range(GATE_WRITE_WORKERS)))
+
+
+# ─── Metrics ──────────────────────────────────────────────────────────────────
+def metrics_snapshot() -> dict:
+    log_length = unacked = dead = None
+    if _use_redis():
+        try:
+            log_length = _redis.xlen(GATE_WRITE_LOG_KEY)
+            dead = _redis.llen(GATE_WRITE_DEAD_KEY)
+            unacked = _redis.xpending(GATE_WRITE_LOG_KEY, GATE_WRITE_GROUP)["pending"]
+        except Exception:
+            pass
+    return {
+        "write_behind":   GATE_WRITE_BEHIND,
+        "workers":        GATE_WRITE_WORKERS,
+        "batch_rows":     GATE_WRITE_BATCH_ROWS,
+        "batch_ms":       GATE_WRITE_BATCH_MS,
+        "log_length":     log_length,
+        "unacked":        unacked,
+        "dead":           dead,
+        "counters":       dict(_counters),
+        "queue_wait":     latency_summary(_wait_ms),
+        "flush_latency":  latency_summary(_flush_ms),
+        "avg_batch_rows": round(sum(_batch_rows) / len(_batch_rows), 1) if _batch_rows else None,
+    }
@@ -0,0 +1,494 @@
+"""
+Live occupancy counters — "currently inside" without scanning entry_items.
+
+Import:
+    from utils.services.occupancy import (
+        record_arrival, record_departure, get_occupancy, occupancy_crowd_status,
+        occupancy_capacity_alerts, entry_counts,
+    )
+
+crowd_status used to be recomputed from entry_items on every analytics /
+tourist-list call.  Arrivals and departures now update per-event, per-day
+Redis counters as they are written:
+
+    occupancy:{event_id}:{date}:stats   hash  inside_registrations, inside_members,
+                                              groups_inside, individuals_inside,
+                                              entries_total, type:{entry_type}, hour:{HH}
+    occupancy:{event_id}:{date}:open    hash  user_id → open entry_items
+    occupancy:{event_id}:{date}:weight  hash  user_id → members (group_count for groups)
+    occupancy:{event_id}:{date}:groups  set   user_ids of groups currently inside
+    occupancy:{event_id}:{date}:visits  hash  user_id → entry_items of the day
+    occupancy:{event_id}:{date}:reconciling / :journal   while a rebuild runs (below)
+
+Each update is one Lua script, so the inside_* totals move only when a
+tourist's open count goes 0 → 1 or 1 → 0 and can't be torn by concurrent scans.
+
+Reconciliation:
+    run_occupancy_reconcile_loop() (started from main.py) rebuilds the keys
+    of every active event for today from the get_event_occupancy RPC
+    (supabase_rpc_event_occupancy.sql) every OCCUPANCY_RECONCILE_SECONDS —
+    repairing drift from entries written outside the API, dead-lettered
+    writes or a Redis restart.  It does not need a quiet gate:
+      1. set the :reconciling marker — from now on every update is also
+         appended to :journal (scan time, user_id, …)
+      2. read the RPC (its as_of is the DB snapshot time) and write the
+         result into :rebuild:* keys
+      3. one Lua script swaps the rebuilt keys in and replays the journal
+         entries newer than as_of on top, then drops marker and journal
+    Updates are counted after their DB write commits, so journal entries
+    from before as_of are already in the snapshot.
+    Counters are only served once a reconciliation has stamped reconciled_at;
+    before that (or without Redis) callers fall back to the DB.
+
+Every update is also published on OCCUPANCY_FEED_CHANNEL as a small delta
+(entry / departure, user_id, members, whether the tourist's inside state
+changed) — the analytics push feed (utils/services/analytics_feed.py)
+fans these out to open dashboards.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
+from utils.services.redis_client import redis_client as _redis, redis_ok as _redis_ok
+from utils.india_time import IST, india_today_str
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+OCCUPANCY_RECONCILE_SECONDS  = int(os.getenv("OCCUPANCY_RECONCILE_SECONDS",  "300"))
+OCCUPANCY_TTL_SECONDS        = int(os.getenv("OCCUPANCY_TTL_SECONDS",        str(2 * 24 * 3600)))
+OCCUPANCY_KEY_PREFIX         = "occupancy:"
+OCCUPANCY_RECONCILE_LOCK     = "occupancy:reconcile_lock"
+OCCUPANCY_FEED_CHANNEL       = "occupancy:feed"
+
+_INSIDE_FIELDS = ("inside_registrations", "inside_members", "groups_inside", "individuals_inside")
+_JOURNAL_TTL_SECONDS = 600   # a rebuild that takes longer is abandoned (marker expired)
+
+_counters = {
+    "arrivals": 0, "departures": 0, "unmatched_departures": 0,
+    "reconciles": 0, "repaired": 0, "journal_replayed": 0, "reconcile_busy": 0,
+    "reconcile_expired": 0, "publish_errors": 0,
+}
+_last_drift: dict[str, dict] = {}
+
+# Shared by the update scripts and the rebuild.  KEYS[1..5]: stats, open, weight, groups, visits
+_LUA_FUNCTIONS = """
+local function arrive(user_id, members, is_group, entry_type, hour)
+  local open = redis.call('HINCRBY', KEYS[2], user_id, 1)
+  redis.call('HINCRBY', KEYS[5], user_id, 1)
+  redis.call('HINCRBY', KEYS[1], 'entries_total', 1)
+  redis.call('HINCRBY', KEYS[1], 'type:' .. entry_type, 1)
+  redis.call('HINCRBY', KEYS[1], 'hour:' .. hour, 1)
+  if open == 1 then
+    redis.call('HSET', KEYS[3], user_id, members)
+    redis.call('HINCRBY', KEYS[1], 'inside_registrations', 1)
+    redis.call('HINCRBY', KEYS[1], 'inside_members', tonumber(members))
+    if is_group == '1' then
+      redis.call('SADD', KEYS[4], user_id)
+      redis.call('HINCRBY', KEYS[1], 'groups_inside', 1)
+    else
+      redis.call('HINCRBY', KEYS[1], 'individuals_inside', 1)
+    end
+  end
+  return open
+end
+
+local function depart(user_id)
+  local open = tonumber(redis.call('HGET', KEYS[2], user_id) or '0')
+  if open <= 0 then return {-1, 0} end
+  open = redis.call('HINCRBY', KEYS[2], user_id, -1)
+  local members = tonumber(redis.call('HGET', KEYS[3], user_id) or '1')
+  if open == 0 then
+    redis.call('HDEL', KEYS[2], user_id)
+    redis.call('HDEL', KEYS[3], user_id)
+    redis.call('HINCRBY', KEYS[1], 'inside_registrations', -1)
+    redis.call('HINCRBY', KEYS[1], 'inside_members', -members)
+    if redis.call('SREM', KEYS[4], user_id) == 1 then
+      redis.call('HINCRBY', KEYS[1], 'groups_inside', -1)
+    else
+      redis.call('HINCRBY', KEYS[1], 'individuals_inside', -1)
+    end
+  end
+  return {open, members}
+end
+"""
+
+# KEYS: stats, open, weight, groups, visits, reconciling, journal
+# ARGV: user_id, members, is_group, entry_type, hour, ttl, scan time
+_ARRIVE_LUA = _LUA_FUNCTIONS + """
+if redis.call('EXISTS', KEYS[6]) == 1 then
+  redis.call('RPUSH', KEYS[7], table.concat({'a', ARGV[7], ARGV[1], ARGV[2], ARGV[3], ARGV[5], ARGV[4]}, '|'))
+end
+local open = arrive(ARGV[1], ARGV[2], ARGV[3], ARGV[4], ARGV[5])
+for i = 1, 5 do redis.call('EXPIRE', KEYS[i], ARGV[6]) end
+return open
+"""
+
+# KEYS: stats, open, weight, groups, visits, reconciling, journal   ARGV: user_id, scan time
+_DEPART_LUA = _LUA_FUNCTIONS + """
+if redis.call('EXISTS', KEYS[6]) == 1 then
+  redis.call('RPUSH', KEYS[7], table.concat({'d', ARGV[2], ARGV[1]}, '|'))
+end
+return depart(ARGV[1])
+"""
+
+# KEYS: stats, open, weight, groups, visits, reconciling, journal, then the 5 rebuilt keys
+# ARGV: as_of, ttl, reconciled_at
+# Returns the stats hash it replaced (flat) and the number of journal entries
+# replayed, or nil when the marker expired (journal incomplete — nothing swapped).
+_REBUILD_LUA = _LUA_FUNCTIONS + """
+if redis.call('EXISTS', KEYS[6]) == 0 then return nil end
+local previous = redis.call('HGETALL', KEYS[1])
+local journal = redis.call('LRANGE', KEYS[7], 0, -1)
+for i = 1, 5 do
+  if redis.call('EXISTS', KEYS[i + 7]) == 1 then
+    redis.call('RENAME', KEYS[i + 7], KEYS[i])
+  else
+    redis.call('DEL', KEYS[i])
+  end
+end
+local replayed = 0
+for _, line in ipairs(journal) do
+  local kind, at, rest = string.match(line, '^(%a)|([^|]*)|(.*)$')
+  if tonumber(at) > tonumber(ARGV[1]) then
+    if kind == 'a' then
+      local user_id, members, is_group, hour, entry_type = string.match(rest, '^([^|]*)|([^|]*)|([^|]*)|([^|]*)|(.*)$')
+      arrive(user_id, members, is_group, entry_type, hour)
+    else
+      depart(rest)
+    end
+    replayed = replayed + 1
+  end
+end
+redis.call('HSET', KEYS[1], 'reconciled_at', ARGV[3])
+for i = 1, 5 do redis.call('EXPIRE', KEYS[i], ARGV[2]) end
+redis.call('DEL', KEYS[6], KEYS[7])
+return {previous, replayed}
+"""
+
+_scripts: dict = {}
+
+
+def _use_redis() -> bool:
+    return bool(_redis_ok and _redis)
+
+
+def _script(name: str, source: str):
+    if name not in _scripts:
+        _scripts[name] = _redis.register_script(source)
+    return _scripts[name]
+
+
+def _keys(event_id: int, entry_date: str) -> list:
+    """stats, open, weight, groups, visits, reconciling, journal."""
+    prefix = f"{OCCUPANCY_KEY_PREFIX}{event_id}:{entry_date}:"
+    return [prefix + "stats", prefix + "open", prefix + "weight", prefix + "groups", prefix + "visits",
+            prefix + "reconciling", prefix + "journal"]
+
+
+def _rebuild_keys(event_id: int, entry_date: str) -> list:
+    prefix = f"{OCCUPANCY_KEY_PREFIX}{event_id}:{entry_date}:rebuild:"
+    return [prefix + "stats", prefix + "open", prefix + "weight", prefix + "groups", prefix + "visits"]
+
+
+def _ist_hour(arrival_time) -> int:
+    if not arrival_time:
+        return datetime.now(IST).hour
+    if isinstance(arrival_time, str):
+        arrival_time = datetime.fromisoformat(arrival_time.replace("Z", "+00:00"))
+    return arrival_time.astimezone(IST).hour
+
+
+def _publish(delta: dict) -> None:
+    try:
+        _redis.publish(OCCUPANCY_FEED_CHANNEL, json.dumps(delta))
+    except Exception as e:
+        _counters["publish_errors"] += 1
+        logging.warning("[Occupancy] feed publish failed: %s", e)
+
+
+def members_of(is_group, group_count) -> int:
+    """Headcount of a registration — same weighting as the analytics RPC."""
+    return max(int(group_count or 1), 1) if is_group else 1
+
+
+# ─── Updates ──────────────────────────────────────────────────────────────────
+def record_arrival(event_id: int, entry_date: str, user_id: int, members: int = 1,
+                   is_group: bool = False, entry_type: str = "qr_code_scan", arrival_time=None) -> None:
+    """Count a written arrival.  Never raises — drift is repaired by reconciliation."""
+    if not _use_redis():
+        return
+    members, hour = max(int(members or 1), 1), _ist_hour(arrival_time)
+    try:
+        open_items = _script("arrive", _ARRIVE_LUA)(
+            keys=_keys(event_id, str(entry_date)),
+            args=[user_id, members, 1 if is_group else 0,
+                  entry_type or "unknown", f"{hour:02d}", OCCUPANCY_TTL_SECONDS, time.time()],
+        )
+        _counters["arrivals"] += 1
+    except Exception as e:
+        logging.warning("[Occupancy] arrival update failed for user_id=%s: %s", user_id, e)
+        return
+    _publish({
+        "kind": "entry", "event_id": event_id, "date": str(entry_date), "user_id": user_id,
+        "members": members, "is_group": bool(is_group), "entry_type": entry_type or "unknown",
+        "hour": hour, "entered": open_items == 1,
+    })
+
+
+def record_departure(event_id: int, entry_date: str, user_id: int) -> None:
+    """Count a written departure.  Never raises — drift is repaired by reconciliation."""
+    if not _use_redis():
+        return
+    try:
+        open_left, members = _script("depart", _DEPART_LUA)(
+            keys=_keys(event_id, str(entry_date)), args=[user_id, time.time()],
+        )
+        _counters["departures"] += 1
+        if open_left == -1:
+            _counters["unmatched_departures"] += 1
+    except Exception as e:
+        logging.warning("[Occupancy] departure update failed for user_id=%s: %s", user_id, e)
+        return
+    _publish({
+        "kind": "departure", "event_id": event_id, "date": str(entry_date), "user_id": user_id,
+        "members": members, "left": open_left == 0,
+    })
+
+
+# ─── Reads ────────────────────────────────────────────────────────────────────
+def get_occupancy(event_id: int, entry_date: Optional[str] = None) -> Optional[dict]:
+    """
+    Counter snapshot for an event / day, or None when the counters are not
+    initialised yet (no reconciliation since they were created) or Redis is down.
+    """
+    if not _use_redis():
+        return None
+    entry_date = entry_date or india_today_str()
+    try:
+        raw = _redis.hgetall(_keys(event_id, entry_date)[0])
+    except Exception as e:
+        logging.warning("[Occupancy] read failed for event_id=%s: %s", event_id, e)
+        return None
+    if "reconciled_at" not in raw:
+        return None
+
+    snapshot = {field: max(int(raw.get(field, 0)), 0) for field in _INSIDE_FIELDS}
+    snapshot["entries_total"] = int(raw.get("entries_total", 0))
+    snapshot["entry_types"] = {k[5:]: int(v) for k, v in raw.items() if k.startswith("type:") and int(v)}
+    snapshot["hourly"] = sorted(
+        ({"hour": int(k[5:]), "entries": int(v)} for k, v in raw.items() if k.startswith("hour:") and int(v)),
+        key=lambda h: h["hour"],
+    )
+    snapshot["reconciled_at"] = float(raw["reconciled_at"])
+    return snapshot
+
+
+def entry_counts(event_id: int, entry_date: str, user_ids) -> Optional[dict]:
+    """
+    {user_id: (entries of the day, open entries)} for `user_ids` — the
+    today_entry block of the tourist endpoints without reading entry_items.
+    Users without an entry are left out.  None when the counters are not
+    initialised or Redis is down (callers fall back to the DB).
+    """
+    user_ids = [int(u) for u in user_ids]
+    if not _use_redis():
+        return None
+    keys = _keys(event_id, entry_date)
+    try:
+        pipe = _redis.pipeline(transaction=False)
+        pipe.hexists(keys[0], "reconciled_at")
+        if user_ids:
+            pipe.hmget(keys[4], user_ids)
+            pipe.hmget(keys[1], user_ids)
+        result = pipe.execute()
+    except Exception as e:
+        logging.warning("[Occupancy] read failed for event_id=%s: %s", event_id, e)
+        return None
+    if not result[0]:
+        return None
+    if not user_ids:
+        return {}
+    return {
+        user_id: (int(visits), max(int(open_items or 0), 0))
+        for user_id, visits, open_items in zip(user_ids, result[1], result[2])
+        if visits and int(visits) > 0
+    }
+
+
+def occupancy_crowd_status(snapshot: dict, max_capacity: Optional[int]) -> dict:
+    """crowd_status in the same shape as the get_event_analytics RPC."""
+    people = snapshot["inside_members"]
+    capacity_pct = round(people / max_capacity * 100, 2) if max_capacity else None
+    if capacity_pct is None:
+        capacity_status = "unknown"
+    elif capacity_pct >= 90:
+        capacity_status = "critical"
+    elif capacity_pct >= 75:
+        capacity_status = "high"
+    elif capacity_pct >= 50:
+        capacity_status = "moderate"
+    else:
+        capacity_status = "low"
+    return {
+        "currently_inside":    snapshot["inside_registrations"],
+        "total_people_inside": people,
+        "groups_inside":       snapshot["groups_inside"],
+        "individuals_inside":  snapshot["individuals_inside"],
+        "capacity_percentage": capacity_pct,
+        "capacity_status":     capacity_status,
+        "source":              "live_counters",
+    }
+
+
+def occupancy_capacity_alerts(crowd_status: dict, max_capacity: Optional[int]) -> list:
+    """The get_event_analytics capacity alert (section 8a) for a live crowd_status."""
+    capacity_pct = crowd_status.get("capacity_percentage")
+    if not max_capacity or capacity_pct is None or capacity_pct < 75:
+        return []
+    critical = capacity_pct >= 90
+    return [{
+        "type":     "capacity_critical" if critical else "capacity_high",
+        "severity": "critical" if critical else "warning",
+        "message":  f"Capacity at {capacity_pct}% – {'Critical' if critical else 'High'}",
+        "data":     {"current": crowd_status["total_people_inside"], "max": max_capacity, "percentage": capacity_pct},
+    }]
+
+
+# ─── Reconciliation ───────────────────────────────────────────────────────────
+def _expected_state(truth: dict) -> tuple:
+    """get_event_occupancy result → (stats, open, weight, groups, visits) as stored in Redis."""
+    counts = {field: 0 for field in _INSIDE_FIELDS}
+    counts["entries_total"] = int(truth.get("entries_total") or 0)
+    for entry_type, n in (truth.get("entry_types") or {}).items():
+        counts[f"type:{entry_type}"] = int(n)
+    for hour, n in (truth.get("hours") or {}).items():
+        counts[f"hour:{int(hour):02d}"] = int(n)
+
+    open_items, weights, groups = {}, {}, set()
+    for user_id, n_open, members, is_group in truth.get("open") or []:
+        open_items[str(user_id)] = int(n_open)
+        weights[str(user_id)] = int(members)
+        counts["inside_registrations"] += 1
+        counts["inside_members"] += int(members)
+        if is_group:
+            groups.add(str(user_id))
+            counts["groups_inside"] += 1
+        else:
+            counts["individuals_inside"] += 1
+    visits = {str(user_id): int(n) for user_id, n in truth.get("visits") or []}
+    return counts, open_items, weights, groups, visits
+
+
+def _drift(current: dict, expected: dict) -> dict:
+    fields = set(current) | set(expected)
+    fields.discard("reconciled_at")
+    return {
+        field: {"redis": int(current.get(field, 0)), "db": expected.get(field, 0)}
+        for field in sorted(fields)
+        if int(current.get(field, 0)) != expected.get(field, 0)
+    }
+
+
+async def reconcile_occupancy(event_id: int, entry_date: Optional[str] = None) -> dict:
+    """
+    Rebuild the counters of one event / day from the DB while scans keep
+    coming (see the module docstring).  Returns the drift that was repaired
+    ({field: {"redis": .., "db": ..}}).
+    """
+    if not _use_redis():
+        return {}
+    entry_date = entry_date or india_today_str()
+    keys = _keys(event_id, entry_date)
+    rebuild = _rebuild_keys(event_id, entry_date)
+
+    started = time.time()
+    if not _redis.set(keys[5], started, nx=True, ex=_JOURNAL_TTL_SECONDS):
+        _counters["reconcile_busy"] += 1     # another rebuild of this day is running
+        return {}
+    swapped = False
+    try:
+        # Entries journaled before the RPC's snapshot are in it anyway
+        _redis.delete(keys[6])
+        resp = await db_execute(supabaseAdmin.rpc(
+            "get_event_occupancy", {"p_event_id": event_id, "p_date": entry_date}
+        ))
+        truth = resp.data or {}
+        expected, open_items, weights, groups, visits = _expected_state(truth)
+        as_of = float(truth.get("as_of") or started)
+
+        pipe = _redis.pipeline()
+        pipe.delete(*rebuild)
+        pipe.hset(rebuild[0], mapping=expected)
+        if open_items:
+            pipe.hset(rebuild[1], mapping=open_items)
+            pipe.hset(rebuild[2], mapping=weights)
+        if groups:
+            pipe.sadd(rebuild[3], *groups)
+        if visits:
+            pipe.hset(rebuild[4], mapping=visits)
+        for key in rebuild:
+            pipe.expire(key, _JOURNAL_TTL_SECONDS)
+        pipe.execute()
+
+        result = _script("rebuild", _REBUILD_LUA)(
+            keys=keys + rebuild, args=[as_of, OCCUPANCY_TTL_SECONDS, time.time()],
+        )
+        if result is None:
+            _counters["reconcile_expired"] += 1
+            logging.warning("[Occupancy] Reconcile of event_id=%s %s took over %ss — abandoned",
+                            event_id, entry_date, _JOURNAL_TTL_SECONDS)
+            return {}
+        swapped = True
+        previous, replayed = result
+        rebuilt = _redis.hgetall(keys[0])
+    finally:
+        if not swapped:
+            _redis.delete(keys[5], keys[6], *rebuild)
+
+    _counters["reconciles"] += 1
+    _counters["journal_replayed"] += replayed
+    rebuilt.pop("reconciled_at", None)
+    drift = _drift(dict(zip(previous[::2], previous[1::2])), {k: int(v) for k, v in rebuilt.items()})
+    if drift:
+        _counters["repaired"] += 1
+        logging.info("[Occupancy] Repaired drift for event_id=%s %s: %s", event_id, entry_date, drift)
+    _last_drift[f"{event_id}:{entry_date}"] = drift
+    return drift
+
+
+async def run_occupancy_reconcile_loop() -> None:
+    """
+    Background coroutine — call once at startup with asyncio.create_task().
+    Reconciles every active event for today now and every
+    OCCUPANCY_RECONCILE_SECONDS; the Redis lock keeps it to one worker.
+    """
+    if not _use_redis():
+        logging.info("[Occupancy] Redis unavailable — occupancy is computed from the DB")
+        return
+    while True:
+        try:
+            if _redis.set(OCCUPANCY_RECONCILE_LOCK, "1", nx=True, ex=max(1, OCCUPANCY_RECONCILE_SECONDS - 5)):
+                events = (await db_execute(
+                    supabaseAdmin.table("events").select("event_id").eq("is_active", True)
+                )).data or []
+                for event in events:
+                    await reconcile_occupancy(event["event_id"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.warning("[Occupancy] Reconciliation failed: %s", e)
+        await asyncio.sleep(OCCUPANCY_RECONCILE_SECONDS)
+
+
+def stats() -> dict:
+    return {
+        "backend":    "redis" if _use_redis() else "disabled",
+        "counters":   dict(_counters),
+        "last_drift": dict(_last_drift),
+    }
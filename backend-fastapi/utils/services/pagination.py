@@ -0,0 +1,162 @@
+"""
+Keyset (cursor) pagination + cached, filter-aware row counts for listings.
+
+Import:
+    from utils.services.pagination import (
+        decode_cursor, page_cursors, cached_count, adjust_count, tourist_count_name,
+        event_tourist_count_name,
+    )
+
+Listings used .range(offset, offset + limit - 1): every deep page made the
+DB walk and discard `offset` rows first, and the page total came from
+rpc("count_tourists") — a global count that ignored the date filter — or
+from fetching every row id just to len() it.
+
+Cursors:
+    A page is fetched "after" (next) or "before" (prev) the sort key of the
+    row at its edge.  The key is wrapped in an opaque urlsafe-base64 cursor:
+
+        next_cursor → rows after the last row of this page
+        prev_cursor → rows before the first row of this page
+
+    Routes fetch limit + 1 rows to know whether another page exists.  Keys
+    are whatever the route sorts on (user_id, or [submitted_at, session_id]).
+
+Counts:
+    cached_count(name, compute) keeps a count per filter (e.g.
+    "tourists:date:2026-03-01") in Redis for COUNT_CACHE_TTL_SECONDS.
+    Writers call adjust_count(name, +1) after inserting a row, which only
+    touches counts that are already cached — so pages never recount, and the
+    TTL bounds drift from writes made outside the API.  Without Redis a
+    per-process copy is kept for the same TTL.
+"""
+
+import os
+import json
+import time
+import base64
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, status
+
+from utils.services.redis_client import redis_client as _redis, redis_ok as _redis_ok
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+COUNT_CACHE_TTL_SECONDS = int(os.getenv("COUNT_CACHE_TTL_SECONDS", "300"))
+COUNT_KEY_PREFIX        = "count:"
+
+# KEYS: count key   ARGV: delta — INCRBY only when the count is cached
+_ADJUST_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return false
+"""
+
+_adjust_script = None
+_local_counts: dict[str, tuple[float, int]] = {}   # name → (expires_at, count)
+
+
+def _use_redis() -> bool:
+    return bool(_redis_ok and _redis)
+
+
+# ─── Cursors ──────────────────────────────────────────────────────────────────
+def encode_cursor(key: Any, direction: str) -> str:
+    raw = json.dumps({"k": key, "d": direction}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: Optional[str], valid: Callable[[Any], bool] = lambda key: type(key) is int) -> tuple:
+    """
+    Opaque cursor → (direction, key); (None, None) for the first page.
+    400 when malformed or when valid(key) is false — keys end up in filters,
+    so routes pass a strict check (default: an integer id).
+    """
+    if not cursor:
+        return None, None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if data["d"] not in ("next", "prev") or not valid(data["k"]):
+            raise ValueError(data)
+        return data["d"], data["k"]
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor",
+        )
+
+
+def page_cursors(rows: list, key: Callable[[dict], Any], has_more: bool,
+                 direction: Optional[str], has_previous: bool = False) -> dict:
+    """
+    next_cursor / prev_cursor for a page already in display order.
+    has_more: the limit + 1 probe found another row in the fetch direction.
+    has_previous: first page reached by offset > 0 (legacy ?offset=).
+    """
+    if not rows:
+        return {"next_cursor": None, "prev_cursor": None}
+    if direction == "prev":
+        more_after, more_before = True, has_more
+    else:
+        more_after, more_before = has_more, direction == "next" or has_previous
+    return {
+        "next_cursor": encode_cursor(key(rows[-1]), "next") if more_after else None,
+        "prev_cursor": encode_cursor(key(rows[0]), "prev") if more_before else None,
+    }
+
+
+# ─── Counts ───────────────────────────────────────────────────────────────────
+async def cached_count(name: str, compute: Callable[[], Awaitable[int]]) -> int:
+    """Cached count for a filter; compute() runs only on a miss."""
+    if _use_redis():
+        try:
+            cached = _redis.get(COUNT_KEY_PREFIX + name)
+            if cached is not None:
+                return int(cached)
+        except Exception as e:
+            logging.warning("[Pagination] count read failed for %s: %s", name, e)
+    else:
+        hit = _local_counts.get(name)
+        if hit and hit[0] > time.monotonic():
+            return hit[1]
+
+    count = int(await compute() or 0)
+    if _use_redis():
+        try:
+            _redis.set(COUNT_KEY_PREFIX + name, count, ex=COUNT_CACHE_TTL_SECONDS, nx=True)
+        except Exception as e:
+            logging.warning("[Pagination] count write failed for %s: %s", name, e)
+    else:
+        _local_counts[name] = (time.monotonic() + COUNT_CACHE_TTL_SECONDS, count)
+    return count
+
+
+def adjust_count(name: str, delta: int = 1) -> None:
+    """Apply a write to a cached count (no-op when it is not cached).  Never raises."""
+    global _adjust_script
+    try:
+        if _use_redis():
+            if _adjust_script is None:
+                _adjust_script = _redis.register_script(_ADJUST_LUA)
+            _adjust_script(keys=[COUNT_KEY_PREFIX + name], args=[delta])
+        elif name in _local_counts:
+            expires_at, count = _local_counts[name]
+            _local_counts[name] = (expires_at, count + delta)
+    except Exception as e:
+        logging.warning("[Pagination] count adjust failed for %s: %s", name, e)
+
+
+def tourist_count_name(valid_date) -> str:
+    """Count of tourists with this valid_date (GET /tourists/) — adjust after inserts."""
+    return f"tourists:date:{valid_date}"
+
+
+def event_tourist_count_name(event_id, valid_date, search: Optional[str] = None) -> str:
+    """
+    Count of an event's tourists with this valid_date (GET /tourists/event/{id}),
+    optionally narrowed by a name search — adjust the unsearched one after inserts.
+    """
+    name = f"tourists:event:{event_id}:date:{valid_date}"
+    return f"{name}:search:{search.lower()}" if search else name
@@ -5,10 +5,21 @@ import hashlib
 import base64
 import secrets
 import string
+from typing import Optional
 from urllib.parse import urlencode
 from utils.supabase.supabase import supabaseAdmin
 
 SECRET_KEY = os.getenv("PUBLIC_LINK_SECRET", "default_secret")
+# Encode a signed payload (user_id|event_id|valid_date) in the card QR instead of
+# the short code, so gates can verify it offline; the short code stays printed as ID.
+# Anyone holding the key can mint a gate pass for any user_id, so signing needs its
+# own explicit secret — never the PUBLIC_LINK_SECRET fallback / default.
+SIGNED_QR_ENABLED = os.getenv("SIGNED_QR_ENABLED", "false").lower() == "true"
+QR_SIGNING_SECRET = os.getenv("QR_SIGNING_SECRET", "")
+if SIGNED_QR_ENABLED and (len(QR_SIGNING_SECRET) < 32 or QR_SIGNING_SECRET == "default_secret"):
+    raise ValueError("SIGNED_QR_ENABLED=true requires QR_SIGNING_SECRET (at least 32 characters)")
+SIGNED_QR_PREFIX = "T1."
+SIGNED_QR_SIG_BYTES = 12  # truncated HMAC-SHA256 → 16 base64url chars, keeps the QR small
 STATIC_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../static'))
 BASE_URL = "/static"  # Adjust if you serve static differently
 
@@ -43,43 +54,85 @@ def verify_public_access_link(file: str, expires: int, sig: str) -> bool:
     return hmac.compare_digest(sig, expected_sig_b64)
 
 
-def short_url_generator(length: int = 6, max_retries: int = 5) -> str:
+def _signed_qr_sig(user_id: int, event_id: int, valid_date: str) -> str:
+    data = f"qr|{user_id}|{event_id}|{valid_date}"
+    signature = hmac.new(QR_SIGNING_SECRET.encode(), data.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(signature[:SIGNED_QR_SIG_BYTES]).decode()
+
+
+def generate_signed_qr_payload(user_id: int, event_id: int, valid_date) -> str:
+    """
+    Compact signed QR payload for offline-capable gate scans:
+        T1.{user_id}.{event_id}.{YYYYMMDD}.{sig}
+    sig is an HMAC over user_id|event_id|valid_date, so the gate can trust the
+    fields without looking the card up.
+    """
+    if not SIGNED_QR_ENABLED:
+        raise RuntimeError("Signed QR payloads are disabled (SIGNED_QR_ENABLED=false)")
+    valid_date = str(valid_date)[:10]
+    sig = _signed_qr_sig(int(user_id), int(event_id), valid_date)
+    return f"{SIGNED_QR_PREFIX}{int(user_id)}.{int(event_id)}.{valid_date.replace('-', '')}.{sig}"
+
+
+def is_signed_qr_payload(code: str) -> bool:
+    """True only while signed QR is enabled — otherwise T1.… is treated as an unknown short code."""
+    return SIGNED_QR_ENABLED and bool(code) and code.startswith(SIGNED_QR_PREFIX)
+
+
+def verify_signed_qr_payload(payload: str) -> Optional[dict]:
+    """
+    Verify a payload from generate_signed_qr_payload.
+    Returns {"user_id", "event_id", "valid_date" (YYYY-MM-DD)} or None if it is
+    malformed or the signature does not match.
     """
-    Generate a unique short code for URL shortening.
-    
-    Args:
-        length: Length of the short code (default: 6 chars) → ~2.2 billion combinations
-        max_retries: Max collision retry attempts (default: 5)
-    
-    Returns:
-        A unique alphanumeric short code (e.g., "a7b2c9")
-    
+    if not is_signed_qr_payload(payload):
+        return None
+    parts = payload[len(SIGNED_QR_PREFIX):].split(".")
+    if len(parts) != 4:
+        return None
+    user_id, event_id, ymd, sig = parts
+    if not (user_id.isdigit() and event_id.isdigit() and ymd.isdigit() and len(ymd) == 8):
+        return None
+    valid_date = f"{ymd[:4]}-{ymd[4:6]}-{ymd[6:]}"
+    expected_sig = _signed_qr_sig(int(user_id), int(event_id), valid_date)
+    if not hmac.compare_digest(sig, expected_sig):
+        return None
+    return {"user_id": int(user_id), "event_id": int(event_id), "valid_date": valid_date}
+
+
+def short_url_batch(count: int, length: int = 6, max_retries: int = 5, chunk_size: int = 200) -> list:
+    """
+    Generate `count` unique short codes with one short_links lookup per
+    chunk_size candidates (bulk registration), instead of one query per code.
+
     Raises:
-        RuntimeError if unable to generate unique code after max_retries attempts
+        RuntimeError if colliding candidates could not be replaced after max_retries rounds
     """
-    alphabet = string.ascii_letters + string.digits  # A-Z, a-z, 0-9 (62 chars)
-    
+    alphabet = string.ascii_letters + string.digits
+    codes: list = []
     for attempt in range(max_retries):
-        # Generate random short code
-        short_code = ''.join(secrets.choice(alphabet) for _ in range(length))
-        
-        # Check if already exists in short_links table
+        seen = set(codes)
+        candidates = []
+        while len(candidates) < count - len(codes):
+            code = ''.join(secrets.choice(alphabet) for _ in range(length))
+            if code not in seen:
+                seen.add(code)
+                candidates.append(code)
+        taken = set()
         try:
-            resp = (
-                supabaseAdmin.table("short_links")
-                .select("short_code")
-                .eq("short_code", short_code)
-                .execute()  # Use execute() instead of .single() to avoid errors on 0 rows
-            )
-            
-            # If no data returned, short_code is unique
-            if not resp.data or len(resp.data) == 0:
-                return short_code
-            
+            for start in range(0, len(candidates), chunk_size):
+                resp = (
+                    supabaseAdmin.table("short_links")
+                    .select("short_code")
+                    .in_("short_code", candidates[start:start + chunk_size])
+                    .execute()
+                )
+                taken.update(row["short_code"] for row in resp.data or [])
         except Exception as e:
-            # Log error but continue retrying
             print(f"Error checking short_code uniqueness (attempt {attempt + 1}): {e}")
             continue
-    
-    # Failed to generate unique code after retries
-    raise RuntimeError(f"Failed to generate unique short code after {max_retries} attempts") 
+        codes.extend(c for c in candidates if c not in taken)
+        if len(codes) >= count:
+            return codes
+
+    raise RuntimeError(f"Failed to generate {count} unique short codes after {max_retries} attempts")
@@ -0,0 +1,184 @@
+"""
+Idempotent QR scans — used by POST /entry/ and POST /entry/departure.
+
+Import:
+    from utils.services.scan_idempotency import run_idempotent_scan
+
+Guards double-tap and the Flutter app retries on flaky Wi-Fi; every retry
+used to be another Supabase write and a spurious "re-entry".  Each scan now
+claims a Redis key before touching the database:
+
+  • no header      → scan_idem:{event_id}:{action}:{short_code}
+                     held for SCAN_DEDUPE_WINDOW_SECONDS
+  • Idempotency-Key → scan_idem:key:{event_id}:{action}:{short_code}:{key}
+                     held for SCAN_IDEMPOTENCY_KEY_TTL_SECONDS (scoped to the
+                     short code, so a reused key never replays another visitor)
+
+The first request stores its response when it is a 2xx or a deterministic
+refusal (REPLAYED_ERROR_STATUSES: not found / wrong date / conflict).  Any
+other error — a 5xx, or the 400 the routes turn DB failures into — releases
+the key so the retry runs for real.  Duplicates get the stored response back with
+an `Idempotent-Replayed: true` header; a duplicate that arrives while the
+first is still running waits up to SCAN_PENDING_WAIT_SECONDS for it, then
+gets 409.
+
+When Redis is down an in-process dict gives the same behaviour per worker.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from utils.services.redis_client import redis_client as _redis, redis_ok as _redis_ok
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+SCAN_DEDUPE_WINDOW_SECONDS       = int(os.getenv("SCAN_DEDUPE_WINDOW_SECONDS",       "10"))
+SCAN_IDEMPOTENCY_KEY_TTL_SECONDS = int(os.getenv("SCAN_IDEMPOTENCY_KEY_TTL_SECONDS", "600"))
+SCAN_PENDING_WAIT_SECONDS        = float(os.getenv("SCAN_PENDING_WAIT_SECONDS",     "3"))
+
+# Refusals that a retry of the same scan would get again; other errors are not kept
+REPLAYED_ERROR_STATUSES = (403, 404, 409, 410)
+
+_PENDING = "__pending__"
+_POLL_SECONDS = 0.05
+
+# Fallback store (single-process only): key → (expires_at, value)
+_memory_store: dict[str, tuple[float, str]] = {}
+
+_counters = {"claimed": 0, "replayed": 0, "replayed_with_key": 0, "in_flight_conflicts": 0, "released": 0}
+_suppressed_by_action: dict[str, int] = {}
+
+
+# ─── Storage ──────────────────────────────────────────────────────────────────
+def _use_redis() -> bool:
+    return bool(_redis_ok and _redis)
+
+
+def _claim(key: str, ttl: int) -> bool:
+    if _use_redis():
+        try:
+            return bool(_redis.set(key, _PENDING, nx=True, ex=ttl))
+        except Exception as e:
+            logging.warning("[ScanIdempotency] Redis claim failed, using memory: %s", e)
+    now = time.monotonic()
+    hit = _memory_store.get(key)
+    if hit and hit[0] > now:
+        return False
+    _memory_store[key] = (now + ttl, _PENDING)
+    return True
+
+
+def _load(key: str) -> Optional[str]:
+    if _use_redis():
+        try:
+            return _redis.get(key)
+        except Exception as e:
+            logging.warning("[ScanIdempotency] Redis get failed, using memory: %s", e)
+    hit = _memory_store.get(key)
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    return None
+
+
+def _store(key: str, value: str, ttl: int) -> None:
+    if _use_redis():
+        try:
+            _redis.set(key, value, ex=ttl)
+            return
+        except Exception as e:
+            logging.warning("[ScanIdempotency] Redis set failed, using memory: %s", e)
+    _memory_store[key] = (time.monotonic() + ttl, value)
+    if len(_memory_store) > 10_000:
+        now = time.monotonic()
+        for k in [k for k, (exp, _) in _memory_store.items() if exp <= now]:
+            _memory_store.pop(k, None)
+
+
+def _release(key: str) -> None:
+    _counters["released"] += 1
+    if _use_redis():
+        try:
+            _redis.delete(key)
+        except Exception:
+            pass
+    _memory_store.pop(key, None)
+
+
+def _replay(stored: str) -> JSONResponse:
+    saved = json.loads(stored)
+    return JSONResponse(
+        status_code=saved["status_code"],
+        content=saved["body"],
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+# ─── Public API ───────────────────────────────────────────────────────────────
+async def run_idempotent_scan(
+    action: str,
+    event_id: int,
+    short_code: str,
+    idempotency_key: Optional[str],
+    success_status: int,
+    handler: Callable[[], Awaitable[dict]],
+):
+    """
+    Run handler() once per (short_code, event_id, action) window — or once per
+    Idempotency-Key — and replay its response to duplicates.
+    """
+    if idempotency_key:
+        key, ttl = f"scan_idem:key:{event_id}:{action}:{short_code}:{idempotency_key}", SCAN_IDEMPOTENCY_KEY_TTL_SECONDS
+    else:
+        key, ttl = f"scan_idem:{event_id}:{action}:{short_code}", SCAN_DEDUPE_WINDOW_SECONDS
+
+    if not _claim(key, ttl):
+        deadline = time.monotonic() + SCAN_PENDING_WAIT_SECONDS
+        stored = _load(key)
+        while stored == _PENDING and time.monotonic() < deadline:
+            await asyncio.sleep(_POLL_SECONDS)
+            stored = _load(key)
+
+        if stored and stored != _PENDING:
+            _counters["replayed_with_key" if idempotency_key else "replayed"] += 1
+            _suppressed_by_action[action] = _suppressed_by_action.get(action, 0) + 1
+            logging.info("[ScanIdempotency] Suppressed duplicate %s for %s (event %s)", action, short_code, event_id)
+            return _replay(stored)
+        if stored == _PENDING:
+            _counters["in_flight_conflicts"] += 1
+            raise HTTPException(status_code=409, detail="This scan is already being processed")
+        # Key expired / released between claim and load — take it now
+        if not _claim(key, ttl):
+            raise HTTPException(status_code=409, detail="This scan is already being processed")
+
+    _counters["claimed"] += 1
+    try:
+        result = await handler()
+    except HTTPException as e:
+        if e.status_code in REPLAYED_ERROR_STATUSES:
+            _store(key, json.dumps({"status_code": e.status_code, "body": {"detail": e.detail}}), ttl)
+        else:
+            _release(key)
+        raise
+    except BaseException:
+        _release(key)
+        raise
+
+    _store(key, json.dumps({"status_code": success_status, "body": jsonable_encoder(result)}), ttl)
+    return result
+
+
+def metrics_snapshot() -> dict:
+    return {
+        "backend":               "redis" if _use_redis() else "memory",
+        "dedupe_window_seconds": SCAN_DEDUPE_WINDOW_SECONDS,
+        "key_ttl_seconds":       SCAN_IDEMPOTENCY_KEY_TTL_SECONDS,
+        "counters":              dict(_counters),
+        "suppressed_by_action":  dict(_suppressed_by_action),
+    }
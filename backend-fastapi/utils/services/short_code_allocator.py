@@ -0,0 +1,167 @@
+"""
+Short-code allocator — unique codes without a uniqueness query per code.
+
+Import:
+    from utils.services.short_code_allocator import allocate_short_code, allocate_short_codes
+
+Codes used to be drawn at random and SELECTed from short_links to see
+whether they were taken — a blocking round-trip (up to 5 attempts) inside every
+registration and renewal.  Codes are now a keyed permutation of a sequence:
+
+    index ──Feistel(SHORT_CODE_SECRET)──▶ n < 62^SHORT_CODE_LENGTH ──base62──▶ "k3ZpQ9a"
+
+  • each worker leases SHORT_CODE_BLOCK_SIZE indexes at a time from
+    lease_short_code_block (supabase_rpc_short_code_block.sql) and hands
+    them out in memory — one DB call per block, none per code
+  • the Feistel network is a bijection on [0, 62^L) (cycle-walking over the
+    next even bit width), so distinct indexes never give the same code, and
+    neighbouring indexes give unrelated codes — not enumerable like a counter
+  • L = 7 by default: the legacy random codes are all 6 chars, so new codes
+    cannot collide with them either
+
+short_links.short_code / tourist_meta.qr_code stay UNIQUE as the safety net.
+SHORT_CODE_SECRET is required (at least 32 characters, its own value — not
+PUBLIC_LINK_SECRET): whoever knows it can enumerate every issued code.  It and
+SHORT_CODE_LENGTH must not change once codes have been issued — a new key is
+a new permutation and can repeat earlier codes.
+
+When the lease RPC fails, codes come from the old random + probe path
+(short_url_batch) and the lease is retried after SHORT_CODE_LEASE_RETRY_SECONDS.
+
+Metrics (GET /debug/short-code-allocator): allocated / leases /
+lease_failures / fallback_codes counters + what is left of the current block.
+"""
+
+import os
+import time
+import string
+import asyncio
+import hashlib
+import logging
+
+from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute, db_run
+from utils.services.public_access_link_provider import short_url_batch
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+SHORT_CODE_LENGTH               = int(os.getenv("SHORT_CODE_LENGTH",               "7"))
+SHORT_CODE_BLOCK_SIZE           = int(os.getenv("SHORT_CODE_BLOCK_SIZE",           "1000"))
+SHORT_CODE_LEASE_RETRY_SECONDS  = int(os.getenv("SHORT_CODE_LEASE_RETRY_SECONDS",  "30"))
+SHORT_CODE_SECRET               = os.getenv("SHORT_CODE_SECRET", "")
+if len(SHORT_CODE_SECRET) < 32 or SHORT_CODE_SECRET == "default_secret":
+    raise ValueError("SHORT_CODE_SECRET must be set (at least 32 characters)")
+
+ALPHABET = string.ascii_letters + string.digits   # same 62 chars as short_url_batch
+_ROUNDS = 4
+
+_DOMAIN = len(ALPHABET) ** SHORT_CODE_LENGTH
+_HALF_BITS = ((_DOMAIN - 1).bit_length() + 1) // 2
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_KEY = hashlib.sha256(SHORT_CODE_SECRET.encode()).digest()
+
+_block = {"next": 0, "end": 0}
+_lease_lock: "asyncio.Lock | None" = None
+_lease_retry_at = 0.0
+
+_counters = {"allocated": 0, "leases": 0, "lease_failures": 0, "fallback_codes": 0}
+
+
+# ─── Index → code ─────────────────────────────────────────────────────────────
+def _round(half: int, rnd: int) -> int:
+    digest = hashlib.blake2b(half.to_bytes(8, "big") + bytes((rnd,)), key=_KEY, digest_size=8).digest()
+    return int.from_bytes(digest, "big") & _HALF_MASK
+
+
+def _feistel(value: int) -> int:
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for rnd in range(_ROUNDS):
+        left, right = right, left ^ _round(right, rnd)
+    return (left << _HALF_BITS) | right
+
+
+def permute(index: int) -> int:
+    """Bijection on [0, 62^SHORT_CODE_LENGTH): re-apply until the value falls back into the domain."""
+    if not 0 <= index < _DOMAIN:
+        raise ValueError(f"short-code index {index} out of range")
+    value = _feistel(index)
+    while value >= _DOMAIN:
+        value = _feistel(value)
+    return value
+
+
+def encode_base62(value: int) -> str:
+    chars = []
+    for _ in range(SHORT_CODE_LENGTH):
+        value, digit = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def short_code_for(index: int) -> str:
+    return encode_base62(permute(index))
+
+
+# ─── Block leases ─────────────────────────────────────────────────────────────
+async def _lease(size: int) -> bool:
+    global _lease_retry_at
+    if time.monotonic() < _lease_retry_at:
+        return False
+    try:
+        resp = await db_execute(supabaseAdmin.rpc("lease_short_code_block", {"p_size": size}))
+        start = resp.data[0] if isinstance(resp.data, list) else resp.data
+        if isinstance(start, dict):
+            start = next(iter(start.values()))
+        start = int(start)
+    except Exception as e:
+        _counters["lease_failures"] += 1
+        _lease_retry_at = time.monotonic() + SHORT_CODE_LEASE_RETRY_SECONDS
+        logging.warning("[ShortCode] block lease failed, using random codes for %ss: %s",
+                        SHORT_CODE_LEASE_RETRY_SECONDS, e)
+        return False
+    if start + size > _DOMAIN:
+        _counters["lease_failures"] += 1
+        _lease_retry_at = time.monotonic() + SHORT_CODE_LEASE_RETRY_SECONDS
+        logging.error("[ShortCode] sequence exhausted at %s — raise SHORT_CODE_LENGTH", start)
+        return False
+    _block["next"], _block["end"] = start, start + size
+    _counters["leases"] += 1
+    return True
+
+
+# ─── Public API ───────────────────────────────────────────────────────────────
+async def allocate_short_codes(count: int) -> list:
+    """`count` unique short codes; a DB call only when the current block runs out."""
+    global _lease_lock
+    codes: list = []
+    while len(codes) < count:
+        if _block["next"] >= _block["end"]:
+            if _lease_lock is None:
+                _lease_lock = asyncio.Lock()
+            async with _lease_lock:
+                if _block["next"] >= _block["end"] and not await _lease(max(SHORT_CODE_BLOCK_SIZE, count - len(codes))):
+                    missing = count - len(codes)
+                    codes.extend(await db_run(short_url_batch, missing))
+                    _counters["fallback_codes"] += missing
+                    break
+            continue
+        # No await between reading and advancing the block → safe across tasks
+        start = _block["next"]
+        take = min(count - len(codes), _block["end"] - start)
+        _block["next"] = start + take
+        codes.extend(short_code_for(i) for i in range(start, start + take))
+    _counters["allocated"] += len(codes)
+    return codes
+
+
+async def allocate_short_code() -> str:
+    return (await allocate_short_codes(1))[0]
+
+
+def stats() -> dict:
+    return {
+        **_counters,
+        "code_length": SHORT_CODE_LENGTH,
+        "block_size": SHORT_CODE_BLOCK_SIZE,
+        "block_remaining": max(0, _block["end"] - _block["next"]),
+        "lease_retry_in_s": max(0.0, round(_lease_retry_at - time.monotonic(), 1)),
+    }
@@ -0,0 +1,169 @@
+"""
+Hot short_code → tourist index in Redis — first lookup for gate scans and
+short-link resolution.
+
+Import:
+    from utils.services.short_code_index import (
+        index_short_code, lookup_short_code, warm_short_code_index,
+    )
+
+Every scan used to resolve the short_code through verify_qr_code, and every
+short-link open hit the short_links table.  A short code never changes owner
+(renewals mint a new tourist + new code), so its data can be cached:
+
+    short_code:{code}  →  hash {user_id, valid_date, event_id, name, group_count, token, created_at}
+
+  • filled on register_tourist / quick renewals (index_short_code)
+  • read-through: a DB hit on the fallback path backfills the hash
+  • warm_short_code_index() (started from main.py) bulk-loads every tourist of
+    the active event(s) whose valid_date is today or later
+  • entries expire SHORT_CODE_INDEX_TTL_SECONDS after they were written
+
+Fields that are unknown on a given path (e.g. token on the scan path) are just
+absent.  When Redis is down every lookup is a miss and the DB path is used.
+"""
+
+import os
+import logging
+from typing import Optional
+
+from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
+from utils.services.redis_client import redis_client as _redis, redis_ok as _redis_ok
+from utils.india_time import india_today_str
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+SHORT_CODE_INDEX_TTL_SECONDS = int(os.getenv("SHORT_CODE_INDEX_TTL_SECONDS", str(3 * 24 * 3600)))
+SHORT_CODE_WARM_PAGE_SIZE    = int(os.getenv("SHORT_CODE_WARM_PAGE_SIZE",    "1000"))
+
+SHORT_CODE_KEY_PREFIX = "short_code:"
+_INT_FIELDS = ("user_id", "event_id", "group_count")
+
+_counters = {"hits": 0, "misses": 0, "writes": 0, "warmed": 0}
+
+
+def _use_redis() -> bool:
+    return bool(_redis_ok and _redis)
+
+
+def _mapping(user_id=None, valid_date=None, event_id=None, name=None, group_count=None, token=None,
+             created_at=None) -> dict:
+    fields = {
+        "user_id": user_id, "valid_date": valid_date, "event_id": event_id,
+        "name": name, "group_count": group_count, "token": token, "created_at": created_at,
+    }
+    return {k: str(v) for k, v in fields.items() if v is not None}
+
+
+# ─── Public API ───────────────────────────────────────────────────────────────
+def index_short_code(short_code: str, **fields) -> None:
+    """
+    Add / update fields for a short code:
+        index_short_code(code, user_id=.., valid_date=.., event_id=.., name=.., group_count=.., token=..,
+                         created_at=..)
+    """
+    if not short_code or not _use_redis():
+        return
+    mapping = _mapping(**fields)
+    if not mapping:
+        return
+    key = SHORT_CODE_KEY_PREFIX + short_code
+    try:
+        pipe = _redis.pipeline()
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, SHORT_CODE_INDEX_TTL_SECONDS)
+        pipe.execute()
+        _counters["writes"] += 1
+    except Exception as e:
+        logging.warning("[ShortCodeIndex] write failed for %s: %s", short_code, e)
+
+
+def lookup_short_code(short_code: str, require: tuple = ("user_id", "valid_date")) -> Optional[dict]:
+    """
+    Cached fields for short_code, or None on a miss (or when any `require`d
+    field is absent — e.g. require=("token",) for short-link resolution).
+    """
+    if not short_code or not _use_redis():
+        return None
+    try:
+        data = _redis.hgetall(SHORT_CODE_KEY_PREFIX + short_code)
+    except Exception as e:
+        logging.warning("[ShortCodeIndex] read failed for %s: %s", short_code, e)
+        return None
+    if not data or any(field not in data for field in require):
+        _counters["misses"] += 1
+        return None
+    _counters["hits"] += 1
+    for field in _INT_FIELDS:
+        if field in data:
+            data[field] = int(data[field])
+    return data
+
+
+def stats() -> dict:
+    return {"backend": "redis" if _use_redis() else "disabled", **_counters}
+
+
+# ─── Startup warm-up ──────────────────────────────────────────────────────────
+async def _warm_event(event_id: int, today: str) -> int:
+    warmed, last_user_id = 0, 0
+    while True:
+        tourists = (await db_execute(
+            supabaseAdmin.table("tourists")
+            .select("user_id, name, valid_date, group_count, registered_event_id")
+            .eq("registered_event_id", event_id)
+            .gte("valid_date", today)
+            .gt("user_id", last_user_id)
+            .order("user_id", desc=False)
+            .limit(SHORT_CODE_WARM_PAGE_SIZE)
+        )).data or []
+        if not tourists:
+            return warmed
+
+        by_user = {t["user_id"]: t for t in tourists}
+        metas = (await db_execute(
+            supabaseAdmin.table("tourist_meta").select("user_id, qr_code").in_("user_id", list(by_user))
+        )).data or []
+        codes = {m["qr_code"]: by_user[m["user_id"]] for m in metas if m.get("qr_code")}
+        tokens = {}
+        if codes:
+            links = (await db_execute(
+                supabaseAdmin.table("short_links").select("short_code, token").in_("short_code", list(codes))
+            )).data or []
+            tokens = {link["short_code"]: link.get("token") for link in links}
+
+        pipe = _redis.pipeline()
+        for code, t in codes.items():
+            key = SHORT_CODE_KEY_PREFIX + code
+            pipe.hset(key, mapping=_mapping(
+                user_id=t["user_id"], valid_date=t.get("valid_date"), event_id=t.get("registered_event_id"),
+                name=t.get("name"), group_count=t.get("group_count"), token=tokens.get(code),
+            ))
+            pipe.expire(key, SHORT_CODE_INDEX_TTL_SECONDS)
+        pipe.execute()
+        warmed += len(codes)
+
+        if len(tourists) < SHORT_CODE_WARM_PAGE_SIZE:
+            return warmed
+        last_user_id = tourists[-1]["user_id"]
+
+
+async def warm_short_code_index() -> None:
+    """
+    Background coroutine — call once at startup with asyncio.create_task().
+    Bulk-loads the short codes of every active event's current / upcoming tourists.
+    """
+    if not _use_redis():
+        logging.info("[ShortCodeIndex] Redis unavailable — scans use the DB lookup")
+        return
+    try:
+        events = (await db_execute(
+            supabaseAdmin.table("events").select("event_id").eq("is_active", True)
+        )).data or []
+        today = india_today_str()
+        for event in events:
+            count = await _warm_event(event["event_id"], today)
+            _counters["warmed"] += count
+            logging.info("[ShortCodeIndex] Warmed %d short codes for event_id=%s", count, event["event_id"])
+    except Exception as e:
+        logging.warning("[ShortCodeIndex] Warm-up failed (lookups fall back to the DB): %s", e)
@@ -60,4 +60,22 @@ def send_welcome_sms_background(background_tasks: BackgroundTasks, to: str, even
         short_code: short code for link (string)
     """
     sms_handler = SMSHandler()
-    background_tasks.add_task(sms_handler.send_sms, to, event_name, valid_date, e_id, short_code)
\ No newline at end of file
+    background_tasks.add_task(sms_handler.send_sms, to, event_name, valid_date, e_id, short_code)
+
+def send_bulk_sms_background(background_tasks: BackgroundTasks, messages: list):
+    """
+    Queue SMS for a whole batch (bulk registration) as one background task
+    that sends them in order, instead of one task per tourist.
+    Args:
+        background_tasks: FastAPI BackgroundTasks instance
+        messages: list of dicts with the send_sms arguments (to, event_name, valid_date, e_id, short_code)
+    """
+    if not messages:
+        return
+    sms_handler = SMSHandler()
+
+    def _send_all():
+        sent = sum(1 for m in messages if sms_handler.send_sms(**m))
+        logger.info(f"Bulk SMS: {sent}/{len(messages)} sent")
+
+    background_tasks.add_task(_send_all)
@@ -0,0 +1,204 @@
+"""
+Staff directory — admin / security users (uid → name, phone, email, role).
+
+Import:
+    from utils.services.staff_directory import get_staff, get_staff_member
+
+Routes that need a verifier's name (entry export, create_entry metadata) used
+to call `auth.admin.get_user_by_id` once per uid — a 3-day export with 80
+guards made 80 serial auth-API round-trips before the first CSV byte.  Now
+the whole directory is bulk-loaded with paginated `auth.admin.list_users`:
+
+  • Redis hash STAFF_DIRECTORY_KEY (uid → JSON), TTL STAFF_DIRECTORY_TTL_SECONDS,
+    shared by every uvicorn worker
+  • per-process copy, re-read from Redis every STAFF_DIRECTORY_LOCAL_TTL_SECONDS
+  • run_staff_directory_refresh_loop() (started from main.py) reloads it in the
+    background; only one worker at a time does the auth-API call (Redis lock)
+  • a lookup miss triggers one reload (rate-limited by
+    STAFF_DIRECTORY_MIN_RELOAD_SECONDS) so newly created guards show up
+
+When Redis is down the per-process copy is the only cache.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Iterable, Optional
+
+from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_run
+from utils.services.redis_client import redis_client as _redis, redis_ok as _redis_ok
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+STAFF_DIRECTORY_TTL_SECONDS        = int(os.getenv("STAFF_DIRECTORY_TTL_SECONDS",        "900"))
+STAFF_DIRECTORY_REFRESH_SECONDS    = int(os.getenv("STAFF_DIRECTORY_REFRESH_SECONDS",    "300"))
+STAFF_DIRECTORY_LOCAL_TTL_SECONDS  = int(os.getenv("STAFF_DIRECTORY_LOCAL_TTL_SECONDS",  "60"))
+STAFF_DIRECTORY_MIN_RELOAD_SECONDS = int(os.getenv("STAFF_DIRECTORY_MIN_RELOAD_SECONDS", "30"))
+STAFF_DIRECTORY_PAGE_SIZE          = int(os.getenv("STAFF_DIRECTORY_PAGE_SIZE",          "500"))
+
+STAFF_ROLES          = ("admin", "security")
+STAFF_DIRECTORY_KEY  = "staff_directory"
+STAFF_DIRECTORY_LOCK = "staff_directory:refresh_lock"
+
+# Per-process copy: uid → {"name", "phone", "email", "role"}
+_directory: dict[str, dict] = {}
+_local_expires_at: float = 0.0
+_last_reload: float = float("-inf")
+_reload_task: Optional[asyncio.Task] = None
+
+
+# ─── Loading ──────────────────────────────────────────────────────────────────
+def _user_list(response) -> list:
+    # Depending on the supabase-py version list_users returns a list or an object with .users
+    if hasattr(response, "users"):
+        return response.users or []
+    return response if isinstance(response, list) else []
+
+
+def _staff_entry(usr) -> Optional[dict]:
+    role = (getattr(usr, "app_metadata", None) or {}).get("role")
+    if role not in STAFF_ROLES:
+        return None
+    return {
+        "name":  (getattr(usr, "user_metadata", None) or {}).get("name", "Unknown"),
+        "phone": getattr(usr, "phone", None) or "No phone",
+        "email": getattr(usr, "email", None) or "",
+        "role":  role,
+    }
+
+
+async def _load_from_auth() -> dict:
+    """Page through auth.admin.list_users and keep admin / security users."""
+    staff, page = {}, 1
+    while True:
+        users = _user_list(await db_run(
+            supabaseAdmin.auth.admin.list_users, page=page, per_page=STAFF_DIRECTORY_PAGE_SIZE
+        ))
+        for usr in users:
+            entry = _staff_entry(usr)
+            if entry:
+                staff[str(usr.id)] = entry
+        if len(users) < STAFF_DIRECTORY_PAGE_SIZE:
+            return staff
+        page += 1
+
+
+def _read_redis() -> Optional[dict]:
+    if not _redis_ok or not _redis:
+        return None
+    try:
+        raw = _redis.hgetall(STAFF_DIRECTORY_KEY)
+    except Exception as e:
+        logging.warning("[StaffDirectory] Redis read failed: %s", e)
+        return None
+    return {uid: json.loads(value) for uid, value in raw.items()} if raw else None
+
+
+def _write_redis(staff: dict) -> None:
+    if not _redis_ok or not _redis or not staff:
+        return
+    try:
+        pipe = _redis.pipeline()
+        pipe.delete(STAFF_DIRECTORY_KEY)
+        pipe.hset(STAFF_DIRECTORY_KEY, mapping={uid: json.dumps(entry) for uid, entry in staff.items()})
+        pipe.expire(STAFF_DIRECTORY_KEY, STAFF_DIRECTORY_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        logging.warning("[StaffDirectory] Redis write failed: %s", e)
+
+
+def _set_local(staff: dict) -> None:
+    global _directory, _local_expires_at
+    _directory = staff
+    _local_expires_at = time.monotonic() + STAFF_DIRECTORY_LOCAL_TTL_SECONDS
+
+
+async def refresh_staff_directory() -> int:
+    """Reload from the auth API, publish to Redis and the local copy. Returns the staff count."""
+    global _last_reload
+    _last_reload = time.monotonic()
+    staff = await _load_from_auth()
+    _write_redis(staff)
+    _set_local(staff)
+    logging.info("[StaffDirectory] Loaded %d staff users", len(staff))
+    return len(staff)
+
+
+async def _reload_once() -> None:
+    """Single-flight refresh shared by concurrent misses in this worker."""
+    global _reload_task
+    if _reload_task is None or _reload_task.done():
+        _reload_task = asyncio.create_task(refresh_staff_directory())
+    try:
+        await asyncio.shield(_reload_task)
+    except Exception as e:
+        logging.warning("[StaffDirectory] Reload failed, keeping previous directory: %s", e)
+
+
+# ─── Public API ───────────────────────────────────────────────────────────────
+async def get_staff(uids: Iterable[str]) -> dict:
+    """
+    Return {uid: {"name", "phone", "email", "role"}} for the uids that are staff.
+    Unknown uids are simply absent — callers pick their own placeholder.
+    """
+    wanted = {str(uid) for uid in uids if uid}
+    if not wanted:
+        return {}
+
+    needs_reload = bool(wanted - _directory.keys())
+    if time.monotonic() >= _local_expires_at:
+        shared = _read_redis()
+        if shared is not None:
+            _set_local(shared)
+            needs_reload = bool(wanted - _directory.keys())
+        else:
+            # Redis hash expired / Redis down — rebuild from the auth API
+            needs_reload = True
+
+    if needs_reload and time.monotonic() - _last_reload >= STAFF_DIRECTORY_MIN_RELOAD_SECONDS:
+        await _reload_once()
+
+    return {uid: _directory[uid] for uid in wanted if uid in _directory}
+
+
+async def get_staff_member(uid: Optional[str]) -> Optional[dict]:
+    """Single-uid convenience wrapper around get_staff()."""
+    if not uid:
+        return None
+    return (await get_staff([uid])).get(str(uid))
+
+
+def invalidate_staff_directory() -> None:
+    """Drop the shared + local copy so the next lookup reloads (call after staff changes)."""
+    global _local_expires_at, _last_reload
+    _local_expires_at = 0.0
+    _last_reload = float("-inf")
+    if not _redis_ok or not _redis:
+        return
+    try:
+        _redis.delete(STAFF_DIRECTORY_KEY)
+    except Exception as e:
+        logging.warning("[StaffDirectory] Redis delete failed: %s", e)
+
+
+# ─── Background refresher ─────────────────────────────────────────────────────
+async def run_staff_directory_refresh_loop() -> None:
+    """
+    Background coroutine — call once at startup with asyncio.create_task().
+    Reloads the directory every STAFF_DIRECTORY_REFRESH_SECONDS; with Redis the
+    lock lets a single worker hit the auth API while the others re-read the hash.
+    """
+    while True:
+        try:
+            got_lock = True
+            if _redis_ok and _redis:
+                got_lock = bool(_redis.set(STAFF_DIRECTORY_LOCK, "1", nx=True, ex=max(1, STAFF_DIRECTORY_REFRESH_SECONDS - 5)))
+            if got_lock:
+                await refresh_staff_directory()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.warning("[StaffDirectory] Background refresh failed: %s", e)
+        await asyncio.sleep(STAFF_DIRECTORY_REFRESH_SECONDS)
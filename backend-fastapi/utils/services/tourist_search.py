@@ -0,0 +1,536 @@
+"""
+In-process search index for guard lookups — name, phone and short code.
+
+Import:
+    from utils.services.tourist_search import (
+        index_tourist, search_tourists, search_tourists_db, warm_tourist_search_index,
+    )
+
+Guards looked visitors up by partial name through get_tourists_by_event's
+p_search (ILIKE '%q%' over every registration) and by phone through
+/profile/phone/{phone} — both sequential scans.  Every worker now keeps an
+index of each active event's registrations in memory:
+
+  • phone / short_code — sorted keys + bisect: a prefix query is one binary
+    search and a slice (a trie's lookups, without a node per digit)
+  • names — normalized (casefold, Latin accents stripped, Devanagari nukta /
+    chandrabindu folded), split into trigrams with posting arrays of
+    user_ids; a query walks its rarest trigram's postings newest-first and
+    confirms each hit with a substring test, so results match ILIKE '%q%'.
+    Queries shorter than a trigram use a sorted word-prefix list.
+
+Freshness:
+    warm_tourist_search_index() (started from main.py) loads every active
+    event page by page.  register_tourist / quick renewals call
+    index_tourist(), which updates the local index and publishes the row on
+    TOURIST_SEARCH_CHANNEL; run_tourist_search_listener() applies rows from
+    other workers.  Registrations are insert-only, so adds are all it needs.
+
+    Rows published while a worker's subscription was down (or made on
+    another worker while Redis is off) are picked up by a catch-up that
+    re-reads each loaded event past the last user_id it read from the DB —
+    after every (re)subscribe and every TOURIST_SEARCH_CATCHUP_SECONDS.
+
+    An event that was not active at startup is loaded in the background on
+    its first search; a failed load is retried after
+    TOURIST_SEARCH_LOAD_RETRY_SECONDS.
+
+Events that are not loaded yet return None from search_tourists(); the
+route then, and whenever the index has no hits, falls back to
+search_tourists_db() — the same phone-prefix /
+short-code-prefix / name-substring semantics, straight from the tables.
+"""
+
+import os
+import json
+import time
+import heapq
+import asyncio
+import logging
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Optional
+
+from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
+from utils.services.batch_loader import BATCH_LOADER_MAX_KEYS
+from utils.services.redis_client import redis_client as _redis, redis_ok as _redis_ok
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+TOURIST_SEARCH_PAGE_SIZE = int(os.getenv("TOURIST_SEARCH_PAGE_SIZE", "1000"))
+TOURIST_SEARCH_MAX_SCAN  = int(os.getenv("TOURIST_SEARCH_MAX_SCAN",  "50000"))
+TOURIST_SEARCH_LOAD_RETRY_SECONDS = int(os.getenv("TOURIST_SEARCH_LOAD_RETRY_SECONDS", "30"))
+TOURIST_SEARCH_CATCHUP_SECONDS    = int(os.getenv("TOURIST_SEARCH_CATCHUP_SECONDS",    "60"))
+TOURIST_SEARCH_CHANNEL   = "tourist_search:updates"
+
+_LATIN_MAX   = 0x024F
+_NUKTA       = "\u093c"
+_CHANDRABINDU, _ANUSVARA = "\u0901", "\u0902"
+
+_PHONE_LENGTH = 10
+
+_counters = {"queries": 0, "index_hits": 0, "db_fallbacks": 0, "adds": 0, "remote_adds": 0,
+             "warmed": 0, "lazy_loads": 0, "load_failures": 0, "caught_up": 0, "catchup_failures": 0}
+
+
+def _use_redis() -> bool:
+    return bool(_redis_ok and _redis)
+
+
+# ─── Normalization ────────────────────────────────────────────────────────────
+def normalize_name(name: Optional[str]) -> str:
+    """Casefolded, accent-free (Latin), nukta-free (Devanagari), single-spaced."""
+    out, prev_base = [], ""
+    for ch in unicodedata.normalize("NFKD", name or ""):
+        category = unicodedata.category(ch)
+        if category[0] == "M":
+            if (prev_base and ord(prev_base) <= _LATIN_MAX) or ch == _NUKTA:
+                continue
+            out.append(_ANUSVARA if ch == _CHANDRABINDU else ch)
+        elif category[0] in "LN":
+            out.append(ch)
+            prev_base = ch
+        else:
+            out.append(" ")
+            prev_base = ""
+    return " ".join("".join(out).casefold().split())
+
+
+def normalize_phone(phone) -> str:
+    digits = "".join(ch for ch in str(phone or "") if ch.isdigit())
+    return digits[2:] if len(digits) == 12 and digits.startswith("91") else digits
+
+
+def phone_prefix(q: str) -> str:
+    """The digits of q as a 10-digit phone prefix, or "" when q is not phone-like."""
+    if any(ch.isalpha() for ch in q):
+        return ""
+    digits = normalize_phone(q)
+    if q.strip().startswith("+91"):
+        digits = digits[2:]     # typed prefix is shorter than a full +91 number
+    return digits if len(digits) >= 3 else ""
+
+
+def code_prefix(q: str) -> str:
+    compact = q.strip()
+    return compact if compact.isascii() and compact.isalnum() else ""
+
+
+def escape_like(text: str) -> str:
+    """Escape LIKE / ILIKE wildcards so user input only matches literally."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# ─── Sorted prefix keys ───────────────────────────────────────────────────────
+class _PrefixKeys:
+    """Sorted (key, user_id) pairs held as a key list + parallel id array."""
+
+    __slots__ = ("keys", "ids", "_pending")
+
+    def __init__(self):
+        self.keys: list = []
+        self.ids = array("q")
+        self._pending: Optional[list] = []   # bulk-load buffer, None once sorted
+
+    def add(self, key: str, user_id: int) -> None:
+        if not key:
+            return
+        if self._pending is not None:
+            self._pending.append((key, user_id))
+            return
+        i = bisect_left(self.keys, key)
+        self.keys.insert(i, key)
+        self.ids.insert(i, user_id)
+
+    def finish_load(self) -> None:
+        if self._pending is None:
+            return
+        pairs = sorted(self._pending + list(zip(self.keys, self.ids)))
+        self.keys = [k for k, _ in pairs]
+        self.ids = array("q", (uid for _, uid in pairs))
+        self._pending = None
+
+    def prefix(self, prefix: str, limit: int) -> list:
+        """Newest `limit` user_ids whose key starts with prefix."""
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + "\U0010ffff", lo=start)
+        end = min(end, start + TOURIST_SEARCH_MAX_SCAN)
+        return heapq.nlargest(limit, set(self.ids[start:end]))
+
+
+# ─── Per-event index ──────────────────────────────────────────────────────────
+class _EventIndex:
+    __slots__ = ("docs", "grams", "phones", "codes", "words", "loaded_at", "synced_id")
+
+    def __init__(self):
+        # user_id → (name, phone, short_code, valid_date, is_group, group_count, normalized name)
+        self.docs: dict[int, tuple] = {}
+        self.grams: dict[str, array] = {}
+        self.phones = _PrefixKeys()
+        self.codes = _PrefixKeys()
+        self.words = _PrefixKeys()
+        self.loaded_at: Optional[float] = None
+        self.synced_id = 0      # highest user_id read from the DB (catch-up cursor)
+
+    def add(self, t: dict) -> bool:
+        user_id = int(t["user_id"])
+        if user_id in self.docs:
+            return False
+        norm = normalize_name(t.get("name"))
+        phone = normalize_phone(t.get("phone"))
+        code = t.get("short_code") or ""
+        self.docs[user_id] = (
+            t.get("name"), t.get("phone"), code or None, str(t.get("valid_date") or "") or None,
+            bool(t.get("is_group")), t.get("group_count"), norm,
+        )
+        for gram in _trigrams(norm):
+            postings = self.grams.get(gram)
+            if postings is None:
+                postings = self.grams[gram] = array("q")
+            postings.append(user_id)
+        for word in set(norm.split()):
+            self.words.add(word, user_id)
+        self.phones.add(phone, user_id)
+        self.codes.add(code, user_id)
+        return True
+
+    def finish_load(self) -> None:
+        for keys in (self.phones, self.codes, self.words):
+            keys.finish_load()
+        self.loaded_at = time.time()
+
+    def _names(self, norm: str, limit: int) -> list:
+        grams = _trigrams(norm)
+        if not grams:
+            # 1–2 characters: word-prefix match
+            return self.words.prefix(norm, limit)
+        postings = []
+        for gram in grams:
+            hits = self.grams.get(gram)
+            if not hits:
+                return []
+            postings.append(hits)
+        rarest = min(postings, key=len)
+        found, scanned = [], 0
+        for user_id in reversed(rarest):
+            if norm in self.docs[user_id][6]:
+                found.append(user_id)
+                if len(found) >= limit:
+                    break
+            scanned += 1
+            if scanned >= TOURIST_SEARCH_MAX_SCAN:
+                break
+        return found
+
+    def search(self, q: str, limit: int) -> list:
+        matches: dict[int, str] = {}
+        digits = phone_prefix(q)
+        if digits:
+            for user_id in self.phones.prefix(digits, limit):
+                matches.setdefault(user_id, "phone")
+        code = code_prefix(q)
+        if code:
+            for user_id in self.codes.prefix(code, limit):
+                matches.setdefault(user_id, "short_code")
+        norm = normalize_name(q)
+        if norm and len(matches) < limit and any(ch.isalpha() for ch in norm):
+            for user_id in self._names(norm, limit):
+                matches.setdefault(user_id, "name")
+
+        results = []
+        for user_id, matched in list(matches.items())[:limit]:
+            name, phone, code, valid_date, is_group, group_count, _ = self.docs[user_id]
+            results.append({
+                "user_id": user_id, "name": name, "phone": phone, "short_code": code,
+                "valid_date": valid_date, "is_group": is_group, "group_count": group_count,
+                "matched": matched,
+            })
+        return results
+
+
+# event_id → index (present while warming too, so live adds are not lost)
+_indexes: dict[int, _EventIndex] = {}
+_loading: dict[int, asyncio.Task] = {}
+_load_failed_at: dict[int, float] = {}
+
+
+# ─── Public API ───────────────────────────────────────────────────────────────
+def search_tourists(event_id: int, q: str, limit: int = 20) -> Optional[list]:
+    """
+    Matches for q (phone prefix, short-code prefix, name substring) — phone /
+    code hits first, then names newest first.  None when the event's index is
+    not loaded yet (the caller falls back to search_tourists_db); the first
+    such search starts loading the event in the background.
+    """
+    _counters["queries"] += 1
+    index = _indexes.get(int(event_id))
+    if index is None or index.loaded_at is None:
+        if index is None:
+            _load_in_background(int(event_id))
+        return None
+    _counters["index_hits"] += 1
+    return index.search(q or "", max(1, limit))
+
+
+def get_indexed_tourist(event_id: int, user_id: int) -> Optional[dict]:
+    """A tourist registered for event_id, from the index — None when absent or not loaded."""
+    index = _indexes.get(int(event_id))
+    doc = index.docs.get(int(user_id)) if index is not None and index.loaded_at is not None else None
+    if doc is None:
+        return None
+    name, phone, code, valid_date, is_group, group_count, _ = doc
+    return {
+        "user_id": int(user_id), "name": name, "phone": phone, "short_code": code,
+        "valid_date": valid_date, "is_group": is_group, "group_count": group_count,
+    }
+
+
+async def search_tourists_db(event_id: int, q: str, limit: int = 20) -> list:
+    """
+    search_tourists() straight from the tables, for events whose index is not
+    loaded: phone prefix (a range on the numeric column), short-code prefix
+    of 3+ chars (tourist_meta.qr_code) and ILIKE '%q%' on names with q's wildcards escaped.
+    """
+    _counters["db_fallbacks"] += 1
+    limit = max(1, limit)
+    columns = "user_id, name, phone, valid_date, is_group, group_count"
+    rows: dict[int, dict] = {}
+    codes: dict[int, Optional[str]] = {}
+
+    def _keep(tourists: list, matched: str) -> None:
+        for t in tourists:
+            if len(rows) < limit:
+                rows.setdefault(t["user_id"], {**t, "matched": matched})
+
+    digits = phone_prefix(q)
+    if digits:
+        _keep((await db_execute(
+            supabaseAdmin.table("tourists").select(columns)
+            .eq("registered_event_id", event_id)
+            .or_(_phone_ranges(digits))
+            .order("user_id", desc=True).limit(limit)
+        )).data or [], "phone")
+
+    code = code_prefix(q)
+    if len(code) >= 3 and len(rows) < limit:
+        # qr_code is not event-scoped: newest codes with the prefix, filtered by event below
+        metas = (await db_execute(
+            supabaseAdmin.table("tourist_meta").select("user_id, qr_code")
+            .like("qr_code", f"{code}%")
+            .order("user_id", desc=True).limit(BATCH_LOADER_MAX_KEYS)
+        )).data or []
+        codes.update((m["user_id"], m.get("qr_code")) for m in metas)
+        if metas:
+            _keep((await db_execute(
+                supabaseAdmin.table("tourists").select(columns)
+                .eq("registered_event_id", event_id)
+                .in_("user_id", [m["user_id"] for m in metas])
+                .order("user_id", desc=True).limit(limit)
+            )).data or [], "short_code")
+
+    if len(rows) < limit and any(ch.isalpha() for ch in q):
+        _keep((await db_execute(
+            supabaseAdmin.table("tourists").select(columns)
+            .eq("registered_event_id", event_id)
+            .ilike("name", f"%{escape_like(q.strip())}%")
+            .order("user_id", desc=True).limit(limit)
+        )).data or [], "name")
+
+    missing = [uid for uid in rows if uid not in codes]
+    if missing:
+        metas = (await db_execute(
+            supabaseAdmin.table("tourist_meta").select("user_id, qr_code").in_("user_id", missing)
+        )).data or []
+        codes.update((m["user_id"], m.get("qr_code")) for m in metas)
+    return [{**t, "short_code": codes.get(uid)} for uid, t in rows.items()]
+
+
+def _phone_ranges(digits: str) -> str:
+    """PostgREST or() filter: phones starting with digits, stored bare or with the 91 prefix."""
+    if len(digits) >= _PHONE_LENGTH:
+        return f"phone.eq.{digits},phone.eq.91{digits}"
+    scale = 10 ** (_PHONE_LENGTH - len(digits))
+    ranges = []
+    for lo in (int(digits) * scale, int("91" + digits) * scale):
+        ranges.append(f"and(phone.gte.{lo},phone.lt.{lo + scale})")
+    return ",".join(ranges)
+
+
+def index_tourist(event_id: int, tourist: dict) -> None:
+    """
+    Add a new registration (keys: user_id, name, phone, short_code, valid_date,
+    is_group, group_count) here and on every other worker.  Never raises.
+    """
+    try:
+        _apply(int(event_id), tourist)
+        if _use_redis():
+            _redis.publish(TOURIST_SEARCH_CHANNEL, json.dumps({"event_id": event_id, "tourist": tourist}, default=str))
+    except Exception as e:
+        logging.warning("[TouristSearch] index update failed for user_id=%s: %s", tourist.get("user_id"), e)
+
+
+def _apply(event_id: int, tourist: dict) -> bool:
+    index = _indexes.get(event_id)
+    if index is None or not index.add(tourist):
+        return False
+    _counters["adds"] += 1
+    return True
+
+
+def stats() -> dict:
+    return {
+        "events": {
+            event_id: {"tourists": len(index.docs), "trigrams": len(index.grams), "loaded_at": index.loaded_at}
+            for event_id, index in _indexes.items()
+        },
+        **_counters,
+    }
+
+
+# ─── Startup load + cross-worker updates ──────────────────────────────────────
+def _load_in_background(event_id: int) -> None:
+    """Load an event that was not indexed at startup (one task per event, retried after a failure)."""
+    if event_id in _loading or time.monotonic() < _load_failed_at.get(event_id, 0.0):
+        return
+    try:
+        _loading[event_id] = asyncio.get_running_loop().create_task(_load_event_logged(event_id))
+    except RuntimeError:
+        return
+    _counters["lazy_loads"] += 1
+
+
+async def _load_event_logged(event_id: int) -> int:
+    started = time.perf_counter()
+    try:
+        count = await _load_event(event_id)
+    except Exception as e:
+        _indexes.pop(event_id, None)
+        _load_failed_at[event_id] = time.monotonic() + TOURIST_SEARCH_LOAD_RETRY_SECONDS
+        _counters["load_failures"] += 1
+        logging.warning("[TouristSearch] Loading event_id=%s failed (search falls back to the DB): %s", event_id, e)
+        return 0
+    finally:
+        _loading.pop(event_id, None)
+    _counters["warmed"] += count
+    logging.info("[TouristSearch] Indexed %d tourists for event_id=%s in %.1fs",
+                 count, event_id, time.perf_counter() - started)
+    return count
+
+
+async def _load_event(event_id: int) -> int:
+    index = _indexes[event_id] = _EventIndex()
+    await _read_new_rows(event_id, index)
+    index.finish_load()
+    return len(index.docs)
+
+
+async def _read_new_rows(event_id: int, index: _EventIndex) -> int:
+    """Add the event's registrations past index.synced_id, page by page (keyset on user_id)."""
+    added = 0
+    while True:
+        tourists = (await db_execute(
+            supabaseAdmin.table("tourists")
+            .select("user_id, name, phone, valid_date, is_group, group_count")
+            .eq("registered_event_id", event_id)
+            .gt("user_id", index.synced_id)
+            .order("user_id", desc=False)
+            .limit(TOURIST_SEARCH_PAGE_SIZE)
+        )).data or []
+        if not tourists:
+            break
+        metas = (await db_execute(
+            supabaseAdmin.table("tourist_meta").select("user_id, qr_code").in_("user_id", [t["user_id"] for t in tourists])
+        )).data or []
+        codes = {m["user_id"]: m.get("qr_code") for m in metas}
+        for t in tourists:
+            added += index.add({**t, "short_code": codes.get(t["user_id"])})
+        index.synced_id = tourists[-1]["user_id"]
+        if len(tourists) < TOURIST_SEARCH_PAGE_SIZE:
+            break
+    return added
+
+
+async def _catch_up() -> int:
+    """Index registrations that never arrived over pub/sub, for every loaded event."""
+    added = 0
+    for event_id, index in list(_indexes.items()):
+        if index.loaded_at is None:
+            continue    # still loading — the load reads them
+        try:
+            added += await _read_new_rows(event_id, index)
+        except Exception as e:
+            _counters["catchup_failures"] += 1
+            logging.warning("[TouristSearch] Catch-up failed for event_id=%s: %s", event_id, e)
+    _counters["caught_up"] += added
+    _counters["adds"] += added
+    if added:
+        logging.info("[TouristSearch] Catch-up indexed %d missed registration(s)", added)
+    return added
+
+
+async def warm_tourist_search_index() -> None:
+    """
+    Background coroutine — call once at startup with asyncio.create_task().
+    Loads the registrations of every active event.
+    """
+    try:
+        events = (await db_execute(
+            supabaseAdmin.table("events").select("event_id").eq("is_active", True)
+        )).data or []
+        for event in events:
+            if int(event["event_id"]) not in _indexes:    # not already loaded for a search
+                await _load_event_logged(int(event["event_id"]))
+    except Exception as e:
+        logging.warning("[TouristSearch] Warm-up failed (search falls back to the DB): %s", e)
+
+
+async def run_tourist_search_listener() -> None:
+    """
+    Background coroutine — call once at startup with asyncio.create_task().
+    Applies registrations indexed on other workers (TOURIST_SEARCH_CHANNEL) and
+    runs the catch-up after each (re)subscribe and every TOURIST_SEARCH_CATCHUP_SECONDS.
+    """
+    if not _use_redis():
+        logging.info("[TouristSearch] Redis unavailable — other workers' registrations are picked up "
+                     "every %ss by the catch-up", TOURIST_SEARCH_CATCHUP_SECONDS)
+        while True:
+            await asyncio.sleep(TOURIST_SEARCH_CATCHUP_SECONDS)
+            await _catch_up()
+    while True:
+        pubsub = None
+        try:
+            pubsub = _redis.pubsub(ignore_subscribe_messages=True)
+            await asyncio.to_thread(pubsub.subscribe, TOURIST_SEARCH_CHANNEL)
+            logging.info("[TouristSearch] Listening on '%s'", TOURIST_SEARCH_CHANNEL)
+            # Anything published while we were not subscribed is only in the DB
+            await _catch_up()
+            next_catch_up = time.monotonic() + TOURIST_SEARCH_CATCHUP_SECONDS
+            while True:
+                if time.monotonic() >= next_catch_up:
+                    await _catch_up()
+                    next_catch_up = time.monotonic() + TOURIST_SEARCH_CATCHUP_SECONDS
+                msg = await asyncio.to_thread(pubsub.get_message, timeout=1.0)
+                if not msg:
+                    continue
+                try:
+                    data = json.loads(msg.get("data"))
+                    if _apply(int(data["event_id"]), data["tourist"]):
+                        _counters["remote_adds"] += 1
+                except (TypeError, ValueError, KeyError):
+                    continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.warning("[TouristSearch] Listener error, reconnecting in 5s: %s", e)
+            await asyncio.sleep(5)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
@@ -2,7 +2,9 @@ import os
 from jose import jwt, JWTError
 from fastapi import Request, HTTPException, status, Depends
 from utils.supabase.supabase import supabaseAdmin
+from utils.services.event_cache import get_event, guard_allowed
 from utils.supabase.auth_key import get_public_key, verify_with_legacy_secret, ISSUER
+from utils.supabase.token_cache import get_cached_payload, cache_payload
 # Load environment variables
 LEGACY_JWT_SECRET = os.getenv("LEGACY_JWT_SECRET")
 REGISTER_SECURITY_KEY = os.getenv("REGISTER_SECURITY_KEY")
@@ -13,7 +15,6 @@ REGISTER_ADMIN_KEY = os.getenv("REGISTER_ADMIN_KEY")
 # -------------------------------------------------------------------
 async def jwt_middleware(request: Request) -> dict:
     auth_header = request.headers.get("Authorization")
-    print("Token is:", auth_header)
 
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(
@@ -22,12 +23,21 @@ async def jwt_middleware(request: Request) -> dict:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    token = auth_header.split(" ", 1)[1]
+    return await verify_access_token(auth_header.split(" ", 1)[1])
+
+
+async def verify_access_token(token: str) -> dict:
+    """Verify a Supabase access token and return its payload (401 on failure).
+    Shared by jwt_middleware and WebSocket endpoints, which can't send headers."""
+    # Fast path: same token already verified and not yet expired
+    cached = get_cached_payload(token)
+    if cached is not None:
+        return cached
 
     try:
         # Primary: verify using Supabase ES256 public key from JWKS
         try:
-            public_key = get_public_key(token)
+            public_key = await get_public_key(token)
             payload = jwt.decode(
                 token,
                 public_key,
@@ -46,11 +56,10 @@ async def jwt_middleware(request: Request) -> dict:
             else:
                 raise
 
-        print("Verified payload:", payload)
-
         # Extract role from app_metadata
         if "app_metadata" in payload and "role" in payload["app_metadata"]:
             payload["role"] = payload["app_metadata"]["role"]
+        cache_payload(token, payload)
         return payload
 
     except jwt.ExpiredSignatureError:
@@ -140,27 +149,18 @@ async def check_guard_admin_access(
             detail="Missing event_id in request body",
         )
 
-    response = supabaseAdmin.table("events").select("allowed_guards").eq("event_id", event_id).single().execute()
-   
-    if hasattr(response, 'error') :
+    event = await get_event(event_id)
+
+    if not event:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Event not found or Supabase error.",
         )
 
-    allowed_guards = response.data.get("allowed_guards") or []
-    print("Allowed guards are : ", allowed_guards)
-    print("Role is : ", role)
-    print("table data is : ", response.data)
-
-    if allowed_guards == [] :
-        return payload
-    
-    if allowed_guards is not None:
-        if (role == "security" and uid not in allowed_guards) :
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You are not authorized to access this event.",
-            )
+    if not guard_allowed(event, role, uid):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not authorized to access this event.",
+        )
 
     return payload
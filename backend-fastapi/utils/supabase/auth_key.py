@@ -1,6 +1,8 @@
 from fastapi import Request, HTTPException, status
 from jose import jwt, jwk
-import requests
+from typing import Optional
+import asyncio
+import httpx
 import time
 import os
 import base64
@@ -15,7 +17,8 @@ _supabase_url = _supabase_url.replace("https://", "").replace("http://", "").str
 _supabase_url = _supabase_url.replace(".supabase.co", "")
 
 SUPABASE_URL = _supabase_url
-JWKS_URL = f"https://{SUPABASE_URL}.supabase.co/auth/v1/.well-known/jwks.json"
+# JWKS_URL may be overridden (e.g. a local stub server when testing key rotation)
+JWKS_URL = os.getenv("JWKS_URL") or f"https://{SUPABASE_URL}.supabase.co/auth/v1/.well-known/jwks.json"
 ISSUER = f"https://{SUPABASE_URL}.supabase.co/auth/v1"
 
 print(f"[DEBUG] SUPABASE_URL: {SUPABASE_URL}")
@@ -23,60 +26,118 @@ print(f"[DEBUG] JWKS_URL: {JWKS_URL}")
 print(f"[DEBUG] ISSUER: {ISSUER}")
 
 # ---- JWKS CACHE (in-memory) ----
+# Refreshed by run_jwks_refresh_loop() (started from main.py) — request
+# handlers only ever read PUBLIC_KEYS and never wait on the network, except
+# for a single-flight refetch when a token carries a kid we have not seen.
 JWKS_CACHE = {"keys": None, "fetched_at": 0}
-JWKS_TTL = 60 * 60  # refresh every 1 hour
+JWKS_TTL = 60 * 60                   # keys are considered fresh for 1 hour
+JWKS_REFRESH_AHEAD = 5 * 60          # background refresh this long before expiry
+JWKS_RETRY_SECONDS = 30              # background retry interval after a failed fetch
+JWKS_MIN_REFETCH_SECONDS = 30        # unknown-kid refetches are rate limited to one per window
+JWKS_FETCH_TIMEOUT = 8
 
-def get_jwks():
-    """Fetch and cache Supabase public keys (only once per hour).
-    Falls back to stale cache if network is unavailable.
-    """
-    now = time.time()
+# kid → constructed jose Key, rebuilt only when the JWKS is (re)fetched.
+# jwt.decode() accepts a Key directly, so per-request jwk.construct()/to_pem() is gone.
+PUBLIC_KEYS: dict = {}
+
+_refetch_task: Optional[asyncio.Task] = None
+_last_fetch_attempt = 0.0
 
-    # Fresh cache hit — return immediately
-    if JWKS_CACHE["keys"] and (now - JWKS_CACHE["fetched_at"] < JWKS_TTL):
-        return JWKS_CACHE["keys"]
 
-    # Try to fetch fresh keys (retry once on failure)
-    for attempt in range(2):
+def _build_public_keys(keys: list) -> None:
+    global PUBLIC_KEYS
+    built = {}
+    for key in keys:
+        kid = key.get("kid")
+        if not kid:
+            continue
         try:
-            print(f"[DEBUG] Fetching JWKS from: {JWKS_URL} (attempt {attempt + 1})")
-            response = requests.get(JWKS_URL, timeout=8)
-            response.raise_for_status()
-            jwks = response.json()
-            JWKS_CACHE["keys"] = jwks["keys"]
-            JWKS_CACHE["fetched_at"] = now
-            print(f"[DEBUG] Successfully fetched {len(jwks['keys'])} keys from JWKS")
-            return jwks["keys"]
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Failed to fetch JWKS (attempt {attempt + 1}): {e}")
-            if attempt == 0:
-                time.sleep(0.5)  # brief pause before retry
-
-    # Fallback: return stale cache if available (better than failing all requests)
+            built[kid] = jwk.construct(key)
+        except Exception as e:
+            print(f"[ERROR] Could not construct JWK kid={kid}: {e}")
+    PUBLIC_KEYS = built
+
+
+async def fetch_jwks() -> bool:
+    """Fetch Supabase public keys once (async, retried once).
+    On failure the previous keys stay in place — stale keys beat failing every request.
+    """
+    global _last_fetch_attempt
+    _last_fetch_attempt = time.time()
+
+    async with httpx.AsyncClient(timeout=JWKS_FETCH_TIMEOUT) as client:
+        for attempt in range(2):
+            try:
+                print(f"[DEBUG] Fetching JWKS from: {JWKS_URL} (attempt {attempt + 1})")
+                response = await client.get(JWKS_URL)
+                response.raise_for_status()
+                keys = response.json()["keys"]
+                _build_public_keys(keys)
+                JWKS_CACHE["keys"] = keys
+                JWKS_CACHE["fetched_at"] = time.time()
+                print(f"[DEBUG] Successfully fetched {len(keys)} keys from JWKS")
+                return True
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                print(f"[ERROR] Failed to fetch JWKS (attempt {attempt + 1}): {e}")
+                if attempt == 0:
+                    await asyncio.sleep(0.5)  # brief pause before retry
+
     if JWKS_CACHE["keys"]:
-        print("[WARN] Using stale JWKS cache due to network error")
-        return JWKS_CACHE["keys"]
+        print("[WARN] Keeping stale JWKS cache due to network error")
+    return False
 
-    raise Exception(f"Failed to fetch JWKS from {JWKS_URL} and no cached keys available")
 
+async def refetch_jwks() -> None:
+    """Single-flight refetch: concurrent callers share one in-flight fetch,
+    and at most one fetch starts per JWKS_MIN_REFETCH_SECONDS."""
+    global _refetch_task
+    if _refetch_task is None or _refetch_task.done():
+        if time.time() - _last_fetch_attempt < JWKS_MIN_REFETCH_SECONDS:
+            return
+        _refetch_task = asyncio.create_task(fetch_jwks())
+    # shield: a cancelled request must not cancel the fetch other requests wait on
+    await asyncio.shield(_refetch_task)
 
-def get_public_key(token: str):
-    """Extract and construct the public key from JWKS based on token's kid (key ID)."""
+
+async def run_jwks_refresh_loop() -> None:
+    """
+    Background coroutine — call once at startup with asyncio.create_task().
+    Loads the keys, then refreshes them JWKS_REFRESH_AHEAD seconds before they expire.
+    """
+    while True:
+        try:
+            ok = await fetch_jwks()
+        except Exception as e:
+            print(f"[ERROR] JWKS refresh loop error: {e}")
+            ok = False
+        delay = max(JWKS_TTL - JWKS_REFRESH_AHEAD, JWKS_RETRY_SECONDS) if ok else JWKS_RETRY_SECONDS
+        await asyncio.sleep(delay)
+
+
+def get_token_kid(token: str) -> str:
     header = jwt.get_unverified_header(token)
     kid = header.get("kid")
-
     if not kid:
         raise Exception("Token missing 'kid' in header")
+    return kid
 
-    keys = get_jwks()
-
-    for key in keys:
-        if key["kid"] == kid:
-            # Construct the public key from JWK
-            public_key = jwk.construct(key)
-            return public_key.to_pem()
 
-    raise Exception(f"Public key with kid '{kid}' not found in JWKS")
+async def get_public_key(token: str):
+    """Return the pre-built public key for the token's kid (key ID).
+    Unknown kid (key rotation) → one shared refetch, then give up.
+    """
+    kid = get_token_kid(token)
+
+    public_key = PUBLIC_KEYS.get(kid)
+    if public_key is None:
+        await refetch_jwks()
+        public_key = PUBLIC_KEYS.get(kid)
+
+    if public_key is None:
+        if not PUBLIC_KEYS:
+            raise Exception(f"Failed to fetch JWKS from {JWKS_URL} and no cached keys available")
+        raise Exception(f"Public key with kid '{kid}' not found in JWKS")
+    return public_key
 
 
 def verify_with_legacy_secret(token: str) -> dict:
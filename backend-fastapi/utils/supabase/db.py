@@ -0,0 +1,164 @@
+"""
+Async data-access layer for the (synchronous) Supabase client.
+
+supabase-py's PostgREST builder is blocking — calling `.execute()` inside an
+`async def` route stalls the whole event loop for one network round-trip.
+Every route goes through this module instead:
+
+    from utils.supabase.db import db_execute, db_run
+
+    resp = await db_execute(
+        supabaseAdmin.table("tourists").select("*").eq("user_id", user_id)
+    )
+    users = await db_run(supabaseAdmin.auth.admin.list_users)
+
+Queries run on a bounded thread pool (the client's httpx pool keeps the
+connections alive), so one slow export can't starve gate scans.
+
+Metrics:
+  • per-request query count + DB time  (X-DB-Queries / X-DB-Time-Ms headers,
+    set by the middleware in main.py)
+  • process-wide latency histogram      (GET /debug/db-metrics)
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+DB_MAX_CONCURRENCY = int(os.getenv("DB_MAX_CONCURRENCY", "32"))
+DB_SLOW_QUERY_MS   = int(os.getenv("DB_SLOW_QUERY_MS",   "1000"))
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_executor = ThreadPoolExecutor(max_workers=DB_MAX_CONCURRENCY, thread_name_prefix="db")
+# asyncio primitives bind to the running loop — created lazily on first use
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(DB_MAX_CONCURRENCY)
+    return _semaphore
+
+
+# ─── Per-request counters ─────────────────────────────────────────────────────
+class RequestDBStats:
+    """Mutable holder so child tasks (BackgroundTasks, call_next) share one counter."""
+    __slots__ = ("queries", "total_ms")
+
+    def __init__(self):
+        self.queries  = 0
+        self.total_ms = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("db_request_stats", default=None)
+
+
+def begin_request_stats() -> RequestDBStats:
+    """Start counting queries for the current request (called by the HTTP middleware)."""
+    stats = RequestDBStats()
+    _request_stats.set(stats)
+    return stats
+
+
+def current_request_stats() -> Optional[RequestDBStats]:
+    return _request_stats.get()
+
+
+# ─── Process-wide histogram ───────────────────────────────────────────────────
+_hist_lock    = threading.Lock()
+_hist_counts  = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+_hist_sum_ms  = 0.0
+_hist_total   = 0
+_hist_errors  = 0
+_in_flight    = 0
+
+
+def _observe(elapsed_ms: float, failed: bool) -> None:
+    global _hist_sum_ms, _hist_total, _hist_errors
+    idx = len(LATENCY_BUCKETS_MS)
+    for i, bound in enumerate(LATENCY_BUCKETS_MS):
+        if elapsed_ms <= bound:
+            idx = i
+            break
+    with _hist_lock:
+        _hist_counts[idx] += 1
+        _hist_sum_ms      += elapsed_ms
+        _hist_total       += 1
+        if failed:
+            _hist_errors  += 1
+
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries  += 1
+        stats.total_ms += elapsed_ms
+
+    if elapsed_ms >= DB_SLOW_QUERY_MS:
+        logger.warning("[DB] slow query — %.0f ms", elapsed_ms)
+
+
+def metrics_snapshot() -> dict:
+    """Histogram + counters for /debug/db-metrics."""
+    with _hist_lock:
+        counts = list(_hist_counts)
+        total, sum_ms, errors = _hist_total, _hist_sum_ms, _hist_errors
+
+    buckets, cumulative = [], 0
+    for bound, count in zip(list(LATENCY_BUCKETS_MS) + ["+Inf"], counts):
+        cumulative += count
+        buckets.append({"le_ms": bound, "count": count, "cumulative": cumulative})
+
+    def _quantile(q: float):
+        if not total:
+            return None
+        target = q * total
+        for b in buckets:
+            if b["cumulative"] >= target:
+                return b["le_ms"]
+        return "+Inf"
+
+    return {
+        "max_concurrency": DB_MAX_CONCURRENCY,
+        "in_flight":       _in_flight,
+        "total_queries":   total,
+        "errors":          errors,
+        "avg_ms":          round(sum_ms / total, 2) if total else None,
+        "p50_le_ms":       _quantile(0.50),
+        "p95_le_ms":       _quantile(0.95),
+        "p99_le_ms":       _quantile(0.99),
+        "buckets":         buckets,
+    }
+
+
+# ─── Public API ───────────────────────────────────────────────────────────────
+async def db_run(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run any blocking Supabase call (auth admin, RPC helpers, ...) off the event loop."""
+    global _in_flight
+    loop = asyncio.get_running_loop()
+    async with _get_semaphore():
+        _in_flight += 1
+        start  = time.perf_counter()
+        failed = False
+        try:
+            return await loop.run_in_executor(_executor, lambda: fn(*args, **kwargs))
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _in_flight -= 1
+            _observe((time.perf_counter() - start) * 1000, failed)
+
+
+async def db_execute(query) -> Any:
+    """Await a PostgREST query builder (table/rpc chain without the trailing .execute())."""
+    return await db_run(query.execute)
@@ -25,6 +25,7 @@ GRANT EXECUTE ON FUNCTION execute_sql(TEXT) TO service_role;
 """
 
 from utils.supabase.supabase import supabaseAdmin
+from utils.supabase.db import db_execute
 from typing import List, Dict, Any
 import logging
 
@@ -45,7 +46,7 @@ async def execute_raw_sql(query: str) -> List[Dict[str, Any]]:
         Exception: If the RPC function doesn't exist or query fails
     """
     try:
-        response = supabaseAdmin.rpc("execute_sql", {"query": query}).execute()
+        response = await db_execute(supabaseAdmin.rpc("execute_sql", {"query": query}))
         
         if response.data is None:
             return []
@@ -0,0 +1,71 @@
+"""
+Verified-token LRU cache for jwt_middleware.
+
+Guard devices send the same bearer token on every scan of a shift; verifying
+ES256 each time is pure CPU waste.  After one successful verify the payload is
+kept here, keyed by sha256(token), until the token's own `exp` — so an expired
+token is never served from cache.
+
+Import:
+    from utils.supabase.token_cache import get_cached_payload, cache_payload
+"""
+
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+JWT_CACHE_MAX_ENTRIES = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "4096"))
+
+# sha256(token) → (exp, payload)
+_cache: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+# ─── Public API ───────────────────────────────────────────────────────────────
+def get_cached_payload(token: str) -> Optional[dict]:
+    """Return a copy of the verified payload, or None on miss / expiry."""
+    key = _token_key(token)
+    hit = _cache.get(key)
+    if hit is None:
+        _stats["misses"] += 1
+        return None
+
+    exp, payload = hit
+    if exp <= time.time():
+        _cache.pop(key, None)
+        _stats["misses"] += 1
+        return None
+
+    _cache.move_to_end(key)
+    _stats["hits"] += 1
+    # Routes sometimes annotate the user dict — never hand out the cached object
+    return dict(payload)
+
+
+def cache_payload(token: str, payload: dict) -> None:
+    """Remember a verified payload until its exp (tokens without exp are not cached)."""
+    exp = payload.get("exp")
+    if not isinstance(exp, (int, float)) or exp <= time.time():
+        return
+
+    key = _token_key(token)
+    _cache[key] = (float(exp), dict(payload))
+    _cache.move_to_end(key)
+    while len(_cache) > JWT_CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+def clear() -> None:
+    _cache.clear()
+
+
+def stats() -> dict:
+    return {"size": len(_cache), "max_entries": JWT_CACHE_MAX_ENTRIES, **_stats}